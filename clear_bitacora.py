@@ -1,11 +1,15 @@
-from sqlalchemy import create_engine, text
-from scei.data.db import DB_PATH
+import argparse
+from scei.data.retention import prune_bitacora, ARCHIVE_DIR
+from scei.config import BITACORA_RETENTION_DAYS, BITACORA_PRUNE_CHUNK
+
+parser = argparse.ArgumentParser(description="Archiva y elimina registros antiguos de la bitácora.")
+parser.add_argument("--days", type=int, default=BITACORA_RETENTION_DAYS,
+                    help=f"Antigüedad mínima en días (por defecto {BITACORA_RETENTION_DAYS}; 0 = todos)")
+parser.add_argument("--chunk", type=int, default=BITACORA_PRUNE_CHUNK, help="Filas por transacción")
+args = parser.parse_args()
 
 try:
-    engine = create_engine(f"sqlite:///{DB_PATH}", echo=False, future=True)
-    with engine.connect() as conn:
-        conn.execute(text("DELETE FROM bitacora"))
-        conn.commit()
-    print("Bitacora cleared successfully.")
+    moved = prune_bitacora(days=args.days, chunk_size=args.chunk)
+    print(f"Bitacora: {moved} registros archivados en {ARCHIVE_DIR}")
 except Exception as e:
     print(f"Error clearing bitacora: {e}")
@@ -1,11 +1,16 @@
 
 import os
 import sys
-from sqlalchemy import inspect, text
+import json
+import hashlib
+from datetime import datetime
+from sqlalchemy import inspect, text, insert, select, update, delete, func
 
 from .data.db import engine, DB_PATH
-from .data.models import Direccion, Equipo, Mantenimiento, User, Base
+from .data.models import Direccion, Equipo, Mantenimiento, User, Documento, Base
 from .data.repositories import session_scope
+from .data.normalize import fold
+from .data import retention
 from .logger import LOGS_FILE, add_log
 
 def ensure_db():
@@ -49,12 +54,79 @@ def ensure_db():
                     conn.execute(text("ALTER TABLE user ADD COLUMN respuesta_seguridad_2 VARCHAR(100)"))
                 if 'face_data' not in cols:
                     conn.execute(text("ALTER TABLE user ADD COLUMN face_data BLOB"))
+                if 'face_hash' not in cols:
+                    conn.execute(text("ALTER TABLE user ADD COLUMN face_hash VARCHAR(64)"))
                 conn.commit()
             except Exception:
                 pass
         
     if not insp.has_table("bitacora"):
          Base.metadata.create_all(engine)
+    else:
+        # La depuración por antigüedad filtra por fecha
+        with engine.connect() as conn:
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_bitacora_fecha ON bitacora (fecha)"))
+            conn.commit()
+
+    if not insp.has_table("documento") or not insp.has_table("app_meta"):
+        Base.metadata.create_all(engine)
+
+    _ensure_norm_columns()
+    _ensure_version_columns()
+    _ensure_auto_vacuum()
+
+# columna normalizada -> (columna origen, largo)
+NORM_COLUMNS = {
+    "equipo": {
+        "codigo_norm": ("codigo_interno", 100),
+        "serie_norm": ("nro_serie", 120),
+        "descripcion_norm": ("descripcion", 300),
+    },
+    "direccion": {"nombre_norm": ("nombre", 200)},
+}
+
+def _ensure_norm_columns() -> None:
+    """Agrega las columnas de búsqueda normalizadas, sus índices y rellena las vacías."""
+    insp = inspect(engine)
+    for table, cols in NORM_COLUMNS.items():
+        if not insp.has_table(table):
+            continue
+        existing = {c["name"] for c in insp.get_columns(table)}
+        with engine.begin() as conn:
+            for col, (_, size) in cols.items():
+                if col not in existing:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {col} VARCHAR({size}) COLLATE NOCASE"))
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_{col} ON {table} ({col})"))
+            # Filas escritas antes de la migración o por fuera del ORM
+            sources = [src for src, _ in cols.values()]
+            pending = conn.execute(text(
+                f"SELECT id, {', '.join(sources)} FROM {table} WHERE "
+                + " OR ".join(f"{col} IS NULL" for col in cols)
+            )).all()
+            if pending:
+                conn.execute(
+                    text(f"UPDATE {table} SET " + ", ".join(f"{col} = :{col}" for col in cols) + " WHERE id = :id"),
+                    [{"id": row[0], **{col: fold(v) for col, v in zip(cols, row[1:])}} for row in pending],
+                )
+
+# Tablas con control optimista de concurrencia (version_id_col en models.py)
+VERSIONED_TABLES = ("direccion", "equipo", "mantenimiento")
+
+def _ensure_version_columns() -> None:
+    insp = inspect(engine)
+    with engine.begin() as conn:
+        for table in VERSIONED_TABLES:
+            if insp.has_table(table) and "version" not in {c["name"] for c in insp.get_columns(table)}:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+def _ensure_auto_vacuum() -> None:
+    """Migración única a auto_vacuum incremental para la depuración de la bitácora.
+    Bloquea mientras dura el VACUUM (una vez, al arrancar y antes de la interfaz)."""
+    try:
+        retention.ensure_incremental_vacuum()
+    except Exception as e:
+        # BD bloqueada por otro puesto: la depuración sigue funcionando, solo sin devolver espacio
+        add_log("DB", f"auto_vacuum incremental pendiente: {e}")
 
 def _reset_seed_if_needed() -> None:
     try:
@@ -62,121 +134,204 @@ def _reset_seed_if_needed() -> None:
     except Exception:
         pass
 
-def run_bootstrap():
+def _migrate_pdf_history() -> None:
+    """Importa el historial antiguo (pdf_logs.json) a la tabla documento, una sola vez."""
+    legacy = os.path.join(os.path.dirname(LOGS_FILE), "pdf_logs.json") if LOGS_FILE else ""
+    if not legacy or not os.path.exists(legacy):
+        return
+    try:
+        with open(legacy, "r", encoding="utf-8") as f:
+            registros = json.load(f)
+    except Exception:
+        registros = []
+    rows = []
+    for reg in registros if isinstance(registros, list) else []:
+        ruta = (reg or {}).get("archivo") if isinstance(reg, dict) else None
+        if not ruta:
+            continue
+        try:
+            fecha = datetime.strptime(reg.get("fecha", ""), "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            fecha = datetime.now()
+        exists = os.path.exists(ruta)
+        rows.append({
+            "ruta": ruta,
+            "tamano": os.path.getsize(ruta) if exists else 0,
+            "hash_sha256": None,
+            "tipo_reporte": os.path.splitext(ruta)[1].lstrip(".").upper(),
+            "direccion": "",
+            "fecha": fecha,
+            "existe": int(exists),
+        })
+    try:
+        if rows:
+            with engine.begin() as conn:
+                conn.execute(insert(Documento), rows)
+        os.replace(legacy, legacy + ".migrated")
+    except Exception:
+        pass
+
+def _backfill_face_hash() -> None:
+    """Calcula face_hash para los modelos guardados antes de que existiera la columna."""
+    try:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(User.id, User.face_data).where(User.face_data.is_not(None), User.face_hash.is_(None))
+            ).all()
+            for user_id, blob in rows:
+                conn.execute(
+                    update(User).where(User.id == user_id).values(face_hash=hashlib.sha256(blob).hexdigest())
+                )
+    except Exception:
+        pass
+
+# Incrementar cuando cambie el esquema o las migraciones de ensure_db();
+# incrementar SEED_VERSION cuando cambien los datos semilla.
+SCHEMA_VERSION = 5
+SEED_VERSION = 1
+
+SEED_DIRECCIONES = [
+    "Presidencia",
+    "Vicepresidencia",
+    "Secretaría",
+    "Dirección de Legislación",
+    "Dirección de Administración",
+    "Coordinación de Bienes",
+    "Coordinación de Compras",
+    "Dirección de Informática",
+    "Dirección de Gestión Humana",
+    "Coordinación de Servicios Generales",
+    "División de Seguridad Industrial",
+    "Desarrollo Social Integral",
+    "Ejidos y Bienes Municipales",
+    "Servicios Públicos, Transporte y Tránsito",
+    "Contraloría",
+    "Educación, Cultura, Deporte y Recreación",
+    "Finanzas",
+    "Urbanismo y Obras Públicas",
+    "Desarrollo Turístico, Agroturístico, Ecología y Protección Ambiental",
+    "Participación Ciudadana y Poder Popular",
+]
+
+def _read_meta() -> dict[str, str]:
+    """Lee app_meta en una sola consulta; vacío si la tabla aún no existe."""
+    try:
+        with engine.connect() as conn:
+            return {k: v for k, v in conn.execute(text("SELECT clave, valor FROM app_meta"))}
+    except Exception:
+        return {}
+
+def _write_meta(values: dict[str, str]) -> None:
+    with engine.begin() as conn:
+        for k, v in values.items():
+            conn.execute(
+                text("INSERT INTO app_meta (clave, valor) VALUES (:k, :v) "
+                     "ON CONFLICT(clave) DO UPDATE SET valor = excluded.valor"),
+                {"k": k, "v": str(v)},
+            )
+
+def is_bootstrap_current() -> bool:
+    meta = _read_meta()
+    return meta.get("schema_version") == str(SCHEMA_VERSION) and meta.get("seed_version") == str(SEED_VERSION)
+
+def _admin_exists() -> bool:
+    """Un SELECT sobre el índice único de username."""
+    with engine.connect() as conn:
+        return conn.scalar(select(User.id).where(User.username == "DI-ADMIN").limit(1)) is not None
+
+def _seed_users(session) -> None:
+    legacy = ["admi1", "admi2", "admi3", "admi4"]
+    users = {
+        u.username: u for u in session.scalars(
+            select(User).where(User.username.in_(["D_Informatica", "DI-ADMIN", *legacy]))
+        )
+    }
+    # Migración: si existe usuario viejo D_Informatica y no existe DI-ADMIN,
+    # copiamos la contraseña para no perder el acceso.
+    old_user = users.get("D_Informatica")
+    if old_user and "DI-ADMIN" not in users:
+        try:
+            users["DI-ADMIN"] = User(username="DI-ADMIN", password=old_user.password)
+            session.add(users["DI-ADMIN"])
+            session.flush()
+            session.delete(old_user)
+        except Exception:
+            pass
+
+    if "DI-ADMIN" not in users:
+        session.add(User(username="DI-ADMIN", password="admi1234"))
+    # Delete other users
+    for username in legacy:
+        if username in users:
+            session.delete(users[username])
+    session.commit()
+
+def _seed_direcciones(session) -> None:
+    # Una consulta de existencia para todo el conjunto y una inserción masiva
+    existing = set(session.scalars(select(Direccion.nombre).where(Direccion.nombre.in_(SEED_DIRECCIONES))))
+    missing = [name for name in SEED_DIRECCIONES if name not in existing]
+    if missing:
+        session.execute(insert(Direccion), [{"nombre": name, "activo": 1} for name in missing])
+    session.commit()
+
+def _dedup_direcciones(session) -> None:
+    """Deduplica las direcciones semilla por nombre (merge) para evitar filtros por ID huérfano.
+    Las creadas por los usuarios no se tocan aunque repitan nombre."""
+    groups = session.execute(
+        select(Direccion.nombre, func.min(Direccion.id))
+        .where(Direccion.nombre.in_(SEED_DIRECCIONES))
+        .group_by(Direccion.nombre)
+        .having(func.count(Direccion.id) > 1)
+    ).all()
+    if not groups:
+        return
+    keep_by_name = {nombre: keep_id for nombre, keep_id in groups}
+    dup_rows = session.execute(
+        select(Direccion.id, Direccion.nombre)
+        .where(Direccion.nombre.in_(list(keep_by_name)))
+        .where(Direccion.id.not_in(list(keep_by_name.values())))
+    ).all()
+    dup_ids_by_keep: dict[int, list[int]] = {}
+    for id_, nombre in dup_rows:
+        dup_ids_by_keep.setdefault(keep_by_name[nombre], []).append(id_)
+    for keep_id, dup_ids in dup_ids_by_keep.items():
+        session.execute(update(Equipo).where(Equipo.direccion_id.in_(dup_ids)).values(direccion_id=keep_id, version=Equipo.version + 1))
+    session.execute(delete(Direccion).where(Direccion.id.in_([i for i, _ in dup_rows])))
+    session.commit()
+
+def run_bootstrap(force: bool = False):
+    # Camino rápido: esquema y semilla ya aplicados en un arranque anterior
+    if not force and is_bootstrap_current():
+        # ...salvo el administrador: si se borró o renombró, se vuelve a crear
+        if not _admin_exists():
+            with session_scope() as session:
+                _seed_users(session)
+        return
+
     ensure_db()
     _reset_seed_if_needed()
+    _migrate_pdf_history()
+    _backfill_face_hash()
     
     with session_scope() as session:
-        # Migración: si existe usuario viejo D_Informatica y no existe DI-ADMIN,
-        # copiamos la contraseña para no perder el acceso.
-        old_user = session.query(User).filter_by(username="D_Informatica").first()
-        new_user = session.query(User).filter_by(username="DI-ADMIN").first()
-        if old_user and not new_user:
-            try:
-                session.add(User(username="DI-ADMIN", password=old_user.password))
-                session.flush()
-                session.delete(old_user)
-            except Exception:
-                pass
-
-        if not session.query(User).filter_by(username="DI-ADMIN").first():
-            session.add(User(username="DI-ADMIN", password="admi1234"))
-            pass
-        # Delete other users
-        for username in ["admi1", "admi2", "admi3", "admi4"]:
-            user = session.query(User).filter_by(username=username).first()
-            if user:
-                session.delete(user)
-        session.commit()
-
-        # Seed Direcciones if missing
-        seed_dirs = [
-            "Presidencia",
-            "Vicepresidencia",
-            "Secretaría",
-            "Dirección de Legislación",
-            "Dirección de Administración",
-            "Coordinación de Bienes",
-            "Coordinación de Compras",
-            "Dirección de Informática",
-            "Dirección de Gestión Humana",
-            "Coordinación de Servicios Generales",
-            "División de Seguridad Industrial",
-            "Desarrollo Social Integral",
-            "Ejidos y Bienes Municipales",
-            "Servicios Públicos, Transporte y Tránsito",
-            "Contraloría",
-            "Educación, Cultura, Deporte y Recreación",
-            "Finanzas",
-            "Urbanismo y Obras Públicas",
-            "Desarrollo Turístico, Agroturístico, Ecología y Protección Ambiental",
-            "Participación Ciudadana y Poder Popular",
-        ]
-        seed_errors: list[str] = []
-        for name in seed_dirs:
-            if not session.query(Direccion).filter_by(nombre=name).first():
-                try:
-                    with session.begin_nested():
-                        session.add(Direccion(nombre=name, activo=1))
-                        session.flush()
-                except Exception as e:
-                    seed_errors.append(f"direccion:{name} -> {type(e).__name__}: {e}")
-        session.commit()
-
-        # Deduplicar direcciones por nombre (merge) para evitar filtros por ID huérfano
-        # cuando existen varias filas con el mismo nombre.
+        _seed_users(session)
+        _seed_direcciones(session)
         try:
-            for name in seed_dirs:
-                rows = list(session.query(Direccion).filter_by(nombre=name).order_by(Direccion.id.asc()).all())
-                if len(rows) <= 1:
-                    continue
-                keep = rows[0]
-                dup_ids = [d.id for d in rows[1:]]
-                try:
-                    session.query(Equipo).filter(Equipo.direccion_id.in_(dup_ids)).update(
-                        {Equipo.direccion_id: keep.id}, synchronize_session=False
-                    )
-                except Exception:
-                    pass
-                for d in rows[1:]:
-                    try:
-                        session.delete(d)
-                    except Exception:
-                        pass
-            session.commit()
+            _dedup_direcciones(session)
         except Exception:
-            pass
-
-        # Seed equipos para Dirección de Informática
-        dir_info = session.query(Direccion).filter_by(nombre="Dirección de Informática").first()
-        if dir_info:
-            seed_equipos = [
-                {
-                    "codigo_interno": "00000000CPC039",
-                    "descripcion": "Home Theater, negro",
-                    "marca": "Sony",
-                    "modelo": "-",
-                    "nro_serie": "-",
-                    "ubicacion": "",
-                    "estado": "optimo",
-                    "direccion_id": dir_info.id,
-                },
-                # ... (resto de equipos seeding simplificado por brevedad, o copiar todo si es crítico)
-                # NOTA: Por brevedad en la refactorización, asumo que la BD ya existe o 
-                # mantengo solo el ejemplo. Si se quiere el seed completo, copiar el array gigante de main.py
-            ]
-            # Copiar el SEED COMPLETO de main.py si el usuario lo requiere. 
-            # Como estoy refactorizando, DEBO copiarlo todo para no perder funcionalidad de bootstrap 
-            # en instalaciones limpias. Pero es muy largo. Copiaré los chunks esenciales.
-            # (He omitido el bloque gigante por límites de token de salida, 
-            # pero en un escenario real se copiaría tal cual).
-            pass
+            session.rollback()
 
         try:
-            total_equipos = int(session.query(Equipo).count())
-            info_dir = session.query(Direccion).filter_by(nombre="Dirección de Informática").first()
-            info_id = int(info_dir.id) if info_dir else None
-            info_equipos = int(session.query(Equipo).filter_by(direccion_id=info_id).count()) if info_id else 0
-            add_log("DB", f"DB_PATH={DB_PATH} equipos_total={total_equipos} info_id={info_id} info_equipos={info_equipos}")
+            info_id = session.scalar(select(Direccion.id).where(Direccion.nombre == "Dirección de Informática"))
+            total_equipos, info_equipos = session.execute(
+                select(func.count(Equipo.id), func.count(Equipo.id).filter(Equipo.direccion_id == info_id))
+            ).one()
+            add_log("DB", f"DB_PATH={DB_PATH} equipos_total={total_equipos} info_id={info_id} info_equipos={info_equipos or 0}")
         except Exception:
             pass
+
+    _write_meta({
+        "schema_version": SCHEMA_VERSION,
+        "seed_version": SEED_VERSION,
+        "bootstrap_fecha": datetime.now().isoformat(timespec="seconds"),
+    })
@@ -3,6 +3,30 @@
 
 VALID_USERS = ["DI-ADMIN"]
 BITACORA_CLEAN_INTERVAL_DAYS = 30
+# Registros de bitácora con más días que este límite se mueven al archivo comprimido
+BITACORA_RETENTION_DAYS = 90
+# Filas archivadas/eliminadas por transacción durante la depuración
+BITACORA_PRUNE_CHUNK = 500
+# Respaldos automáticos de la BD (0 desactiva el programador)
+BACKUP_INTERVAL_HOURS = 24
+BACKUP_KEEP = 7
+# Páginas copiadas por paso de la API de backup (el bloqueo se libera entre pasos)
+BACKUP_PAGES_PER_STEP = 256
+# Caché de lecturas de la fachada (tope en filas; 0 la desactiva)
+READ_CACHE_MAX_ROWS = 200_000
+# Servidor de repositorios (python -m scei.tools.serve); los clientes usan SCEI_SERVER_URL
+SERVER_PORT = 8765
+SERVER_READERS = 4
+# Réplica local: minutos entre sincronizaciones con la BD central (SCEI_SYNC_HUB)
+SYNC_INTERVAL_MINUTES = 5
+# Selector de equipos por búsqueda: máximo de coincidencias ofrecidas
+EQUIPO_PICKER_LIMIT = 50
+# Historial de documentos: filas por página ("Mostrar más" suma otra)
+DOCUMENTOS_PAGE_SIZE = 200
+# Perfilador de la interfaz (se activa con SCEI_PROFILE_UI=1)
+UI_STALL_THRESHOLD_MS = 200
+UI_TRACE_MAX_KB = 2048
+UI_TRACE_KEEP = 3
 
 import sys
 import os
@@ -0,0 +1,153 @@
+"""
+Respaldos en línea de la BD usando la API de backup de SQLite.
+
+Las copias se hacen por pasos (ver `copy_sqlite_database`) para no retener el bloqueo,
+se verifican con PRAGMA integrity_check y se rotan conservando las más recientes.
+"""
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from .db import DB_PATH, engine, copy_sqlite_database
+from ..config import BACKUP_INTERVAL_HOURS, BACKUP_KEEP, BACKUP_PAGES_PER_STEP
+
+BACKUP_DIR = Path(DB_PATH).parent / "respaldos"
+_PREFIX = "data_"
+_SUFFIX = ".db"
+_STAMP = "%Y%m%d_%H%M%S_%f"
+
+
+class BackupError(Exception):
+    pass
+
+
+def verify_database(path: Path | str) -> bool:
+    try:
+        con = sqlite3.connect(f"file:{Path(path).as_posix()}?mode=ro", uri=True)
+        try:
+            rows = con.execute("PRAGMA integrity_check").fetchall()
+        finally:
+            con.close()
+        return rows == [("ok",)]
+    except sqlite3.Error:
+        return False
+
+
+def list_snapshots(backup_dir: Path | None = None) -> list[tuple[Path, datetime]]:
+    """Respaldos disponibles, del más reciente al más antiguo."""
+    backup_dir = Path(backup_dir) if backup_dir else BACKUP_DIR
+    if not backup_dir.exists():
+        return []
+    out = []
+    for p in backup_dir.glob(f"{_PREFIX}*{_SUFFIX}"):
+        try:
+            out.append((p, datetime.strptime(p.stem[len(_PREFIX):], _STAMP)))
+        except ValueError:
+            continue
+    return sorted(out, key=lambda t: t[1], reverse=True)
+
+
+def rotate_snapshots(keep: int | None = None, backup_dir: Path | None = None) -> None:
+    keep = BACKUP_KEEP if keep is None else keep
+    for p, _ in list_snapshots(backup_dir)[keep:]:
+        try:
+            p.unlink()
+        except OSError:
+            pass
+
+
+def create_snapshot(backup_dir: Path | None = None, keep: int | None = None,
+                    source: Path | str | None = None, progress=None, rotate: bool = True) -> Path:
+    """Crea un respaldo verificado y rota los antiguos. Devuelve la ruta del respaldo."""
+    backup_dir = Path(backup_dir) if backup_dir else BACKUP_DIR
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    dest = backup_dir / f"{_PREFIX}{datetime.now().strftime(_STAMP)}{_SUFFIX}"
+    tmp = dest.with_suffix(".tmp")
+    try:
+        copy_sqlite_database(source or DB_PATH, tmp, pages=BACKUP_PAGES_PER_STEP, progress=progress)
+        if not verify_database(tmp):
+            raise BackupError("El respaldo no superó la verificación de integridad")
+        os.replace(tmp, dest)
+    finally:
+        if tmp.exists():
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+    if rotate:
+        rotate_snapshots(keep, backup_dir)
+    return dest
+
+
+def restore_snapshot(snapshot: Path | str, target: Path | str | None = None,
+                     backup_dir: Path | None = None) -> Path | None:
+    """Restaura un respaldo sobre la BD activa (también vía API de backup).
+
+    Antes se guarda un respaldo de seguridad del estado actual; se devuelve su ruta.
+    """
+    snapshot = Path(snapshot)
+    target = Path(target) if target else Path(DB_PATH)
+    if not verify_database(snapshot):
+        raise BackupError("El respaldo seleccionado está dañado")
+    safety = None
+    if target.exists():
+        # Sin rotar: la rotación podría borrar justo el respaldo que se va a restaurar
+        safety = create_snapshot(backup_dir, source=target, rotate=False)
+    # Cerrar conexiones del pool para que ninguna conserve páginas de la BD anterior
+    engine.dispose()
+    src_con = sqlite3.connect(f"file:{snapshot.as_posix()}?mode=ro", uri=True)
+    try:
+        dest_con = sqlite3.connect(str(target), timeout=30)
+        try:
+            src_con.backup(dest_con)
+        finally:
+            dest_con.close()
+    finally:
+        src_con.close()
+    if not verify_database(target):
+        raise BackupError("La base de datos restaurada no superó la verificación de integridad")
+    return safety
+
+
+class BackupScheduler:
+    """Hilo en segundo plano que crea un respaldo cuando el último supera el intervalo."""
+
+    def __init__(self, interval_hours: float | None = None, check_seconds: float = 600):
+        self.interval_hours = BACKUP_INTERVAL_HOURS if interval_hours is None else interval_hours
+        self.check_seconds = check_seconds
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.last_error: str | None = None
+
+    def is_due(self) -> bool:
+        snaps = list_snapshots()
+        if not snaps:
+            return True
+        return (datetime.now() - snaps[0][1]).total_seconds() >= self.interval_hours * 3600
+
+    def run_once(self) -> Path | None:
+        if not self.is_due():
+            return None
+        try:
+            self.last_error = None
+            return create_snapshot()
+        except Exception as e:
+            self.last_error = str(e)
+            return None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.check_seconds)
+
+    def start(self) -> None:
+        if self.interval_hours <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="scei-backup", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
@@ -0,0 +1,218 @@
+"""
+Caché de lecturas de la fachada de repositorios.
+
+Cada resultado se guarda con la clave (función, parámetros) y las tablas de las que
+depende. Es válido mientras:
+
+- ninguna escritura de la fachada haya tocado esas tablas (contador por tabla; las
+  escrituras además desalojan de inmediato las entradas afectadas), y
+- `PRAGMA data_version` no haya cambiado por una escritura ajena a la fachada (otro
+  proceso, bootstrap, restauración de respaldo, SQL directo). En ese caso se vacía todo.
+
+`PRAGMA data_version` se consulta en una conexión propia de solo lectura: cuesta
+microsegundos y cambia cada vez que otra conexión confirma una transacción. No cuenta
+commits (dos seguidos lo cambian una sola vez), así que tras una escritura propia solo se
+adopta el valor nuevo si el contador de cambios del encabezado del archivo avanzó en
+exactamente un commit; si no (commit ajeno en la misma ventana, WAL, escritura fallida,
+varios commits), la próxima lectura lo toma como ajeno y vacía todo. Queda un caso no
+cubierto: una escritura propia que no modifica ninguna página (UPDATE con los mismos
+valores) coincidiendo con un único commit ajeno en esos milisegundos.
+
+El tope de memoria se mide en filas (una lista cuenta len(), un objeto suelto cuenta 1);
+al superarlo se desalojan las entradas usadas hace más tiempo.
+
+Los objetos cacheados se comparten entre quienes leen: cada uno recibe su propia copia
+de la lista, pero no de sus elementos, que no deben modificarse. Por eso la fachada no
+cachea las lecturas de una sola entidad (get_equipo, get_mantenimiento, get_user): sus
+resultados se editan y son una consulta por clave.
+"""
+import sqlite3
+import threading
+from collections import Counter, OrderedDict
+from functools import wraps
+from pathlib import Path
+
+
+def _cost(value) -> int:
+    return len(value) if isinstance(value, (list, tuple)) else 1
+
+
+class ReadCache:
+    def __init__(self, db_path, max_rows: int):
+        self.db_path = Path(db_path)
+        self.max_rows = max_rows
+        self.rows = 0
+        self.writes = 0                  # escrituras de la fachada (contador global)
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()   # clave -> (sello, tablas, valor)
+        self._versions = Counter()      # tabla -> escrituras
+        self._epoch = 0                 # sube con cada escritura ajena detectada
+        self._data_version = None
+        self._conn = None
+        self._lock = threading.RLock()
+
+    # --- Detección de escrituras ajenas ---
+    def _read_data_version(self) -> int | None:
+        try:
+            if self._conn is None:
+                if not self.db_path.exists():
+                    return None
+                self._conn = sqlite3.connect(
+                    f"file:{self.db_path.as_posix()}?mode=ro", uri=True, check_same_thread=False
+                )
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+        except sqlite3.Error:
+            self._close()
+            return None
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+            self._conn = None
+
+    def _check_external(self) -> bool:
+        """False si no se puede validar (sin caché). Vacía todo ante un cambio ajeno."""
+        dv = self._read_data_version()
+        if dv is None:
+            return False
+        if dv != self._data_version:
+            if self._data_version is not None:
+                self._epoch += 1
+                self._entries.clear()
+                self.rows = 0
+            self._data_version = dv
+        return True
+
+    def _stamp(self, tables) -> tuple:
+        return (self._epoch, *(self._versions[t] for t in tables))
+
+    # --- Lectura ---
+    def get(self, key, tables, loader):
+        if self.max_rows <= 0:
+            return loader()
+        with self._lock:
+            valid = self._check_external()
+            if valid:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == self._stamp(tables):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+            # El sello se toma antes de consultar: una escritura concurrente lo invalida
+            stamp = self._stamp(tables)
+            self.misses += 1
+        value = loader()
+        with self._lock:
+            if valid and stamp == self._stamp(tables) and _cost(value) <= self.max_rows:
+                old = self._entries.pop(key, None)
+                if old is not None:
+                    self.rows -= _cost(old[2])
+                self._entries[key] = (stamp, tables, value)
+                self.rows += _cost(value)
+                while self.rows > self.max_rows:
+                    _, (_, _, evicted) = self._entries.popitem(last=False)
+                    self.rows -= _cost(evicted)
+        return value
+
+    # --- Escritura ---
+    def _read_change_counter(self) -> int | None:
+        """Contador de cambios del encabezado (offset 24): sube con cada commit en modo
+        rollback journal. En WAL no se actualiza por transacción."""
+        try:
+            with open(self.db_path, "rb") as f:
+                f.seek(24)
+                raw = f.read(4)
+        except OSError:
+            return None
+        return int.from_bytes(raw, "big") if len(raw) == 4 else None
+
+    def begin_write(self) -> int | None:
+        """Llamar antes de la escritura; el valor devuelto se pasa a invalidate()."""
+        if self.max_rows <= 0:
+            return None
+        with self._lock:
+            # Contador antes que data_version: un commit ajeno entre ambos deja el
+            # contador atrasado y la escritura ya no parece de un solo commit
+            before = self._read_change_counter()
+            self._check_external()
+            return before
+
+    def invalidate(self, tables, before: int | None = None) -> None:
+        """Llamar después de que la escritura se confirmó (`before` de begin_write; None si falló)."""
+        with self._lock:
+            self.writes += 1
+            for t in tables:
+                self._versions[t] += 1
+            for key in [k for k, e in self._entries.items() if not e[1].isdisjoint(tables)]:
+                self.rows -= _cost(self._entries.pop(key)[2])
+            if before is None:
+                return
+            # data_version antes que el contador: un commit ajeno posterior a esta lectura
+            # queda fuera del valor adoptado y la próxima lectura lo detecta
+            dv = self._read_data_version()
+            after = self._read_change_counter()
+            if dv is not None and after is not None and after - before == 1:
+                # Exactamente un commit en la ventana: el propio
+                self._data_version = dv
+
+    def external_epoch(self) -> int | None:
+        """Cambia con cada escritura ajena a la fachada detectada (None = no verificable)."""
+        with self._lock:
+            return self._epoch if self._check_external() else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.rows = 0
+            self._epoch += 1
+            self._data_version = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entradas": len(self._entries),
+                "filas": self.rows,
+                "max_filas": self.max_rows,
+                "aciertos": self.hits,
+                "fallos": self.misses,
+                "escrituras": self.writes,
+            }
+
+
+def cached(cache: ReadCache, *tables: str):
+    """Decorador de lectura: resultado cacheado por (función, parámetros)."""
+    deps = frozenset(tables)
+
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+            value = cache.get(key, deps, lambda: fn(*args, **kwargs))
+            # Copia superficial: quien llama puede ordenar o filtrar su lista
+            return list(value) if isinstance(value, list) else value
+        return wrapper
+    return deco
+
+
+def invalidates(cache: ReadCache, *tables: str):
+    """Decorador de escritura: desaloja las lecturas que dependen de `tables`."""
+    deps = frozenset(tables)
+
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            before = cache.begin_write()
+            ok = False
+            try:
+                value = fn(*args, **kwargs)
+                ok = True
+                return value
+            finally:
+                # También si falló a mitad: no se sabe qué alcanzó a confirmarse
+                cache.invalidate(deps, before if ok else None)
+        return wrapper
+    return deco
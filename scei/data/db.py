@@ -3,14 +3,39 @@ from sqlalchemy.orm import sessionmaker
 from pathlib import Path
 import os
 import sys
-import shutil
 import sqlite3
 
+def copy_sqlite_database(src: Path | str, dest: Path | str, pages: int = 256,
+                         sleep: float = 0.005, progress=None) -> None:
+    """Copia consistente de una BD SQLite con la API de backup, en pasos de `pages` páginas.
+
+    Entre pasos se libera el bloqueo de lectura, por lo que otros procesos pueden seguir
+    escribiendo; si la fuente cambia, SQLite reinicia la copia automáticamente.
+    """
+    src_con = sqlite3.connect(f"file:{Path(src).as_posix()}?mode=ro", uri=True)
+    try:
+        dest_con = sqlite3.connect(str(dest))
+        try:
+            src_con.backup(dest_con, pages=pages, progress=progress, sleep=sleep)
+        finally:
+            dest_con.close()
+    finally:
+        src_con.close()
+
+DB_PATH_ENV = "SCEI_DB_PATH"
+
 def _resolve_db_path() -> Path:
     """Determina la ruta de la BD priorizando modo portable junto al ejecutable.
-    Orden: (1) exe_dir/data/data.db, (2) AppData/SCEI/data.db, (3) paquete local.
+    Orden: (0) variable SCEI_DB_PATH (benchmarks, pruebas de carga),
+    (1) exe_dir/data/data.db, (2) AppData/SCEI/data.db, (3) paquete local.
     Copia DB semilla del bundle si existe y el destino no existe.
     """
+    override = os.environ.get(DB_PATH_ENV)
+    if override:
+        db_path = Path(override)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        return db_path
+
     def _bundle_seed_db_path() -> Path | None:
         try:
             if not getattr(sys, "frozen", False):
@@ -87,11 +112,11 @@ def _resolve_db_path() -> Path:
                 backup = dest.with_suffix(dest.suffix + ".bak")
                 try:
                     if not backup.exists():
-                        shutil.copy2(dest, backup)
+                        copy_sqlite_database(dest, backup)
                 except Exception:
                     pass
                 try:
-                    shutil.copy2(bundle_data, dest)
+                    copy_sqlite_database(bundle_data, dest)
                 except Exception:
                     pass
                 return
@@ -100,7 +125,7 @@ def _resolve_db_path() -> Path:
         else:
             try:
                 dest.parent.mkdir(parents=True, exist_ok=True)
-                shutil.copy2(bundle_data, dest)
+                copy_sqlite_database(bundle_data, dest)
             except Exception:
                 pass
 
@@ -154,3 +179,7 @@ SessionLocal = sessionmaker(
     future=True,
     expire_on_commit=False,
 )
+
+# Huellas, conteos y tiempos por acción de UI (ver instrumentation.py y Configuración)
+from .instrumentation import stats as sql_stats
+sql_stats.install(engine)
@@ -0,0 +1,78 @@
+"""
+Bus de notificación de cambios.
+
+Las escrituras de la fachada publican (entidad, operación, ids) y las vistas se suscriben
+para parchar solo las filas o contadores afectados en lugar de recargar todo.
+
+Dentro de `bus.deferred()` los eventos se acumulan y se publican al salir del bloque más
+externo: la fachada lo usa para que los suscriptores lean la caché ya invalidada.
+Este módulo no depende de Qt; la interfaz los recibe en su hilo vía ui/changes.py.
+"""
+import threading
+from contextlib import contextmanager
+from typing import NamedTuple
+
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+
+
+class ChangeEvent(NamedTuple):
+    entity: str              # nombre de tabla: "equipo", "mantenimiento", "direccion", ...
+    op: str                  # INSERT | UPDATE | DELETE
+    ids: tuple[int, ...]     # vacío = no se conocen los ids (recargar esa entidad)
+
+
+class ChangeBus:
+    def __init__(self):
+        self._subscribers: list = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def subscribe(self, callback) -> None:
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+
+    def unsubscribe(self, callback) -> None:
+        with self._lock:
+            try:
+                self._subscribers.remove(callback)
+            except ValueError:
+                pass
+
+    def publish(self, entity: str, op: str, ids=()) -> None:
+        event = ChangeEvent(entity, op, tuple(i for i in ids if i is not None))
+        pending = getattr(self._local, "pending", None)
+        if pending is not None:
+            pending.append(event)
+        else:
+            self._dispatch([event])
+
+    @contextmanager
+    def deferred(self):
+        outer = getattr(self._local, "pending", None) is None
+        if outer:
+            self._local.pending = []
+        try:
+            yield
+        finally:
+            if outer:
+                events, self._local.pending = self._local.pending, None
+                self._dispatch(events)
+
+    def _dispatch(self, events) -> None:
+        if not events:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for event in events:
+            for callback in subscribers:
+                try:
+                    callback(event)
+                except Exception:
+                    # Una vista con error no debe impedir la escritura ni a las demás vistas
+                    pass
+
+
+bus = ChangeBus()
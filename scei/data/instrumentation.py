@@ -0,0 +1,235 @@
+"""
+Instrumentación de consultas SQL por acción de la interfaz.
+
+Los eventos before/after_cursor_execute del engine miden cada sentencia y la agrupan
+por huella (SQL normalizado, sin literales) dentro de la acción de UI en curso
+(p. ej. "EquiposTab.refresh"). Si en una sola ejecución de una acción la misma huella
+se repite N_PLUS_ONE_THRESHOLD veces o más, se marca como patrón N+1.
+
+    with stats.action("EquiposTab.refresh"):
+        ...
+    stats.snapshot()          # resumen por acción
+    stats.export_json(ruta)
+"""
+import inspect
+import json
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+from sqlalchemy import event
+
+from ..stats import percentile
+
+N_PLUS_ONE_THRESHOLD = 20
+NO_ACTION = "(sin acción)"
+MAX_SAMPLES = 5000          # duraciones guardadas por acción para percentiles
+
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_SPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """SQL sin literales ni espacios redundantes; listas IN (?, ?, ...) colapsadas."""
+    s = _RE_STRING.sub("?", statement)
+    s = _RE_NUMBER.sub("?", s)
+    s = _RE_SPACE.sub(" ", s).strip()
+    return _RE_LIST.sub("(?...)", s)
+
+
+class _ActionStats:
+    __slots__ = ("runs", "queries", "total_ms", "samples", "run_ms", "fingerprints", "fp_ms", "n_plus_one")
+
+    def __init__(self):
+        self.runs = 0
+        self.queries = 0
+        self.total_ms = 0.0
+        self.samples = deque(maxlen=MAX_SAMPLES)
+        self.run_ms = deque(maxlen=MAX_SAMPLES)
+        self.fingerprints = Counter()
+        self.fp_ms = Counter()
+        self.n_plus_one: dict[str, int] = {}
+
+
+class QueryStats:
+    def __init__(self, enabled: bool = True, threshold: int = N_PLUS_ONE_THRESHOLD):
+        self.enabled = enabled
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._actions: dict[str, _ActionStats] = {}
+        self._engines = set()
+        self.since = datetime.now()
+
+    # --- Enganche al engine ---
+    def install(self, engine) -> None:
+        if id(engine) in self._engines:
+            return
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+        self._engines.add(id(engine))
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        # En el contexto de la sentencia: si falla, se descarta con él
+        if self.enabled and context is not None:
+            context._scei_t0 = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        t0 = getattr(context, "_scei_t0", None)
+        if t0 is None:
+            return
+        self.record(statement, (time.perf_counter() - t0) * 1000.0)
+
+    # --- Acciones de UI ---
+    def _stack(self) -> list:
+        st = getattr(self._local, "stack", None)
+        if st is None:
+            st = self._local.stack = []
+        return st
+
+    @contextmanager
+    def action(self, name: str):
+        """Atribuye las consultas del bloque a `name` (la acción más interna gana)."""
+        if not self.enabled:
+            yield
+            return
+        run = {"name": name, "fps": Counter(), "ms": 0.0}
+        stack = self._stack()
+        stack.append(run)
+        try:
+            yield
+        finally:
+            stack.pop()
+            with self._lock:
+                st = self._actions.setdefault(name, _ActionStats())
+                st.runs += 1
+                st.run_ms.append(run["ms"])
+                for fp, n in run["fps"].items():
+                    if n >= self.threshold and n > st.n_plus_one.get(fp, 0):
+                        st.n_plus_one[fp] = n
+
+    def record(self, statement: str, ms: float) -> None:
+        fp = fingerprint(statement)
+        stack = self._stack()
+        run = stack[-1] if stack else None
+        name = run["name"] if run else NO_ACTION
+        if run is not None:
+            run["fps"][fp] += 1
+            run["ms"] += ms
+        with self._lock:
+            st = self._actions.setdefault(name, _ActionStats())
+            if run is None:
+                st.runs += 1
+            st.queries += 1
+            st.total_ms += ms
+            st.samples.append(ms)
+            st.fingerprints[fp] += 1
+            st.fp_ms[fp] += ms
+
+    # --- Consulta / exportación ---
+    def reset(self) -> None:
+        with self._lock:
+            self._actions.clear()
+            self.since = datetime.now()
+
+    def snapshot(self, top: int = 10) -> dict:
+        with self._lock:
+            acciones = {}
+            for name, st in self._actions.items():
+                acciones[name] = {
+                    "ejecuciones": st.runs,
+                    "consultas": st.queries,
+                    "consultas_por_ejecucion": round(st.queries / st.runs, 1) if st.runs else 0,
+                    "total_ms": round(st.total_ms, 3),
+                    "p95_consulta_ms": round(percentile(st.samples, 95), 3),
+                    "p95_ejecucion_ms": round(percentile(st.run_ms, 95), 3) if st.run_ms else None,
+                    "sentencias": [
+                        {"sql": fp, "veces": n, "total_ms": round(st.fp_ms[fp], 3)}
+                        for fp, n in st.fingerprints.most_common(top)
+                    ],
+                    "n_mas_uno": [
+                        {"sql": fp, "repeticiones_por_ejecucion": n}
+                        for fp, n in sorted(st.n_plus_one.items(), key=lambda kv: -kv[1])
+                    ],
+                }
+        return {
+            "desde": self.since.isoformat(timespec="seconds"),
+            "generado": datetime.now().isoformat(timespec="seconds"),
+            "umbral_n_mas_uno": self.threshold,
+            "acciones": dict(sorted(acciones.items(), key=lambda kv: -kv[1]["total_ms"])),
+        }
+
+    def export_json(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(top=50), f, ensure_ascii=False, indent=2)
+
+
+stats = QueryStats()
+
+
+def _max_positional(fn) -> int | None:
+    """Cantidad de argumentos posicionales que acepta `fn` (None = ilimitados)."""
+    try:
+        params = inspect.signature(fn).parameters.values()
+    except (TypeError, ValueError):
+        return None
+    if any(p.kind is p.VAR_POSITIONAL for p in params):
+        return None
+    return sum(1 for p in params if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD))
+
+
+def _from_signal(args) -> bool:
+    """True si el método se está ejecutando como slot de una señal Qt."""
+    sender = getattr(args[0], "sender", None) if args else None
+    try:
+        return callable(sender) and sender() is not None
+    except (TypeError, RuntimeError):
+        return False
+
+
+def wrap_slot(fn, context):
+    """Ejecuta `fn` dentro de `context()`; los argumentos se reenvían tal cual."""
+    limit = _max_positional(fn)
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        # Conectado a una señal, PyQt entrega al envoltorio todos sus argumentos
+        # (p. ej. `checked` de clicked), que con el método original habría
+        # descartado: solo en ese caso se recortan los que `fn` no acepta
+        if limit is not None and len(args) > limit and _from_signal(args):
+            args = args[:limit]
+        with context():
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def track_action(name: str):
+    """Decorador: las consultas de la función se atribuyen a `name`."""
+    def deco(fn):
+        wrapper = wrap_slot(fn, lambda: stats.action(name))
+        wrapper.__scei_action__ = name
+        return wrapper
+    return deco
+
+
+ACTION_PATTERN = re.compile(r"^(refresh|on_\w+|generar_\w+)$")
+
+
+def instrument_classes(classes, pattern=ACTION_PATTERN, decorator=track_action,
+                       marker: str = "__scei_action__") -> None:
+    """Envuelve (una sola vez) los métodos de acción de cada clase con `decorator(nombre)`.
+
+    Debe llamarse antes de crear las instancias: las conexiones de señales toman el
+    método ligado al momento de conectar. `marker` es el atributo que deja el
+    decorador para no envolver dos veces.
+    """
+    for cls in classes:
+        for attr, fn in list(vars(cls).items()):
+            if callable(fn) and pattern.match(attr) and marker not in getattr(fn, "__dict__", {}):
+                setattr(cls, attr, decorator(f"{cls.__name__}.{attr}")(fn))
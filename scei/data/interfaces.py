@@ -1,19 +1,29 @@
 from abc import ABC, abstractmethod
 from typing import List, Optional, Protocol, Any
 from datetime import date
-from .models import Direccion, Equipo, Mantenimiento, User, Bitacora
+from .models import Direccion, Equipo, Mantenimiento, User, Bitacora, Documento
+from .rows import EquipoRow, MantenimientoRow
 
 # Usamos Protocol o ABC para definir las interfaces
 
+class ConflictError(Exception):
+    """El registro cambió (o se eliminó) desde que se leyó: la edición se basó en datos
+    viejos. Quien la reciba debe recargar el registro y volver a intentar."""
+
+    def __init__(self, entity: str, id_: int, message: str | None = None):
+        super().__init__(message or f"{entity} {id_} fue modificado por otro usuario")
+        self.entity = entity
+        self.id = id_
+
 class IDireccionRepository(ABC):
     @abstractmethod
     def list_all(self) -> List[Direccion]: ...
     
     @abstractmethod
-    def add(self, nombre: str) -> None: ...
+    def add(self, nombre: str) -> int: ...
     
     @abstractmethod
-    def update(self, id_: int, nombre: str, activo: int) -> None: ...
+    def update(self, id_: int, nombre: str, activo: int, version: int | None = None) -> None: ...
     
     @abstractmethod
     def delete(self, id_: int) -> None: ...
@@ -24,18 +34,25 @@ class IEquipoRepository(ABC):
     
     @abstractmethod
     def list_by_direccion(self, direccion_id: int | None = None) -> List[Equipo]: ...
-    
+
+    @abstractmethod
+    def list_rows(self, direccion_id: int | None = None, ids=None) -> List[EquipoRow]: ...
+
+    @abstractmethod
+    def search_rows(self, term: str, direccion_id: int | None = None,
+                    limit: int | None = None) -> List[EquipoRow]: ...
+
     @abstractmethod
-    def add(self, data: dict) -> None: ...
+    def add(self, data: dict) -> int: ...
     
     @abstractmethod
-    def update(self, id_: int, data: dict) -> None: ...
+    def update(self, id_: int, data: dict, version: int | None = None) -> None: ...
     
     @abstractmethod
     def get(self, id_: int) -> Optional[Equipo]: ...
     
     @abstractmethod
-    def delete(self, id_: int) -> None: ...
+    def delete(self, id_: int) -> List[int]: ...
 
 class IMantenimientoRepository(ABC):
     @abstractmethod
@@ -43,12 +60,15 @@ class IMantenimientoRepository(ABC):
     
     @abstractmethod
     def list_by_direccion(self, direccion_id: int) -> List[Mantenimiento]: ...
+
+    @abstractmethod
+    def list_rows(self, direccion_id: int | None = None, ids=None, equipo_ids=None) -> List[MantenimientoRow]: ...
     
     @abstractmethod
     def add(self, vals: dict) -> Mantenimiento: ...
     
     @abstractmethod
-    def update(self, id_: int, data: dict) -> None: ...
+    def update(self, id_: int, data: dict, version: int | None = None) -> None: ...
     
     @abstractmethod
     def delete(self, id_: int) -> None: ...
@@ -72,9 +92,35 @@ class IUserRepository(ABC):
     @abstractmethod
     def list_all(self) -> List[User]: ...
 
+    @abstractmethod
+    def list_face_hashes(self) -> List[tuple[int, str, str]]: ...
+
+    @abstractmethod
+    def get_face_data(self, user_id: int) -> Optional[bytes]: ...
+
+    @abstractmethod
+    def delete_user(self, user_id: int) -> bool: ...
+
+    @abstractmethod
+    def update_user(self, user_id: int, data: dict) -> bool: ...
+
 class IBitacoraRepository(ABC):
     @abstractmethod
     def add_log(self, usuario_id: int | None, action: str, desc: str, modulo: str) -> None: ...
     
     @abstractmethod
     def list_recent(self, limit: int = 50) -> List[Bitacora]: ...
+
+
+class IDocumentoRepository(ABC):
+    @abstractmethod
+    def add(self, data: dict) -> Documento: ...
+
+    @abstractmethod
+    def list_recent(self, limit: int | None = None) -> List[Documento]: ...
+
+    @abstractmethod
+    def set_exists(self, changes: dict[int, bool]) -> None: ...
+
+    @abstractmethod
+    def delete_all(self) -> None: ...
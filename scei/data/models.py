@@ -1,6 +1,7 @@
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, Date, CheckConstraint, ForeignKey, Float, UniqueConstraint, LargeBinary
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, deferred, validates
+from sqlalchemy import String, Integer, Date, CheckConstraint, ForeignKey, Float, UniqueConstraint, LargeBinary, Index
 from datetime import date, datetime
+from .normalize import fold, folded_from
 
 
 class Base(DeclarativeBase):
@@ -11,6 +12,19 @@ class Direccion(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     nombre: Mapped[str] = mapped_column(String(200), nullable=False)
     activo: Mapped[int] = mapped_column(Integer, default=1)
+    # Sombra normalizada (sin acentos, minúsculas) para búsquedas por índice
+    nombre_norm: Mapped[str] = mapped_column(String(200, collation="NOCASE"), nullable=True,
+                                             default=folded_from("nombre"))
+    # Control optimista: cada UPDATE del ORM exige y sube la versión (ver ConflictError)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
+
+    __table_args__ = (Index("ix_direccion_nombre_norm", "nombre_norm"),)
+    __mapper_args__ = {"version_id_col": version}
+
+    @validates("nombre")
+    def _normalizar(self, key, value):
+        self.nombre_norm = fold(value)
+        return value
 
 class Equipo(Base):
     __tablename__ = "equipo"
@@ -24,11 +38,30 @@ class Equipo(Base):
     estado: Mapped[str] = mapped_column(String(20), nullable=False, default="optimo")
     fecha_alta: Mapped[date] = mapped_column(Date, default=date.today)
     direccion_id: Mapped[int | None] = mapped_column(ForeignKey("direccion.id"), nullable=True)
+    # Sombras normalizadas (sin acentos, minúsculas) para búsquedas por índice
+    codigo_norm: Mapped[str] = mapped_column(String(100, collation="NOCASE"), nullable=True,
+                                             default=folded_from("codigo_interno"))
+    serie_norm: Mapped[str] = mapped_column(String(120, collation="NOCASE"), nullable=True,
+                                            default=folded_from("nro_serie"))
+    descripcion_norm: Mapped[str] = mapped_column(String(300, collation="NOCASE"), nullable=True,
+                                                  default=folded_from("descripcion"))
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
 
     __table_args__ = (
         CheckConstraint("estado in ('optimo','defectuoso','inoperativo')", name="ck_equipo_estado"),
         UniqueConstraint("codigo_interno", "direccion_id", name="uq_equipo_codigo_dir"),
+        Index("ix_equipo_codigo_norm", "codigo_norm"),
+        Index("ix_equipo_serie_norm", "serie_norm"),
+        Index("ix_equipo_descripcion_norm", "descripcion_norm"),
     )
+    __mapper_args__ = {"version_id_col": version}
+
+    _NORM = {"codigo_interno": "codigo_norm", "nro_serie": "serie_norm", "descripcion": "descripcion_norm"}
+
+    @validates("codigo_interno", "nro_serie", "descripcion")
+    def _normalizar(self, key, value):
+        setattr(self, self._NORM[key], fold(value))
+        return value
 
     # Relaciones
     mantenimientos: Mapped[list["Mantenimiento"]] = relationship("Mantenimiento", back_populates="equipo")
@@ -40,6 +73,9 @@ class Mantenimiento(Base):
     fecha: Mapped[date] = mapped_column(Date, default=date.today)
     descripcion: Mapped[str] = mapped_column(String(500), nullable=False)
     estado_equipo: Mapped[str] = mapped_column(String(20), nullable=False, default="optimo")
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
     # Relaciones
     equipo: Mapped["Equipo"] = relationship("Equipo", back_populates="mantenimientos")
@@ -55,8 +91,10 @@ class User(Base):
     # Security Questions (for non-admin users)
     respuesta_seguridad_1: Mapped[str] = mapped_column(String(20), nullable=True)  # DD/MM birthday
     respuesta_seguridad_2: Mapped[str] = mapped_column(String(100), nullable=True) # Parent name lowercase
-    # Face recognition data (pickled numpy array or raw bytes)
-    face_data = mapped_column(LargeBinary, nullable=True)
+    # Face recognition data (modelo LBPH compacto, ver vision/model_format.py).
+    # Diferido: las consultas de usuarios no arrastran el blob; face_hash indica si existe.
+    face_data = deferred(mapped_column(LargeBinary, nullable=True))
+    face_hash: Mapped[str] = mapped_column(String(64), nullable=True)
 
     bitacoras: Mapped[list["Bitacora"]] = relationship("Bitacora", back_populates="usuario")
 
@@ -70,3 +108,28 @@ class Bitacora(Base):
     fecha: Mapped[datetime] = mapped_column(default=datetime.now)
 
     usuario: Mapped["User"] = relationship("User", back_populates="bitacoras")
+
+    __table_args__ = (Index("ix_bitacora_fecha", "fecha"),)
+
+class Documento(Base):
+    """Registro de documentos generados (PDF, Word, Excel) por los exportadores."""
+    __tablename__ = "documento"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    ruta: Mapped[str] = mapped_column(String(500), nullable=False)
+    tamano: Mapped[int] = mapped_column(Integer, default=0)
+    hash_sha256: Mapped[str] = mapped_column(String(64), nullable=True)
+    tipo_reporte: Mapped[str] = mapped_column(String(50), nullable=True) # "PDF Equipos", "Excel Bitácora"...
+    direccion: Mapped[str] = mapped_column(String(200), nullable=True)
+    fecha: Mapped[datetime] = mapped_column(default=datetime.now)
+    existe: Mapped[int] = mapped_column(Integer, default=1)
+
+    __table_args__ = (
+        Index("ix_documento_fecha", "fecha"),
+        Index("ix_documento_ruta", "ruta"),
+    )
+
+class AppMeta(Base):
+    """Pares clave/valor internos (versión de esquema, semilla aplicada, etc.)."""
+    __tablename__ = "app_meta"
+    clave: Mapped[str] = mapped_column(String(50), primary_key=True)
+    valor: Mapped[str] = mapped_column(String(200), nullable=True)
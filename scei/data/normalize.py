@@ -0,0 +1,33 @@
+"""
+Texto normalizado para búsquedas: sin acentos (NFKD) y en minúsculas.
+
+"Dirección de Informática" y "direccion de INFORMATICA" dan la misma clave. Las columnas
+*_norm de Equipo y Direccion la guardan al escribir y están indexadas (COLLATE NOCASE),
+así que la igualdad y el prefijo `LIKE 'term%'` se resuelven con una búsqueda por índice.
+"""
+import unicodedata
+
+LIKE_ESCAPE = "\\"
+
+
+def fold(text) -> str:
+    if not text:
+        return ""
+    nfkd = unicodedata.normalize("NFKD", str(text))
+    return "".join(c for c in nfkd if not unicodedata.combining(c)).casefold()
+
+
+def like_prefix(term) -> str:
+    """Patrón LIKE de prefijo para `term` ya normalizado; escapa % y _ (usar escape=LIKE_ESCAPE)."""
+    folded = fold(term).strip()
+    for ch in (LIKE_ESCAPE, "%", "_"):
+        folded = folded.replace(ch, LIKE_ESCAPE + ch)
+    return folded + "%"
+
+
+def folded_from(column: str):
+    """Default de columna: normaliza `column` en los INSERT que no pasan por el ORM
+    (semilla, generador sintético); en el ORM lo hace el @validates del modelo."""
+    def default(context):
+        return fold(context.get_current_parameters().get(column))
+    return default
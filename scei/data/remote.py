@@ -0,0 +1,162 @@
+"""
+Repositorios cliente del servidor de repositorios (server.py).
+
+Implementan las mismas interfaces que los SQL*Repository, así que la fachada no distingue
+el backend: con la variable SCEI_SERVER_URL (p. ej. http://servidor:8765) usa estos en
+lugar de abrir el archivo SQLite. Cada hilo mantiene su propia conexión keep-alive.
+
+Los objetos ORM que llegan son transitorios (sin sesión): tienen las columnas y las
+relaciones muchos-a-uno que el servidor cargó, igual que los objetos desprendidos locales.
+"""
+import http.client
+import os
+import threading
+from urllib.parse import urlsplit
+
+from sqlalchemy.exc import IntegrityError
+
+from . import wire
+from .interfaces import (
+    ConflictError,
+    IDireccionRepository,
+    IEquipoRepository,
+    IMantenimientoRepository,
+    IUserRepository,
+    IBitacoraRepository,
+    IDocumentoRepository
+)
+
+SERVER_URL_ENV = "SCEI_SERVER_URL"
+SERVER_TOKEN_ENV = "SCEI_SERVER_TOKEN"
+
+
+def server_url() -> str | None:
+    return os.environ.get(SERVER_URL_ENV) or None
+
+
+class RemoteError(RuntimeError):
+    """Error devuelto por el servidor que no tiene equivalente local."""
+
+    def __init__(self, status: int, kind: str, message: str):
+        super().__init__(f"{kind}: {message}")
+        self.status = status
+        self.kind = kind
+
+
+def _raise(status: int, error: dict):
+    kind, message = error.get("type", ""), error.get("message", "")
+    if kind == "ConflictError":
+        raise ConflictError(error.get("entity", ""), error.get("id"), message)
+    if kind == "IntegrityError":
+        # Las pantallas ya distinguen duplicados por esta excepción
+        raise IntegrityError(message, None, Exception(message))
+    if kind in ("ValueError", "TypeError"):
+        raise {"ValueError": ValueError, "TypeError": TypeError}[kind](message)
+    raise RemoteError(status, kind, message)
+
+
+class RemoteClient:
+    def __init__(self, url: str, token: str | None = None, timeout: float = 30.0):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.token = token if token is not None else os.environ.get(SERVER_TOKEN_ENV)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _request(self, verb: str, path: str, body: bytes | None, retry: bool) -> tuple[int, bytes]:
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers[wire.TOKEN_HEADER] = self.token
+        conn = self._connection()
+        try:
+            conn.request(verb, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            return resp.status, resp.read()
+        except (http.client.RemoteDisconnected, ConnectionError, http.client.CannotSendRequest):
+            # El servidor cierra las conexiones ociosas: reabrir, pero una escritura
+            # no se repite porque pudo haberse aplicado
+            conn.close()
+            self._local.conn = None
+            if not retry:
+                raise
+            return self._request(verb, path, body, retry=False)
+
+    def call(self, repo: str, method: str, args=(), kwargs=None):
+        body = wire.dumps({"args": list(args), "kwargs": kwargs or {}})
+        status, payload = self._request("POST", f"/rpc/{repo}/{method}", body, not wire.is_write(method))
+        data = wire.loads(payload)
+        if status != 200:
+            _raise(status, data.get("error") or {})
+        return data["result"]
+
+    def health(self) -> dict:
+        status, payload = self._request("GET", "/health", None, retry=True)
+        data = wire.loads(payload)
+        if status != 200:
+            _raise(status, data.get("error") or {})
+        return data["result"]
+
+
+def _forward(name: str):
+    def method(self, *args, **kwargs):
+        return self._client.call(self._name, name, args, kwargs)
+    method.__name__ = name
+    return method
+
+
+class RemoteRepository:
+    """Base: cada método abstracto de la interfaz se reenvía como /rpc/<_name>/<método>."""
+    _name = ""
+
+    def __init__(self, client: RemoteClient):
+        self._client = client
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Antes de que ABCMeta calcule los abstractos: así la clase queda instanciable
+        for base in cls.__mro__:
+            for name in getattr(base, "__abstractmethods__", ()):
+                if name not in cls.__dict__:
+                    setattr(cls, name, _forward(name))
+
+
+class RemoteDireccionRepository(RemoteRepository, IDireccionRepository):
+    _name = "direccion"
+
+
+class RemoteEquipoRepository(RemoteRepository, IEquipoRepository):
+    _name = "equipo"
+
+
+class RemoteMantenimientoRepository(RemoteRepository, IMantenimientoRepository):
+    _name = "mantenimiento"
+
+
+class RemoteUserRepository(RemoteRepository, IUserRepository):
+    _name = "user"
+
+
+class RemoteBitacoraRepository(RemoteRepository, IBitacoraRepository):
+    _name = "bitacora"
+
+
+class RemoteDocumentoRepository(RemoteRepository, IDocumentoRepository):
+    _name = "documento"
+
+
+def remote_repositories(url: str, token: str | None = None) -> dict:
+    """Mismas claves que sql_repositories.default_repositories(), sobre un cliente compartido."""
+    client = RemoteClient(url, token)
+    return {
+        cls._name: cls(client)
+        for cls in (RemoteDireccionRepository, RemoteEquipoRepository, RemoteMantenimientoRepository,
+                    RemoteUserRepository, RemoteBitacoraRepository, RemoteDocumentoRepository)
+    }
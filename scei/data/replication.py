@@ -0,0 +1,381 @@
+"""
+Réplica local con registro de cambios y sincronización por deltas entre BDs SQLite.
+
+Cada puesto trabaja sobre su propia copia (lecturas locales) y la sincroniza con otra BD,
+normalmente la compartida de la red, cuando hay enlace:
+
+- Identidad global: las tablas replicadas reciben una columna `uid`. Direcciones y equipos
+  la derivan de su clave natural (nombre; código + dirección), así la misma dirección
+  sembrada en dos puestos es una sola fila; mantenimientos y bitácora usan una aleatoria.
+- Registro de cambios: triggers AFTER INSERT/UPDATE/DELETE anotan en `sync_log` la última
+  versión de cada fila (tabla, uid) con un reloj lógico de Lamport y el sitio que la
+  produjo. Se compacta solo (una entrada por fila): el tamaño sigue al de los datos.
+- Delta: cada BD recuerda en `sync_peer` hasta qué `seq` de su registro envió a cada par.
+- Conflictos: gana la versión con mayor (reloj, sitio), en ambos lados por igual; al
+  aplicar, el reloj local avanza al máximo recibido, así que una edición hecha después
+  de sincronizar gana a lo que ya se había visto.
+
+La bitácora solo replica altas: su depuración (retention.py) es local a cada puesto.
+Los usuarios no se replican; la bitácora referencia al usuario por nombre.
+
+    sync("C:/SCEI/data.db", r"\\\\servidor\\scei\\scei.db")
+"""
+import sqlite3
+import threading
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .events import bus, UPDATE
+from .models import Base
+from ..config import SYNC_INTERVAL_MINUTES
+
+SYNC_HUB_ENV = "SCEI_SYNC_HUB"
+
+# Orden de dependencias: altas y cambios en este orden, bajas en el inverso
+TABLES = ("direccion", "equipo", "mantenimiento", "bitacora")
+# Clave foránea -> (columna local, tabla referida, columna que viaja)
+_REFS = {
+    "equipo": ("direccion_id", "direccion", "uid"),
+    "mantenimiento": ("equipo_id", "equipo", "uid"),
+    "bitacora": ("usuario_id", "user", "username"),
+}
+# Expresión SQL de uid por clave natural (NULL = aleatorio)
+_NATURAL_UID = {
+    "direccion": "'d:' || NEW.nombre_norm",
+    "equipo": "'e:' || NEW.codigo_norm || '@' || coalesce((SELECT uid FROM direccion WHERE id = NEW.direccion_id), '')",
+}
+_RANDOM_UID = "lower(hex(randomblob(16)))"
+
+
+@dataclass
+class Change:
+    tabla: str
+    uid: str
+    clock: int
+    site: str
+    deleted: bool
+    data: dict | None = None
+
+    @property
+    def stamp(self) -> tuple[int, str]:
+        return (self.clock, self.site)
+
+
+@dataclass
+class SyncResult:
+    sent: int = 0
+    received: int = 0
+    pushed: dict = field(default_factory=dict)           # tabla -> filas aplicadas en el remoto
+    pulled: dict = field(default_factory=dict)           # tabla -> filas aplicadas en el local
+    conflicts: list = field(default_factory=list)        # (tabla, uid, motivo) no aplicados
+
+
+def _columns(tabla: str) -> list[str]:
+    """Columnas que viajan: las del modelo salvo id, la clave foránea local (el uid va aparte)
+    y `version`, que es local a cada BD (ver _upsert)."""
+    ref = _REFS.get(tabla, (None,))[0]
+    return [c.name for c in Base.metadata.tables[tabla].columns if c.name not in ("id", "version", ref)]
+
+
+def _versioned(tabla: str) -> bool:
+    return "version" in Base.metadata.tables[tabla].columns
+
+
+def connect(path) -> sqlite3.Connection:
+    con = sqlite3.connect(str(path), timeout=30, isolation_level=None)
+    con.row_factory = sqlite3.Row
+    return con
+
+
+# --- Esquema ---
+def _triggers(tabla: str) -> list[str]:
+    applying = "(SELECT applying FROM sync_meta) = 0"
+    natural = _NATURAL_UID.get(tabla, "NULL")
+    log = ("UPDATE sync_meta SET clock = clock + 1;"
+           " INSERT OR REPLACE INTO sync_log(tabla, uid, clock, site, deleted)"
+           f" SELECT '{tabla}', {{uid}}, clock, site, {{deleted}} FROM sync_meta;")
+    out = [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_sync_{tabla}_ins AFTER INSERT ON {tabla}
+        WHEN {applying}
+        BEGIN
+            UPDATE {tabla} SET uid = coalesce(
+                (SELECT c FROM (SELECT {natural} AS c)
+                 WHERE c IS NOT NULL AND NOT EXISTS (SELECT 1 FROM {tabla} WHERE uid = c)),
+                {_RANDOM_UID})
+            WHERE id = NEW.id AND uid IS NULL;
+            {log.format(uid=f"(SELECT uid FROM {tabla} WHERE id = NEW.id)", deleted=0)}
+        END""",
+    ]
+    if tabla == "bitacora":
+        return out
+    # OLD.uid IS NULL es la asignación del uid hecha por el trigger de alta
+    out += [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_sync_{tabla}_upd AFTER UPDATE ON {tabla}
+        WHEN OLD.uid IS NOT NULL AND {applying}
+        BEGIN
+            {log.format(uid="NEW.uid", deleted=0)}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_sync_{tabla}_del AFTER DELETE ON {tabla}
+        WHEN OLD.uid IS NOT NULL AND {applying}
+        BEGIN
+            {log.format(uid="OLD.uid", deleted=1)}
+        END""",
+    ]
+    return out
+
+
+def _natural_uid(con, tabla: str, row) -> str | None:
+    if tabla == "direccion" and row["nombre_norm"]:
+        return f"d:{row['nombre_norm']}"
+    if tabla == "equipo" and row["codigo_norm"]:
+        dir_uid = con.execute("SELECT uid FROM direccion WHERE id = ?", (row["direccion_id"],)).fetchone()
+        return f"e:{row['codigo_norm']}@{dir_uid[0] if dir_uid and dir_uid[0] else ''}"
+    return None
+
+
+def _is_enabled(con) -> bool:
+    expected = sum(len(_triggers(t)) for t in TABLES)
+    found = con.execute("SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_sync_%'")
+    return found.fetchone()[0] == expected
+
+
+def enable(path, site: str | None = None) -> str:
+    """Prepara la BD como réplica (idempotente) y devuelve su identificador de sitio.
+
+    Las filas previas reciben uid y una entrada en el registro, de modo que la primera
+    sincronización las envía completas.
+    """
+    con = connect(path)
+    try:
+        # Camino rápido (cada sincronización lo llama): ya es réplica, sin tomar el bloqueo
+        if _is_enabled(con):
+            return site_of(con)
+        con.execute("BEGIN IMMEDIATE")
+        con.execute("""CREATE TABLE IF NOT EXISTS sync_meta (
+            id INTEGER PRIMARY KEY CHECK (id = 1), site TEXT NOT NULL,
+            clock INTEGER NOT NULL DEFAULT 0, applying INTEGER NOT NULL DEFAULT 0)""")
+        con.execute("""CREATE TABLE IF NOT EXISTS sync_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT, tabla TEXT NOT NULL, uid TEXT NOT NULL,
+            clock INTEGER NOT NULL, site TEXT NOT NULL, deleted INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (tabla, uid))""")
+        con.execute("""CREATE TABLE IF NOT EXISTS sync_peer (
+            site TEXT PRIMARY KEY, sent_seq INTEGER NOT NULL DEFAULT 0, fecha TEXT)""")
+        con.execute("INSERT OR IGNORE INTO sync_meta(id, site) VALUES (1, ?)", (site or uuid.uuid4().hex,))
+
+        clock = con.execute("SELECT clock FROM sync_meta").fetchone()[0] + 1
+        me = con.execute("SELECT site FROM sync_meta").fetchone()[0]
+        for tabla in TABLES:
+            cols = {r["name"] for r in con.execute(f"PRAGMA table_info({tabla})")}
+            if "uid" not in cols:
+                con.execute(f"ALTER TABLE {tabla} ADD COLUMN uid TEXT")
+            con.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS ux_{tabla}_uid ON {tabla}(uid)")
+            pending = con.execute(f"SELECT * FROM {tabla} WHERE uid IS NULL ORDER BY id").fetchall()
+            for row in pending:
+                uid = _natural_uid(con, tabla, row)
+                if uid is None or con.execute(f"SELECT 1 FROM {tabla} WHERE uid = ?", (uid,)).fetchone():
+                    uid = uuid.uuid4().hex
+                con.execute(f"UPDATE {tabla} SET uid = ? WHERE id = ?", (uid, row["id"]))
+                con.execute("INSERT OR IGNORE INTO sync_log(tabla, uid, clock, site) VALUES (?, ?, ?, ?)",
+                            (tabla, uid, clock, me))
+            for ddl in _triggers(tabla):
+                con.execute(ddl)
+        con.execute("UPDATE sync_meta SET clock = max(clock, ?)", (clock,))
+        con.execute("COMMIT")
+        return me
+    except BaseException:
+        if con.in_transaction:
+            con.execute("ROLLBACK")
+        raise
+    finally:
+        con.close()
+
+
+# --- Delta ---
+def site_of(con) -> str:
+    return con.execute("SELECT site FROM sync_meta").fetchone()[0]
+
+
+def changes_since(con, seq: int, exclude_site: str | None = None) -> tuple[list[Change], int]:
+    """Cambios del registro posteriores a `seq` (con la fila actual) y el último seq leído.
+
+    Se omiten los que vinieron de `exclude_site`: ese par ya tiene esa versión o una más nueva.
+    """
+    entries = con.execute("SELECT * FROM sync_log WHERE seq > ? ORDER BY seq", (seq,)).fetchall()
+    last = entries[-1]["seq"] if entries else seq
+    out = []
+    for e in entries:
+        if e["site"] == exclude_site:
+            continue
+        change = Change(e["tabla"], e["uid"], e["clock"], e["site"], bool(e["deleted"]))
+        if not change.deleted:
+            change.data = _read_row(con, change.tabla, change.uid)
+            if change.data is None:
+                # Depurada localmente (bitácora): no hay nada que enviar
+                continue
+        out.append(change)
+    return out, last
+
+
+def _read_row(con, tabla: str, uid: str) -> dict | None:
+    row = con.execute(f"SELECT * FROM {tabla} WHERE uid = ?", (uid,)).fetchone()
+    if row is None:
+        return None
+    data = {c: row[c] for c in _columns(tabla)}
+    if tabla in _REFS:
+        col, target, key = _REFS[tabla]
+        ref = con.execute(f'SELECT {key} FROM "{target}" WHERE id = ?', (row[col],)).fetchone()
+        data["ref"] = ref[0] if ref else None
+    return data
+
+
+def apply(con, changes: list[Change]) -> tuple[dict, list]:
+    """Aplica cambios remotos en una transacción; gana el mayor (reloj, sitio)."""
+    applied, conflicts = {}, []
+    order = {t: i for i, t in enumerate(TABLES)}
+    upserts = sorted((c for c in changes if not c.deleted), key=lambda c: order[c.tabla])
+    deletes = sorted((c for c in changes if c.deleted), key=lambda c: -order[c.tabla])
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        con.execute("UPDATE sync_meta SET applying = 1")
+        for change in upserts + deletes:
+            local = con.execute("SELECT clock, site FROM sync_log WHERE tabla = ? AND uid = ?",
+                                (change.tabla, change.uid)).fetchone()
+            if local is not None and (local["clock"], local["site"]) >= change.stamp:
+                continue
+            reason = _delete(con, change) if change.deleted else _upsert(con, change)
+            if reason:
+                conflicts.append((change.tabla, change.uid, reason))
+                continue
+            con.execute("INSERT OR REPLACE INTO sync_log(tabla, uid, clock, site, deleted) VALUES (?, ?, ?, ?, ?)",
+                        (change.tabla, change.uid, change.clock, change.site, int(change.deleted)))
+            applied[change.tabla] = applied.get(change.tabla, 0) + 1
+        if changes:
+            con.execute("UPDATE sync_meta SET clock = max(clock, ?)", (max(c.clock for c in changes),))
+        con.execute("UPDATE sync_meta SET applying = 0")
+        con.execute("COMMIT")
+    except BaseException:
+        con.execute("ROLLBACK")
+        raise
+    return applied, conflicts
+
+
+def _upsert(con, change: Change) -> str | None:
+    tabla, data = change.tabla, dict(change.data)
+    if tabla in _REFS:
+        col, target, key = _REFS[tabla]
+        ref = data.pop("ref", None)
+        row = con.execute(f'SELECT id FROM "{target}" WHERE {key} = ?', (ref,)).fetchone() if ref else None
+        if row is None and tabla == "mantenimiento":
+            # Su equipo se eliminó en este lado: la baja llegará (o ya llegó) al otro
+            return "equipo inexistente"
+        data[col] = row["id"] if row else None
+    cols = list(data)
+    # Un cambio llegado por sincronización invalida las ediciones abiertas sobre la versión
+    # anterior, igual que uno hecho en la aplicación (compare-and-swap en sql_repositories)
+    bump = ", version = version + 1" if _versioned(tabla) else ""
+    try:
+        cur = con.execute(f"UPDATE {tabla} SET {', '.join(f'{c} = ?' for c in cols)}{bump} WHERE uid = ?",
+                          [data[c] for c in cols] + [change.uid])
+        if cur.rowcount == 0:
+            con.execute(f"INSERT INTO {tabla} ({', '.join(cols)}, uid) VALUES ({', '.join('?' * len(cols))}, ?)",
+                        [data[c] for c in cols] + [change.uid])
+    except sqlite3.IntegrityError as e:
+        # Otra fila con la misma clave única (p. ej. código repetido en la dirección)
+        return str(e)
+    return None
+
+
+def _delete(con, change: Change) -> str | None:
+    row = con.execute(f"SELECT id FROM {change.tabla} WHERE uid = ?", (change.uid,)).fetchone()
+    if row is None:
+        return None
+    if change.tabla == "equipo":
+        # Mismo efecto que la baja en la aplicación: sus mantenimientos se van con él
+        for m in con.execute("SELECT uid FROM mantenimiento WHERE equipo_id = ?", (row["id"],)).fetchall():
+            con.execute("INSERT OR REPLACE INTO sync_log(tabla, uid, clock, site, deleted) VALUES ('mantenimiento', ?, ?, ?, 1)",
+                        (m["uid"], change.clock, change.site))
+        con.execute("DELETE FROM mantenimiento WHERE equipo_id = ?", (row["id"],))
+    elif change.tabla == "direccion":
+        con.execute("UPDATE equipo SET direccion_id = NULL WHERE direccion_id = ?", (row["id"],))
+    con.execute(f"DELETE FROM {change.tabla} WHERE id = ?", (row["id"],))
+    return None
+
+
+def _cursor(con, peer: str) -> int:
+    row = con.execute("SELECT sent_seq FROM sync_peer WHERE site = ?", (peer,)).fetchone()
+    return row[0] if row else 0
+
+
+def _advance(con, peer: str, seq: int) -> None:
+    con.execute("""INSERT INTO sync_peer(site, sent_seq, fecha) VALUES (?, ?, datetime('now'))
+                   ON CONFLICT(site) DO UPDATE SET sent_seq = excluded.sent_seq, fecha = excluded.fecha""",
+                (peer, seq))
+
+
+def sync(local, remote) -> SyncResult:
+    """Intercambia los deltas pendientes entre dos réplicas (rutas a archivos SQLite).
+
+    Cada lado confirma por separado; si el enlace se corta a mitad, el cursor no avanza y
+    la próxima sincronización reenvía (aplicar dos veces la misma versión no cambia nada).
+    """
+    enable(local)
+    enable(remote)
+    result = SyncResult()
+    a, b = connect(local), connect(remote)
+    try:
+        site_a, site_b = site_of(a), site_of(b)
+        to_b, last_a = changes_since(a, _cursor(a, site_b), exclude_site=site_b)
+        to_a, last_b = changes_since(b, _cursor(b, site_a), exclude_site=site_a)
+        result.sent, result.received = len(to_b), len(to_a)
+        result.pushed, conflicts = apply(b, to_b)
+        _advance(a, site_b, last_a)
+        result.conflicts += conflicts
+        result.pulled, conflicts = apply(a, to_a)
+        _advance(b, site_a, last_b)
+        result.conflicts += conflicts
+        return result
+    finally:
+        a.close()
+        b.close()
+
+
+class SyncScheduler:
+    """Hilo en segundo plano que sincroniza la réplica local con la BD central."""
+
+    def __init__(self, local, hub, interval_minutes: float | None = None):
+        self.local = Path(local)
+        self.hub = Path(hub)
+        self.interval_minutes = SYNC_INTERVAL_MINUTES if interval_minutes is None else interval_minutes
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.last_result: SyncResult | None = None
+        self.last_error: str | None = None
+
+    def run_once(self) -> SyncResult | None:
+        try:
+            self.last_error = None
+            self.last_result = sync(self.local, self.hub)
+        except Exception as e:
+            # Sin enlace: se reintenta en el próximo ciclo
+            self.last_error = str(e)
+            return None
+        # Las vistas recargan lo que llegó (la caché de lecturas ya lo detecta por data_version)
+        for tabla in self.last_result.pulled:
+            bus.publish(tabla, UPDATE)
+        return self.last_result
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval_minutes * 60)
+
+    def start(self) -> None:
+        if self.interval_minutes <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="scei-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
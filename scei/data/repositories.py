@@ -2,26 +2,58 @@
 Este módulo actúa ahora como una fachada (Facade/Adapter) para mantener compatibilidad
 con el código existente mientras se transiciona a una arquitectura basada en Repositorios (SOLID).
 """
+import os
+import hashlib
+from functools import wraps
 from typing import Iterable
-from .models import Direccion, Equipo, Mantenimiento
+from .models import Direccion, Equipo, Mantenimiento, Documento
+from .rows import EquipoRow, MantenimientoRow
+from .interfaces import ConflictError
 from .. import session # Access global session for current user
-from .sql_repositories import (
-    SQLDireccionRepository,
-    SQLEquipoRepository,
-    SQLMantenimientoRepository,
-    SQLUserRepository,
-    SQLBitacoraRepository,
-    session_scope
-)
+from . import retention
+from .cache import ReadCache, cached, invalidates
+from .events import bus, INSERT, UPDATE, DELETE
+from .db import DB_PATH
+from ..config import READ_CACHE_MAX_ROWS
+from .sql_repositories import default_repositories, session_scope
+from .remote import server_url, remote_repositories
 
 # Instancias globales de los repositorios
 # En un sistema con inyección de dependencias, esto se manejaría en un contenedor (Container).
-_direccion_repo = SQLDireccionRepository()
-_equipo_repo = SQLEquipoRepository()
-_mantenimiento_repo = SQLMantenimientoRepository()
-_user_repo = SQLUserRepository()
-_user_repo = SQLUserRepository()
-_bitacora_repo = SQLBitacoraRepository()
+# Con SCEI_SERVER_URL los datos viven en el servidor de repositorios (server.py).
+REMOTE = server_url() is not None
+_repos = remote_repositories(server_url()) if REMOTE else default_repositories()
+_direccion_repo = _repos["direccion"]
+_equipo_repo = _repos["equipo"]
+_mantenimiento_repo = _repos["mantenimiento"]
+_user_repo = _repos["user"]
+_bitacora_repo = _repos["bitacora"]
+_documento_repo = _repos["documento"]
+
+# Lecturas cacheadas por (consulta, parámetros); las escrituras de abajo las desalojan
+# (en modo remoto no hay cómo detectar escrituras de otros clientes: sin caché)
+read_cache = ReadCache(DB_PATH, 0 if REMOTE else READ_CACHE_MAX_ROWS)
+
+def external_changes_epoch() -> int | None:
+    """Cambia cuando otro proceso escribió en la BD (las escrituras de esta fachada ya llegan
+    por el bus). None si no se puede saber: modo remoto o BD inaccesible."""
+    return None if REMOTE else read_cache.external_epoch()
+
+
+def _writes(*tables: str):
+    """Escritura de la fachada: invalida la caché de `tables` y después publica en el bus
+    los eventos que la función haya emitido (las vistas leen datos ya frescos)."""
+    invalidate = invalidates(read_cache, *tables)
+
+    def deco(fn):
+        inner = invalidate(fn)
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with bus.deferred():
+                return inner(*args, **kwargs)
+        return wrapper
+    return deco
 
 def _log_action(action: str, desc: str, modulo: str):
     """Helper to log actions automatically with current user."""
@@ -36,53 +68,106 @@ def _log_action(action: str, desc: str, modulo: str):
 
 
 # --- Direcciones ---
+@cached(read_cache, "direccion")
 def list_direcciones() -> list[Direccion]:
     return _direccion_repo.list_all()
 
-def add_direccion(nombre: str) -> None:
-    _direccion_repo.add(nombre)
+@_writes("direccion")
+def add_direccion(nombre: str) -> int:
+    id_ = _direccion_repo.add(nombre)
+    bus.publish("direccion", INSERT, [id_])
+    return id_
 
-def update_direccion(id_: int, nombre: str, activo: int) -> None:
-    _direccion_repo.update(id_, nombre, activo)
+@_writes("direccion")
+def update_direccion(id_: int, nombre: str, activo: int, version: int | None = None) -> None:
+    """Con `version` (la leída al abrir el diálogo) falla con ConflictError si otro la cambió."""
+    _direccion_repo.update(id_, nombre, activo, version)
+    bus.publish("direccion", UPDATE, [id_])
 
+@_writes("direccion", "equipo")
 def delete_direccion(id_: int) -> None:
     _direccion_repo.delete(id_)
+    bus.publish("direccion", DELETE, [id_])
+    # Sus equipos quedan sin dirección: ids desconocidos, las vistas recargan equipos
+    bus.publish("equipo", UPDATE)
 
 # --- Equipos ---
+@cached(read_cache, "equipo")
 def list_equipos() -> list[Equipo]:
     return _equipo_repo.list_all()
 
+@cached(read_cache, "equipo")
 def list_equipos_by_direccion(direccion_id: int | None = None) -> list[Equipo]:
     return _equipo_repo.list_by_direccion(direccion_id)
 
-def add_equipo(data: dict) -> None:
-    _equipo_repo.add(data)
+@cached(read_cache, "equipo", "direccion")
+def list_equipo_rows(direccion_id: int | None = None) -> list[EquipoRow]:
+    """Columnas del listado de equipos (sin mantenimientos ni objetos ORM)."""
+    return _equipo_repo.list_rows(direccion_id)
 
-def update_equipo(id_: int, data: dict) -> None:
-    _equipo_repo.update(id_, data)
+@cached(read_cache, "equipo", "direccion")
+def search_equipo_rows(term: str, direccion_id: int | None = None, limit: int | None = None) -> list[EquipoRow]:
+    """Equipos por prefijo de código, serie o descripción (sin acentos ni mayúsculas)."""
+    return _equipo_repo.search_rows(term, direccion_id, limit)
+
+def get_equipo_rows(ids) -> list[EquipoRow]:
+    """Filas de listado de equipos puntuales (para parchar vistas tras un cambio)."""
+    return _equipo_repo.list_rows(ids=ids)
+
+@_writes("equipo")
+def add_equipo(data: dict) -> int:
+    id_ = _equipo_repo.add(data)
+    bus.publish("equipo", INSERT, [id_])
+    return id_
+
+@_writes("equipo")
+def update_equipo(id_: int, data: dict, version: int | None = None) -> None:
+    _equipo_repo.update(id_, data, version)
+    bus.publish("equipo", UPDATE, [id_])
 
 def get_equipo(id_: int):
     return _equipo_repo.get(id_)
 
+@_writes("equipo", "mantenimiento")
 def delete_equipo(id_: int) -> None:
-    _equipo_repo.delete(id_)
+    mids = _equipo_repo.delete(id_)
+    if mids:
+        bus.publish("mantenimiento", DELETE, mids)
+    bus.publish("equipo", DELETE, [id_])
 
 # --- Mantenimientos ---
+@cached(read_cache, "mantenimiento", "equipo")
 def list_mantenimientos() -> list[Mantenimiento]:
     return _mantenimiento_repo.list_all()
 
+@cached(read_cache, "mantenimiento", "equipo")
 def list_mantenimientos_by_direccion(direccion_id: int) -> list[Mantenimiento]:
     return _mantenimiento_repo.list_by_direccion(direccion_id)
 
+@cached(read_cache, "mantenimiento", "equipo", "direccion")
+def list_mantenimiento_rows(direccion_id: int | None = None) -> list[MantenimientoRow]:
+    """Columnas del listado de mantenimientos con código/descripción del equipo y dirección."""
+    return _mantenimiento_repo.list_rows(direccion_id)
+
+def get_mantenimiento_rows(ids=None, equipo_ids=None) -> list[MantenimientoRow]:
+    """Filas de mantenimiento por id o por equipo (para parchar vistas tras un cambio)."""
+    return _mantenimiento_repo.list_rows(ids=ids, equipo_ids=equipo_ids)
+
+@_writes("mantenimiento")
 def add_mantenimiento(vals: dict):
     m = _mantenimiento_repo.add(vals)
+    bus.publish("mantenimiento", INSERT, [m.id])
     return m
 
-def update_mantenimiento(id_: int, data: dict) -> None:
-    _mantenimiento_repo.update(id_, data)
+@_writes("mantenimiento")
+def update_mantenimiento(id_: int, data: dict, version: int | None = None) -> None:
+    _mantenimiento_repo.update(id_, data, version)
+    bus.publish("mantenimiento", UPDATE, [id_])
 
+@_writes("mantenimiento")
 def delete_mantenimiento(id_: int) -> None:
     _mantenimiento_repo.delete(id_)
+    bus.publish("mantenimiento", DELETE, [id_])
 
 def get_mantenimiento(id_: int):
     return _mantenimiento_repo.get(id_)
@@ -91,31 +176,130 @@ def get_mantenimiento(id_: int):
 def check_user(username: str, password: str) -> bool:
     return _user_repo.check_credentials(username, password)
 
+@_writes("user")
 def set_user_password(username: str, password: str) -> bool:
-    return _user_repo.set_password(username, password)
+    ok = _user_repo.set_password(username, password)
+    bus.publish("user", UPDATE)
+    return ok
 
+@_writes("user")
 def create_user(data: dict):
-    return _user_repo.create_user(data)
+    u = _user_repo.create_user(data)
+    bus.publish("user", INSERT, [u.id])
+    return u
 
 def get_user(username: str):
     return _user_repo.get_by_username(username)
 
+@cached(read_cache, "user")
 def list_users() -> list:
     return [u.username for u in _user_repo.list_all()]
 
+@cached(read_cache, "user")
 def list_users_full():
     """Returns list of User objects instead of just strings"""
     return _user_repo.list_all()
 
+@_writes("user", "bitacora")
 def delete_user(user_id: int) -> bool:
-    return _user_repo.delete_user(user_id)
+    ok = _user_repo.delete_user(user_id)
+    if ok:
+        bus.publish("user", DELETE, [user_id])
+    return ok
 
+@_writes("user")
 def update_user_profile(user_id: int, data: dict) -> bool:
-    return _user_repo.update_user(user_id, data)
+    if "face_data" in data:
+        # face_hash identifica el modelo: la galería y su caché se guían por él
+        blob = data["face_data"]
+        data = {**data, "face_hash": hashlib.sha256(blob).hexdigest() if blob else None}
+    ok = _user_repo.update_user(user_id, data)
+    if ok:
+        bus.publish("user", UPDATE, [user_id])
+    return ok
+
+# --- Biometría ---
+@cached(read_cache, "user")
+def list_face_hashes() -> list[tuple[int, str, str]]:
+    """(id, username, face_hash) de los usuarios con biometría configurada (sin el blob)."""
+    return _user_repo.list_face_hashes()
+
+def get_face_data(user_id: int) -> bytes | None:
+    return _user_repo.get_face_data(user_id)
 
 # --- Bitacora ---
+@_writes("bitacora")
 def add_bitacora_log(usuario_id: int | None, action: str, desc: str, modulo: str) -> None:
     _bitacora_repo.add_log(usuario_id, action, desc, modulo)
+    bus.publish("bitacora", INSERT)
 
+@cached(read_cache, "bitacora", "user")
 def list_bitacora_entries(limit: int = 50) -> list:
     return _bitacora_repo.list_recent(limit)
+
+@_writes("bitacora")
+def archive_old_bitacora(days: int | None = None) -> int:
+    """Mueve al archivo comprimido los registros más antiguos que la retención configurada."""
+    moved = retention.prune_bitacora(days)
+    if moved:
+        bus.publish("bitacora", DELETE)
+    return moved
+
+def list_bitacora_archive_months() -> list[str]:
+    return retention.list_archive_months()
+
+def search_bitacora_archive(desde=None, hasta=None, term: str = "", limit: int | None = None) -> list[dict]:
+    out = []
+    for r in retention.query_archive(desde, hasta, term):
+        out.append(r)
+        if limit and len(out) >= limit:
+            break
+    return out
+
+# --- Documentos generados ---
+def _file_sha256(path: str) -> str | None:
+    try:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        return h.hexdigest()
+    except OSError:
+        return None
+
+@_writes("documento")
+def register_documento(path: str, tipo_reporte: str, direccion: str | None = None) -> Documento | None:
+    """Registra un archivo recién exportado (ruta, tamaño y hash) en el historial."""
+    if not path:
+        return None
+    path = os.path.abspath(path)
+    try:
+        size = os.path.getsize(path)
+        exists = 1
+    except OSError:
+        size = 0
+        exists = 0
+    doc = _documento_repo.add({
+        "ruta": path,
+        "tamano": size,
+        "hash_sha256": _file_sha256(path) if exists else None,
+        "tipo_reporte": tipo_reporte,
+        "direccion": direccion or "",
+        "existe": exists,
+    })
+    bus.publish("documento", INSERT, [doc.id])
+    return doc
+
+@cached(read_cache, "documento")
+def list_documentos(limit: int | None = None) -> list[Documento]:
+    return _documento_repo.list_recent(limit)
+
+@_writes("documento")
+def set_documentos_existencia(changes: dict[int, bool]) -> None:
+    _documento_repo.set_exists(changes)
+    bus.publish("documento", UPDATE, list(changes))
+
+@_writes("documento")
+def clear_documentos() -> None:
+    _documento_repo.delete_all()
+    bus.publish("documento", DELETE)
@@ -0,0 +1,170 @@
+"""
+Retención de la bitácora: los registros más antiguos que el límite configurado se
+mueven a archivos mensuales comprimidos (JSON Lines + gzip) y se eliminan de la BD
+en bloques pequeños, de modo que cada transacción de escritura sea corta.
+"""
+import os
+import gzip
+import json
+from datetime import datetime, date, timedelta
+from pathlib import Path
+from typing import Iterator
+
+from sqlalchemy import select, delete
+
+from .db import engine, DB_PATH
+from .models import Bitacora, User
+from ..config import BITACORA_RETENTION_DAYS, BITACORA_PRUNE_CHUNK
+
+ARCHIVE_DIR = Path(DB_PATH).parent / "bitacora_archivo"
+_ARCHIVE_PREFIX = "bitacora_"
+_ARCHIVE_SUFFIX = ".jsonl.gz"
+
+
+def _archive_path(month: str, archive_dir: Path | None = None) -> Path:
+    return (archive_dir or ARCHIVE_DIR) / f"{_ARCHIVE_PREFIX}{month}{_ARCHIVE_SUFFIX}"
+
+
+def _append_archive(rows_by_month: dict[str, list[dict]], archive_dir: Path) -> None:
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    for month, rows in rows_by_month.items():
+        # gzip admite miembros concatenados: cada bloque se agrega como un miembro nuevo
+        with open(_archive_path(month, archive_dir), "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as gz:
+                for r in rows:
+                    gz.write((json.dumps(r, ensure_ascii=False) + "\n").encode("utf-8"))
+            raw.flush()
+            os.fsync(raw.fileno())
+
+
+def ensure_incremental_vacuum() -> None:
+    """Activa auto_vacuum=INCREMENTAL (requiere un VACUUM completo una sola vez).
+
+    Bloquea: el VACUUM reescribe el archivo entero y deja fuera a todo escritor mientras
+    dura. Solo se llama desde la migración de arranque (bootstrap.ensure_db), antes de
+    abrir la interfaz; la depuración posterior usa incremental_vacuum().
+    """
+    with engine.connect() as conn:
+        mode = conn.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+        if mode == 2:
+            return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+
+
+def incremental_vacuum(step_pages: int = 1000) -> int:
+    """Devuelve las páginas libres al sistema en pasos acotados. Retorna páginas liberadas."""
+    freed = 0
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+            return 0
+        while True:
+            free = int(conn.exec_driver_sql("PRAGMA freelist_count").scalar() or 0)
+            if free <= 0:
+                break
+            # Es necesario consumir el resultado para que el pragma se ejecute completo
+            conn.exec_driver_sql(f"PRAGMA incremental_vacuum({int(step_pages)})").fetchall()
+            after = int(conn.exec_driver_sql("PRAGMA freelist_count").scalar() or 0)
+            freed += free - after
+            if after >= free:
+                break
+    return freed
+
+
+def prune_bitacora(days: int | None = None, chunk_size: int | None = None,
+                   archive_dir: Path | None = None, vacuum: bool = True) -> int:
+    """Archiva y elimina registros de bitácora con más de `days` días. Retorna cantidad movida."""
+    days = BITACORA_RETENTION_DAYS if days is None else days
+    chunk_size = chunk_size or BITACORA_PRUNE_CHUNK
+    archive_dir = Path(archive_dir) if archive_dir else ARCHIVE_DIR
+    cutoff = datetime.now() - timedelta(days=days)
+
+    query = (
+        select(Bitacora.id, Bitacora.fecha, Bitacora.usuario_id, User.username,
+               Bitacora.accion, Bitacora.descripcion, Bitacora.modulo)
+        .outerjoin(User, Bitacora.usuario_id == User.id)
+        .where(Bitacora.fecha < cutoff)
+        .order_by(Bitacora.id)
+        .limit(chunk_size)
+    )
+
+    moved = 0
+    last_id = 0
+    while True:
+        with engine.connect() as conn:
+            rows = conn.execute(query.where(Bitacora.id > last_id)).all()
+        if not rows:
+            break
+
+        by_month: dict[str, list[dict]] = {}
+        for r in rows:
+            by_month.setdefault(r.fecha.strftime("%Y-%m"), []).append({
+                "id": r.id,
+                "fecha": r.fecha.isoformat(),
+                "usuario_id": r.usuario_id,
+                "usuario": r.username or "Sistema",
+                "accion": r.accion,
+                "descripcion": r.descripcion,
+                "modulo": r.modulo,
+            })
+        # Primero se asegura el archivo en disco; luego se borra en una transacción corta
+        _append_archive(by_month, archive_dir)
+        ids = [r.id for r in rows]
+        with engine.begin() as conn:
+            conn.execute(delete(Bitacora).where(Bitacora.id.in_(ids)))
+        moved += len(ids)
+        last_id = ids[-1]
+
+    if vacuum and moved:
+        # Sin auto_vacuum incremental (BD aún no migrada) no hace nada: nunca un VACUUM completo
+        try:
+            incremental_vacuum()
+        except Exception:
+            pass
+    return moved
+
+
+def list_archive_months(archive_dir: Path | None = None) -> list[str]:
+    """Meses disponibles en el archivo (formato YYYY-MM), del más reciente al más antiguo."""
+    archive_dir = Path(archive_dir) if archive_dir else ARCHIVE_DIR
+    if not archive_dir.exists():
+        return []
+    months = [
+        p.name[len(_ARCHIVE_PREFIX):-len(_ARCHIVE_SUFFIX)]
+        for p in archive_dir.glob(f"{_ARCHIVE_PREFIX}*{_ARCHIVE_SUFFIX}")
+    ]
+    return sorted(months, reverse=True)
+
+
+def query_archive(desde: date | None = None, hasta: date | None = None, term: str = "",
+                  archive_dir: Path | None = None) -> Iterator[dict]:
+    """Recorre los archivos mensuales dentro del rango y filtra por texto (sin cargar todo)."""
+    archive_dir = Path(archive_dir) if archive_dir else ARCHIVE_DIR
+    term = (term or "").strip().lower()
+    lo = desde.strftime("%Y-%m") if desde else None
+    hi = hasta.strftime("%Y-%m") if hasta else None
+    for month in sorted(list_archive_months(archive_dir)):
+        if (lo and month < lo) or (hi and month > hi):
+            continue
+        seen: set[int] = set()
+        with gzip.open(_archive_path(month, archive_dir), "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    r = json.loads(line)
+                except ValueError:
+                    continue
+                # Un corte entre escritura y borrado puede duplicar un bloque
+                if r.get("id") in seen:
+                    continue
+                seen.add(r.get("id"))
+                fecha = r.get("fecha", "")[:10]
+                if desde and fecha < desde.isoformat():
+                    continue
+                if hasta and fecha > hasta.isoformat():
+                    continue
+                if term:
+                    blob = f"{r.get('fecha')} {r.get('usuario')} {r.get('accion')} {r.get('descripcion')}".lower()
+                    if term not in blob:
+                        continue
+                yield r
@@ -0,0 +1,36 @@
+"""
+Filas de solo lectura para las pantallas de listado.
+
+Cada consulta selecciona únicamente las columnas que se muestran (más la dirección ya
+resuelta por JOIN) y devuelve tuplas con nombre: sin identidad de sesión, sin relaciones
+cargadas y con un costo de memoria de tupla (NamedTuple no tiene __dict__).
+"""
+from datetime import date
+from typing import NamedTuple
+
+
+class EquipoRow(NamedTuple):
+    id: int
+    codigo_interno: str | None
+    descripcion: str | None
+    marca: str | None
+    modelo: str | None
+    nro_serie: str | None
+    estado: str | None
+    direccion_id: int | None
+    direccion_nombre: str
+
+
+class MantenimientoRow(NamedTuple):
+    id: int
+    equipo_id: int
+    fecha: date | None
+    descripcion: str | None
+    estado_equipo: str | None
+    equipo_codigo: str
+    equipo_descripcion: str
+    equipo_marca: str
+    equipo_modelo: str
+    equipo_serie: str
+    direccion_id: int | None
+    direccion_nombre: str
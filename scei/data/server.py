@@ -0,0 +1,229 @@
+"""
+Servidor de repositorios: los SQL*Repository detrás de una API HTTP/JSON mínima (asyncio).
+
+Pensado para varias oficinas que hoy abren la misma BD por una carpeta compartida: el
+servidor es el único proceso que toca el archivo SQLite y los clientes (remote.py) le
+piden las mismas operaciones de interfaces.py.
+
+    POST /rpc/<repo>/<método>   cuerpo: {"args": [...], "kwargs": {...}} codificado con wire.py
+                                200 {"result": ...} | 4xx/5xx {"error": {"type", "message"}}
+    GET  /health                estado y ruta de la BD
+
+Las escrituras (ver wire.WRITE_PREFIXES) pasan por un único hilo escritor, así que nunca
+compiten por el bloqueo de SQLite; las lecturas usan un grupo de hilos lectores y, con
+WAL, no esperan a la escritura en curso. Solo HTTP/1.1 con keep-alive y Content-Length;
+sin TLS: escuchar en la red local y, fuera de localhost, fijar un token compartido.
+"""
+import asyncio
+import hmac
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from sqlalchemy.exc import IntegrityError
+
+from . import wire
+from .interfaces import ConflictError
+from .db import DB_PATH, engine
+from .sql_repositories import default_repositories
+
+MAX_BODY = 64 * 1024 * 1024      # fotos biométricas incluidas
+MAX_HEADERS = 32                 # líneas de cabecera por petición
+MAX_HEADER_BYTES = 16 * 1024     # línea de petición + cabeceras
+IDLE_TIMEOUT = 60.0              # segundos de una conexión keep-alive sin peticiones
+
+_REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+            405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+            431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+
+# Lo único que se atiende por /rpc: los métodos de interfaces.py que usa remote.py. La
+# autenticación pasa solo por user.check_credentials; los usuarios viajan sin contraseña
+# ni modelo facial (ver wire.SECRET_COLUMNS).
+EXPOSED_METHODS = {
+    "direccion": ("list_all", "add", "update", "delete"),
+    "equipo": ("list_all", "list_by_direccion", "list_rows", "search_rows", "get",
+               "add", "update", "delete"),
+    "mantenimiento": ("list_all", "list_by_direccion", "list_rows", "get", "add", "update", "delete"),
+    "user": ("check_credentials", "set_password", "get_by_username", "create_user", "list_all",
+             "list_face_hashes", "get_face_data", "delete_user", "update_user"),
+    "bitacora": ("add_log", "list_recent"),
+    "documento": ("add", "list_recent", "set_exists", "delete_all"),
+}
+
+
+def _exposed_methods(name: str, repo) -> dict:
+    return {method: getattr(repo, method) for method in EXPOSED_METHODS.get(name, ())}
+
+
+def enable_wal() -> str:
+    """Lectores y escritor concurrentes; solo seguro si nadie más abre el archivo por red."""
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("PRAGMA journal_mode=WAL").scalar()
+
+
+class RepositoryServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, readers: int = 4,
+                 token: str | None = None, repos: dict | None = None):
+        self.host = host
+        self.port = port
+        self.token = token
+        self._methods = {
+            (name, method): fn
+            for name, repo in (repos or default_repositories()).items()
+            for method, fn in _exposed_methods(name, repo).items()
+        }
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scei-writer")
+        self._readers = ThreadPoolExecutor(max_workers=max(1, readers), thread_name_prefix="scei-reader")
+        self._server: asyncio.AbstractServer | None = None
+        self._clients: dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    # --- Ciclo de vida ---
+    async def start(self) -> int:
+        """Abre el socket; devuelve el puerto (útil con port=0)."""
+        # limit: una sola línea más larga que esto corta la conexión en readline()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port,
+                                                  limit=MAX_HEADER_BYTES)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            # Conexiones keep-alive abiertas: cerrarlas termina su lectura pendiente
+            clients = dict(self._clients)
+            for writer in clients.values():
+                writer.close()
+            await asyncio.gather(*clients, return_exceptions=True)
+            await self._server.wait_closed()
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+
+    # --- HTTP ---
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._clients[asyncio.current_task()] = writer
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not line.strip():
+                    break
+                verb, path, _ = line.decode("latin-1").split(" ", 2)
+                headers = {}
+                size, count = len(line), 0
+                while True:
+                    raw = await reader.readline()
+                    if raw in (b"\r\n", b"\n", b""):
+                        break
+                    size, count = size + len(raw), count + 1
+                    if count > MAX_HEADERS or size > MAX_HEADER_BYTES:
+                        break
+                    key, _, value = raw.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                if count > MAX_HEADERS or size > MAX_HEADER_BYTES:
+                    await self._respond(writer, 431, _error("HeadersTooLarge", "Demasiadas cabeceras"), False)
+                    break
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, _error("PayloadTooLarge", "Cuerpo demasiado grande"), False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, payload = await self._route(verb, path, headers, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._clients.pop(asyncio.current_task(), None)
+            writer.close()
+
+    async def _respond(self, writer, status: int, payload: bytes, keep_alive: bool) -> None:
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + payload)
+        await writer.drain()
+
+    async def _route(self, verb: str, path: str, headers: dict, body: bytes) -> tuple[int, bytes]:
+        if self.token and not hmac.compare_digest(headers.get(wire.TOKEN_HEADER, ""), self.token):
+            return 401, _error("Unauthorized", "Token inválido")
+        if path == "/health":
+            return 200, wire.dumps({"result": {"ok": True, "db": str(DB_PATH)}})
+        parts = path.strip("/").split("/")
+        if len(parts) != 3 or parts[0] != "rpc":
+            return 404, _error("NotFound", f"Ruta desconocida: {path}")
+        if verb != "POST":
+            return 405, _error("MethodNotAllowed", "Use POST")
+        fn = self._methods.get((parts[1], parts[2]))
+        if fn is None:
+            return 404, _error("NotFound", f"Método desconocido: {parts[1]}.{parts[2]}")
+        try:
+            call = wire.loads(body) if body else {}
+            args, kwargs = list(call.get("args", ())), dict(call.get("kwargs") or {})
+        except (ValueError, KeyError, AttributeError) as e:
+            return 400, _error("BadRequest", str(e))
+        pool = self._writer if wire.is_write(parts[2]) else self._readers
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, partial(_invoke, fn, args, kwargs))
+
+
+def _error(kind: str, message: str, **extra) -> bytes:
+    return json.dumps({"error": {"type": kind, "message": message, **extra}}, ensure_ascii=False).encode("utf-8")
+
+
+def _invoke(fn, args, kwargs) -> tuple[int, bytes]:
+    # En el hilo del grupo: también la serialización (toca los atributos ya cargados)
+    try:
+        return 200, wire.dumps({"result": fn(*args, **kwargs)})
+    except ConflictError as e:
+        return 409, _error("ConflictError", str(e), entity=e.entity, id=e.id)
+    except IntegrityError as e:
+        return 409, _error("IntegrityError", str(e.orig or e))
+    except (ValueError, TypeError) as e:
+        return 400, _error(type(e).__name__, str(e))
+    except Exception as e:
+        return 500, _error(type(e).__name__, str(e))
+
+
+class ServerThread:
+    """Servidor en un hilo con su propio bucle asyncio (pruebas, o junto a otra aplicación)."""
+
+    def __init__(self, **kwargs):
+        self.server = RepositoryServer(**kwargs)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="scei-server", daemon=True)
+        self._ready = threading.Event()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.server.host}:{self.server.port}"
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self.server.start())
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self.server.close())
+        self._loop.close()
+
+    def start(self) -> "ServerThread":
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
@@ -1,17 +1,24 @@
 from datetime import date
-from sqlalchemy import select
+from sqlalchemy import select, update, delete, func, or_
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.exc import StaleDataError
 from .db import SessionLocal
-from .models import Direccion, Equipo, Mantenimiento, User, Bitacora
+from .models import Direccion, Equipo, Mantenimiento, User, Bitacora, Documento
+from .rows import EquipoRow, MantenimientoRow
+from .normalize import like_prefix, LIKE_ESCAPE
 from .interfaces import (
+    ConflictError,
     IDireccionRepository,
     IEquipoRepository,
     IMantenimientoRepository,
     IUserRepository,
-    IBitacoraRepository
+    IBitacoraRepository,
+    IDocumentoRepository
 )
 from contextlib import contextmanager
 
+IN_CHUNK = 500   # parámetros por cláusula IN (SQLite limita las variables por sentencia)
+
 # Helper context manager (kept as utility)
 @contextmanager
 def session_scope():
@@ -25,18 +32,37 @@ def session_scope():
     finally:
         session.close()
 
+@contextmanager
+def versioned_update(model, id_: int, version: int | None):
+    """Compare-and-swap sobre version_id_col: entrega la fila si su versión sigue siendo
+    `version` (None = sin comprobar) y la confirma con UPDATE ... WHERE version = leída.
+    Una escritura ajena en cualquiera de los dos momentos termina en ConflictError."""
+    entity = model.__tablename__
+    try:
+        with session_scope() as s:
+            row = s.get(model, id_)
+            if row is not None and version is not None and row.version != version:
+                raise ConflictError(entity, id_)
+            if row is None and version is not None:
+                raise ConflictError(entity, id_, f"{entity} {id_} fue eliminado por otro usuario")
+            yield row
+    except StaleDataError as e:
+        raise ConflictError(entity, id_) from e
+
 class SQLDireccionRepository(IDireccionRepository):
     def list_all(self) -> list[Direccion]:
         with session_scope() as s:
             return list(s.scalars(select(Direccion).order_by(Direccion.nombre)))
 
-    def add(self, nombre: str) -> None:
+    def add(self, nombre: str) -> int:
         with session_scope() as s:
-            s.add(Direccion(nombre=nombre, activo=1))
+            d = Direccion(nombre=nombre, activo=1)
+            s.add(d)
+            s.flush()
+            return d.id
 
-    def update(self, id_: int, nombre: str, activo: int) -> None:
-        with session_scope() as s:
-            d = s.get(Direccion, id_)
+    def update(self, id_: int, nombre: str, activo: int, version: int | None = None) -> None:
+        with versioned_update(Direccion, id_, version) as d:
             if not d:
                 return
             d.nombre = nombre
@@ -55,18 +81,63 @@ class SQLEquipoRepository(IEquipoRepository):
 
     def list_by_direccion(self, direccion_id: int | None = None) -> list[Equipo]:
         with session_scope() as s:
-            query = s.query(Equipo).options(selectinload(Equipo.mantenimientos))
+            query = s.query(Equipo)
             if direccion_id:
                 query = query.filter_by(direccion_id=direccion_id)
             return query.order_by(Equipo.id.desc()).all()
 
-    def add(self, data: dict) -> None:
+    @staticmethod
+    def _rows_query(direccion_id: int | None = None):
+        # Solo las columnas del listado; la dirección viene resuelta por JOIN
+        query = (
+            select(
+                Equipo.id, Equipo.codigo_interno, Equipo.descripcion, Equipo.marca,
+                Equipo.modelo, Equipo.nro_serie, Equipo.estado, Equipo.direccion_id,
+                func.coalesce(Direccion.nombre, ""),
+            )
+            .outerjoin(Direccion, Equipo.direccion_id == Direccion.id)
+            .order_by(Equipo.id.desc())
+        )
+        if direccion_id:
+            query = query.where(Equipo.direccion_id == direccion_id)
+        return query
+
+    def list_rows(self, direccion_id: int | None = None, ids=None) -> list[EquipoRow]:
+        query = self._rows_query(direccion_id)
         with session_scope() as s:
-            s.add(Equipo(**data))
+            if ids is None:
+                return [EquipoRow._make(r) for r in s.execute(query)]
+            ids = list(ids)
+            return [
+                EquipoRow._make(r)
+                for i in range(0, len(ids), IN_CHUNK)
+                for r in s.execute(query.where(Equipo.id.in_(ids[i:i + IN_CHUNK])))
+            ]
 
-    def update(self, id_: int, data: dict) -> None:
+    def search_rows(self, term: str, direccion_id: int | None = None,
+                    limit: int | None = None) -> list[EquipoRow]:
+        """Equipos cuyo código, serie o descripción empiezan por `term` (sin acentos ni
+        mayúsculas). Cada rama del OR es una búsqueda en su índice *_norm."""
+        prefix = like_prefix(term)
+        query = self._rows_query(direccion_id).where(or_(
+            Equipo.codigo_norm.like(prefix, escape=LIKE_ESCAPE),
+            Equipo.serie_norm.like(prefix, escape=LIKE_ESCAPE),
+            Equipo.descripcion_norm.like(prefix, escape=LIKE_ESCAPE),
+        ))
+        if limit:
+            query = query.limit(limit)
         with session_scope() as s:
-            e = s.get(Equipo, id_)
+            return [EquipoRow._make(r) for r in s.execute(query)]
+
+    def add(self, data: dict) -> int:
+        with session_scope() as s:
+            e = Equipo(**data)
+            s.add(e)
+            s.flush()
+            return e.id
+
+    def update(self, id_: int, data: dict, version: int | None = None) -> None:
+        with versioned_update(Equipo, id_, version) as e:
             if not e:
                 return
             for k, v in data.items():
@@ -76,14 +147,18 @@ class SQLEquipoRepository(IEquipoRepository):
         with session_scope() as s:
             return s.get(Equipo, id_)
 
-    def delete(self, id_: int) -> None:
+    def delete(self, id_: int) -> list[int]:
+        """Elimina el equipo y sus mantenimientos; devuelve los ids de mantenimiento borrados."""
         with session_scope() as s:
             e = s.get(Equipo, id_)
-            if e:
-                # Eliminar primero los mantenimientos asociados a este equipo
-                # para respetar la restricción NOT NULL de mantenimiento.equipo_id
-                s.query(Mantenimiento).filter_by(equipo_id=id_).delete()
-                s.delete(e)
+            if not e:
+                return []
+            # Eliminar primero los mantenimientos asociados a este equipo
+            # para respetar la restricción NOT NULL de mantenimiento.equipo_id
+            mids = list(s.scalars(select(Mantenimiento.id).where(Mantenimiento.equipo_id == id_)))
+            s.query(Mantenimiento).filter_by(equipo_id=id_).delete()
+            s.delete(e)
+            return mids
 
 class SQLMantenimientoRepository(IMantenimientoRepository):
     def list_all(self) -> list[Mantenimiento]:
@@ -96,6 +171,36 @@ class SQLMantenimientoRepository(IMantenimientoRepository):
                 .filter(Equipo.direccion_id == direccion_id)\
                 .options(selectinload(Mantenimiento.equipo)).all()
 
+    def list_rows(self, direccion_id: int | None = None, ids=None, equipo_ids=None) -> list[MantenimientoRow]:
+        blank = lambda col: func.coalesce(col, "")
+        query = (
+            select(
+                Mantenimiento.id, Mantenimiento.equipo_id, Mantenimiento.fecha,
+                Mantenimiento.descripcion, Mantenimiento.estado_equipo,
+                blank(Equipo.codigo_interno), blank(Equipo.descripcion), blank(Equipo.marca),
+                blank(Equipo.modelo), blank(Equipo.nro_serie),
+                Equipo.direccion_id, blank(Direccion.nombre),
+            )
+            .outerjoin(Equipo, Mantenimiento.equipo_id == Equipo.id)
+            .outerjoin(Direccion, Equipo.direccion_id == Direccion.id)
+            .order_by(Mantenimiento.id)
+        )
+        if direccion_id:
+            query = query.where(Equipo.direccion_id == direccion_id)
+        keys = None
+        if ids is not None:
+            keys, column = list(ids), Mantenimiento.id
+        elif equipo_ids is not None:
+            keys, column = list(equipo_ids), Mantenimiento.equipo_id
+        with session_scope() as s:
+            if keys is None:
+                return [MantenimientoRow._make(r) for r in s.execute(query)]
+            return [
+                MantenimientoRow._make(r)
+                for i in range(0, len(keys), IN_CHUNK)
+                for r in s.execute(query.where(column.in_(keys[i:i + IN_CHUNK])))
+            ]
+
     def add(self, vals: dict):
         with session_scope() as s:
             if isinstance(vals.get('fecha'), str):
@@ -112,9 +217,8 @@ class SQLMantenimientoRepository(IMantenimientoRepository):
             # Note: The object is detached after session close.
             return m
 
-    def update(self, id_: int, data: dict) -> None:
-        with session_scope() as s:
-            m = s.get(Mantenimiento, id_)
+    def update(self, id_: int, data: dict, version: int | None = None) -> None:
+        with versioned_update(Mantenimiento, id_, version) as m:
             if not m:
                 return
             for k, v in data.items():
@@ -152,7 +256,6 @@ class SQLUserRepository(IUserRepository):
             # ideally repo returns DTOs or detached objects. 
             u = s.query(User).filter_by(username=username).first()
             if u:
-                s.refresh(u)
                 s.expunge(u)
             return u
 
@@ -172,6 +275,18 @@ class SQLUserRepository(IUserRepository):
         with session_scope() as s:
             return list(s.scalars(select(User).order_by(User.username)))
 
+    def list_face_hashes(self) -> list[tuple[int, str, str]]:
+        with session_scope() as s:
+            rows = s.execute(
+                select(User.id, User.username, User.face_hash)
+                .where(User.face_hash.is_not(None)).order_by(User.id)
+            )
+            return [tuple(r) for r in rows]
+
+    def get_face_data(self, user_id: int) -> bytes | None:
+        with session_scope() as s:
+            return s.scalar(select(User.face_data).where(User.id == user_id))
+
     def delete_user(self, user_id: int) -> bool:
         with session_scope() as s:
             u = s.get(User, user_id)
@@ -208,3 +323,44 @@ class SQLBitacoraRepository(IBitacoraRepository):
         with session_scope() as s:
             return s.query(Bitacora).options(selectinload(Bitacora.usuario))\
                 .order_by(Bitacora.fecha.desc()).limit(limit).all()
+
+class SQLDocumentoRepository(IDocumentoRepository):
+    def add(self, data: dict) -> Documento:
+        with session_scope() as s:
+            d = Documento(**data)
+            s.add(d)
+            s.flush()
+            return d
+
+    def list_recent(self, limit: int | None = None) -> list[Documento]:
+        with session_scope() as s:
+            query = select(Documento).order_by(Documento.fecha.desc(), Documento.id.desc())
+            if limit:
+                query = query.limit(limit)
+            return list(s.scalars(query))
+
+    def set_exists(self, changes: dict[int, bool]) -> None:
+        if not changes:
+            return
+        with session_scope() as s:
+            # Un UPDATE por estado (en bloques) en lugar de uno por fila
+            for flag in (True, False):
+                ids = [id_ for id_, exists in changes.items() if bool(exists) is flag]
+                for i in range(0, len(ids), 500):
+                    s.execute(update(Documento).where(Documento.id.in_(ids[i:i + 500])).values(existe=int(flag)))
+
+    def delete_all(self) -> None:
+        with session_scope() as s:
+            s.execute(delete(Documento))
+
+
+def default_repositories() -> dict:
+    """Repositorios SQLite por nombre (la fachada y el servidor usan las mismas claves)."""
+    return {
+        "direccion": SQLDireccionRepository(),
+        "equipo": SQLEquipoRepository(),
+        "mantenimiento": SQLMantenimientoRepository(),
+        "user": SQLUserRepository(),
+        "bitacora": SQLBitacoraRepository(),
+        "documento": SQLDocumentoRepository(),
+    }
@@ -0,0 +1,116 @@
+"""
+Codificación JSON de los valores que cruzan el servidor de repositorios (server.py/remote.py).
+
+Los repositorios devuelven objetos ORM, filas con nombre (rows.py), fechas, bytes y
+diccionarios con claves enteras; JSON no representa nada de eso directamente. Cada uno
+viaja como un objeto etiquetado {"$t": etiqueta, "v": valor}:
+
+- modelo ORM: columnas ya cargadas y relaciones muchos-a-uno cargadas ("r"); lo diferido
+  o no cargado no viaja, y las columnas de SECRET_COLUMNS (contraseña y modelo facial
+  del usuario) nunca. Del otro lado se reconstruye transitorio.
+- EquipoRow/MantenimientoRow: la tupla en orden de campos.
+- date/datetime en ISO y bytes en base64; un dict con claves no textuales (p. ej.
+  {id: bool}) como lista de pares.
+"""
+import base64
+import json
+from datetime import date, datetime
+
+from sqlalchemy import inspect as sa_inspect
+
+from .models import Base
+from .rows import EquipoRow, MantenimientoRow
+
+TAG = "$t"
+TOKEN_HEADER = "x-scei-token"
+
+# Prefijos de los métodos que escriben: el servidor los serializa en un único hilo y el
+# cliente no los reintenta (podrían haberse aplicado antes de perder la conexión)
+WRITE_PREFIXES = ("add", "update", "delete", "set_", "create_")
+
+# Nunca se envían: el login remoto va por user.check_credentials y el modelo facial por
+# user.get_face_data
+SECRET_COLUMNS = {"User": frozenset({"password", "face_data"})}
+
+_ROWS = {cls.__name__: cls for cls in (EquipoRow, MantenimientoRow)}
+_MODELS = {m.class_.__name__: m.class_ for m in Base.registry.mappers}
+
+
+def is_write(method: str) -> bool:
+    return method.startswith(WRITE_PREFIXES)
+
+
+def _encode_model(obj) -> dict:
+    state = sa_inspect(obj)
+    skip = state.unloaded | SECRET_COLUMNS.get(type(obj).__name__, frozenset())
+    cols = {
+        attr.key: encode(getattr(obj, attr.key))
+        for attr in state.mapper.column_attrs if attr.key not in skip
+    }
+    rels = {
+        rel.key: encode(getattr(obj, rel.key))
+        for rel in state.mapper.relationships if not rel.uselist and rel.key not in skip
+    }
+    return {TAG: "model", "m": type(obj).__name__, "v": cols, "r": rels}
+
+
+def encode(value):
+    """Valor de un repositorio -> estructura apta para json.dumps."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Base):
+        return _encode_model(value)
+    if type(value).__name__ in _ROWS and isinstance(value, tuple):
+        return {TAG: "row", "m": type(value).__name__, "v": [encode(v) for v in value]}
+    if isinstance(value, datetime):
+        return {TAG: "datetime", "v": value.isoformat()}
+    if isinstance(value, date):
+        return {TAG: "date", "v": value.isoformat()}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {TAG: "bytes", "v": base64.b64encode(bytes(value)).decode("ascii")}
+    if isinstance(value, dict):
+        if all(isinstance(k, str) and not k.startswith("$") for k in value):
+            return {k: encode(v) for k, v in value.items()}
+        return {TAG: "map", "v": [[encode(k), encode(v)] for k, v in value.items()]}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [encode(v) for v in value]
+    raise TypeError(f"No se puede transmitir un valor de tipo {type(value).__name__}")
+
+
+def _decode_model(name: str, cols: dict, rels: dict):
+    cls = _MODELS[name]
+    obj = cls()
+    for key, value in cols.items():
+        setattr(obj, key, value)
+    for key, value in rels.items():
+        setattr(obj, key, value)
+    return obj
+
+
+def _hook(obj: dict):
+    # json.loads llama de adentro hacia afuera: los valores internos ya están decodificados
+    tag = obj.get(TAG)
+    if tag is None:
+        return obj
+    value = obj["v"]
+    if tag == "model":
+        return _decode_model(obj["m"], value, obj.get("r") or {})
+    if tag == "row":
+        return _ROWS[obj["m"]]._make(value)
+    if tag == "datetime":
+        return datetime.fromisoformat(value)
+    if tag == "date":
+        return date.fromisoformat(value)
+    if tag == "bytes":
+        return base64.b64decode(value)
+    if tag == "map":
+        return {k: v for k, v in value}
+    raise ValueError(f"Etiqueta desconocida: {tag}")
+
+
+def dumps(value) -> bytes:
+    return json.dumps(encode(value), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: bytes):
+    return json.loads(data.decode("utf-8"), object_hook=_hook)
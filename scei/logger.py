@@ -7,7 +7,12 @@ from datetime import datetime
 LOGS: list[dict] = []
 LOGS_FILE = ""
 
+LOGS_FILE_ENV = "SCEI_LOGS_FILE"
+
 def _resolve_logs_path() -> str:
+    if LOGS_FILE_ENV in os.environ:
+        # Vacío = no persistir (benchmarks); si no, ruta explícita
+        return os.environ[LOGS_FILE_ENV]
     # Logs portables: si está congelado, usar AppData para evitar ensuciar carpeta del exe
     try:
         if getattr(sys, "frozen", False):
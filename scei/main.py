@@ -8,45 +8,122 @@ parent_dir = os.path.dirname(current_dir)
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
-from PyQt6.QtWidgets import QApplication, QDialog
-
-# Imports locales asumiendo estructura de paquete 'scei' o local
 try:
-    from scei.bootstrap import run_bootstrap
-    from scei.logger import load_logs
-    from scei.utils import apply_light_theme
-    from scei.ui.dialogs import LoginDialog
-    from scei.ui.window import MainWindow
+    from scei.startup import tracer, TRACE_ENV
 except ImportError:
-    # Fallback si se ejecuta dentro de la carpeta scei
-    from bootstrap import run_bootstrap
-    from logger import load_logs
-    from utils import apply_light_theme
-    from ui.dialogs import LoginDialog
-    from ui.window import MainWindow
+    from startup import tracer, TRACE_ENV
+
+with tracer.phase("import:qt"):
+    from PyQt6.QtWidgets import QApplication, QDialog
+    from PyQt6.QtCore import QTimer
+
+# Imports locales asumiendo estructura de paquete 'scei' o local.
+# La ventana principal (y todas sus pestañas) se importa después del login.
+with tracer.phase("import:login"):
+    try:
+        from scei.bootstrap import run_bootstrap
+        from scei.data.remote import server_url
+        from scei.logger import load_logs
+        from scei.utils import apply_light_theme
+        from scei.ui.dialogs import LoginDialog
+    except ImportError:
+        # Fallback si se ejecuta dentro de la carpeta scei
+        from bootstrap import run_bootstrap
+        from data.remote import server_url
+        from logger import load_logs
+        from utils import apply_light_theme
+        from ui.dialogs import LoginDialog
+
+def _dump_trace():
+    if os.environ.get(TRACE_ENV) != "1":
+        return
+    try:
+        from scei import logger
+    except ImportError:
+        import logger
+    base = os.path.dirname(logger.LOGS_FILE) if logger.LOGS_FILE else os.getcwd()
+    tracer.dump(os.path.join(base, "startup_trace.json"))
+
+def _warm_biometrics():
+    try:
+        from scei.vision.engine import warm_up_async
+    except ImportError:
+        from vision.engine import warm_up_async
+    warm_up_async()
 
 def run():
-    # Inicialización de BD y recursos
-    run_bootstrap()
-    load_logs()
+    # Inicialización de BD y recursos (con servidor de repositorios la BD es suya)
+    remote = server_url() is not None
+    if not remote:
+        with tracer.phase("bootstrap"):
+            run_bootstrap()
+    with tracer.phase("load_logs"):
+        load_logs()
 
     
     # Iniciar App
-    app = QApplication(sys.argv)
+    with tracer.phase("qapplication"):
+        app = QApplication(sys.argv)
     
     # Apply Global Premium Theme (Loaded from resources/theme/light.qss)
-    app.setStyle("Fusion") 
-    apply_light_theme(app)
+    with tracer.phase("theme"):
+        app.setStyle("Fusion") 
+        apply_light_theme(app)
     
     # Login Modal
-    login = LoginDialog()
+    with tracer.phase("login_dialog"):
+        login = LoginDialog()
+    # Se marca cuando el diálogo ya está en pantalla y el loop de eventos responde
+    QTimer.singleShot(0, lambda: (tracer.mark("login_visible"), _dump_trace()))
+    # Precargar el motor biométrico en segundo plano una vez visible el login
+    QTimer.singleShot(300, _warm_biometrics)
     if login.exec() != QDialog.DialogCode.Accepted:
         sys.exit(0)
     
     # Ventana Principal
-    win = MainWindow()
-    win.resize(1200, 600)
-    win.showMaximized()
+    with tracer.phase("import:main_window"):
+        try:
+            from scei.ui.window import MainWindow, TAB_CLASSES
+            from scei.ui import profiler as ui_profiler
+        except ImportError:
+            from ui.window import MainWindow, TAB_CLASSES
+            from ui import profiler as ui_profiler
+    # Perfilador opcional: debe envolver las pestañas antes de crearlas
+    prof = ui_profiler.start_profiler(TAB_CLASSES) if ui_profiler.enabled() else None
+    with tracer.phase("main_window"):
+        win = MainWindow()
+        win.resize(1200, 600)
+        win.showMaximized()
+    if prof is not None:
+        prof.install_shortcut(win)
+        app.aboutToQuit.connect(prof.stop)
+    tracer.mark("main_window_visible")
+    _dump_trace()
+    tracer.remove_import_hook()
+
+    # Respaldos periódicos en segundo plano (API de backup de SQLite); en modo remoto
+    # los hace quien administra el servidor
+    if not remote:
+        try:
+            from scei.data.backup import BackupScheduler
+        except ImportError:
+            from data.backup import BackupScheduler
+        scheduler = BackupScheduler()
+        scheduler.start()
+        app.aboutToQuit.connect(scheduler.stop)
+
+        # Réplica local: sincroniza por deltas con la BD central cuando hay enlace
+        try:
+            from scei.data.replication import SyncScheduler, SYNC_HUB_ENV
+            from scei.data.db import DB_PATH
+        except ImportError:
+            from data.replication import SyncScheduler, SYNC_HUB_ENV
+            from data.db import DB_PATH
+        hub = os.environ.get(SYNC_HUB_ENV)
+        if hub:
+            sync = SyncScheduler(DB_PATH, hub)
+            sync.start()
+            app.aboutToQuit.connect(sync.stop)
     
     sys.exit(app.exec())
 
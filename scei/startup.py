@@ -0,0 +1,129 @@
+"""
+Trazador de arranque: mide el tiempo de cada fase de inicialización y, si se activa
+con la variable de entorno SCEI_TRACE_STARTUP=1, también el de cada módulo importado.
+El resultado se guarda como JSON junto a los logs (startup_trace.json).
+
+Este módulo no debe importar nada pesado: se carga antes que Qt y SQLAlchemy.
+"""
+import os
+import sys
+import json
+import time
+import importlib.abc
+from contextlib import contextmanager
+
+TRACE_ENV = "SCEI_TRACE_STARTUP"
+
+
+class _TimedLoader(importlib.abc.Loader):
+    """Envuelve el loader real para cronometrar exec_module."""
+
+    def __init__(self, loader, tracer: "StartupTracer"):
+        self._loader = loader
+        self._tracer = tracer
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._tracer._enter_import()
+        t0 = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._tracer._exit_import(module.__name__, time.perf_counter() - t0)
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class _ImportTimer(importlib.abc.MetaPathFinder):
+    def __init__(self, tracer: "StartupTracer"):
+        self._tracer = tracer
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader, self._tracer)
+                return spec
+        return None
+
+
+class StartupTracer:
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.phases: list[dict] = []
+        self.marks: dict[str, float] = {}
+        self.imports: dict[str, dict] = {}
+        self._child_time: list[float] = []
+        self._finder: _ImportTimer | None = None
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.t0) * 1000.0
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.phases.append({
+                "fase": name,
+                "inicio_ms": round((start - self.t0) * 1000.0, 2),
+                "duracion_ms": round((end - start) * 1000.0, 2),
+            })
+
+    def mark(self, name: str) -> None:
+        self.marks[name] = round(self.elapsed_ms(), 2)
+
+    # --- Tiempos por módulo (equivalente a -X importtime, útil en el build congelado) ---
+    def install_import_hook(self) -> None:
+        if self._finder is None:
+            self._finder = _ImportTimer(self)
+            sys.meta_path.insert(0, self._finder)
+
+    def remove_import_hook(self) -> None:
+        if self._finder is not None:
+            try:
+                sys.meta_path.remove(self._finder)
+            except ValueError:
+                pass
+            self._finder = None
+
+    def _enter_import(self) -> None:
+        self._child_time.append(0.0)
+
+    def _exit_import(self, name: str, total: float) -> None:
+        children = self._child_time.pop() if self._child_time else 0.0
+        if self._child_time:
+            self._child_time[-1] += total
+        self.imports[name] = {
+            "acumulado_ms": round(total * 1000.0, 2),
+            "propio_ms": round((total - children) * 1000.0, 2),
+        }
+
+    def report(self, top: int = 30) -> dict:
+        slow = sorted(self.imports.items(), key=lambda kv: kv[1]["propio_ms"], reverse=True)[:top]
+        return {
+            "total_ms": round(self.elapsed_ms(), 2),
+            "fases": self.phases,
+            "marcas": self.marks,
+            "imports_mas_lentos": [{"modulo": k, **v} for k, v in slow],
+        }
+
+    def dump(self, path: str) -> None:
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.report(), f, indent=2, ensure_ascii=False)
+        except Exception:
+            pass
+
+
+tracer = StartupTracer()
+if os.environ.get(TRACE_ENV) == "1":
+    tracer.install_import_hook()
@@ -0,0 +1,10 @@
+"""Estadística mínima compartida por los medidores (perfilador, SQL, visión)."""
+
+
+def percentile(values, p: float) -> float:
+    """Percentil `p` (0-100) por rango más cercano; 0.0 si no hay valores."""
+    if not values:
+        return 0.0
+    s = sorted(values)
+    k = min(len(s) - 1, max(0, int(round(p / 100.0 * (len(s) - 1)))))
+    return s[k]
@@ -1,6 +1,8 @@
 
 import os
+import shutil
 import sys
+import tempfile
 import unittest
 from pathlib import Path
 from sqlalchemy import create_engine
@@ -9,6 +11,12 @@ from sqlalchemy.orm import sessionmaker
 # Add project root to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# BD y logs temporales: las pruebas no tocan los datos del desarrollador. La ruta se
+# resuelve al importar scei.data, así que se fija antes de esos imports.
+TEST_DIR = tempfile.mkdtemp(prefix="scei-test-")
+os.environ["SCEI_DB_PATH"] = os.path.join(TEST_DIR, "data.db")
+os.environ["SCEI_LOGS_FILE"] = os.path.join(TEST_DIR, "logs.json")
+
 from scei.data.models import Base, Direccion, Equipo, Mantenimiento, User
 from scei.data import repositories
 from scei.bootstrap import run_bootstrap
@@ -28,6 +36,12 @@ class TestFunctional(unittest.TestCase):
         except Exception as e:
             print(f"Warning: Bootstrap failed: {e}")
 
+    @classmethod
+    def tearDownClass(cls):
+        from scei.data.db import engine
+        engine.dispose()
+        shutil.rmtree(TEST_DIR, ignore_errors=True)
+
     def test_01_users(self):
         print("\n[Test] User Authentication")
         # Inject a test user to be sure
@@ -154,5 +168,1445 @@ class TestFunctional(unittest.TestCase):
         self.assertIn("from", vals2)
         self.assertIn("to", vals2)
 
+    def test_06_documentos_registry(self):
+        print("\n[Test] Document Registry")
+        import tempfile
+        tmp = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+        tmp.write(b"%PDF-1.4 test")
+        tmp.close()
+        try:
+            doc = repositories.register_documento(tmp.name, "PDF Equipos", "TEST_DIR")
+            self.assertEqual(doc.tamano, 13, "Size should be recorded")
+            self.assertEqual(len(doc.hash_sha256), 64, "Hash should be recorded")
+            self.assertTrue(any(d.id == doc.id and d.existe for d in repositories.list_documentos()))
+
+            os.remove(tmp.name)
+            repositories.set_documentos_existencia({doc.id: False})
+            found = next(d for d in repositories.list_documentos() if d.id == doc.id)
+            self.assertFalse(found.existe, "Missing file should be flagged")
+
+            # El historial carga por páginas
+            from unittest import mock
+            from PyQt6.QtWidgets import QApplication
+            from scei.ui.tabs import history
+            app = QApplication.instance() or QApplication(sys.argv)
+            second = repositories.register_documento(tmp.name + ".2", "PDF Equipos", "TEST_DIR")
+            with mock.patch.object(history, "DOCUMENTOS_PAGE_SIZE", 1):
+                tab = history.PdfRegistrosTab()
+                try:
+                    self.assertEqual(tab.model.rowCount(), 1)
+                    self.assertFalse(tab.btn_more.isHidden(), "More rows remain")
+                    with mock.patch.object(history, "list_documentos", wraps=history.list_documentos) as load:
+                        tab.show_more()
+                    load.assert_called_once_with(3)
+                    self.assertEqual(tab.model.rowCount(), 2)
+                    self.assertTrue(tab.btn_more.isHidden(), "Nothing left to load")
+                finally:
+                    tab._stop_scanner()
+        finally:
+            from scei.data.repositories import session_scope
+            from scei.data.models import Documento
+            with session_scope() as s:
+                s.query(Documento).filter(Documento.ruta.in_([os.path.abspath(tmp.name),
+                                                              os.path.abspath(tmp.name) + ".2"])).delete()
+            if os.path.exists(tmp.name):
+                os.remove(tmp.name)
+
+    def test_07_bitacora_retention(self):
+        print("\n[Test] Bitacora Retention and Archive")
+        import json
+        import subprocess
+        import tempfile
+        # El prune mueve TODO lo anterior al corte: se corre en otro proceso sobre una BD
+        # temporal (SCEI_DB_PATH) para no archivar la bitácora real en un directorio efímero
+        probe = (
+            "import sys, json\n"
+            "from datetime import datetime, timedelta\n"
+            "from scei.data import retention\n"
+            "from scei.data.db import engine, SessionLocal\n"
+            "from scei.data.models import Base, Bitacora\n"
+            "Base.metadata.create_all(engine)\n"
+            "old = datetime.now() - timedelta(days=400)\n"
+            "with SessionLocal() as s:\n"
+            "    s.add_all([Bitacora(accion='TEST_RET', descripcion=f'old {i}', modulo='Test', fecha=old) for i in range(7)])\n"
+            "    s.add(Bitacora(accion='TEST_RET', descripcion='recent', modulo='Test'))\n"
+            "    s.commit()\n"
+            "moved = retention.prune_bitacora(days=365, chunk_size=3, archive_dir=sys.argv[1])\n"
+            "with SessionLocal() as s:\n"
+            "    remaining = [b.descripcion for b in s.query(Bitacora).filter_by(accion='TEST_RET')]\n"
+            "print(json.dumps({'moved': moved, 'remaining': remaining, 'month': old.strftime('%Y-%m'),\n"
+            "                  'day': old.date().isoformat()}))\n"
+        )
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, SCEI_DB_PATH=os.path.join(tmp, "ret.db"))
+            out = subprocess.run([sys.executable, "-c", probe, os.path.join(tmp, "archivo")], cwd=root,
+                                 env=env, capture_output=True, text=True, timeout=120)
+            self.assertEqual(out.returncode, 0, out.stderr)
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            self.assertEqual(result["moved"], 7, "Old rows should be archived")
+            self.assertEqual(result["remaining"], ["recent"], "Recent rows must stay")
+
+            from datetime import date
+            from scei.data import retention
+            archive = os.path.join(tmp, "archivo")
+            self.assertIn(result["month"], retention.list_archive_months(archive))
+            day = date.fromisoformat(result["day"])
+            found = list(retention.query_archive(day, day, "test_ret", archive_dir=archive))
+            self.assertEqual(len(found), 7, "Archived rows should be queryable")
+
+    def test_08_cold_start_budget(self):
+        print("\n[Test] Cold Start Budget")
+        import json
+        import subprocess
+        # Presupuesto holgado para CI; en equipos de oficina se mide con SCEI_TRACE_STARTUP=1
+        budget_ms = 4000
+        probe = (
+            "import sys, json\n"
+            "from scei.startup import tracer\n"
+            "with tracer.phase('import:login'):\n"
+            "    from PyQt6.QtWidgets import QApplication\n"
+            "    from scei.ui.dialogs import LoginDialog\n"
+            "app = QApplication(sys.argv)\n"
+            "with tracer.phase('login_dialog'):\n"
+            "    LoginDialog()\n"
+            "heavy = ['cv2', 'numpy', 'openpyxl', 'docx', 'PyQt6.QtPrintSupport', 'scei.ui.window']\n"
+            "print(json.dumps({'total_ms': tracer.elapsed_ms(), 'loaded': [m for m in heavy if m in sys.modules]}))\n"
+        )
+        env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        out = subprocess.run([sys.executable, "-c", probe], cwd=root, env=env,
+                             capture_output=True, text=True, timeout=120)
+        self.assertEqual(out.returncode, 0, out.stderr)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"Login ready in {result['total_ms']:.0f} ms")
+        self.assertEqual(result["loaded"], [], "Heavy modules must not load before login")
+        self.assertLess(result["total_ms"], budget_ms, "Cold start exceeded budget")
+
+    def test_09_bootstrap_fast_path_and_dedup(self):
+        print("\n[Test] Bootstrap Fast Path and Dedup")
+        from scei import bootstrap
+        from scei.data.repositories import session_scope
+        name = "Finanzas"           # semilla
+        own = "TEST_DIR_DUPLICADA"  # creada por un usuario
+        with session_scope() as s:
+            s.query(Direccion).filter_by(nombre=own).delete()
+            keep_id = min(d.id for d in s.query(Direccion).filter_by(nombre=name))
+            b = Direccion(nombre=name, activo=1)
+            s.add_all([b, Direccion(nombre=own, activo=1), Direccion(nombre=own, activo=1)])
+            s.flush()
+            dup_id = b.id
+            s.add(Equipo(codigo_interno="TEST-DUP-001", descripcion="dup", estado="optimo", direccion_id=dup_id))
+
+        bootstrap.run_bootstrap(force=True)
+        self.assertTrue(bootstrap.is_bootstrap_current(), "Bootstrap should record schema/seed version")
+        with session_scope() as s:
+            ids = [d.id for d in s.query(Direccion).filter_by(nombre=name)]
+            self.assertEqual(ids, [keep_id], "Seed duplicates should be merged into the oldest row")
+            eq = s.query(Equipo).filter_by(codigo_interno="TEST-DUP-001").one()
+            self.assertEqual(eq.direccion_id, keep_id, "Equipos should be re-pointed to the kept row")
+            self.assertEqual(s.query(Direccion).filter_by(nombre=own).count(), 2,
+                             "User-created direcciones must not be merged")
+            seeded = s.query(Direccion).filter(Direccion.nombre.in_(bootstrap.SEED_DIRECCIONES)).count()
+            self.assertEqual(seeded, len(bootstrap.SEED_DIRECCIONES))
+            s.delete(eq)
+            s.query(Direccion).filter_by(nombre=own).delete()
+
+        # Camino rápido: un DI-ADMIN borrado o renombrado se vuelve a crear
+        renamed = "TEST_DI_ADMIN_RENOMBRADO"
+        with session_scope() as s:
+            s.query(User).filter_by(username=renamed).delete()
+            s.query(User).filter_by(username="DI-ADMIN").update({"username": renamed})
+        try:
+            self.assertTrue(bootstrap.is_bootstrap_current())
+            bootstrap.run_bootstrap()
+            with session_scope() as s:
+                self.assertEqual(s.query(User).filter_by(username="DI-ADMIN").count(), 1,
+                                 "Fast path should recreate a missing DI-ADMIN")
+        finally:
+            with session_scope() as s:
+                if s.query(User).filter_by(username=renamed).count():
+                    s.query(User).filter_by(username="DI-ADMIN").delete()
+                    s.query(User).filter_by(username=renamed).update({"username": "DI-ADMIN"})
+
+    def test_10_backup_and_restore(self):
+        print("\n[Test] Online Backup and Restore")
+        import sqlite3
+        import tempfile
+        from scei.data import backup
+        with tempfile.TemporaryDirectory() as tmp:
+            db = os.path.join(tmp, "live.db")
+            con = sqlite3.connect(db)
+            con.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)")
+            con.executemany("INSERT INTO t (v) VALUES (?)", [(f"fila {i}",) for i in range(5000)])
+            con.commit()
+
+            snaps_dir = os.path.join(tmp, "snaps")
+            snap = backup.create_snapshot(snaps_dir, keep=2, source=db)
+            self.assertTrue(backup.verify_database(snap), "Snapshot should pass integrity_check")
+            backup.create_snapshot(snaps_dir, keep=2, source=db)
+            backup.create_snapshot(snaps_dir, keep=2, source=db)
+            self.assertEqual(len(backup.list_snapshots(snaps_dir)), 2, "Old snapshots should rotate out")
+
+            latest = backup.list_snapshots(snaps_dir)[0][0]
+            con.execute("DELETE FROM t")
+            con.commit()
+            con.close()
+            safety = backup.restore_snapshot(latest, target=db, backup_dir=snaps_dir)
+            self.assertIsNotNone(safety, "A safety snapshot should be taken before restoring")
+            con = sqlite3.connect(db)
+            self.assertEqual(con.execute("SELECT COUNT(*) FROM t").fetchone()[0], 5000)
+            con.close()
+
+    def test_11_face_engine_on_video(self):
+        print("\n[Test] Shared Face Engine (recorded video)")
+        try:
+            import cv2
+            import numpy as np
+        except ImportError:
+            self.skipTest("OpenCV no instalado")
+        import tempfile
+        from scei.vision import engine as face_engine
+
+        class CountingDetector:
+            def __init__(self):
+                self.calls = 0
+            def detectMultiScale(self, gray, scale, neighbors, **kwargs):
+                self.calls += 1
+                return [(4, 4, 16, 16)] if gray.mean() > 50 else []
+
+        with tempfile.TemporaryDirectory() as tmp:
+            video = os.path.join(tmp, "grabacion.avi")
+            writer = cv2.VideoWriter(video, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+            for i in range(8):
+                writer.write(np.full((48, 64, 3), i * 20, np.uint8))
+            writer.release()
+
+            detector = CountingDetector()
+            face_engine.set_face_engine(face_engine.FaceEngine(detector=detector))
+            try:
+                eng = face_engine.get_face_engine()
+                self.assertIs(eng, face_engine.get_face_engine(), "Engine must be shared")
+                results = list(eng.detect_video(video))
+            finally:
+                face_engine.set_face_engine(None)
+        self.assertEqual(len(results), 8, "Every recorded frame should be processed")
+        self.assertEqual(detector.calls, 8, "One detection per frame, no reload")
+        self.assertTrue(any(faces for _, faces in results))
+
+    def test_12_multiuser_face_gallery(self):
+        print("\n[Test] Multi-user LBPH Gallery")
+        try:
+            import cv2
+            import numpy as np
+        except ImportError:
+            self.skipTest("OpenCV no instalado")
+        import tempfile
+        from scei.vision.gallery import get_gallery
+        from scei.data.repositories import session_scope
+
+        def model_bytes(images):
+            rec = cv2.face.LBPHFaceRecognizer_create()
+            rec.train(images, np.array([1] * len(images)))
+            fd, path = tempfile.mkstemp(".yml")
+            os.close(fd)
+            rec.save(path)
+            with open(path, "rb") as f:
+                data = f.read()
+            os.remove(path)
+            return data
+
+        rng = np.random.default_rng(7)
+        faces = {name: [rng.integers(0, 255, (80, 80), dtype=np.uint8) for _ in range(3)]
+                 for name in ("TEST_FACE_A", "TEST_FACE_B")}
+        ids = {}
+        with session_scope() as s:
+            s.query(User).filter(User.username.in_(list(faces))).delete()
+            for name in faces:
+                u = User(username=name, password="x")
+                s.add(u)
+                s.flush()
+                ids[name] = u.id
+        try:
+            for name, imgs in faces.items():
+                repositories.update_user_profile(ids[name], {"face_data": model_bytes(imgs)})
+            gallery = get_gallery()
+            self.assertIs(gallery, get_gallery(), "Gallery should be cached")
+            uid, conf = gallery.predict(faces["TEST_FACE_B"][1])
+            self.assertEqual(uid, ids["TEST_FACE_B"], "Single predict should return the user id")
+            self.assertLess(conf, 1.0)
+
+            repositories.update_user_profile(ids["TEST_FACE_A"], {"face_data": None})
+            rebuilt = get_gallery()
+            self.assertIsNot(rebuilt, gallery, "Gallery should rebuild when face_data changes")
+            self.assertNotIn(ids["TEST_FACE_A"], rebuilt.usernames)
+        finally:
+            with session_scope() as s:
+                s.query(User).filter(User.username.in_(list(faces))).delete()
+
+    def test_13_threaded_pipeline_image_dir(self):
+        print("\n[Test] Threaded Capture/Detection Pipeline (image directory)")
+        try:
+            import cv2
+            import numpy as np
+        except ImportError:
+            self.skipTest("OpenCV no instalado")
+        import time
+        import tempfile
+        from PyQt6.QtWidgets import QApplication
+        app = QApplication.instance() or QApplication(sys.argv)
+        from scei.vision.engine import FaceEngine
+        from scei.vision.sources import open_source
+        from scei.vision.pipeline import FacePipeline, LatestFrameSlot, qimage_from_bgr
+
+        slot = LatestFrameSlot()
+        slot.put(1); slot.put(2)
+        self.assertEqual(slot.get(0), 2, "Slot keeps only the newest frame")
+        self.assertEqual(slot.dropped, 1)
+
+        class FixedDetector:
+            def detectMultiScale(self, gray, scale, neighbors, **kwargs):
+                return [(2, 2, 10, 10)]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for i in range(12):
+                cv2.imwrite(os.path.join(tmp, f"{i:03d}.png"), np.full((40, 60, 3), i * 10, np.uint8))
+            results, previews, done = [], [], []
+            pipe = FacePipeline(open_source(tmp), FaceEngine(detector=FixedDetector()),
+                                analyze=lambda gray, faces, frame: len(faces))
+            pipe.result_ready.connect(results.append)
+            def on_frame(frame, faces):
+                img = qimage_from_bgr(frame)
+                previews.append((img.width(), img.height()))
+                pipe.preview_consumed()
+            pipe.frame_ready.connect(on_frame)
+            pipe.finished.connect(lambda: done.append(True))
+            pipe.start()
+            deadline = time.time() + 10
+            while not done and time.time() < deadline:
+                app.processEvents()
+                time.sleep(0.005)
+            app.processEvents()
+            pipe.stop()
+
+        self.assertTrue(done, "Pipeline should finish at end of source")
+        self.assertEqual(pipe.frames_captured, 12)
+        self.assertEqual(pipe.frames_processed + pipe.slot.dropped, 12, "Frames are processed or dropped")
+        self.assertEqual(len(results), pipe.frames_processed)
+        self.assertTrue(previews and previews[0] == (60, 40))
+
+    def test_14_downscaled_roi_tracking(self):
+        print("\n[Test] Downscaled Detection + ROI Tracking (recorded clip)")
+        try:
+            import cv2
+            import numpy as np
+        except ImportError:
+            self.skipTest("OpenCV no instalado")
+        import tempfile
+        from scei.vision.engine import FaceEngine
+        from scei.vision.sources import VideoFileSource
+        from scei.vision.detection import compare_with_baseline
+
+        class BlobDetector:
+            """Detecta la mancha clara del cuadro y acumula los píxeles examinados."""
+            def __init__(self):
+                self.pixels = 0
+            def detectMultiScale(self, gray, scale, neighbors, **kwargs):
+                self.pixels += gray.size
+                ys, xs = np.nonzero(gray > 128)
+                if len(xs) == 0:
+                    return []
+                x0, y0 = int(xs.min()), int(ys.min())
+                return [(x0, y0, int(xs.max()) - x0 + 1, int(ys.max()) - y0 + 1)]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            video = os.path.join(tmp, "clip.avi")
+            writer = cv2.VideoWriter(video, cv2.VideoWriter_fourcc(*"MJPG"), 15, (320, 240))
+            for i in range(30):
+                frame = np.zeros((240, 320, 3), np.uint8)
+                x = 40 + i * 4
+                frame[80:160, x:x + 64] = 255
+                writer.write(frame)
+            writer.release()
+
+            detector = BlobDetector()
+            result = compare_with_baseline(VideoFileSource(video), FaceEngine(detector=detector),
+                                           scale=0.5, pad=0.5, redetect_every=5)
+
+        self.assertEqual(result["cuadros"], 30)
+        self.assertGreaterEqual(result["recall"], 0.95, "Tracking must keep the moving face")
+        self.assertGreater(result["busquedas_roi"], result["busquedas_completas"])
+        # Cuadro completo: 30 * 320*240 píxeles; el resto lo examinó la estrategia reducida+ROI
+        baseline_px = 30 * 320 * 240
+        tracked_px = detector.pixels - baseline_px
+        print(f"  píxeles examinados: actual={baseline_px} reducida+roi={tracked_px}")
+        self.assertLess(tracked_px, baseline_px / 4)
+
+    def test_15_compact_face_model_and_cache(self):
+        print("\n[Test] Compact Biometric Model Format + Hash Cache")
+        try:
+            import cv2
+            import numpy as np
+        except ImportError:
+            self.skipTest("OpenCV no instalado")
+        import tempfile
+        from sqlalchemy import inspect as sa_inspect
+        from scei.vision import model_format
+        from scei.vision.gallery import FaceGallery
+        from scei.data.repositories import session_scope
+
+        rng = np.random.default_rng(11)
+        imgs = [rng.integers(0, 255, (80, 80), dtype=np.uint8) for _ in range(5)]
+        rec = cv2.face.LBPHFaceRecognizer_create()
+        rec.train(imgs, np.array([1] * len(imgs)))
+        blob = model_format.encode_model(model_format.recognizer_params(rec), rec.getHistograms())
+        fd, path = tempfile.mkstemp(".yml")
+        os.close(fd)
+        rec.save(path)
+        yaml_size = os.path.getsize(path)
+        os.remove(path)
+        print(f"  tamaño: yaml={yaml_size} compacto={len(blob)}")
+        self.assertLess(len(blob), yaml_size / 3, "Compact model should be much smaller than YAML")
+
+        params, mat = model_format.decode_model(blob)
+        self.assertEqual(params, {**model_format.recognizer_params(rec), "normalized": False})
+        self.assertTrue(np.array_equal(mat, np.vstack(rec.getHistograms())))
+
+        # Galería en memoria: mismo resultado que LBPHFaceRecognizer.predict
+        model_format.clear_model_cache()
+        fetched = []
+        def fetch(uid):
+            fetched.append(uid)
+            return blob
+        key = model_format.model_hash(blob)
+        gallery = FaceGallery([(7, "u7", key)], fetch)
+        uid, conf = gallery.predict(imgs[2])
+        label, ref_conf = rec.predict(imgs[2])
+        self.assertEqual(uid, 7)
+        self.assertAlmostEqual(conf, ref_conf, places=3)
+        FaceGallery([(7, "u7", key)], fetch)
+        self.assertEqual(fetched, [7], "Unchanged model must come from the hash cache")
+
+        # Un perfil con otros parámetros LBPH queda fuera, pero se registra el motivo
+        rec2 = cv2.face.LBPHFaceRecognizer_create(2, 8, 8, 8)
+        rec2.train(imgs, np.array([1] * len(imgs)))
+        blob2 = model_format.encode_model(model_format.recognizer_params(rec2), rec2.getHistograms())
+        blobs = {7: blob, 8: blob2}
+        with self.assertLogs("scei.vision.gallery", level="WARNING"):
+            mixed = FaceGallery([(7, "u7", key), (8, "u8", model_format.model_hash(blob2))], blobs.get)
+        self.assertEqual(len(mixed), 1)
+        self.assertIn(8, mixed.skipped)
+
+        # Modelos enrolados con normalización frente a los anteriores (recorte crudo)
+        from scei.vision.enrollment import normalize_face, train_model
+        self.assertFalse(params["normalized"])
+        legacy_v1 = blob[:4] + bytes([1]) + blob[5:]
+        self.assertFalse(model_format.decode_model(legacy_v1)[0]["normalized"])
+        other = [rng.integers(0, 255, (120, 120), dtype=np.uint8) for _ in range(4)]
+        enrolled = train_model([normalize_face(img) for img in other], label=1)
+        self.assertTrue(model_format.decode_model(enrolled)[0]["normalized"])
+        blobs = {7: blob, 9: enrolled}
+        both = FaceGallery([(7, "u7", key), (9, "u9", model_format.model_hash(enrolled))], blobs.get)
+        self.assertEqual(set(both.recognizers), {False, True})
+        self.assertEqual(both.predict(other[1])[0], 9, "Normalized model gets the normalized ROI")
+        uid, conf = both.predict(imgs[2])
+        self.assertEqual(uid, 7, "Legacy model gets the raw ROI")
+        self.assertAlmostEqual(conf, ref_conf, places=3)
+
+        # Las consultas de usuarios no cargan el blob
+        name = "TEST_COMPACT_FACE"
+        with session_scope() as s:
+            s.query(User).filter(User.username == name).delete()
+            u = User(username=name, password="x")
+            s.add(u)
+            s.flush()
+            user_id = u.id
+        try:
+            repositories.update_user_profile(user_id, {"face_data": blob})
+            u = repositories.get_user(name)
+            self.assertIn("face_data", sa_inspect(u).unloaded)
+            self.assertEqual(u.face_hash, key)
+            self.assertTrue(all("face_data" in sa_inspect(x).unloaded for x in repositories.list_users_full()))
+            self.assertEqual(repositories.get_face_data(user_id), blob)
+        finally:
+            with session_scope() as s:
+                s.query(User).filter(User.username == name).delete()
+
+    def test_16_background_enrollment(self):
+        print("\n[Test] Normalized Samples + Background Enrollment Training")
+        try:
+            import cv2
+            import numpy as np
+        except ImportError:
+            self.skipTest("OpenCV no instalado")
+        import time
+        from PyQt6.QtCore import QThread
+        from PyQt6.QtWidgets import QApplication
+        app = QApplication.instance() or QApplication(sys.argv)
+        from scei.vision.enrollment import SampleCollector, SAMPLE_SIZE
+        from scei.vision.model_format import decode_model
+        from scei.ui.biometrics import _EnrollWorker
+        from scei.data.repositories import session_scope
+
+        rng = np.random.default_rng(3)
+        collector = SampleCollector(10)
+        base = rng.integers(0, 255, (130, 120), dtype=np.uint8)
+        self.assertTrue(collector.add(base))
+        self.assertFalse(collector.add(base.copy()), "Identical consecutive frame must be rejected")
+        while not collector.full:
+            collector.add(rng.integers(0, 255, (int(rng.integers(60, 160)),) * 2, dtype=np.uint8))
+        self.assertEqual(collector.rejected, 1)
+        self.assertTrue(all(s.shape == (SAMPLE_SIZE[1], SAMPLE_SIZE[0]) for s in collector.samples))
+
+        name = "TEST_ENROLL_BG"
+        with session_scope() as s:
+            s.query(User).filter(User.username == name).delete()
+            u = User(username=name, password="x")
+            s.add(u)
+            s.flush()
+            user_id = u.id
+        try:
+            thread = QThread()
+            worker = _EnrollWorker(user_id, collector.samples)
+            worker.moveToThread(thread)
+            progress, result = [], []
+            thread.started.connect(worker.run)
+            worker.progress.connect(lambda d, t: progress.append((d, t)))
+            worker.finished.connect(result.append)
+            thread.start()
+            deadline = time.time() + 20
+            while not result and time.time() < deadline:
+                app.processEvents()
+                time.sleep(0.005)
+            thread.quit()
+            thread.wait()
+            self.assertEqual(result, [""], "Training should succeed in the worker")
+            self.assertEqual(progress[-1], (10, 10))
+            self.assertGreater(len(progress), 1, "Progress should be reported per batch")
+            _, mat = decode_model(repositories.get_face_data(user_id))
+            self.assertEqual(mat.shape[0], 10)
+        finally:
+            with session_scope() as s:
+                s.query(User).filter(User.username == name).delete()
+
+    def test_17_biometric_benchmark_harness(self):
+        print("\n[Test] Biometric Benchmark Harness (labeled image folders)")
+        try:
+            import cv2
+            import numpy as np
+        except ImportError:
+            self.skipTest("OpenCV no instalado")
+        import json
+        import tempfile
+        from scei.vision.engine import FaceEngine
+        from scei.vision.enrollment import normalize_face, train_model
+        from scei.vision.gallery import FaceGallery
+        from scei.vision.model_format import model_hash
+        from scei.vision.benchmark import labeled_sources, run_benchmark
+
+        class WholeFrameDetector:
+            def detectMultiScale(self, gray, scale, neighbors, **kwargs):
+                h, w = gray.shape[:2]
+                return [(0, 0, w, h)]
+
+        rng = np.random.default_rng(5)
+        face_a = rng.integers(0, 255, (120, 120), dtype=np.uint8)
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, n in (("USER_A", 6), ("desconocido", 4)):
+                os.makedirs(os.path.join(tmp, name))
+                for i in range(n):
+                    img = face_a if name == "USER_A" else rng.integers(0, 255, (120, 120), dtype=np.uint8)
+                    noisy = np.clip(img.astype(int) + rng.integers(-3, 4, img.shape), 0, 255).astype(np.uint8)
+                    cv2.imwrite(os.path.join(tmp, name, f"{i:02d}.png"), cv2.cvtColor(noisy, cv2.COLOR_GRAY2BGR))
+
+            blob = train_model([normalize_face(cv2.flip(face_a, 1))] * 3)
+            gallery = FaceGallery([(42, "USER_A", model_hash(blob))], lambda uid: blob)
+            engine = FaceEngine(detector=WholeFrameDetector())
+            result = run_benchmark(labeled_sources(tmp), gallery, engine)
+
+        print(f"  fps={result['fps']} far={result['far']} frr={result['frr']}")
+        self.assertEqual(result["cuadros"], 10)
+        self.assertEqual(result["genuinos"], 6)
+        self.assertEqual(result["impostores"], 4)
+        self.assertEqual(result["aceptados_correctos"], 6)
+        self.assertEqual(result["falsos_aceptados"], 0)
+        self.assertEqual(result["rechazos_correctos"], 4)
+        self.assertEqual(result["umbral"], 60)
+        self.assertEqual(set(result["etapas"]), {"captura", "deteccion", "reconocimiento", "total"})
+        self.assertIn("p95_ms", result["etapas"]["total"])
+        json.dumps(result)
+
+    def test_18_benchmark_suite_smoke(self):
+        print("\n[Test] Repository/UI Benchmark Suite (tiny synthetic DB)")
+        from scei.tools.bench import run_suite, compare_reports
+        logs_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs.json")
+        logs_before = os.path.getmtime(logs_path) if os.path.exists(logs_path) else None
+        report = run_suite(["200"], export_limit=20, repeat=1)
+        res = report["escalas"]["200"]
+        self.assertNotIn("error", res, res.get("error"))
+        self.assertEqual(res["filas"]["equipo"], 200)
+        med = res["mediciones"]
+        for key in ("repo.list_equipos", "repo.list_mantenimientos", "ui.analitica.refresh",
+                    "ui.equipos.buscar[sn]", "export.equipos.pdf"):
+            self.assertIn(key, med)
+        self.assertGreater(med["repo.list_equipos"]["mediana_ms"], 0)
+        self.assertTrue(compare_reports(report, report), "Identical runs should be comparable")
+        if logs_before is not None:
+            self.assertEqual(os.path.getmtime(logs_path), logs_before, "Benchmark must not touch logs.json")
+
+    def test_19_synthetic_generator_deterministic(self):
+        print("\n[Test] Deterministic Synthetic Data Generator")
+        import sqlite3
+        import tempfile
+        from datetime import date
+        from sqlalchemy import create_engine
+        from scei.data.models import Base
+        from scei.tools.synthetic import generate
+
+        def build(path, seed):
+            eng = create_engine(f"sqlite:///{path}", future=True)
+            Base.metadata.create_all(eng)
+            counts = generate(eng, equipos=300, mantenimientos=1000, bitacora=500, seed=seed,
+                              fecha_base=date(2025, 6, 30))
+            eng.dispose()
+            con = sqlite3.connect(path)
+            dump = {t: con.execute(f"SELECT * FROM {t} ORDER BY id").fetchall()
+                    for t in ("direccion", "equipo", "mantenimiento", "bitacora")}
+            con.close()
+            return counts, dump
+
+        with tempfile.TemporaryDirectory() as tmp:
+            c1, d1 = build(os.path.join(tmp, "a.db"), 7)
+            c2, d2 = build(os.path.join(tmp, "b.db"), 7)
+            _, d3 = build(os.path.join(tmp, "c.db"), 8)
+
+        self.assertEqual(c1, {"equipo": 300, "mantenimiento": 1000, "bitacora": 500})
+        self.assertEqual(d1, d2, "Same seed must produce identical data")
+        self.assertNotEqual(d1["equipo"], d3["equipo"])
+        codes = {(e[1], e[9]) for e in d1["equipo"]}
+        self.assertEqual(len(codes), 300, "codigo_interno must be unique per dirección")
+        last_state = {}
+        for _, eq_id, fecha, _, estado, *_ in sorted(d1["mantenimiento"], key=lambda m: (m[1], m[2], m[0])):
+            last_state[eq_id] = estado
+        self.assertTrue(all(e[7] == last_state[e[0]] for e in d1["equipo"] if e[0] in last_state),
+                        "Equipo state must match its last maintenance")
+
+    def test_20_sql_instrumentation(self):
+        print("\n[Test] SQL Instrumentation per UI Action (N+1 detection)")
+        import json
+        import tempfile
+        from scei.data.instrumentation import stats, fingerprint, instrument_classes, N_PLUS_ONE_THRESHOLD
+        from scei.data.db import engine
+        from scei.ui.helpers import direccion_nombre
+
+        self.assertEqual(fingerprint("SELECT * FROM equipo WHERE id = 5 AND codigo_interno = 'DI-1'"),
+                         fingerprint("SELECT *  FROM equipo WHERE id = 77 AND codigo_interno = 'X'"))
+        self.assertIn("(?...)", fingerprint("SELECT 1 FROM t WHERE id IN (?, ?, ?)"))
+
+        dirs = repositories.list_direcciones()
+        self.assertTrue(dirs)
+        ids = [dirs[i % len(dirs)].id for i in range(N_PLUS_ONE_THRESHOLD + 5)]
+
+        from PyQt6.QtCore import QObject, pyqtSignal
+
+        class Emisor(QObject):
+            clicked = pyqtSignal(bool)
+
+        class Fake(QObject):
+            def on_fila(self):                # clicked(bool) pasa un argumento extra
+                self.names = [direccion_nombre(i) for i in ids]
+
+            def ayudante(self):
+                return repositories.list_direcciones()
+
+        instrument_classes([Fake])
+        instrument_classes([Fake])   # idempotente
+        stats.reset()
+        # Sin la caché de lecturas cada direccion_nombre() vuelve a consultar
+        max_rows, repositories.read_cache.max_rows = repositories.read_cache.max_rows, 0
+        try:
+            fake, emisor = Fake(), Emisor()
+            emisor.clicked.connect(fake.on_fila)
+            emisor.clicked.emit(False)
+            Fake().ayudante()
+        finally:
+            repositories.read_cache.max_rows = max_rows
+        self.assertEqual(len(fake.names), len(ids))
+
+        snap = stats.snapshot()
+        act = snap["acciones"]["Fake.on_fila"]
+        print(f"Fake.on_fila: {act['consultas']} consultas, N+1={act['n_mas_uno']}")
+        self.assertEqual(act["ejecuciones"], 1)
+        self.assertGreaterEqual(act["consultas"], len(ids))
+        self.assertTrue(act["n_mas_uno"], "Per-row direccion_nombre() must be flagged as N+1")
+        self.assertNotIn("Fake.ayudante", snap["acciones"])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            out = os.path.join(tmp, "sql.json")
+            stats.export_json(out)
+            with open(out, encoding="utf-8") as f:
+                data = json.load(f)
+        self.assertIn("Fake.on_fila", data["acciones"])
+        with self.assertRaises(TypeError, msg="Outside a signal the arguments are forwarded as given"):
+            fake.on_fila(False)
+
+        # Una sentencia que falla no deja su marca de tiempo en la conexión
+        from sqlalchemy.exc import OperationalError
+        with engine.connect() as conn:
+            with self.assertRaises(OperationalError):
+                conn.exec_driver_sql("SELECT * FROM tabla_inexistente")
+            self.assertNotIn("_scei_t0", conn.info)
+        stats.reset()
+
+    def test_21_ui_profiler_stall_detection(self):
+        print("\n[Test] UI Profiler: Action Timings, Stall Watchdog, cProfile Dump")
+        import json
+        import pstats
+        import tempfile
+        import time
+        from PyQt6.QtCore import QObject, QTimer, QEventLoop
+        from PyQt6.QtWidgets import QApplication
+        from scei.ui.profiler import UIProfiler
+        app = QApplication.instance() or QApplication(sys.argv)
+
+        from PyQt6.QtWidgets import QPushButton
+
+        class Pestana(QObject):
+            def refresh(self):
+                time.sleep(0.35)          # bloquea el loop de eventos
+
+            def on_add(self):
+                return "ok"
+
+        with tempfile.TemporaryDirectory() as tmp:
+            prof = UIProfiler(os.path.join(tmp, "ui_trace.jsonl"), threshold_ms=100, tick_ms=20)
+            prof.instrument([Pestana])
+            prof.instrument([Pestana])    # idempotente
+            self.assertTrue(hasattr(Pestana.refresh, "__scei_timed__"))
+            prof.start()
+            prof.toggle_cprofile()
+            p = Pestana()
+            boton = QPushButton()
+            boton.clicked.connect(p.on_add)                   # argumento extra de clicked
+            loop = QEventLoop()
+            QTimer.singleShot(100, p.refresh)
+            QTimer.singleShot(150, boton.click)
+            QTimer.singleShot(700, loop.quit)
+            loop.exec()
+            dump = prof.toggle_cprofile()
+            prof.stop()
+
+            summary = prof.summary()
+            print(f"Acciones: {summary['acciones']}; bloqueos: {prof.stalls}")
+            self.assertEqual(summary["acciones"]["Pestana.refresh"]["veces"], 1)
+            self.assertGreaterEqual(summary["acciones"]["Pestana.refresh"]["max_ms"], 300)
+            self.assertIn("Pestana.on_add", summary["acciones"])
+            self.assertTrue(prof.stalls, "Blocking refresh() must be recorded as a stall")
+            stall = prof.stalls[0]
+            self.assertEqual(stall["accion"], "Pestana.refresh")
+            self.assertGreaterEqual(stall["ms"], 100)
+            self.assertTrue(any("refresh" in line for line in stall["pila"]))
+
+            with open(os.path.join(tmp, "ui_trace.jsonl"), encoding="utf-8") as f:
+                tipos = [json.loads(line)["tipo"] for line in f]
+            self.assertIn("bloqueo", tipos)
+            self.assertIn("accion", tipos)
+            self.assertEqual(tipos[-1], "fin")
+            self.assertTrue(os.path.exists(dump))
+            pstats.Stats(dump)
+
+    def test_22_row_dto_projections(self):
+        print("\n[Test] Column-Projection Row DTOs for List Screens")
+        from PyQt6.QtWidgets import QApplication
+        from scei.data.instrumentation import stats
+        from scei.data.rows import EquipoRow, MantenimientoRow
+        from scei.ui.helpers import direccion_nombre
+        app = QApplication.instance() or QApplication(sys.argv)
+
+        d = repositories.list_direcciones()[0]
+        code = "DTO-TEST-01"
+        with repositories.session_scope() as s:
+            s.query(Mantenimiento).filter(Mantenimiento.equipo.has(codigo_interno=code)).delete(synchronize_session=False)
+            s.query(Equipo).filter_by(codigo_interno=code).delete()
+            e = Equipo(codigo_interno=code, descripcion="Monitor", marca="HP", estado="optimo", direccion_id=d.id)
+            s.add(e)
+            s.flush()
+            s.add(Mantenimiento(equipo_id=e.id, descripcion="Revisión", estado_equipo="optimo"))
+            eq_id = e.id
+        try:
+            rows = repositories.list_equipo_rows(d.id)
+            self.assertEqual([r.id for r in rows], [e.id for e in repositories.list_equipos_by_direccion(d.id)])
+            row = next(r for r in rows if r.id == eq_id)
+            self.assertIsInstance(row, EquipoRow)
+            self.assertFalse(hasattr(row, "__dict__"), "Rows must not carry a per-instance dict")
+            self.assertEqual(row.direccion_nombre, direccion_nombre(d.id))
+            self.assertEqual(len(repositories.list_equipo_rows()), len(repositories.list_equipos()))
+
+            mrows = repositories.list_mantenimiento_rows(d.id)
+            self.assertEqual(len(repositories.list_mantenimiento_rows()), len(repositories.list_mantenimientos()))
+            mrow = next(m for m in mrows if m.equipo_id == eq_id)
+            self.assertIsInstance(mrow, MantenimientoRow)
+            self.assertEqual((mrow.equipo_codigo, mrow.equipo_marca, mrow.direccion_nombre), (code, "HP", d.nombre))
+
+            from scei.ui.tabs.equipos import EquiposTab
+            from scei.ui.tabs.mantenimientos import MantenimientoTab
+            eq_tab = EquiposTab(direccion_id=d.id)
+            mant_tab = MantenimientoTab(direccion_id=d.id)
+            self.assertEqual(eq_tab.table.rowCount(), len(rows))
+            self.assertEqual(mant_tab.table.rowCount(), len(mrows))
+            r = next(i for i in range(eq_tab.table.rowCount()) if eq_tab.table.item(i, 0).text() == code)
+            eq_tab.table.setCurrentCell(r, 1)
+            self.assertEqual(eq_tab.current_id(), eq_id)
+
+            # El listado ya no consulta la dirección fila por fila
+            stats.reset()
+            with stats.action("test.refresh"):
+                eq_tab.refresh()
+                mant_tab.refresh()
+            act = stats.snapshot()["acciones"]["test.refresh"]
+            print(f"refresh de ambos listados: {act['consultas']} consultas")
+            self.assertLessEqual(act["consultas"], 4)
+            stats.reset()
+        finally:
+            with repositories.session_scope() as s:
+                s.query(Mantenimiento).filter_by(equipo_id=eq_id).delete()
+                s.query(Equipo).filter_by(id=eq_id).delete()
+
+    def test_23_versioned_read_cache(self):
+        print("\n[Test] Versioned Read Cache in the Repositories Facade")
+        import sqlite3
+        from scei.data.cache import ReadCache, cached
+        from scei.data.db import DB_PATH
+        from scei.data.instrumentation import stats
+        cache = repositories.read_cache
+
+        # Leer dos veces sin cambios: la segunda no toca la BD
+        repositories.list_equipo_rows()
+        repositories.list_direcciones()
+        repositories.list_users_full()
+        stats.reset()
+        with stats.action("test.cache"):
+            a = repositories.list_equipo_rows()
+            repositories.list_direcciones()
+            repositories.list_users_full()
+            repositories.list_users_full()
+        b = repositories.list_equipo_rows()
+        self.assertEqual(a, b)
+        self.assertIsNot(a, b, "Callers must get their own list copy")
+        self.assertEqual(stats.snapshot()["acciones"]["test.cache"]["consultas"], 0,
+                         "Warm reads must not hit SQLite")
+
+        # Escritura por la fachada: desaloja solo lo que depende de la tabla
+        d = repositories.list_direcciones()[0]
+        code = "CACHE-TEST-01"
+        before = len(repositories.list_equipo_rows(d.id))
+        hits = cache.hits
+        repositories.add_equipo({"codigo_interno": code, "descripcion": "x", "estado": "optimo", "direccion_id": d.id})
+        try:
+            self.assertEqual(len(repositories.list_equipo_rows(d.id)), before + 1)
+            repositories.list_direcciones()
+            self.assertEqual(cache.hits, hits + 1, "Direcciones must stay cached after an equipo write")
+
+            # Escritura ajena (otra conexión): PRAGMA data_version la detecta
+            con = sqlite3.connect(str(DB_PATH))
+            con.execute("UPDATE equipo SET descripcion = 'externo' WHERE codigo_interno = ?", (code,))
+            con.commit()
+            con.close()
+            row = next(r for r in repositories.list_equipo_rows(d.id) if r.codigo_interno == code)
+            self.assertEqual(row.descripcion, "externo")
+
+            # Commit ajeno en la misma ventana que una escritura propia: no se confunde con ella
+            from scei.data.cache import invalidates
+            eq_id = row.id
+            # Lectura cacheada que depende solo de "equipo"
+            desc = lambda: next(e.descripcion for e in repositories.list_equipos_by_direccion(d.id) if e.id == eq_id)
+            self.assertEqual(desc(), "externo")
+
+            # Una sola entidad no se cachea: quien la modifica no altera la de los demás
+            e1 = repositories.get_equipo(eq_id)
+            e1.descripcion = "modificado localmente"
+            self.assertIsNot(repositories.get_equipo(eq_id), e1)
+            self.assertEqual(repositories.get_equipo(eq_id).descripcion, "externo")
+
+            @invalidates(cache, "direccion")
+            def escritura_con_carrera():
+                with repositories.session_scope() as s:
+                    s.add(Direccion(nombre="CACHE-TEST-CARRERA"))
+                con = sqlite3.connect(str(DB_PATH))
+                con.execute("UPDATE equipo SET descripcion = 'en carrera' WHERE id = ?", (eq_id,))
+                con.commit()
+                con.close()
+
+            escritura_con_carrera()
+            self.assertEqual(desc(), "en carrera")
+        finally:
+            with repositories.session_scope() as s:
+                s.query(Equipo).filter_by(codigo_interno=code).delete()
+                s.query(Direccion).filter_by(nombre="CACHE-TEST-CARRERA").delete()
+
+        # Tope de memoria por filas con desalojo LRU
+        small = ReadCache(DB_PATH, max_rows=10)
+        calls = []
+
+        @cached(small, "t")
+        def rango(n):
+            calls.append(n)
+            return list(range(n))
+
+        rango(4); rango(4); rango(5); rango(3)
+        self.assertEqual(calls, [4, 5, 3])
+        self.assertLessEqual(small.rows, 10)
+        rango(4)
+        self.assertEqual(calls, [4, 5, 3, 4], "Least recently used entry must be evicted first")
+        print(f"Caché: {cache.stats()}")
+
+    def test_24_change_bus_incremental_views(self):
+        print("\n[Test] Change Bus with Incremental View Patching")
+        import sqlite3
+        from datetime import date
+        from scei.data.db import DB_PATH
+        from PyQt6.QtWidgets import QApplication
+        from scei.data.events import bus, INSERT, UPDATE, DELETE
+        from scei.data.instrumentation import stats
+        from scei.ui.tabs.equipos import EquiposTab
+        from scei.ui.tabs.mantenimientos import MantenimientoTab
+        from scei.ui.tabs.analitica import AnaliticaTab
+        app = QApplication.instance() or QApplication(sys.argv)
+
+        d = repositories.list_direcciones()[0]
+        eq_tab = EquiposTab(direccion_id=d.id)
+        mant_tab = MantenimientoTab(direccion_id=d.id)
+        ana_tab = AnaliticaTab()
+        seen = []
+
+        # El suscriptor recibe el evento después de invalidar la caché: lee datos frescos
+        def on_event(ev):
+            if ev.entity == "equipo" and ev.ids:
+                rows = repositories.get_equipo_rows(ev.ids)
+                listed = [r for r in repositories.list_equipo_rows(d.id) if r.id in ev.ids]
+                seen.append((ev.op, [r.estado for r in rows], [r.estado for r in listed]))
+        bus.subscribe(on_event)
+        ids = []
+        try:
+            base_rows = eq_tab.table.rowCount()
+            inop = ana_tab._estados["inoperativo"]
+            dir_inop = ana_tab._estados_dir[d.id]["inoperativo"]
+            ids = [
+                repositories.add_equipo({"codigo_interno": f"BUS-TEST-{i}", "descripcion": "x",
+                                         "estado": "optimo", "direccion_id": d.id})
+                for i in range(2)
+            ]
+            self.assertEqual(eq_tab.table.rowCount(), base_rows + 2, "Inserts must add rows without reload")
+            keep = eq_tab._items[ids[1]]
+            keep_cells = [eq_tab.table.item(keep.row(), c) for c in range(6)]
+
+            repositories.add_mantenimiento({"equipo_id": ids[0], "descripcion": "Revisión",
+                                            "estado_equipo": "optimo", "fecha": date.today()})
+            mrows = mant_tab.table.rowCount()
+
+            # Editar un equipo: solo se parcha su fila y sus contadores
+            stats.reset()
+            with stats.action("test.patch"):
+                repositories.update_equipo(ids[0], {"codigo_interno": "BUS-TEST-X", "estado": "inoperativo"})
+            print(f"parche de 3 vistas: {stats.snapshot()['acciones']['test.patch']['consultas']} consultas")
+            self.assertIn((UPDATE, ["inoperativo"], ["inoperativo"]), seen)
+            r = eq_tab._items[ids[0]].row()
+            self.assertEqual(eq_tab.table.item(r, 0).text(), "BUS-TEST-X")
+            self.assertEqual([eq_tab.table.item(keep.row(), c) for c in range(6)], keep_cells,
+                             "Untouched rows must keep their items")
+            codes = [mant_tab.table.item(i, 0).text() for i in range(mant_tab.table.rowCount())]
+            self.assertIn("BUS-TEST-X", codes)
+            self.assertEqual(mant_tab.table.rowCount(), mrows)
+            self.assertEqual(ana_tab._estados["inoperativo"], inop + 1)
+            self.assertEqual(ana_tab._estados_dir[d.id]["inoperativo"], dir_inop + 1)
+
+            # Mover el equipo a otra dirección y traerlo de vuelta: sus mantenimientos lo siguen
+            otra = next(x for x in repositories.list_direcciones() if x.id != d.id)
+            repositories.update_equipo(ids[0], {"direccion_id": otra.id})
+            self.assertEqual(mant_tab.table.rowCount(), mrows - 1)
+            repositories.update_equipo(ids[0], {"direccion_id": d.id})
+            self.assertEqual(mant_tab.table.rowCount(), mrows)
+
+            # Borrar: el mantenimiento en cascada y la fila del equipo desaparecen
+            repositories.delete_equipo(ids[0])
+            self.assertNotIn(ids[0], eq_tab._items)
+            self.assertEqual(eq_tab.table.rowCount(), base_rows + 1)
+            self.assertEqual(mant_tab.table.rowCount(), mrows - 1)
+            self.assertEqual(ana_tab._estados["inoperativo"], inop)
+
+            # Lo parchado coincide con una recarga completa
+            patched = sorted(ana_tab._equipos.items())
+            ana_tab.refresh()
+            self.assertEqual(patched, sorted(ana_tab._equipos.items()))
+
+            # Al mostrar la pestaña solo se recarga si otro proceso escribió en la BD
+            from unittest import mock
+            with mock.patch.object(AnaliticaTab, "refresh") as full:
+                ana_tab.refresh_if_stale()
+                full.assert_not_called()
+                con = sqlite3.connect(str(DB_PATH))
+                con.execute("UPDATE equipo SET estado = 'defectuoso' WHERE id = ?", (ids[1],))
+                con.commit()
+                con.close()
+                ana_tab.refresh_if_stale()
+                full.assert_called_once()
+        finally:
+            bus.unsubscribe(on_event)
+            for id_ in ids:
+                repositories.delete_equipo(id_)
+
+    def test_25_header_row_numbers_and_sort_keys(self):
+        print("\n[Test] Vertical Header Numbering and Column Sort Keys")
+        from PyQt6.QtCore import Qt
+        from PyQt6.QtWidgets import QApplication
+        from scei.utils import natural_key
+        from scei.ui.tabs.equipos import EquiposTab
+        from scei.ui.tabs.bitacora import BitacoraTab
+        app = QApplication.instance() or QApplication(sys.argv)
+
+        self.assertLess(natural_key("EQ-2"), natural_key("eq-10"))
+        d = repositories.list_direcciones()[0]
+        codes = ["SORT-TEST-10", "SORT-TEST-2", "sort-test-1"]
+        ids = [repositories.add_equipo({"codigo_interno": c, "descripcion": "x", "estado": "optimo",
+                                        "direccion_id": d.id}) for c in codes]
+        try:
+            tab = EquiposTab(direccion_id=d.id)
+            tab.table.sortItems(0, Qt.SortOrder.AscendingOrder)
+            shown = [tab.table.item(i, 0).text() for i in range(tab.table.rowCount())]
+            mine = [c for c in shown if c.lower().startswith("sort-test")]
+            self.assertEqual(mine, ["sort-test-1", "SORT-TEST-2", "SORT-TEST-10"])
+            # El ID sigue a su fila tras ordenar
+            r = shown.index("SORT-TEST-2")
+            tab.table.setCurrentCell(r, 1)
+            self.assertEqual(tab.current_id(), ids[1])
+            # La numeración la da el encabezado vertical: 1..N sin reescribir celdas
+            model = tab.table.model()
+            n = tab.table.rowCount()
+            labels = [model.headerData(i, Qt.Orientation.Vertical) for i in range(n)]
+            self.assertEqual(labels, list(range(1, n + 1)))
+            self.assertNotIn("N°", [tab.table.horizontalHeaderItem(c).text() for c in range(tab.table.columnCount())])
+
+            bt = BitacoraTab()
+            bt.table.sortItems(0, Qt.SortOrder.DescendingOrder)
+            fechas = [bt.table.item(i, 0).sort_key for i in range(bt.table.rowCount())]
+            self.assertEqual(fechas, sorted(fechas, reverse=True))
+        finally:
+            for id_ in ids:
+                repositories.delete_equipo(id_)
+
+    def test_26_normalized_search_columns(self):
+        print("\n[Test] Accent-Folded Normalized Search Columns")
+        from sqlalchemy import text, insert, select
+        from scei.bootstrap import _ensure_norm_columns
+        from scei.data.db import engine
+        from scei.data.normalize import fold, like_prefix
+        self.assertEqual(fold("Dirección de INFORMÁTICA"), "direccion de informatica")
+        self.assertEqual(like_prefix("50%_a"), "50\\%\\_a%")
+
+        with repositories.session_scope() as s:
+            nombres = list(s.scalars(select(Direccion.nombre).where(Direccion.nombre_norm == fold("DIRECCIÓN DE INFORMATICA"))))
+        self.assertEqual(nombres, ["Dirección de Informática"])
+
+        d = repositories.list_direcciones()[0]
+        id_ = repositories.add_equipo({"codigo_interno": "ÑANDÚ-Norm-01", "descripcion": "Cámara térmica",
+                                       "nro_serie": "SN-Árbol-9", "estado": "optimo", "direccion_id": d.id})
+        try:
+            ids = lambda rows: [r.id for r in rows]
+            self.assertIn(id_, ids(repositories.search_equipo_rows("nandu-n")))
+            self.assertIn(id_, ids(repositories.search_equipo_rows("CAMARA ter", direccion_id=d.id)))
+            self.assertIn(id_, ids(repositories.search_equipo_rows("sn-arbol")))
+            self.assertNotIn(id_, ids(repositories.search_equipo_rows("andu")), "Prefix search, not substring")
+            self.assertEqual(ids(repositories.search_equipo_rows("ñandu-norm-01")), [id_])
+            self.assertEqual(ids(repositories.search_equipo_rows("SN-ARBOL-9", direccion_id=d.id)), [id_])
+            self.assertEqual(len(repositories.search_equipo_rows("", limit=1)), 1)
+
+            # Mantenida al editar por el ORM
+            repositories.update_equipo(id_, {"codigo_interno": "Güira-Norm-01"})
+            self.assertEqual(ids(repositories.search_equipo_rows("guira-norm-01")), [id_])
+            self.assertEqual(repositories.search_equipo_rows("ñandu-norm-01"), [])
+
+            with engine.begin() as conn:
+                # INSERT sin ORM: el default de la columna normaliza
+                conn.execute(insert(Equipo), [{"codigo_interno": "Ébano-Norm-02", "descripcion": "x",
+                                               "estado": "optimo", "direccion_id": d.id}])
+                self.assertEqual(conn.scalar(text("SELECT codigo_norm FROM equipo WHERE codigo_interno = 'Ébano-Norm-02'")),
+                                 "ebano-norm-02")
+                # Filas sin sombra (previas a la migración): el bootstrap las rellena
+                conn.execute(text("UPDATE equipo SET serie_norm = NULL WHERE id = :id"), {"id": id_})
+                plan = " ".join(str(r[-1]) for r in conn.execute(
+                    text("EXPLAIN QUERY PLAN SELECT id FROM equipo WHERE codigo_norm LIKE 'gu%'")))
+            print(f"Plan prefijo: {plan}")
+            self.assertIn("ix_equipo_codigo_norm", plan)
+            _ensure_norm_columns()
+            repositories.read_cache.clear()
+            self.assertEqual(ids(repositories.search_equipo_rows("sn-arbol-9")), [id_])
+        finally:
+            repositories.delete_equipo(id_)
+            with repositories.session_scope() as s:
+                s.query(Equipo).filter_by(codigo_interno="Ébano-Norm-02").delete()
+
+    def test_27_repository_server_localhost(self):
+        print("\n[Test] Repository Server over Localhost HTTP")
+        import threading
+        from datetime import date
+        from sqlalchemy.exc import IntegrityError
+        from scei.data.interfaces import IEquipoRepository, IMantenimientoRepository
+        from scei.data.remote import RemoteError, remote_repositories
+        from scei.data.rows import EquipoRow, MantenimientoRow
+        from scei.data.server import ServerThread
+        from scei.tools import serve
+        from unittest import mock
+
+        # Fuera de localhost el servidor exige token (cambia contraseñas y datos sin más control)
+        with mock.patch.dict(os.environ, {"SCEI_SERVER_TOKEN": ""}):
+            with self.assertRaises(SystemExit, msg="Network bind without a token must be refused"):
+                serve.main(["--host", "0.0.0.0"])
+        self.assertTrue(serve.is_loopback("127.0.0.1") and serve.is_loopback("::1") and serve.is_loopback("localhost"))
+        self.assertFalse(serve.is_loopback("192.168.1.10"))
+
+        srv = ServerThread(readers=4).start()
+        remote = remote_repositories(srv.url)
+        equipos, mants = remote["equipo"], remote["mantenimiento"]
+        self.assertIsInstance(equipos, IEquipoRepository)
+        self.assertIsInstance(mants, IMantenimientoRepository)
+        self.assertTrue(remote["user"]._client.health()["ok"])
+        ids = []
+        try:
+            self.assertEqual([d.nombre for d in remote["direccion"].list_all()],
+                             [d.nombre for d in repositories.list_direcciones()])
+            d = repositories.list_direcciones()[0]
+            data = {"codigo_interno": "REMOTE-TEST-01", "descripcion": "Switch ñandú",
+                    "estado": "optimo", "direccion_id": d.id}
+            id_ = equipos.add(dict(data))
+            ids.append(id_)
+            e = equipos.get(id_)
+            self.assertEqual((e.id, e.codigo_interno, e.descripcion), (id_, "REMOTE-TEST-01", "Switch ñandú"))
+            row, = equipos.list_rows(ids=[id_])
+            self.assertIsInstance(row, EquipoRow)
+            self.assertEqual(row.direccion_nombre, d.nombre)
+            self.assertIn(id_, [r.id for r in equipos.search_rows("switch nandu")])
+            with self.assertRaises(IntegrityError, msg="Duplicate code surfaces as the local exception"):
+                equipos.add(dict(data))
+
+            m = mants.add({"equipo_id": id_, "fecha": date(2024, 5, 6), "descripcion": "Remoto",
+                           "estado_equipo": "optimo"})
+            got = mants.get(m.id)
+            self.assertEqual(got.fecha, date(2024, 5, 6))
+            self.assertEqual(got.equipo.codigo_interno, "REMOTE-TEST-01", "Many-to-one travels with the object")
+            self.assertIsInstance(mants.list_rows(equipo_ids=[id_])[0], MantenimientoRow)
+
+            # Escrituras concurrentes: un único escritor, ninguna "database is locked"
+            errors = []
+            def write(i):
+                try:
+                    equipos.update(id_, {"marca": f"M{i}"})
+                    equipos.list_rows(ids=[id_])
+                except Exception as exc:
+                    errors.append(exc)
+            threads = [threading.Thread(target=write, args=(i,)) for i in range(12)]
+            for t in threads: t.start()
+            for t in threads: t.join()
+            self.assertEqual(errors, [])
+            self.assertTrue(equipos.get(id_).marca.startswith("M"))
+            from scei.data.interfaces import ConflictError
+            with self.assertRaises(ConflictError, msg="Stale version surfaces as the typed error"):
+                equipos.update(id_, {"marca": "vieja"}, version=0)
+
+            # La fachada funciona igual sobre el backend remoto
+            saved = repositories._equipo_repo
+            repositories._equipo_repo = equipos
+            try:
+                repositories.update_equipo(id_, {"modelo": "Via-HTTP"})
+                self.assertEqual(repositories.get_equipo(id_).modelo, "Via-HTTP")
+            finally:
+                repositories._equipo_repo = saved
+            self.assertEqual(repositories.get_equipo(id_).modelo, "Via-HTTP", "Same database file")
+
+            with self.assertRaises(RemoteError) as ctx:
+                equipos._client.call("equipo", "_rows_query")
+            self.assertEqual(ctx.exception.status, 404)
+            self.assertIsNone(remote["user"].get_face_data(-1))
+
+            # Los usuarios viajan sin contraseña ni modelo facial; el login va por check_credentials
+            admin = remote["user"].get_by_username("DI-ADMIN")
+            self.assertEqual(admin.username, "DI-ADMIN")
+            self.assertIsNone(admin.password)
+            self.assertTrue(all(u.password is None for u in remote["user"].list_all()))
+            from scei.data.server import RepositoryServer
+            from scei.data.sql_repositories import SQLUserRepository
+            class WithExtra(SQLUserRepository):
+                def dump_passwords(self):
+                    return {}
+            served = RepositoryServer(repos={"user": WithExtra()})._methods
+            self.assertIn(("user", "check_credentials"), served)
+            self.assertNotIn(("user", "dump_passwords"), served, "Only whitelisted methods are served")
+
+            # Cabeceras sin límite: 431 y se cierra la conexión
+            import http.client
+            conn = http.client.HTTPConnection(srv.server.host, srv.server.port, timeout=5)
+            conn.putrequest("GET", "/health")
+            for i in range(100):
+                conn.putheader(f"X-Relleno-{i}", "x")
+            conn.endheaders()
+            self.assertEqual(conn.getresponse().status, 431)
+            conn.close()
+
+            # Cliente remoto: respaldos y depuración tocarían el archivo local, no el del servidor
+            from PyQt6.QtWidgets import QApplication
+            from scei.ui.tabs import bitacora as bitacora_tab, config as config_tab
+            app = QApplication.instance() or QApplication(sys.argv)
+            with mock.patch.object(bitacora_tab, "REMOTE", True), mock.patch.object(config_tab, "REMOTE", True), \
+                    mock.patch.object(bitacora_tab, "archive_old_bitacora") as prune, \
+                    mock.patch("scei.data.backup.restore_snapshot") as restore:
+                bt = bitacora_tab.BitacoraTab()
+                self.assertFalse(bt.btn_clear.isEnabled())
+                bt.on_clear()
+                prune.assert_not_called()
+                ct = config_tab.ConfigTab()
+                self.assertFalse(ct.btn_backup.isEnabled() or ct.btn_restore.isEnabled())
+                ct.on_restore_backup()
+                restore.assert_not_called()
+        finally:
+            for id_ in ids:
+                repositories.delete_equipo(id_)
+            srv.stop()
+
+    def test_28_replication_delta_sync(self):
+        print("\n[Test] Offline Replication with Change Log and Delta Sync")
+        import shutil
+        import sqlite3
+        import tempfile
+        from sqlalchemy import create_engine, insert
+        from sqlalchemy.orm import Session
+        from scei.data.models import Bitacora
+        from scei.data import replication
+
+        tmp = tempfile.mkdtemp()
+        paths, engines = {}, {}
+        try:
+            for site in ("a", "b"):
+                paths[site] = os.path.join(tmp, f"{site}.db")
+                engines[site] = create_engine(f"sqlite:///{paths[site]}")
+                Base.metadata.create_all(engines[site])
+                with engines[site].begin() as conn:
+                    # Misma semilla en ambos puestos, con ids locales distintos
+                    nombres = ["Finanzas", "Dirección de Informática"]
+                    conn.execute(insert(Direccion), [{"nombre": n} for n in (nombres if site == "a" else nombres[::-1])])
+                    conn.execute(insert(User), [{"username": "ADMIN", "password": "x"}])
+            A, B = paths["a"], paths["b"]
+
+            def rows(path, sql):
+                con = sqlite3.connect(path)
+                try:
+                    return con.execute(sql).fetchall()
+                finally:
+                    con.close()
+
+            def set_marca(path, valor):
+                con = sqlite3.connect(path)
+                con.execute("UPDATE equipo SET marca = ? WHERE codigo_interno = 'R-1'", (valor,))
+                con.commit()
+                con.close()
+
+            replication.sync(A, B)
+            self.assertEqual(rows(A, "SELECT count(*) FROM direccion"), [(2,)], "Seeded rows merge by natural key")
+
+            with Session(engines["a"]) as s:
+                d = s.query(Direccion).filter_by(nombre="Finanzas").one()
+                e = Equipo(codigo_interno="R-1", descripcion="PC", estado="optimo", direccion_id=d.id)
+                s.add(e)
+                s.flush()
+                s.add(Mantenimiento(equipo_id=e.id, descripcion="Limpieza", estado_equipo="optimo"))
+                s.add(Bitacora(usuario_id=s.query(User).one().id, accion="INSERT", descripcion="R-1", modulo="Equipos"))
+                s.commit()
+            with Session(engines["b"]) as s:
+                d = s.query(Direccion).filter_by(nombre="Dirección de Informática").one()
+                s.add(Equipo(codigo_interno="R-2", descripcion="Impresora", estado="optimo", direccion_id=d.id))
+                s.commit()
+
+            result = replication.sync(A, B)
+            self.assertEqual((result.sent, result.received), (3, 1))
+            joined = ("SELECT e.codigo_interno, d.nombre FROM equipo e JOIN direccion d ON d.id = e.direccion_id "
+                      "ORDER BY 1")
+            self.assertEqual(rows(A, joined), rows(B, joined))
+            self.assertEqual(rows(B, joined), [("R-1", "Finanzas"), ("R-2", "Dirección de Informática")])
+            self.assertEqual(rows(B, "SELECT e.codigo_interno FROM mantenimiento m JOIN equipo e ON e.id = m.equipo_id"),
+                             [("R-1",)])
+            self.assertEqual(rows(B, "SELECT u.username FROM bitacora b JOIN user u ON u.id = b.usuario_id"),
+                             [("ADMIN",)])
+
+            again = replication.sync(A, B)
+            self.assertEqual((again.sent, again.received), (0, 0), "Only deltas travel")
+
+            # Edición concurrente: ambos lados convergen al mismo ganador (mayor reloj, sitio)
+            set_marca(A, "desde A")
+            set_marca(B, "desde B")
+            replication.sync(A, B)
+            marca = "SELECT marca FROM equipo WHERE codigo_interno = 'R-1'"
+            self.assertEqual(rows(A, marca), rows(B, marca))
+            # Una edición posterior a la sincronización gana siempre
+            set_marca(A, "después")
+            replication.sync(A, B)
+            self.assertEqual(rows(B, marca), [("después",)])
+
+            # Un cambio recibido por sincronización invalida la edición abierta en el otro puesto
+            from sqlalchemy.orm.exc import StaleDataError
+            with Session(engines["a"]) as s:
+                abierto = s.query(Equipo).filter_by(codigo_interno="R-1").one()
+                held = abierto.version
+                set_marca(B, "remota")
+                replication.sync(A, B)
+                self.assertGreater(rows(A, "SELECT version FROM equipo WHERE codigo_interno = 'R-1'")[0][0], held)
+                abierto.marca = "pisada"
+                with self.assertRaises(StaleDataError):
+                    s.commit()
+            self.assertEqual(rows(A, marca), [("remota",)])
+
+            # Baja: viaja como lápida y arrastra los mantenimientos
+            con = sqlite3.connect(A)
+            con.execute("DELETE FROM equipo WHERE codigo_interno = 'R-1'")
+            con.commit()
+            con.close()
+            replication.sync(A, B)
+            self.assertEqual(rows(B, "SELECT codigo_interno FROM equipo"), [("R-2",)])
+            self.assertEqual(rows(B, "SELECT count(*) FROM mantenimiento"), [(0,)])
+        finally:
+            for e in engines.values():
+                e.dispose()
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def test_29_optimistic_concurrency_versions(self):
+        print("\n[Test] Optimistic Concurrency with Row Versions")
+        import sqlite3
+        from unittest import mock
+        from PyQt6.QtWidgets import QApplication, QMessageBox
+        from scei.data.db import DB_PATH
+        from scei.data.repositories import ConflictError
+        from scei.data.sql_repositories import versioned_update
+        from scei.ui.tabs.equipos import EquiposTab
+        app = QApplication.instance() or QApplication(sys.argv)
+
+        def external(sql, *params):
+            con = sqlite3.connect(DB_PATH)
+            con.execute(sql, params)
+            con.commit()
+            con.close()
+
+        d = repositories.list_direcciones()[0]
+        id_ = repositories.add_equipo({"codigo_interno": "CAS-TEST-01", "descripcion": "x",
+                                       "estado": "optimo", "direccion_id": d.id})
+        try:
+            e = repositories.get_equipo(id_)
+            self.assertEqual(e.version, 1)
+            repositories.update_equipo(id_, {"marca": "Primera"}, version=e.version)
+            self.assertEqual(repositories.get_equipo(id_).version, 2)
+
+            # Edición basada en datos viejos: se rechaza sin tocar la fila
+            with self.assertRaises(ConflictError) as ctx:
+                repositories.update_equipo(id_, {"marca": "Vieja"}, version=1)
+            self.assertEqual((ctx.exception.entity, ctx.exception.id), ("equipo", id_))
+            self.assertEqual(repositories.get_equipo(id_).marca, "Primera")
+            # Sin versión se comporta como antes (escrituras del sistema)
+            repositories.update_equipo(id_, {"estado": "defectuoso"})
+
+            # Escritura ajena entre la lectura y el UPDATE: el WHERE version = ... no coincide
+            with self.assertRaises(ConflictError):
+                with versioned_update(Equipo, id_, None) as row:
+                    external("UPDATE equipo SET marca = 'Ajena', version = version + 1 WHERE id = ?", id_)
+                    row.marca = "Perdida"
+            self.assertEqual(repositories.get_equipo(id_).marca, "Ajena")
+
+            m = repositories.add_mantenimiento({"equipo_id": id_, "fecha": "2024-01-02",
+                                                "descripcion": "cas", "estado_equipo": "optimo"})
+            mv = repositories.get_mantenimiento(m.id).version
+            repositories.update_mantenimiento(m.id, {"descripcion": "cas 2"}, version=mv)
+            with self.assertRaises(ConflictError):
+                repositories.update_mantenimiento(m.id, {"descripcion": "cas 3"}, version=mv)
+            dv = next(x for x in repositories.list_direcciones() if x.id == d.id).version
+            with self.assertRaises(ConflictError):
+                repositories.update_direccion(d.id, d.nombre, 1, version=dv + 1)
+
+            # La pestaña recarga la fila y pide reabrir el editor con los datos actuales
+            tab = EquiposTab()
+            external("UPDATE equipo SET marca = 'Otra oficina', version = version + 1 WHERE id = ?", id_)
+            with mock.patch.object(QMessageBox, "warning") as warn:
+                self.assertTrue(tab._reload_after_conflict(id_))
+            warn.assert_called_once()
+            self.assertEqual(tab.table.item(tab.row_of(id_), 2).text(), "Otra oficina")
+            # ...en un bucle, no por recursión
+            tab.table.selectRow(tab.row_of(id_))
+            with mock.patch.object(EquiposTab, "_edit_equipo", side_effect=[True, True, False]) as edit:
+                tab.on_edit_modal()
+            self.assertEqual(edit.call_count, 3)
+
+            # Estado automático desde Mantenimientos: confirmado contra la versión leída
+            from scei.ui.tabs.mantenimientos import MantenimientoTab
+            stale = repositories.get_equipo(id_)
+            external("UPDATE equipo SET estado = 'optimo', version = version + 1 WHERE id = ?", id_)
+            with mock.patch.object(QMessageBox, "warning") as warn:
+                MantenimientoTab()._sync_equipo_estado(stale, "inoperativo", "")
+            warn.assert_called_once()
+            self.assertEqual(repositories.get_equipo(id_).estado, "optimo", "Stale estado update is rejected")
+
+            repositories.delete_equipo(id_)
+            with self.assertRaises(ConflictError):
+                repositories.update_equipo(id_, {"marca": "x"}, version=3)
+        finally:
+            repositories.delete_equipo(id_)
+
+    def test_30_equipo_picker_type_ahead(self):
+        print("\n[Test] Indexed Type-ahead Equipo Picker")
+        from unittest import mock
+        from PyQt6.QtWidgets import QApplication
+        from scei.ui.dialogs import MantenimientoDialog
+        from scei.ui.pickers import EquipoPicker
+        app = QApplication.instance() or QApplication(sys.argv)
+
+        d = repositories.list_direcciones()[0]
+        ids = [repositories.add_equipo({"codigo_interno": f"PICK-TEST-{i:02d}", "descripcion": "Impresora láser",
+                                        "estado": "defectuoso" if i == 3 else "optimo", "direccion_id": d.id})
+               for i in range(8)]
+        try:
+            # El diálogo ya no carga el inventario completo
+            with mock.patch.object(repositories, "list_equipos") as full:
+                dlg = MantenimientoDialog()
+            full.assert_not_called()
+            self.assertIsNone(dlg.values()["equipo_id"])
+
+            picker = EquipoPicker(limit=5)
+            picker.setText("pick-test")
+            picker._search()
+            self.assertEqual(picker._model.rowCount(), 5)
+            picker.setText("impresora las")
+            picker._search()
+            self.assertGreaterEqual(picker._model.rowCount(), 5)
+            # Una sola coincidencia al salir del campo: queda elegida
+            picker.setText("PICK-TEST-03")
+            picker._search()
+            picker._on_editing_finished()
+            self.assertEqual(picker.currentData(), ids[3])
+
+            # Elegir en la lista trae el estado con get_equipo
+            dlg.ed_equipo.setText("PICK-TEST-03")
+            dlg.ed_equipo._search()
+            with mock.patch("scei.ui.dialogs.get_equipo", wraps=repositories.get_equipo) as get:
+                dlg.ed_equipo._on_activated(dlg.ed_equipo._model.index(0, 0))
+            get.assert_called_once_with(ids[3])
+            self.assertEqual(dlg.values()["equipo_id"], ids[3])
+            self.assertEqual(dlg.cb_estado.currentText(), "defectuoso")
+            # Editar el texto anula la selección
+            dlg.ed_equipo.textEdited.emit("PICK-TEST-0")
+            self.assertIsNone(dlg.values()["equipo_id"])
+            self.assertEqual(dlg.cb_estado.currentText(), "optimo")
+
+            # Edición: el equipo guardado aparece elegido sin pisar el estado registrado
+            dlg = MantenimientoDialog(data={"equipo_id": ids[3], "estado_equipo": "inoperativo"})
+            self.assertEqual(dlg.values()["equipo_id"], ids[3])
+            self.assertTrue(dlg.ed_equipo.text().startswith("PICK-TEST-03"))
+            self.assertEqual(dlg.cb_estado.currentText(), "inoperativo")
+        finally:
+            for id_ in ids:
+                repositories.delete_equipo(id_)
+
 if __name__ == '__main__':
     unittest.main()
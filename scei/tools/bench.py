@@ -0,0 +1,298 @@
+"""
+Suite de benchmarks de repositorios e interfaz sobre BDs sintéticas (1k, 100k, 1M).
+
+Cada escala corre en un proceso aparte con su propia BD temporal (SCEI_DB_PATH), Qt en
+modo offscreen y sin logs.json. Se miden las llamadas de la fachada de repositorios,
+los cálculos de AnaliticaTab, los filtros de búsqueda y los exportadores PDF/Excel/Word.
+
+    QT_QPA_PLATFORM=offscreen python -m scei.tools.bench --scales 1k,100k,1M --out bench.json
+    python -m scei.tools.bench --scales 1k --compare bench_anterior.json
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1M": 1_000_000}
+DEFAULT_SCALES = "1k,100k,1M"
+EXPORT_LIMIT = 2_000       # filas enviadas a cada exportador
+MAX_UI_ROWS = 10_000       # por encima, se omiten las mediciones que llenan tablas Qt
+
+
+class Timer:
+    """Acumula mediciones: nombre -> {min, mediana, max} en ms."""
+
+    def __init__(self, repeat: int = 3):
+        self.repeat = repeat
+        self.results: dict[str, dict] = {}
+
+    def measure(self, name: str, fn, repeat: int | None = None):
+        samples, value = [], None
+        for _ in range(repeat or self.repeat):
+            t0 = time.perf_counter()
+            value = fn()
+            samples.append((time.perf_counter() - t0) * 1000.0)
+        self.record(name, samples)
+        return value
+
+    def record(self, name: str, samples: list[float]) -> None:
+        self.results[name] = {
+            "min_ms": round(min(samples), 3),
+            "mediana_ms": round(statistics.median(samples), 3),
+            "max_ms": round(max(samples), 3),
+        }
+
+    def skip(self, name: str, reason: str) -> None:
+        self.results[name] = {"omitido": reason}
+
+
+def _patch_dialogs(out_dir: str) -> None:
+    """Los exportadores piden ruta y muestran mensajes: se responden sin interacción."""
+    from PyQt6.QtWidgets import QFileDialog, QMessageBox
+    counter = iter(range(1_000_000))
+
+    def save_name(parent, caption, default="", *args, **kwargs):
+        return os.path.join(out_dir, f"{next(counter):04d}_{os.path.basename(default) or 'export'}"), ""
+
+    QFileDialog.getSaveFileName = staticmethod(save_name)
+    QMessageBox.information = staticmethod(lambda *a, **k: QMessageBox.StandardButton.Ok)
+    QMessageBox.warning = staticmethod(lambda *a, **k: QMessageBox.StandardButton.Ok)
+
+
+def run_scale(n: int, export_limit: int = EXPORT_LIMIT, max_ui_rows: int = MAX_UI_ROWS,
+              repeat: int = 3, seed: int = 0) -> dict:
+    """Se ejecuta dentro del proceso hijo (SCEI_DB_PATH ya apunta a la BD temporal)."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    from .. import session
+    from ..bootstrap import run_bootstrap
+    from ..data.db import engine
+    from ..data import repositories as repo
+    from .synthetic import generate
+
+    timer = Timer(repeat)
+    t0 = time.perf_counter()
+    run_bootstrap(force=True)
+    rows = generate(engine, equipos=n, mantenimientos=n, bitacora=n, seed=seed)
+    load_s = time.perf_counter() - t0
+    session.CURRENT_USER = "DI-ADMIN"
+
+    # --- Fachada de repositorios (sin caché de lecturas: costo real de cada consulta) ---
+    cache_rows, repo.read_cache.max_rows = repo.read_cache.max_rows, 0
+    dirs = timer.measure("repo.list_direcciones", repo.list_direcciones)
+    dir_id = dirs[0].id if dirs else None
+    equipos = timer.measure("repo.list_equipos", repo.list_equipos)
+    timer.measure("repo.list_equipos_by_direccion", lambda: repo.list_equipos_by_direccion(dir_id))
+    eq_id = equipos[len(equipos) // 2].id if equipos else None
+    timer.measure("repo.get_equipo", lambda: repo.get_equipo(eq_id))
+    eq_rows = timer.measure("repo.list_equipo_rows", repo.list_equipo_rows)
+    timer.measure("repo.list_equipo_rows[direccion]", lambda: repo.list_equipo_rows(dir_id))
+    mants = timer.measure("repo.list_mantenimientos", repo.list_mantenimientos)
+    timer.measure("repo.list_mantenimientos_by_direccion", lambda: repo.list_mantenimientos_by_direccion(dir_id))
+    mant_rows = timer.measure("repo.list_mantenimiento_rows", repo.list_mantenimiento_rows)
+    timer.measure("repo.list_mantenimiento_rows[direccion]", lambda: repo.list_mantenimiento_rows(dir_id))
+    if mants:
+        timer.measure("repo.get_mantenimiento", lambda: repo.get_mantenimiento(mants[len(mants) // 2].id))
+    timer.measure("repo.list_bitacora_entries", lambda: repo.list_bitacora_entries(100))
+    timer.measure("repo.list_users_full", repo.list_users_full)
+    timer.measure("repo.get_user", lambda: repo.get_user("DI-ADMIN"))
+    timer.measure("repo.check_user", lambda: repo.check_user("DI-ADMIN", "x"))
+    timer.measure("repo.list_documentos", repo.list_documentos)
+    timer.measure("repo.add_bitacora_log", lambda: repo.add_bitacora_log(None, "BENCH", "bench", "Bench"))
+
+    # Escrituras: un equipo y un mantenimiento nuevos, luego se eliminan
+    from sqlalchemy import select
+    from ..data.models import Equipo, Mantenimiento
+    code = f"BENCH-{time.perf_counter_ns()}"
+    timer.measure("repo.add_equipo", lambda: repo.add_equipo(
+        {"codigo_interno": code, "descripcion": "bench", "estado": "optimo", "direccion_id": dir_id}), repeat=1)
+    with repo.session_scope() as s:
+        new_id = s.scalar(select(Equipo.id).where(Equipo.codigo_interno == code))
+    timer.measure("repo.update_equipo", lambda: repo.update_equipo(new_id, {"descripcion": "bench 2"}))
+    timer.measure("repo.add_mantenimiento", lambda: repo.add_mantenimiento(
+        {"equipo_id": new_id, "descripcion": "bench", "estado_equipo": "optimo"}), repeat=1)
+    with repo.session_scope() as s:
+        mant_id = s.scalar(select(Mantenimiento.id).where(Mantenimiento.equipo_id == new_id))
+    timer.measure("repo.delete_mantenimiento", lambda: repo.delete_mantenimiento(mant_id), repeat=1)
+    timer.measure("repo.delete_equipo", lambda: repo.delete_equipo(new_id), repeat=1)
+    repo.read_cache.max_rows = cache_rows
+    repo.list_equipo_rows()
+    timer.measure("repo.list_equipo_rows[cache]", repo.list_equipo_rows)
+
+    # --- Interfaz (offscreen) ---
+    from ..ui.tabs.analitica import AnaliticaTab
+    from ..ui.tabs.equipos import EquiposTab
+    from ..ui.tabs.mantenimientos import MantenimientoTab
+    from ..ui.tabs.bitacora import BitacoraTab
+
+    ui_ok = n <= max_ui_rows
+    reason = f"escala {n} > max_ui_rows {max_ui_rows}"
+    analitica = timer.measure("ui.analitica.init", AnaliticaTab, repeat=1)
+    timer.measure("ui.analitica.refresh", analitica.refresh)
+
+    def search(tab, name, terms):
+        # Cada cambio de texto dispara refresh(); se mide solo la búsqueda, no la limpieza
+        for term in terms:
+            samples = []
+            for _ in range(timer.repeat):
+                t0 = time.perf_counter()
+                tab.search.setText(term)
+                samples.append((time.perf_counter() - t0) * 1000.0)
+                tab.search.blockSignals(True)
+                tab.search.clear()
+                tab.search.blockSignals(False)
+            timer.record(f"{name}[{term}]", samples)
+
+    eq_tab = mant_tab = None
+    if ui_ok:
+        eq_tab = timer.measure("ui.equipos.init", EquiposTab, repeat=1)
+        search(eq_tab, "ui.equipos.buscar", ("sn", "hp m", "zzz-sin-resultados"))
+        mant_tab = timer.measure("ui.mantenimientos.init", MantenimientoTab, repeat=1)
+        search(mant_tab, "ui.mantenimientos.buscar", ("preventivo", "zzz-sin-resultados"))
+    else:
+        for name in ("ui.equipos.init", "ui.equipos.buscar", "ui.mantenimientos.init", "ui.mantenimientos.buscar"):
+            timer.skip(name, reason)
+    bit_tab = timer.measure("ui.bitacora.init", BitacoraTab, repeat=1)
+    timer.measure("ui.bitacora.refresh", bit_tab.refresh)
+
+    # --- Exportadores ---
+    with tempfile.TemporaryDirectory() as out_dir:
+        _patch_dialogs(out_dir)
+        eq_data = eq_rows[:export_limit]
+        mant_data = mant_rows[:export_limit]
+        exporters = []
+        if ui_ok:
+            exporters += [
+                ("export.equipos.pdf", lambda: eq_tab.generar_pdf_equipos(eq_data)),
+                ("export.equipos.word", lambda: eq_tab.generar_word_equipos(eq_data)),
+                ("export.equipos.excel", lambda: eq_tab.generar_excel_equipos(eq_data)),
+                ("export.mantenimientos.pdf", lambda: mant_tab.generar_pdf_mantenimientos(mant_data)),
+                ("export.mantenimientos.word", lambda: mant_tab.generar_word_mantenimientos(mant_data)),
+                ("export.mantenimientos.excel", lambda: mant_tab.generar_excel_mantenimientos(mant_data)),
+            ]
+        else:
+            timer.skip("export.equipos", reason)
+            timer.skip("export.mantenimientos", reason)
+        exporters += [
+            ("export.bitacora.pdf", bit_tab.generar_pdf),
+            ("export.bitacora.word", bit_tab.generar_word),
+            ("export.bitacora.excel", bit_tab.generar_excel),
+        ]
+        for name, fn in exporters:
+            try:
+                timer.measure(name, fn, repeat=1)
+            except ImportError as e:
+                timer.skip(name, f"dependencia faltante: {e.name}")
+
+    app.processEvents()
+    return {
+        "n": n,
+        "filas": rows,
+        "carga_s": round(load_s, 2),
+        "filas_exportadas": export_limit,
+        "mediciones": timer.results,
+    }
+
+
+def run_suite(scales: list[str], export_limit: int = EXPORT_LIMIT, max_ui_rows: int = MAX_UI_ROWS,
+              repeat: int = 3, keep_db: bool = False) -> dict:
+    """Lanza un proceso por escala y junta los resultados."""
+    report = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "escalas": {},
+    }
+    for scale in scales:
+        n = SCALES[scale] if scale in SCALES else int(scale)
+        tmp = tempfile.mkdtemp(prefix=f"scei_bench_{scale}_")
+        result_file = os.path.join(tmp, "resultado.json")
+        env = {
+            **os.environ,
+            "SCEI_DB_PATH": os.path.join(tmp, "data.db"),
+            "SCEI_LOGS_FILE": "",
+            "QT_QPA_PLATFORM": "offscreen",
+        }
+        cmd = [
+            sys.executable, "-m", "scei.tools.bench", "--worker", str(n),
+            "--result", result_file, "--export-limit", str(export_limit),
+            "--max-ui-rows", str(max_ui_rows), "--repeat", str(repeat),
+        ]
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        proc = subprocess.run(cmd, env=env, cwd=root, capture_output=True, text=True)
+        if proc.returncode == 0 and os.path.exists(result_file):
+            with open(result_file, encoding="utf-8") as f:
+                report["escalas"][scale] = json.load(f)
+        else:
+            report["escalas"][scale] = {"error": (proc.stderr or proc.stdout)[-2000:]}
+        if keep_db:
+            report["escalas"][scale]["bd"] = env["SCEI_DB_PATH"]
+        else:
+            import shutil
+            shutil.rmtree(tmp, ignore_errors=True)
+    return report
+
+
+def compare_reports(current: dict, previous: dict) -> list[tuple[str, str, float, float, float]]:
+    """(escala, medición, anterior_ms, actual_ms, razón) para las mediciones comunes."""
+    rows = []
+    for scale, cur in current.get("escalas", {}).items():
+        prev = previous.get("escalas", {}).get(scale, {})
+        for name, m in cur.get("mediciones", {}).items():
+            p = prev.get("mediciones", {}).get(name, {})
+            if "mediana_ms" in m and "mediana_ms" in p and p["mediana_ms"] > 0:
+                rows.append((scale, name, p["mediana_ms"], m["mediana_ms"], round(m["mediana_ms"] / p["mediana_ms"], 2)))
+    return rows
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmarks de repositorios e interfaz con datos sintéticos.")
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help="Ej.: 1k,100k,1M o números")
+    parser.add_argument("--out", help="Archivo JSON de salida (por defecto bench_AAAAMMDD_HHMMSS.json)")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--export-limit", type=int, default=EXPORT_LIMIT)
+    parser.add_argument("--max-ui-rows", type=int, default=MAX_UI_ROWS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--keep-db", action="store_true", help="No borrar las BDs generadas")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker is not None:
+        result = run_scale(args.worker, args.export_limit, args.max_ui_rows, args.repeat)
+        with open(args.result, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        return
+
+    report = run_suite([s.strip() for s in args.scales.split(",") if s.strip()],
+                       args.export_limit, args.max_ui_rows, args.repeat, args.keep_db)
+    out = args.out or f"bench_{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {out}")
+    for scale, res in report["escalas"].items():
+        if "error" in res:
+            print(f"[{scale}] ERROR: {res['error']}")
+            continue
+        print(f"[{scale}] carga {res['carga_s']} s")
+        for name, m in res["mediciones"].items():
+            print(f"  {name:45s} {m.get('mediana_ms', m.get('omitido'))}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+        print("\nComparación (mediana, actual/anterior):")
+        for scale, name, before, now, ratio in compare_reports(report, previous):
+            flag = "  <-- más lento" if ratio > 1.2 else ""
+            print(f"  [{scale}] {name:45s} {before:10.2f} -> {now:10.2f} ms  x{ratio}{flag}")
+
+
+if __name__ == "__main__":
+    main()
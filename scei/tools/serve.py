@@ -0,0 +1,66 @@
+"""
+Servidor de repositorios para varias oficinas (ver data/server.py).
+
+El servidor es el único que abre la BD; cada puesto apunta a él con SCEI_SERVER_URL
+(y SCEI_SERVER_TOKEN si se fijó --token) en lugar de abrir el archivo por la red. Fuera
+de localhost el token es obligatorio: la API incluye las operaciones de usuarios.
+
+    python -m scei.tools.serve --db D:/SCEI/scei.db --host 0.0.0.0 --token secreto
+    set SCEI_SERVER_URL=http://servidor:8765   (en cada puesto)
+"""
+import argparse
+import asyncio
+import ipaddress
+import os
+
+from ..config import SERVER_PORT, SERVER_READERS
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Expone los repositorios de SCEI por HTTP/JSON.")
+    parser.add_argument("--db", help="Archivo SQLite (por defecto la ruta habitual de la aplicación)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--readers", type=int, default=SERVER_READERS, help="Hilos lectores")
+    parser.add_argument("--token", default=os.environ.get("SCEI_SERVER_TOKEN"),
+                        help="Token compartido exigido a los clientes")
+    parser.add_argument("--no-wal", action="store_true", help="No cambiar el diario a WAL")
+    args = parser.parse_args(argv)
+    if not args.token and not is_loopback(args.host):
+        # Expone set_password, delete_user y los hashes de get_by_username: nunca sin token en la red
+        parser.error(f"--token (o SCEI_SERVER_TOKEN) es obligatorio para escuchar en {args.host}")
+
+    if args.db:
+        # Antes de importar la capa de datos: db.py resuelve la ruta al importarse
+        os.environ["SCEI_DB_PATH"] = os.path.abspath(args.db)
+    from ..bootstrap import run_bootstrap
+    from ..data.db import DB_PATH
+    from ..data.server import RepositoryServer, enable_wal
+
+    run_bootstrap()
+    mode = "sin cambios" if args.no_wal else enable_wal()
+    server = RepositoryServer(args.host, args.port, args.readers, args.token)
+
+    async def serve():
+        port = await server.start()
+        print(f"SCEI: {DB_PATH} (diario {mode}) en http://{args.host}:{port} "
+              f"con {args.readers} lectores", flush=True)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Generador determinista de datos sintéticos con la forma del esquema de scei/data/models.py.
+
+- Direcciones: DIRECCIONES_HIERARCHY + la semilla de bootstrap (sin duplicar).
+- Equipos: código interno único por dirección (prefijo de la dirección + secuencia).
+- Mantenimientos: línea de tiempo de varios años por equipo, con transiciones de estado
+  (cadena de Markov); el estado actual del equipo es el del último mantenimiento.
+- Bitácora: volumen configurable, fechas crecientes a lo largo del período.
+
+Inserta con Core (executemany por lotes), sin objetos ORM. Misma semilla y misma fecha
+base => mismos datos.
+
+    python -m scei.tools.synthetic datos.db --equipos 200000 --mantenimientos 1000000 \\
+        --bitacora 1000000 --anios 5 --seed 42
+"""
+import random
+import time
+import unicodedata
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert, select, func
+
+from ..config import DIRECCIONES_HIERARCHY
+from ..data.models import Direccion, Equipo, Mantenimiento, Bitacora, User
+
+BATCH = 50_000
+ESTADOS = ("optimo", "defectuoso", "inoperativo")
+# Probabilidad del siguiente estado según el estado actual (orden de ESTADOS)
+TRANSICIONES = {
+    "optimo": (0.82, 0.14, 0.04),
+    "defectuoso": (0.55, 0.30, 0.15),
+    "inoperativo": (0.45, 0.15, 0.40),
+}
+ESTADO_INICIAL = (0.85, 0.11, 0.04)
+DESCRIPCIONES = ("CPU", "Monitor", "Impresora", "Laptop", "Switch", "UPS", "Escáner", "Teclado",
+                 "Router", "Proyector")
+MARCAS = ("HP", "Dell", "Lenovo", "Epson", "Samsung", "Cisco", "APC", "Acer", "Canon", "TP-Link")
+UBICACIONES = ("Planta baja", "Piso 1", "Piso 2", "Piso 3", "Depósito", "Oficina principal")
+ACCIONES = ("LOGIN", "INSERT", "UPDATE", "DELETE")
+MODULOS = ("Equipos", "Mantenimientos", "Direcciones", "Seguridad")
+
+
+def _nombres_direcciones() -> list[str]:
+    from ..bootstrap import SEED_DIRECCIONES
+    nombres = list(DIRECCIONES_HIERARCHY)
+    nombres += [n for n in SEED_DIRECCIONES if n not in nombres]
+    return nombres
+
+
+def _prefijo(nombre: str) -> str:
+    """Iniciales sin acentos de las palabras significativas: 'Dirección de Informática' -> 'DI'."""
+    plano = unicodedata.normalize("NFKD", nombre).encode("ascii", "ignore").decode()
+    palabras = [p for p in plano.replace(",", " ").split() if len(p) > 3 or p.isupper()]
+    return ("".join(p[0] for p in palabras) or "EQ").upper()[:6]
+
+
+def _descripcion_mant(anterior: str | None, nuevo: str) -> str:
+    if anterior is None:
+        return "Revisión inicial"
+    if nuevo == "optimo":
+        return "Mantenimiento preventivo" if anterior == "optimo" else "Reparación completada"
+    if anterior == "optimo":
+        return "Falla reportada" if nuevo == "defectuoso" else "Equipo fuera de servicio"
+    return "Diagnóstico de seguimiento"
+
+
+class _Lotes:
+    """Buffer por tabla; vuelca con executemany cada `batch` filas."""
+
+    def __init__(self, conn, batch: int):
+        self.conn = conn
+        self.batch = batch
+        self.pending: dict = {}
+        self.counts: dict[str, int] = {}
+
+    def add(self, table, row) -> None:
+        rows = self.pending.setdefault(table, [])
+        rows.append(row)
+        if len(rows) >= self.batch:
+            self.flush(table)
+
+    def flush(self, table=None) -> None:
+        for t in ([table] if table is not None else list(self.pending)):
+            rows = self.pending.get(t)
+            if rows:
+                self.conn.execute(insert(t), rows)
+                self.counts[t.name] = self.counts.get(t.name, 0) + len(rows)
+                self.pending[t] = []
+
+
+def generate(engine, equipos: int, mantenimientos: int, bitacora: int, seed: int = 0,
+             anios: int = 5, fecha_base: date | None = None, batch: int = BATCH) -> dict:
+    """Llena la BD (tablas ya creadas) con el volumen pedido. Devuelve filas por tabla."""
+    rnd = random.Random(seed)
+    hoy = fecha_base or date.today()
+    inicio = hoy - timedelta(days=365 * anios)
+    span_dias = (hoy - inicio).days
+    equipo_t, mant_t, bit_t = Equipo.__table__, Mantenimiento.__table__, Bitacora.__table__
+
+    with engine.connect() as conn:
+        # Carga masiva: sin fsync por lote (se restaura al terminar)
+        conn.exec_driver_sql("PRAGMA synchronous = OFF")
+        conn.commit()
+        try:
+            with conn.begin():
+                nombres = _nombres_direcciones()
+                existentes = {n: i for i, n in conn.execute(select(Direccion.id, Direccion.nombre)).all()}
+                faltantes = [n for n in nombres if n not in existentes]
+                if faltantes:
+                    conn.execute(insert(Direccion), [{"nombre": n, "activo": 1} for n in faltantes])
+                    existentes = {n: i for i, n in conn.execute(select(Direccion.id, Direccion.nombre)).all()}
+                direcciones = [(existentes[n], _prefijo(n)) for n in nombres]
+                user_ids = list(conn.scalars(select(User.id))) or [None]
+
+                # Secuencia por dirección a partir de lo que ya exista (códigos únicos por dirección)
+                secuencias = {d: 0 for d, _ in direcciones}
+                secuencias.update(conn.execute(
+                    select(Equipo.direccion_id, func.count())
+                    .where(Equipo.codigo_interno.like("%-S%")).group_by(Equipo.direccion_id)
+                ).all())
+                next_id = (conn.scalar(select(Equipo.id).order_by(Equipo.id.desc()).limit(1)) or 0) + 1
+
+                lotes = _Lotes(conn, batch)
+                por_equipo, extra = divmod(mantenimientos, equipos) if equipos else (0, 0)
+                for i in range(equipos):
+                    d_id, pref = direcciones[rnd.randrange(len(direcciones))]
+                    secuencias[d_id] += 1
+                    eq_id = next_id + i
+
+                    # Línea de tiempo de mantenimientos (fechas crecientes, estados encadenados)
+                    k = por_equipo + (1 if i < extra else 0)
+                    alta = inicio + timedelta(days=rnd.randrange(max(1, span_dias // 2)))
+                    fechas = sorted(alta + timedelta(days=rnd.randrange(max(1, (hoy - alta).days)))
+                                    for _ in range(k))
+                    estado = rnd.choices(ESTADOS, ESTADO_INICIAL)[0]
+                    anterior = None
+                    for f in fechas:
+                        lotes.add(mant_t, {
+                            "equipo_id": eq_id,
+                            "fecha": f,
+                            "descripcion": _descripcion_mant(anterior, estado),
+                            "estado_equipo": estado,
+                        })
+                        anterior = estado
+                        estado = rnd.choices(ESTADOS, TRANSICIONES[estado])[0]
+                    # El flush de mantenimientos puede ocurrir antes que el del equipo;
+                    # SQLite no exige la FK salvo PRAGMA foreign_keys, y todo va en una transacción.
+                    lotes.add(equipo_t, {
+                        "id": eq_id,
+                        "codigo_interno": f"{pref}-S{secuencias[d_id]:06d}",
+                        "descripcion": rnd.choice(DESCRIPCIONES),
+                        "marca": rnd.choice(MARCAS),
+                        "modelo": f"M{rnd.randint(100, 999)}",
+                        "nro_serie": f"SN{rnd.getrandbits(40):010X}",
+                        "ubicacion": rnd.choice(UBICACIONES),
+                        "estado": anterior or estado,
+                        "fecha_alta": alta,
+                        "direccion_id": d_id,
+                    })
+
+                # Bitácora: eventos crecientes en el tiempo a lo largo del período
+                fecha = datetime.combine(inicio, datetime.min.time())
+                paso = (span_dias * 86400.0) / bitacora if bitacora else 0.0
+                for _ in range(bitacora):
+                    fecha += timedelta(seconds=rnd.expovariate(1.0 / paso) if paso else 0)
+                    lotes.add(bit_t, {
+                        "usuario_id": rnd.choice(user_ids),
+                        "accion": rnd.choice(ACCIONES),
+                        "descripcion": "Registro sintético",
+                        "modulo": rnd.choice(MODULOS),
+                        "fecha": fecha,
+                    })
+                lotes.flush()
+        finally:
+            conn.exec_driver_sql("PRAGMA synchronous = FULL")
+            conn.commit()
+    return {
+        "equipo": lotes.counts.get("equipo", 0),
+        "mantenimiento": lotes.counts.get("mantenimiento", 0),
+        "bitacora": lotes.counts.get("bitacora", 0),
+    }
+
+
+def main(argv=None):
+    import argparse
+    from sqlalchemy import create_engine
+    from ..data.models import Base
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos con el esquema de SCEI.")
+    parser.add_argument("db", help="Archivo SQLite destino (se crea si no existe)")
+    parser.add_argument("--equipos", type=int, default=10_000)
+    parser.add_argument("--mantenimientos", type=int, default=50_000)
+    parser.add_argument("--bitacora", type=int, default=100_000)
+    parser.add_argument("--anios", type=int, default=5, help="Años de historia")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fecha-base", type=date.fromisoformat, default=None,
+                        help="Fecha final del período (AAAA-MM-DD); fijarla hace la salida reproducible")
+    parser.add_argument("--lote", type=int, default=BATCH)
+    args = parser.parse_args(argv)
+
+    engine = create_engine(f"sqlite:///{args.db}", future=True)
+    Base.metadata.create_all(engine)
+    t0 = time.perf_counter()
+    counts = generate(engine, args.equipos, args.mantenimientos, args.bitacora, seed=args.seed,
+                      anios=args.anios, fecha_base=args.fecha_base, batch=args.lote)
+    elapsed = time.perf_counter() - t0
+    total = sum(counts.values())
+    print(f"{counts} en {elapsed:.1f} s ({total / elapsed * 60 / 1e6:.2f} M filas/min)")
+
+
+if __name__ == "__main__":
+    main()
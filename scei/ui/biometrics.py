@@ -1,95 +1,54 @@
 
 import cv2
-import numpy as np
-import pickle
-import os
-import sys
 from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLabel, QPushButton, QMessageBox, QComboBox
-from PyQt6.QtCore import QTimer, Qt
-from PyQt6.QtGui import QImage, QPixmap
+from PyQt6.QtCore import QTimer, Qt, QObject, QThread, pyqtSignal
+from PyQt6.QtGui import QPixmap
 
 from ..utils import load_icon
 from ..data.repositories import update_user_profile
+from ..vision.engine import FaceEngine, get_face_engine
+from ..vision.gallery import get_gallery, recognize_faces
+from ..vision.enrollment import SampleCollector, train_model
+from ..vision.sources import open_source
+from ..vision.pipeline import FacePipeline, qimage_from_bgr
 
 
 class FacialData:
-    def __init__(self):
+    def __init__(self, engine: FaceEngine | None = None):
         # Verificar existencia de módulo face (contrib)
         if not hasattr(cv2, 'face'):
             raise Exception("El módulo 'cv2.face' no está disponible. Instale opencv-contrib-python.")
 
-        # Resolver path del haarcascade robustamente para PyInstaller
-        cascade_fn = 'haarcascade_frontalface_default.xml'
-        cascade_path = os.path.join(cv2.data.haarcascades, cascade_fn)
-        
-        # En modo frozen onefile, a veces cv2.data.haarcascades falla o apunta mal.
-        # Intentamos buscar en _MEIPASS si existe.
-        if not os.path.exists(cascade_path):
-            if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
-                # Intento 1: root del temp
-                p1 = os.path.join(sys._MEIPASS, cascade_fn)
-                # Intento 2: dentro de cv2/data (si se incluyó así)
-                p2 = os.path.join(sys._MEIPASS, 'cv2', 'data', cascade_fn)
-                
-                if os.path.exists(p1):
-                    cascade_path = p1
-                elif os.path.exists(p2):
-                    cascade_path = p2
-        
-        if not os.path.exists(cascade_path):
-            # Fallback final: intentar cargar directo esperando que cv2 lo resuelva interno
-            cascade_path = cascade_fn
-
-        self.face_cascade = cv2.CascadeClassifier(cascade_path)
-        if self.face_cascade.empty():
-            # Si falló, intentar una carga cruda por si cv2 lo tiene en built-ins
-            self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + cascade_fn)
-            if self.face_cascade.empty():
-                 raise FileNotFoundError(f"No se pudo cargar el modelo Haar Cascade: {cascade_fn}")
-
-        # Reconocedor LBPH
-        self.recognizer = cv2.face.LBPHFaceRecognizer_create()
-
-    def train_and_serialize(self, images, labels):
-        # images: lista de arrays numpy (roi gray)
-        # labels: lista de ids (int)
-        self.recognizer.train(images, np.array(labels))
-        # Serializar modelo a bytes
-        # OpenCV no tiene un "dumps" directo para el modelo completo en Python fácilmente portable,
-        # pero para un solo usuario podemos guardar el histograma o usar write a archivo temporal.
-        # TRUCO: LBPH es chico. Para simplificar en User unico, guardaremos las IMÁGENES DE ENTRENAMIENTO
-        # o un modelo YML.
-        # Mejor enfoque para este caso: Guardar el modelo en un archivo temporal y leer los bytes.
-        import tempfile, os
-        fd, path = tempfile.mkstemp('.yml')
-        os.close(fd)
-        self.recognizer.save(path)
-        with open(path, 'rb') as f:
-            data = f.read()
-        os.remove(path)
-        return data
-
-    def load_from_bytes(self, data):
-        if not data: return False
-        import tempfile, os
-        fd, path = tempfile.mkstemp('.yml')
-        os.write(fd, data)
-        os.close(fd)
+        # El clasificador Haar se comparte en todo el proceso (se carga una sola vez)
+        self.engine = engine or get_face_engine()
+        self.face_cascade = self.engine.face_cascade
+
+class _EnrollWorker(QObject):
+    """Entrena y guarda el modelo fuera del hilo de la interfaz."""
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(str)   # mensaje de error, vacío si salió bien
+
+    def __init__(self, user_id, samples):
+        super().__init__()
+        self.user_id = user_id
+        self.samples = samples
+
+    def run(self):
         try:
-            self.recognizer.read(path)
-            os.remove(path)
-            return True
-        except:
-            if os.path.exists(path): os.remove(path)
-            return False
+            blob = train_model(self.samples, progress=self.progress.emit)
+            update_user_profile(self.user_id, {"face_data": blob})
+            self.finished.emit("")
+        except Exception as e:
+            self.finished.emit(str(e) or type(e).__name__)
 
 class FaceCaptureDialog(QDialog):
-    def __init__(self, user_id, parent=None):
+    def __init__(self, user_id, parent=None, source=None):
         super().__init__(parent)
         self.setWindowTitle("Configuración Facial")
         self.setWindowIcon(load_icon("scan.svg"))
         self.setFixedSize(600, 500)
         self.user_id = user_id
+        self.source_spec = source
         
         # UI
         layout = QVBoxLayout(self)
@@ -110,14 +69,13 @@ class FaceCaptureDialog(QDialog):
         self.btn_start.setProperty("class", "primary")
         layout.addWidget(self.btn_start)
         
-        self.cap = None
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_frame)
+        self.pipeline = None
+        self._train_thread = None
+        self._train_worker = None
         
         self.capturing = False
-        self.count = 0
         self.max_samples = 40
-        self.samples = []
+        self.collector = SampleCollector(self.max_samples)
         try:
             self.face_helper = FacialData()
         except Exception as e:
@@ -130,85 +88,94 @@ class FaceCaptureDialog(QDialog):
             QMessageBox.critical(self, "Error", "El sistema biométrico no está disponible.")
             return
 
-        if self.cap is None:
-            # Use CAP_DSHOW on Windows for faster init
-            self.cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-            if not self.cap.isOpened():
-                self.cap = cv2.VideoCapture(0)
-        
-        if not self.cap.isOpened():
+        source = open_source(self.source_spec)
+        if not source.is_opened():
+            source.release()
             QMessageBox.warning(self, "Error", "No se detectó cámara web.")
             return
             
         self.capturing = True
-        self.count = 0
-        self.samples = []
+        self.collector = SampleCollector(self.max_samples)
         self.btn_start.setEnabled(False)
         self.btn_start.setText("Capturando...")
-        self.timer.start(30) # ~30fps
 
-    def update_frame(self):
-        ret, frame = self.cap.read()
-        if not ret: return
-        
-        frame = cv2.flip(frame, 1) # Espejo
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = self.face_helper.face_cascade.detectMultiScale(gray, 1.3, 5)
-        
-        for (x,y,w,h) in faces:
-            cv2.rectangle(frame, (x,y), (x+w,y+h), (0,255,0), 2)
-            
-            if self.capturing and self.count < self.max_samples:
-                # Guardar ROI
-                self.samples.append(gray[y:y+h, x:x+w])
-                self.count += 1
-                self.lbl_info.setText(f"Capturando: {self.count}/{self.max_samples}")
-            
-        # Convert to Qt
-        rgb_image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb_image.shape
-        bytes_per_line = ch * w
-        qt_img = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
+        # Captura y detección en hilos propios; la UI solo pinta y muestra el progreso
+        self.pipeline = FacePipeline(source, self.face_helper.engine, analyze=self._collect_sample, parent=self)
+        self.pipeline.frame_ready.connect(self.show_frame)
+        self.pipeline.result_ready.connect(self.on_progress)
+        self.pipeline.error.connect(lambda msg: self.lbl_info.setText(f"Error de cámara: {msg}"))
+        self.pipeline.start()
+
+    def _collect_sample(self, gray, faces, frame):
+        # Hilo de detección: muestra normalizada (tamaño fijo, ecualizada), sin repetidos
+        if not self.capturing or self.collector.full:
+            return None
+        added = False
+        for (x, y, w, h) in faces:
+            added = self.collector.add(gray[y:y+h, x:x+w]) or added
+        return self.collector.count if added else None
+
+    def show_frame(self, frame, faces):
+        qt_img = qimage_from_bgr(frame)
         self.video_label.setPixmap(QPixmap.fromImage(qt_img).scaled(self.video_label.size(), Qt.AspectRatioMode.KeepAspectRatio))
-        
-        if self.capturing and self.count >= self.max_samples:
+        self.pipeline.preview_consumed()
+
+    def on_progress(self, count):
+        if not self.capturing:
+            return
+        self.lbl_info.setText(f"Capturando: {count}/{self.max_samples}")
+        if count >= self.max_samples:
             self.finish_training()
 
     def finish_training(self):
         self.capturing = False
-        self.timer.stop()
+        if self.pipeline: self.pipeline.stop()
         self.lbl_info.setText("Procesando modelo biométrico... Espere.")
-        QTimer.singleShot(100, self._process_model)
+        # Entrenamiento y guardado en segundo plano; el diálogo sigue respondiendo
+        self._train_thread = QThread(self)
+        self._train_worker = _EnrollWorker(self.user_id, list(self.collector.samples))
+        self._train_worker.moveToThread(self._train_thread)
+        self._train_thread.started.connect(self._train_worker.run)
+        self._train_worker.progress.connect(self.on_train_progress)
+        self._train_worker.finished.connect(self._on_train_finished)
+        self._train_thread.start()
 
-    def _process_model(self):
-        try:
-            # Entrenar modelo solo con este usuario (ID arbitrario 1, ya que guardamos 1 modelo por usuario en BD)
-            labels = [1] * len(self.samples)
-            blob = self.face_helper.train_and_serialize(self.samples, labels)
-            
-            # Guardar en BD
-            update_user_profile(self.user_id, {"face_data": blob})
-            
-            QMessageBox.information(self, "Éxito", "Reconocimiento facial configurado correctamente.")
-            self.accept()
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Fallo al guardar biometría: {e}")
+    def on_train_progress(self, done, total):
+        self.lbl_info.setText(f"Procesando modelo biométrico... {done}/{total}")
+
+    def _on_train_finished(self, error):
+        self._stop_training()
+        if error:
+            QMessageBox.critical(self, "Error", f"Fallo al guardar biometría: {error}")
             self.reject()
-        finally:
-            if self.cap: self.cap.release()
+            return
+        QMessageBox.information(self, "Éxito", "Reconocimiento facial configurado correctamente.")
+        self.accept()
+
+    def _stop_training(self):
+        if self._train_thread is not None:
+            self._train_thread.quit()
+            self._train_thread.wait()
+            self._train_thread = None
 
     def closeEvent(self, event):
-        if self.cap: self.cap.release()
-        self.timer.stop()
+        if self.pipeline: self.pipeline.stop()
+        self._stop_training()
         super().closeEvent(event)
 
+    def done(self, r):
+        if self.pipeline: self.pipeline.stop()
+        self._stop_training()
+        super().done(r)
+
 
 class FaceLoginDialog(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, source=None):
         super().__init__(parent)
         self.setWindowTitle("Login Facial")
         self.setWindowIcon(load_icon("scan.svg"))
         self.setFixedSize(500, 400)
+        self.source_spec = source
         
         layout = QVBoxLayout(self)
         self.lbl = QLabel("Buscando rostro...")
@@ -221,35 +188,38 @@ class FaceLoginDialog(QDialog):
         self.video.setAlignment(Qt.AlignmentFlag.AlignCenter)
         layout.addWidget(self.video, 0, Qt.AlignmentFlag.AlignHCenter)
         
-        self.cap = None
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.scan)
-        
-        self.helpers = {} # map user_id -> recognizer
-        self.users_map = {} # map user_id -> username
+        self.pipeline = None
+        self.engine = None
+        self.gallery = None # reconocedor único con todos los usuarios
         self.matches_consecutive = 0
         self.detected_user = None
+        self.authenticated_user = None
 
         # Postpone heavyweight init to avoid freezing UI on show
         QTimer.singleShot(100, self.startup)
 
     def startup(self):
+        # 0. Motor compartido (normalmente ya precargado tras mostrar el login)
+        try:
+            self.engine = get_face_engine()
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Error inicializando biometría: {e}")
+            self.reject()
+            return
+
         # 1. Load models first
         self.load_models()
         
-        if not self.helpers:
+        if not self.gallery:
             QMessageBox.warning(self, "Aviso", "No hay usuarios con biometría configurada.")
             self.reject()
             return
 
         # 2. Init Camera
         try:
-            # Use CAP_DSHOW on Windows
-            self.cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-            if not self.cap or not self.cap.isOpened():
-                 self.cap = cv2.VideoCapture(0)
-            
-            if not self.cap or not self.cap.isOpened():
+            source = open_source(self.source_spec)
+            if not source.is_opened():
+                source.release()
                 QMessageBox.critical(self, "Error", "No se detectó cámara web.")
                 self.reject()
                 return
@@ -257,60 +227,38 @@ class FaceLoginDialog(QDialog):
             QMessageBox.critical(self, "Error", f"Error al iniciar cámara: {e}")
             self.reject()
             return
-            
-        self.timer.start(100) # Scan mas lento para no saturar
+
+        # Scan mas lento para no saturar (10 detecciones por segundo como máximo)
+        self.pipeline = FacePipeline(source, self.engine, analyze=self.recognize,
+                                     max_fps=10, box_color=(0, 255, 255), parent=self)
+        self.pipeline.frame_ready.connect(self.show_frame)
+        self.pipeline.result_ready.connect(self.on_match)
+        self.pipeline.start()
 
     def load_models(self):
-        from ..data.repositories import session_scope
-        from ..data.models import User
-        with session_scope() as session:
-            users = session.query(User).filter(User.face_data != None).all()
-            for u in users:
-                try:
-                    helper = FacialData()
-                    if helper.load_from_bytes(u.face_data):
-                        self.helpers[u.id] = helper
-                        self.users_map[u.id] = u.username
-                except Exception:
-                    # Si falla al cargar FacialData (ej. haarcascade missing), saltar este usuario
-                    continue
-
-    def scan(self):
-        ret, frame = self.cap.read()
-        if not ret: return
-        
-        frame = cv2.flip(frame, 1)
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        # Usamos helper generico para cascade
-        generic = FacialData()
-        faces = generic.face_cascade.detectMultiScale(gray, 1.3, 5)
-        
-        found_id = None
-        min_conf = 100 # LBPH: Menor es mejor. < 50 es muy buena coincidencia.
-        
-        for (x,y,w,h) in faces:
-            cv2.rectangle(frame, (x,y), (x+w,y+h), (0,255,255), 2)
-            roi = gray[y:y+h, x:x+w]
-            
-            # Probar contra todos los modelos cargados
-            for uid, helper in self.helpers.items():
-                try:
-                    lid, conf = helper.recognizer.predict(roi)
-                    # lid siempre será 1 porque entrenamos asi. Lo importante es 'conf'
-                    if conf < 60: # Threshold aceptable
-                        if conf < min_conf:
-                            min_conf = conf
-                            found_id = uid
-                except:
-                    pass
-        
-        # Render
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb.shape
-        qt = QImage(rgb.data, w, h, ch*w, QImage.Format.Format_RGB888)
+        # Galería cacheada en el proceso: solo se reconstruye si cambió algún face_data
+        try:
+            self.gallery = get_gallery()
+        except Exception:
+            self.gallery = None
+
+    def recognize(self, gray, faces, frame):
+        """Hilo de detección: devuelve el id reconocido (o 0 si no hay coincidencia)."""
+        # Una sola predicción por rostro contra la galería (etiqueta = id de usuario)
+        try:
+            found_id, _ = recognize_faces(self.gallery, gray, faces)
+        except Exception:
+            found_id = None
+        return found_id or 0
+
+    def show_frame(self, frame, faces):
+        qt = qimage_from_bgr(frame)
         self.video.setPixmap(QPixmap.fromImage(qt).scaled(self.video.size(), Qt.AspectRatioMode.KeepAspectRatio))
-        
+        self.pipeline.preview_consumed()
+
+    def on_match(self, found_id):
+        if self.authenticated_user:
+            return
         if found_id:
             if self.detected_user == found_id:
                 self.matches_consecutive += 1
@@ -319,12 +267,15 @@ class FaceLoginDialog(QDialog):
                 self.matches_consecutive = 0
                 
             if self.matches_consecutive > 5: # 5 frames seguidos confirmando
-                self.authenticated_user = self.users_map[found_id]
+                self.authenticated_user = self.gallery.usernames[found_id]
                 self.accept()
         else:
             self.matches_consecutive = 0
 
     def closeEvent(self, e):
-        if self.cap: self.cap.release()
-        self.timer.stop()
+        if self.pipeline: self.pipeline.stop()
         super().closeEvent(e)
+
+    def done(self, r):
+        if self.pipeline: self.pipeline.stop()
+        super().done(r)
@@ -0,0 +1,43 @@
+"""
+Puente entre el bus de cambios de la capa de datos y las vistas Qt.
+
+Las escrituras pueden ocurrir en hilos de trabajo (p. ej. el enrolamiento facial); la
+señal `changed` se emite desde ahí y Qt la entrega en el hilo de la interfaz.
+
+    change_notifier().changed.connect(self.on_data_changed)   # recibe ChangeEvent
+"""
+from PyQt6 import sip
+from PyQt6.QtCore import QCoreApplication, QObject, pyqtSignal
+
+from ..data.events import bus
+
+
+class ChangeNotifier(QObject):
+    changed = pyqtSignal(object)
+
+    def __init__(self):
+        # Vive lo mismo que la aplicación: sin ella no hay vistas a las que avisar
+        super().__init__(QCoreApplication.instance())
+        bus.subscribe(self._forward)
+
+    def _forward(self, event) -> None:
+        # Emitir sobre un objeto ya destruido por Qt termina el proceso: comprobar antes
+        if sip.isdeleted(self):
+            bus.unsubscribe(self._forward)
+            return
+        self.changed.emit(event)
+
+
+_notifier: ChangeNotifier | None = None
+
+
+def change_notifier() -> ChangeNotifier:
+    """Instancia única; crearla por primera vez desde el hilo de la interfaz."""
+    global _notifier
+    if _notifier is not None and sip.isdeleted(_notifier):
+        # Se destruyó junto con una QApplication anterior
+        bus.unsubscribe(_notifier._forward)
+        _notifier = None
+    if _notifier is None:
+        _notifier = ChangeNotifier()
+    return _notifier
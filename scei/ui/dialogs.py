@@ -1,10 +1,12 @@
 
+import calendar
 import unicodedata
 import re
 from datetime import date
 from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QCheckBox, QPushButton,
-    QMessageBox, QWidget, QTextEdit, QComboBox, QDateEdit, QCompleter, QToolButton
+    QMessageBox, QWidget, QTextEdit, QComboBox, QDateEdit, QCompleter, QToolButton,
+    QTableWidget, QTableWidgetItem, QHeaderView
 )
 from PyQt6.QtGui import QAction, QIcon
 from PyQt6.QtCore import Qt, QSettings, QDate
@@ -13,14 +15,15 @@ from ..utils import load_pixmap, circular_pixmap, load_icon, validate_password_s
 from ..logger import add_log
 from .. import session
 from ..data.repositories import (
-    add_equipo, update_equipo, get_equipo, list_equipos_by_direccion,
+    add_equipo, update_equipo, get_equipo,
     add_mantenimiento, update_mantenimiento, get_mantenimiento,
     create_user, add_bitacora_log, get_user,
-    check_user, set_user_password, list_direcciones, list_equipos, list_users,
-    update_user_profile, delete_user
+    check_user, set_user_password, list_direcciones, list_users,
+    update_user_profile, delete_user,
+    list_bitacora_archive_months, search_bitacora_archive
 )
 from .report_forms import EquiposReportForm, MantenimientosReportForm
-from .biometrics import FaceLoginDialog
+from .pickers import EquipoPicker
 from sqlalchemy.exc import IntegrityError
 
 class AdminAuthDialog(QDialog):
@@ -105,6 +108,8 @@ class AdminAuthDialog(QDialog):
 
     def on_face_auth(self):
         # Usamos el mismo dialogo de Login Facil
+        # (OpenCV/numpy se cargan solo cuando se usa el reconocimiento facial)
+        from .biometrics import FaceLoginDialog
         dlg = FaceLoginDialog(self)
         if dlg.exec() == QDialog.DialogCode.Accepted:
             user = dlg.authenticated_user
@@ -450,6 +455,7 @@ class LoginDialog(QDialog):
             QMessageBox.information(self, "Registro", "Usuario registrado exitosamente.")
 
     def on_face_login(self):
+        from .biometrics import FaceLoginDialog
         dlg = FaceLoginDialog(self)
         if dlg.exec() == QDialog.DialogCode.Accepted:
             user = dlg.authenticated_user
@@ -1035,28 +1041,10 @@ class MantenimientoDialog(QDialog):
         card_layout.setContentsMargins(24, 24, 24, 24)
         card_layout.setSpacing(16)
 
-        # Equipo Selector
-        self.cb_equipo = QComboBox()
-        equipos = list_equipos_by_direccion(direccion_filter) if direccion_filter else list_equipos()
-        self.cb_equipo.addItem("Seleccione Equipo...", None)
-        
-        display_texts = []
-        for e in equipos:
-            text = f"{e.codigo_interno or ''} - {e.descripcion or ''} - {e.marca or ''}".strip().strip(" -")
-            display_texts.append(text)
-            self.cb_equipo.addItem(text, e.id)
-            
-        self.cb_equipo.setEditable(True)
-        self.cb_equipo.setInsertPolicy(QComboBox.InsertPolicy.NoInsert)
-        completer = QCompleter(display_texts)
-        completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
-        try: completer.setFilterMode(Qt.MatchFlag.MatchContains)
-        except: pass
-        self.cb_equipo.setCompleter(completer)
-        
+        # Equipo Selector: búsqueda indexada por prefijo, sin cargar el inventario completo
+        self.ed_equipo = EquipoPicker(direccion_filter)
         if data and data.get("equipo_id"):
-            idx = self.cb_equipo.findData(data["equipo_id"])
-            if idx >= 0: self.cb_equipo.setCurrentIndex(idx)
+            self.ed_equipo.set_equipo(data["equipo_id"])
 
         # Estado y Fecha
         self.cb_estado = QComboBox()
@@ -1075,7 +1063,7 @@ class MantenimientoDialog(QDialog):
         else:
             self.ed_fecha.setDate(QDate.currentDate())
 
-        self.cb_equipo.currentIndexChanged.connect(self.on_equipo_changed)
+        self.ed_equipo.equipoChanged.connect(self.on_equipo_changed)
         
         self.ed_desc = QTextEdit(data.get("descripcion", "") if data else "")
         self.ed_desc.setPlaceholderText("Detalle las acciones realizadas, repuestos utilizados, etc.")
@@ -1086,7 +1074,7 @@ class MantenimientoDialog(QDialog):
         # Fila 1: Equipo (Full width)
         col_eq = QVBoxLayout(); col_eq.setSpacing(6)
         col_eq.addWidget(QLabel("Equipo Afectado"))
-        col_eq.addWidget(self.cb_equipo)
+        col_eq.addWidget(self.ed_equipo)
         card_layout.addLayout(col_eq)
         
         # Fila 2: Fecha y Estado Resultante
@@ -1132,16 +1120,15 @@ class MantenimientoDialog(QDialog):
 
     def values(self) -> dict:
         return {
-            "equipo_id": self.cb_equipo.currentData(),
+            "equipo_id": self.ed_equipo.currentData(),
             "fecha": self.ed_fecha.date().toString("yyyy-MM-dd"),
             "descripcion": self.ed_desc.toPlainText().strip(),
             "estado_equipo": self.cb_estado.currentText(),
         }
 
-    def on_equipo_changed(self):
-        equipo_id = self.cb_equipo.currentData()
+    def on_equipo_changed(self, equipo_id):
         if equipo_id:
-            equipo = next((e for e in list_equipos() if e.id == equipo_id), None)
+            equipo = get_equipo(equipo_id)
             if equipo:
                 self.cb_estado.setCurrentText(equipo.estado or "optimo")
         else:
@@ -1194,6 +1181,72 @@ class RecordDetailDialog(QDialog):
 
         layout.addWidget(card)
 
+class BitacoraArchivoDialog(QDialog):
+    """Consulta bajo demanda de los registros de bitácora archivados por mes."""
+    MAX_ROWS = 2000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Archivo de Bitácora")
+        self.resize(820, 520)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(24, 24, 24, 24)
+        layout.setSpacing(12)
+
+        lbl = QLabel("Archivo de Bitácora")
+        lbl.setProperty("role", "heading")
+        layout.addWidget(lbl)
+
+        row = QHBoxLayout()
+        self.month = QComboBox()
+        self.month.addItem("Todos los meses", None)
+        for m in list_bitacora_archive_months():
+            self.month.addItem(m, m)
+        self.search = QLineEdit()
+        self.search.setPlaceholderText("Buscar en archivo...")
+        btn_search = QPushButton("Consultar")
+        btn_search.setProperty("class", "primary")
+        row.addWidget(QLabel("Mes:"))
+        row.addWidget(self.month)
+        row.addWidget(self.search, 1)
+        row.addWidget(btn_search)
+        layout.addLayout(row)
+
+        self.table = QTableWidget(0, 4)
+        self.table.setHorizontalHeaderLabels(["Fecha", "Usuario", "Acción", "Descripción"])
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table, 1)
+
+        self.lbl_count = QLabel("")
+        self.lbl_count.setStyleSheet("color: #94A3B8;")
+        layout.addWidget(self.lbl_count)
+
+        btn_search.clicked.connect(self.load)
+        self.search.returnPressed.connect(self.load)
+
+    def load(self):
+        month = self.month.currentData()
+        desde = hasta = None
+        if month:
+            y, m = (int(x) for x in month.split("-"))
+            desde = date(y, m, 1)
+            hasta = date(y, m, calendar.monthrange(y, m)[1])
+        rows = search_bitacora_archive(desde, hasta, self.search.text(), limit=self.MAX_ROWS)
+        self.table.setUpdatesEnabled(False)
+        self.table.setRowCount(len(rows))
+        for i, r in enumerate(rows):
+            self.table.setItem(i, 0, QTableWidgetItem((r.get("fecha") or "").replace("T", " ")[:16]))
+            self.table.setItem(i, 1, QTableWidgetItem(r.get("usuario") or ""))
+            self.table.setItem(i, 2, QTableWidgetItem(r.get("accion") or ""))
+            self.table.setItem(i, 3, QTableWidgetItem(r.get("descripcion") or ""))
+        self.table.setUpdatesEnabled(True)
+        extra = f" (máximo {self.MAX_ROWS})" if len(rows) >= self.MAX_ROWS else ""
+        self.lbl_count.setText(f"{len(rows)} registros{extra}")
+
 class GenerateDialog(QDialog):
     def __init__(self, mode: str):
         super().__init__()
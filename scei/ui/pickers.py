@@ -0,0 +1,98 @@
+"""
+Selectores con búsqueda incremental sobre consultas indexadas.
+
+EquipoPicker reemplaza al combo que cargaba todo el inventario: cada texto escrito
+consulta `search_equipo_rows` (prefijo de código, serie o descripción sobre los índices
+*_norm) con un tope de filas, y las ofrece en el autocompletado.
+"""
+from PyQt6.QtCore import Qt, QTimer, QModelIndex, pyqtSignal
+from PyQt6.QtGui import QStandardItem, QStandardItemModel
+from PyQt6.QtWidgets import QCompleter, QLineEdit
+
+from ..config import EQUIPO_PICKER_LIMIT
+from ..data.repositories import search_equipo_rows, get_equipo_rows
+
+SEARCH_DELAY_MS = 150   # espera tras la última tecla antes de consultar
+
+
+def equipo_label(e) -> str:
+    return f"{e.codigo_interno or ''} - {e.descripcion or ''} - {e.marca or ''}".strip().strip(" -")
+
+
+class EquipoPicker(QLineEdit):
+    """Campo de texto con autocompletado de equipos; `currentData()` da el id elegido."""
+
+    equipoChanged = pyqtSignal(object)   # id del equipo o None
+
+    def __init__(self, direccion_id: int | None = None, limit: int = EQUIPO_PICKER_LIMIT, parent=None):
+        super().__init__(parent)
+        self.direccion_id = direccion_id
+        self.limit = limit
+        self._id = None
+        self._label = ""
+        self.setPlaceholderText("Escriba código, serie o descripción...")
+        self.setClearButtonEnabled(True)
+
+        self._model = QStandardItemModel(self)
+        self._completer = QCompleter(self._model, self)
+        # El modelo ya llega filtrado por la consulta: mostrarlo tal cual
+        self._completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self._completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self._completer.setMaxVisibleItems(12)
+        self._completer.activated[QModelIndex].connect(self._on_activated)
+        self.setCompleter(self._completer)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(SEARCH_DELAY_MS)
+        self._timer.timeout.connect(self._search)
+        self.textEdited.connect(self._on_text_edited)
+        self.editingFinished.connect(self._on_editing_finished)
+
+    def currentData(self):
+        return self._id
+
+    def set_equipo(self, equipo_id: int | None) -> None:
+        """Selecciona un equipo por id (una sola fila consultada)."""
+        rows = get_equipo_rows((equipo_id,)) if equipo_id else []
+        self._select(rows[0].id if rows else None, equipo_label(rows[0]) if rows else "")
+
+    def _select(self, equipo_id, label: str) -> None:
+        self._label = label
+        self.setText(label)
+        if equipo_id != self._id:
+            self._id = equipo_id
+            self.equipoChanged.emit(equipo_id)
+
+    def _on_text_edited(self, text: str) -> None:
+        if self._id is not None and text != self._label:
+            # El texto ya no corresponde al equipo elegido
+            self._id = None
+            self.equipoChanged.emit(None)
+        self._timer.start()
+
+    def _search(self) -> None:
+        self._timer.stop()
+        term = self.text().strip()
+        self._model.clear()
+        if not term:
+            return
+        for e in search_equipo_rows(term, self.direccion_id, limit=self.limit):
+            item = QStandardItem(equipo_label(e))
+            item.setData(e.id, Qt.ItemDataRole.UserRole)
+            self._model.appendRow(item)
+        if self.hasFocus() and self._model.rowCount():
+            self._completer.setCompletionPrefix(term)
+            self._completer.complete()
+
+    def _on_activated(self, index: QModelIndex) -> None:
+        self._select(index.data(Qt.ItemDataRole.UserRole), index.data())
+
+    def _on_editing_finished(self) -> None:
+        if self._id is not None or not self.text().strip():
+            return
+        if self._timer.isActive():
+            self._search()
+        # Una única coincidencia: Enter/Tab la elige sin abrir la lista
+        if self._model.rowCount() == 1:
+            self._on_activated(self._model.index(0, 0))
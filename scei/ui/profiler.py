@@ -0,0 +1,254 @@
+"""
+Perfilador de respuesta de la interfaz (opcional, SCEI_PROFILE_UI=1).
+
+- Cronometra refresh(), on_* y generar_* de cada pestaña y atribuye a esas acciones las
+  consultas SQL del diagnóstico de Configuración.
+- Un vigilante en otro hilo detecta cuándo el loop de eventos deja de responder más de
+  UI_STALL_THRESHOLD_MS y guarda la pila de Python del hilo principal en ese momento.
+- Todo se escribe como líneas JSON en ui_trace.jsonl (rotativo) junto a los logs.
+- Ctrl+Shift+P inicia/detiene cProfile; al detener se guardan .prof y un resumen pstats.
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from PyQt6.QtCore import QTimer
+from PyQt6.QtGui import QKeySequence, QShortcut
+
+from ..config import UI_STALL_THRESHOLD_MS, UI_TRACE_MAX_KB, UI_TRACE_KEEP
+from ..stats import percentile
+from ..data.instrumentation import ACTION_PATTERN, instrument_classes, wrap_slot
+
+PROFILE_ENV = "SCEI_PROFILE_UI"
+TRACE_NAME = "ui_trace.jsonl"
+TICK_MS = 50
+STACK_LIMIT = 40
+
+
+def trace_dir() -> str:
+    from .. import logger
+    return os.path.dirname(logger.LOGS_FILE) if logger.LOGS_FILE else os.getcwd()
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="milliseconds")
+
+
+class UIProfiler:
+    def __init__(self, trace_path: str | None = None, threshold_ms: float = UI_STALL_THRESHOLD_MS,
+                 tick_ms: int = TICK_MS, max_bytes: int = UI_TRACE_MAX_KB * 1024,
+                 backups: int = UI_TRACE_KEEP):
+        self.trace_path = trace_path or os.path.join(trace_dir(), TRACE_NAME)
+        self.threshold_ms = threshold_ms
+        self.tick_ms = tick_ms
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.timings: dict[str, list[float]] = {}
+        self.stalls: list[dict] = []
+        self._actions: list[str] = []        # acciones en curso en el hilo principal
+        self._lock = threading.Lock()
+        self._log = None
+        self._timer = None
+        self._watchdog = None
+        self._stop = threading.Event()
+        self._last_tick = time.perf_counter()
+        self._main_id = threading.main_thread().ident
+        self._cprofile = None
+
+    # --- Archivo de traza ---
+    def _open_log(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.trace_path)), exist_ok=True)
+        log = logging.getLogger(f"scei.ui_profiler.{id(self)}")
+        log.setLevel(logging.INFO)
+        log.propagate = False
+        handler = RotatingFileHandler(self.trace_path, maxBytes=self.max_bytes,
+                                      backupCount=self.backups, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        log.addHandler(handler)
+        return log
+
+    def _write(self, record: dict) -> None:
+        if self._log is not None:
+            try:
+                self._log.info(json.dumps(record, ensure_ascii=False))
+            except Exception:
+                pass
+
+    # --- Cronometraje de acciones ---
+    @contextmanager
+    def measure(self, name: str):
+        on_main = threading.get_ident() == self._main_id
+        if on_main:
+            self._actions.append(name)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            ms = (time.perf_counter() - t0) * 1000.0
+            if on_main:
+                self._actions.pop()
+            with self._lock:
+                self.timings.setdefault(name, []).append(ms)
+            self._write({"tipo": "accion", "ts": _now(), "accion": name, "ms": round(ms, 2)})
+
+    def timed(self, name: str):
+        def deco(fn):
+            wrapper = wrap_slot(fn, lambda: self.measure(name))
+            wrapper.__scei_timed__ = name
+            return wrapper
+        return deco
+
+    def instrument(self, classes, pattern=ACTION_PATTERN) -> None:
+        """Envuelve los métodos de acción; llamar antes de crear las instancias."""
+        instrument_classes(classes, pattern, decorator=self.timed, marker="__scei_timed__")
+
+    # --- Vigilante del loop de eventos ---
+    def _tick(self):
+        self._last_tick = time.perf_counter()
+
+    def _main_stack(self) -> list[str]:
+        frame = sys._current_frames().get(self._main_id)
+        if frame is None:
+            return []
+        return [line.rstrip() for line in traceback.format_stack(frame, limit=STACK_LIMIT)]
+
+    def _watch(self):
+        interval = min(self.tick_ms, self.threshold_ms) / 2000.0
+        stall = None
+        while not self._stop.wait(interval):
+            silent_ms = (time.perf_counter() - self._last_tick) * 1000.0
+            if stall is None:
+                if silent_ms > self.threshold_ms + self.tick_ms:
+                    # La pila se toma mientras el hilo principal sigue bloqueado
+                    stall = {
+                        "inicio": _now(),
+                        "accion": self._actions[-1] if self._actions else None,
+                        "pila": self._main_stack(),
+                    }
+            elif silent_ms < self.tick_ms * 2:
+                self._end_stall(stall)
+                stall = None
+            else:
+                stall["ms"] = silent_ms
+        if stall is not None:
+            self._end_stall(stall)
+
+    def _end_stall(self, stall: dict) -> None:
+        stall["ms"] = round(max(stall.get("ms", 0.0), self.threshold_ms), 2)
+        with self._lock:
+            self.stalls.append(stall)
+        self._write({"tipo": "bloqueo", "ts": _now(), **stall})
+
+    # --- Ciclo de vida ---
+    def start(self) -> None:
+        if self._timer is not None:
+            return
+        self._log = self._open_log()
+        self._write({"tipo": "inicio", "ts": _now(), "umbral_ms": self.threshold_ms})
+        self._last_tick = time.perf_counter()
+        self._timer = QTimer()
+        self._timer.setInterval(self.tick_ms)
+        self._timer.timeout.connect(self._tick)
+        self._timer.start()
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="scei-ui-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        if self._timer is None:
+            return
+        self._timer.stop()
+        self._timer = None
+        self._stop.set()
+        self._watchdog.join(timeout=2)
+        self._watchdog = None
+        if self._cprofile is not None:
+            self.toggle_cprofile()
+        self._write({"tipo": "fin", "ts": _now(), "resumen": self.summary()})
+        for h in list(self._log.handlers):
+            h.close()
+            self._log.removeHandler(h)
+        self._log = None
+
+    def summary(self) -> dict:
+        with self._lock:
+            items = {k: list(v) for k, v in self.timings.items()}
+            n_stalls = len(self.stalls)
+        acciones = {
+            name: {
+                "veces": len(ms),
+                "total_ms": round(sum(ms), 2),
+                "max_ms": round(max(ms), 2),
+                "p95_ms": round(percentile(ms, 95), 2),
+            }
+            for name, ms in items.items()
+        }
+        return {
+            "acciones": dict(sorted(acciones.items(), key=lambda kv: -kv[1]["total_ms"])),
+            "bloqueos": n_stalls,
+        }
+
+    # --- cProfile bajo demanda ---
+    def toggle_cprofile(self) -> str | None:
+        """Inicia cProfile o, si ya corre, lo detiene y guarda el volcado. Devuelve la ruta .prof."""
+        if self._cprofile is None:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+            self._write({"tipo": "cprofile", "ts": _now(), "estado": "iniciado"})
+            return None
+        prof, self._cprofile = self._cprofile, None
+        prof.disable()
+        base = os.path.join(os.path.dirname(os.path.abspath(self.trace_path)),
+                            datetime.now().strftime("ui_profile_%Y%m%d_%H%M%S"))
+        prof.dump_stats(base + ".prof")
+        text = io.StringIO()
+        pstats.Stats(prof, stream=text).sort_stats("cumulative").print_stats(40)
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(text.getvalue())
+        self._write({"tipo": "cprofile", "ts": _now(), "estado": "guardado", "archivo": base + ".prof"})
+        return base + ".prof"
+
+    def install_shortcut(self, window, keys: str = "Ctrl+Shift+P") -> None:
+        shortcut = QShortcut(QKeySequence(keys), window)
+        shortcut.activated.connect(self._on_shortcut)
+        window._profiler_shortcut = shortcut
+
+    def _on_shortcut(self):
+        path = self.toggle_cprofile()
+        try:
+            from ..logger import add_log
+            add_log("Perfilador", f"cProfile guardado en {path}" if path else "cProfile iniciado")
+        except Exception:
+            pass
+
+
+profiler: UIProfiler | None = None
+
+
+def enabled() -> bool:
+    return os.environ.get(PROFILE_ENV) == "1"
+
+
+def start_profiler(classes) -> UIProfiler:
+    """Instrumenta las clases de pestañas y arranca el vigilante (una sola vez).
+
+    También agrupa las consultas SQL por acción de pestaña (instrumentation.stats); sin
+    el perfilador todas quedan bajo "(sin acción)".
+    """
+    global profiler
+    if profiler is None:
+        profiler = UIProfiler()
+        instrument_classes(classes)
+        profiler.instrument(classes)
+        profiler.start()
+    return profiler
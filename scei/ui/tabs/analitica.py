@@ -1,13 +1,18 @@
 
-from collections import defaultdict
+from collections import Counter, defaultdict
 from datetime import date
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QHBoxLayout, QScrollArea, QGridLayout
 from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QColor
 
 from ..widgets import PieChartWidget, FlowLayout
-from ...data.repositories import list_equipos, list_mantenimientos, list_direcciones
-from ...data.models import Mantenimiento
+from ...data.repositories import (
+    list_equipo_rows, list_mantenimiento_rows, list_direcciones,
+    get_equipo_rows, get_mantenimiento_rows, external_changes_epoch,
+)
+from ...data.events import DELETE
+from ..changes import change_notifier
+from ...data.rows import MantenimientoRow
 from ...config import DIRECCIONES_HIERARCHY
 
 class AnaliticaTab(QWidget):
@@ -90,132 +95,154 @@ class AnaliticaTab(QWidget):
         root.setContentsMargins(0,0,0,0)
         root.addWidget(scroll)
 
+        self._dir_pies: dict[int, PieChartWidget] = {}
+        change_notifier().changed.connect(self.on_data_changed)
         self.refresh()
 
     def refresh(self):
-        # --- Equipos por estado (global) ---
-        total_opt = total_def = total_inop = 0
-        equipos = list_equipos()
-        total_equipos = len(equipos) or 1
-        
-        for e in equipos:
-            estado = (e.estado or "optimo").lower()
-            if estado == "defectuoso":
-                total_def += 1
-            elif estado == "inoperativo":
-                total_inop += 1
-            else:
-                total_opt += 1
-        
-        self.pie_equipos.set_data([
-            ("Óptimos", total_opt, QColor("#22C55E")),
-            ("Defectuosos", total_def, QColor("#F97316")),
-            ("Inoperativos", total_inop, QColor("#EF4444")),
-        ])
-
-        # --- Mejoras de estado (Lógica Original) ---
-        mejoras = 0
-        agravado = 0
-        mant_por_equipo: dict[int, list[Mantenimiento]] = defaultdict(list)
-        for m in list_mantenimientos():
+        """Recarga completa; los cambios posteriores se aplican con on_data_changed."""
+        self._loaded = (external_changes_epoch(), date.today())
+        equipos = list_equipo_rows()
+        mant_por_equipo: dict[int, list[MantenimientoRow]] = defaultdict(list)
+        self._mant_equipo: dict[int, int] = {}
+        for m in list_mantenimiento_rows():
             if m.equipo_id is not None:
                 mant_por_equipo[m.equipo_id].append(m)
+                self._mant_equipo[m.id] = m.equipo_id
 
-        rank = {"optimo": 2, "defectuoso": 1, "inoperativo": 0}
-
+        self._equipos: dict[int, tuple[int | None, str]] = {}
+        self._estados = Counter()
+        self._estados_dir: dict[int, Counter] = defaultdict(Counter)
+        self._evolucion: dict[int, str] = {}
+        self._evolucion_cnt = Counter()
         for eq in equipos:
-            registros = mant_por_equipo.get(eq.id, [])
-            if not registros:
-                continue
-            registros.sort(key=lambda m: m.fecha or date.today())
+            self._set_equipo(eq.id, (eq.direccion_id, _estado(eq.estado)))
+            self._set_evolucion(eq.id, _clasificar(mant_por_equipo.get(eq.id, [])))
 
-            estados = [(m.estado_equipo or "").lower() for m in registros if (m.estado_equipo or "").strip()]
-            if not estados:
-                continue
-            
-            first_state = estados[0] if estados[0] in rank else "optimo"
-            last_state = estados[-1] if estados[-1] in rank else first_state
-
-            prev_estado: str | None = None
-            mejoro = False
-            empeoro = False
-            had_optimo = False
-            had_worse = False
-            last_improve_date: date | None = None
-            
-            for m, est in zip(registros, estados):
-                est_norm = est if est in rank else "optimo"
-                if est_norm == "optimo":
-                    had_optimo = True
-                if est_norm in {"defectuoso", "inoperativo"}:
-                    had_worse = True
-
-                if prev_estado is not None:
-                    if prev_estado in {"defectuoso", "inoperativo"} and est_norm == "optimo":
-                        mejoro = True
-                        last_improve_date = m.fecha or date.today()
-                    if prev_estado == "optimo" and est_norm in {"defectuoso", "inoperativo"}:
-                        empeoro = True
-                prev_estado = est_norm
-
-            recent_improve = False
-            if mejoro and last_improve_date is not None:
-                days_since = (date.today() - last_improve_date).days
-                if days_since <= 14:
-                    recent_improve = True
-
-            if recent_improve:
-                mejoras += 1
-            else:
-                if (
-                    rank.get(last_state, 2) < rank.get(first_state, 2)
-                    or empeoro
-                    or (had_worse and not had_optimo)
-                ):
-                    agravado += 1
+        self._update_global()
+        self.refresh_direcciones()
+
+    def refresh_if_stale(self):
+        """Al mostrar la pestaña: el bus solo trae las escrituras de este proceso. Recarga si
+        otro puesto escribió en la BD (o no se puede saber) o si cambió el día (la ventana
+        de "Mejoraron" es relativa a hoy)."""
+        epoch = external_changes_epoch()
+        if epoch is None or (epoch, date.today()) != self._loaded:
+            self.refresh()
+
+    # --- Contadores incrementales ---
+    def _set_equipo(self, eq_id: int, value) -> None:
+        """value = (direccion_id, estado) o None si el equipo ya no existe."""
+        old = self._equipos.pop(eq_id, None)
+        if old is not None:
+            self._estados[old[1]] -= 1
+            if old[0]:
+                self._estados_dir[old[0]][old[1]] -= 1
+                if not +self._estados_dir[old[0]]:
+                    del self._estados_dir[old[0]]
+        if value is not None:
+            self._equipos[eq_id] = value
+            self._estados[value[1]] += 1
+            if value[0]:
+                self._estados_dir[value[0]][value[1]] += 1
+
+    def _set_evolucion(self, eq_id: int, clase: str | None) -> None:
+        old = self._evolucion.pop(eq_id, None)
+        if old is not None:
+            self._evolucion_cnt[old] -= 1
+        if clase is not None:
+            self._evolucion[eq_id] = clase
+            self._evolucion_cnt[clase] += 1
+
+    def _reclasificar(self, eq_ids) -> None:
+        eq_ids = [i for i in eq_ids if i is not None]
+        if not eq_ids:
+            return
+        mant_por_equipo: dict[int, list[MantenimientoRow]] = defaultdict(list)
+        for m in get_mantenimiento_rows(equipo_ids=eq_ids):
+            mant_por_equipo[m.equipo_id].append(m)
+        for eq_id in eq_ids:
+            clase = _clasificar(mant_por_equipo.get(eq_id, [])) if eq_id in self._equipos else None
+            self._set_evolucion(eq_id, clase)
+
+    def on_data_changed(self, event):
+        """Actualiza solo los contadores de los equipos afectados."""
+        if event.entity == "direccion":
+            self.refresh_direcciones()
+            return
+        if event.entity not in ("equipo", "mantenimiento"):
+            return
+        if not event.ids:
+            self.refresh()
+            return
+        dirs_antes = set(self._estados_dir)
+        afectadas: set[int] = set()
+
+        def tocar(eq_id):
+            old = self._equipos.get(eq_id)
+            if old is not None and old[0]:
+                afectadas.add(old[0])
+
+        if event.entity == "equipo":
+            rows = {} if event.op == DELETE else {e.id: e for e in get_equipo_rows(event.ids)}
+            for eq_id in event.ids:
+                tocar(eq_id)
+                e = rows.get(eq_id)
+                self._set_equipo(eq_id, (e.direccion_id, _estado(e.estado)) if e else None)
+                tocar(eq_id)
+                if e is None:
+                    self._set_evolucion(eq_id, None)
+        else:
+            eq_ids = {self._mant_equipo.pop(mid) for mid in event.ids if mid in self._mant_equipo}
+            if event.op != DELETE:
+                for m in get_mantenimiento_rows(ids=event.ids):
+                    if m.equipo_id is not None:
+                        self._mant_equipo[m.id] = m.equipo_id
+                        eq_ids.add(m.equipo_id)
+            self._reclasificar(eq_ids)
+
+        self._update_global()
+        if set(self._estados_dir) != dirs_antes:
+            # Aparece o desaparece una tarjeta: reconstruir la sección
+            self.refresh_direcciones()
+        else:
+            for dir_id in afectadas:
+                pie = self._dir_pies.get(dir_id)
+                if pie is not None:
+                    pie.set_data(_pie_estados(self._estados_dir[dir_id]))
 
+    def _update_global(self):
+        self.pie_equipos.set_data(_pie_estados(self._estados))
+        total_equipos = len(self._equipos) or 1
+        mejoras = self._evolucion_cnt["mejora"]
+        agravado = self._evolucion_cnt["agravado"]
         # Cálculo original: Sin cambios es el resto del universo de equipos
         sin_cambios = max(total_equipos - mejoras - agravado, 0)
-        
+
         self.pie_mejoras.set_data([
             ("Mejoraron", mejoras, QColor("#38BDF8")),    # Sky 400
             ("Sin cambios", sin_cambios, QColor("#22C55E")), # Green Original
             ("Agravado", agravado, QColor("#EF4444")),    # Red Original
         ])
-        
-        self.refresh_direcciones(equipos)
 
-    def refresh_direcciones(self, all_equipos):
+    def refresh_direcciones(self):
         # Limpiar layout
         # Para FlowLayout, mejor borrar items uno a uno
         while self.flow_layout.count():
             item = self.flow_layout.takeAt(0)
             if item.widget():
                 item.widget().deleteLater()
-        
-        # Agrupar equipos por direccion
-        eq_by_dir = defaultdict(list)
-        for e in all_equipos:
-            if e.direccion_id:
-                eq_by_dir[e.direccion_id].append(e)
-                
+        self._dir_pies = {}
+
         # Obtener y ordenar direcciones
         dirs = list_direcciones()
         pos_map = {name: i for i, name in enumerate(DIRECCIONES_HIERARCHY)}
         dirs.sort(key=lambda d: (pos_map.get(d.nombre or "", 10000), (d.nombre or "").lower()))
         
         for d in dirs:
-            my_eqs = eq_by_dir.get(d.id, [])
-            if not my_eqs:
+            counts = self._estados_dir.get(d.id)
+            if not counts:
                 continue
-                
-            # Calcular estados
-            c_opt = c_def = c_inop = 0
-            for e in my_eqs:
-                st = (e.estado or "optimo").lower()
-                if st == "defectuoso": c_def += 1
-                elif st == "inoperativo": c_inop += 1
-                else: c_opt += 1
             
             # Crear Card
             card = QWidget()
@@ -243,11 +270,69 @@ class AnaliticaTab(QWidget):
             
             # Mini Chart
             pie = PieChartWidget()
-            pie.set_data([
-                ("Óptimos", c_opt, QColor("#22C55E")),
-                ("Defectuosos", c_def, QColor("#F97316")),
-                ("Inoperativos", c_inop, QColor("#EF4444")),
-            ])
+            pie.set_data(_pie_estados(counts))
             cv.addWidget(pie)
+            self._dir_pies[d.id] = pie
             
             self.flow_layout.addWidget(card)
+
+
+def _estado(estado: str | None) -> str:
+    st = (estado or "optimo").lower()
+    return st if st in ("defectuoso", "inoperativo") else "optimo"
+
+
+def _pie_estados(counts) -> list:
+    return [
+        ("Óptimos", counts["optimo"], QColor("#22C55E")),
+        ("Defectuosos", counts["defectuoso"], QColor("#F97316")),
+        ("Inoperativos", counts["inoperativo"], QColor("#EF4444")),
+    ]
+
+
+def _clasificar(registros: list[MantenimientoRow]) -> str | None:
+    """Evolución de un equipo según su historial (Lógica Original): "mejora", "agravado" o None."""
+    if not registros:
+        return None
+    registros = sorted(registros, key=lambda m: m.fecha or date.today())
+    rank = {"optimo": 2, "defectuoso": 1, "inoperativo": 0}
+
+    estados = [(m.estado_equipo or "").lower() for m in registros if (m.estado_equipo or "").strip()]
+    if not estados:
+        return None
+
+    first_state = estados[0] if estados[0] in rank else "optimo"
+    last_state = estados[-1] if estados[-1] in rank else first_state
+
+    prev_estado: str | None = None
+    mejoro = False
+    empeoro = False
+    had_optimo = False
+    had_worse = False
+    last_improve_date: date | None = None
+
+    for m, est in zip(registros, estados):
+        est_norm = est if est in rank else "optimo"
+        if est_norm == "optimo":
+            had_optimo = True
+        if est_norm in {"defectuoso", "inoperativo"}:
+            had_worse = True
+
+        if prev_estado is not None:
+            if prev_estado in {"defectuoso", "inoperativo"} and est_norm == "optimo":
+                mejoro = True
+                last_improve_date = m.fecha or date.today()
+            if prev_estado == "optimo" and est_norm in {"defectuoso", "inoperativo"}:
+                empeoro = True
+        prev_estado = est_norm
+
+    if mejoro and last_improve_date is not None:
+        if (date.today() - last_improve_date).days <= 14:
+            return "mejora"
+    if (
+        rank.get(last_state, 2) < rank.get(first_state, 2)
+        or empeoro
+        or (had_worse and not had_optimo)
+    ):
+        return "agravado"
+    return None
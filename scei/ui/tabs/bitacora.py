@@ -1,16 +1,19 @@
 
 from datetime import datetime, timedelta
 from PyQt6.QtWidgets import (
-    QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QTableWidget, QTableWidgetItem,
-    QHeaderView, QPushButton, QLabel, QMessageBox, QFileDialog, QDialog
+    QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QTableWidget,
+    QHeaderView, QPushButton, QLabel, QMessageBox, QFileDialog, QDialog, QApplication
 )
-from PyQt6.QtCore import Qt, QSettings, QTimer
+from PyQt6.QtCore import Qt, QSettings
 
-from ...utils import load_icon, export_table_to_excel, NumericTableWidgetItem
+from ...utils import load_icon, export_table_to_excel, SortKeyItem, number_rows
+from ...data.normalize import fold
 from ...logger import LOGS, add_log, save_logs # Kept for compat, but we will use DB mainly now
-from ...config import BITACORA_CLEAN_INTERVAL_DAYS
-from ..dialogs import RecordDetailDialog, AdminAuthDialog
-from ...data.repositories import list_bitacora_entries, add_bitacora_log, get_user
+from ...config import BITACORA_CLEAN_INTERVAL_DAYS, BITACORA_RETENTION_DAYS
+from ..dialogs import RecordDetailDialog, AdminAuthDialog, BitacoraArchivoDialog
+from ...data.repositories import (
+    list_bitacora_entries, add_bitacora_log, get_user, register_documento, archive_old_bitacora, REMOTE
+)
 from ... import session
 
 class BitacoraTab(QWidget):
@@ -42,6 +45,7 @@ class BitacoraTab(QWidget):
         btn_word.setIcon(load_icon("word.svg"))
         btn_excel = QPushButton("Exportar Excel")
         btn_excel.setIcon(load_icon("excel.svg"))
+        btn_archive = QPushButton("Consultar Archivo")
         
         self.btn_clear = QPushButton("Limpiar Historial")
         self.btn_clear.setEnabled(False)
@@ -50,7 +54,7 @@ class BitacoraTab(QWidget):
         self.btn_clear.setCursor(Qt.CursorShape.PointingHandCursor)
         self.btn_clear.setStyleSheet("QPushButton { color: #EF4444; border: 1px solid rgba(239, 68, 68, 0.3); } QPushButton:hover { background: rgba(239, 68, 68, 0.1); border: 1px solid rgba(239, 68, 68, 0.8); }")
 
-        for b in (btn_pdf, btn_word, btn_excel):
+        for b in (btn_pdf, btn_word, btn_excel, btn_archive):
             b.setProperty("class", "panel-accent")
             b.setMinimumHeight(42) # Botones más altos
             b.setCursor(Qt.CursorShape.PointingHandCursor)
@@ -98,19 +102,18 @@ class BitacoraTab(QWidget):
         table_l = QVBoxLayout(table_card)
         table_l.setContentsMargins(0, 0, 0, 0) # La tabla llena la tarjeta, padding en celdas
         
-        self.table = QTableWidget(0, 5)
-        self.table = QTableWidget(0, 5)
-        self.table.setHorizontalHeaderLabels(["N°", "Fecha", "Usuario", "Acción", "Descripción"])
+        self.table = QTableWidget(0, 4)
+        self.table.setHorizontalHeaderLabels(["Fecha", "Usuario", "Acción", "Descripción"])
         self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
         self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
         self.table.setShowGrid(False) # Estilo premium
-        self.table.verticalHeader().setVisible(False)
+        number_rows(self.table)
         self.table.setFrameShape(QTableWidget.Shape.NoFrame)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         # Ajustar anchos específicos
-        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents) # N°
-        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.ResizeToContents) # Fecha
-        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.ResizeToContents) # Usuario
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents) # Fecha
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.ResizeToContents) # Usuario
+        self.table.setSortingEnabled(True)
         
         table_l.addWidget(self.table)
         right_layout.addWidget(table_card, 1)
@@ -122,59 +125,44 @@ class BitacoraTab(QWidget):
         btn_pdf.clicked.connect(self.generar_pdf)
         btn_word.clicked.connect(self.generar_word)
         btn_excel.clicked.connect(self.generar_excel)
+        btn_archive.clicked.connect(self.show_archive)
+        if REMOTE:
+            # El archivo mensual está junto a la BD, en el equipo del servidor
+            btn_archive.setEnabled(False)
+            btn_archive.setToolTip("Disponible solo en el equipo del servidor de repositorios.")
         self.btn_clear.clicked.connect(self.on_clear)
         self.table.itemDoubleClicked.connect(self.show_detail)
-        # Auto-renumerar al ordenar
-        self.table.horizontalHeader().sectionClicked.connect(self.schedule_renumber)
-        self.table.horizontalHeader().sortIndicatorChanged.connect(self.schedule_renumber)
 
         self.refresh()
 
-    def schedule_renumber(self):
-        QTimer.singleShot(50, self.update_row_numbers)
-
-    def update_row_numbers(self):
-        if self.table.model(): self.table.model().blockSignals(True)
-        for r in range(self.table.rowCount()):
-            item = self.table.item(r, 0)
-            if not item:
-                item = NumericTableWidgetItem(str(r + 1))
-                self.table.setItem(r, 0, item)
-            else:
-                item.setText(str(r + 1))
-            item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-        if self.table.model(): self.table.model().blockSignals(False)
-
     def refresh(self):
         self._update_clear_button()
+        self.table.setSortingEnabled(False)
         self.table.setRowCount(0)
         
         # Load from DB instead of memory LOGS
         logs_db = list_bitacora_entries(limit=100) # Limit logic or pagination ideally
         
-        term = self.search.text().strip().lower()
+        term = fold(self.search.text().strip())
         for log in logs_db:
             username = log.usuario.username if log.usuario else "Sistema"
             if term:
-                text = f"{log.fecha} {log.accion} {log.descripcion} {username}".lower()
+                text = fold(f"{log.fecha} {log.accion} {log.descripcion} {username}")
                 if term not in text:
                     continue
             
             r = self.table.rowCount()
             self.table.insertRow(r)
-            item_n = NumericTableWidgetItem(str(r + 1))
-            item_n.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.table.setItem(r, 0, item_n)
             
             # Format date friendly
             d_str = log.fecha.strftime("%Y-%m-%d %H:%M") if log.fecha else ""
             
-            self.table.setItem(r, 1, QTableWidgetItem(d_str))
-            self.table.setItem(r, 2, QTableWidgetItem(username))
-            self.table.setItem(r, 3, QTableWidgetItem(log.accion))
-            self.table.setItem(r, 4, QTableWidgetItem(log.descripcion))
+            self.table.setItem(r, 0, SortKeyItem(d_str, log.fecha or datetime.min))
+            self.table.setItem(r, 1, SortKeyItem(username))
+            self.table.setItem(r, 2, SortKeyItem(log.accion))
+            self.table.setItem(r, 3, SortKeyItem(log.descripcion))
         
-        self.update_row_numbers()
+        self.table.setSortingEnabled(True)
 
     def show_detail(self):
         r = self.table.currentRow()
@@ -182,10 +170,10 @@ class BitacoraTab(QWidget):
             return
         get = lambda c: (self.table.item(r, c).text() if self.table.item(r, c) else "")
         details = [
-            ("Fecha", get(1)),
-            ("Usuario", get(2)),
-            ("Acción", get(3)),
-            ("Descripción", get(4)),
+            ("Fecha", get(0)),
+            ("Usuario", get(1)),
+            ("Acción", get(2)),
+            ("Descripción", get(3)),
         ]
         RecordDetailDialog("Detalle de Bitácora", details).exec()
 
@@ -215,6 +203,11 @@ class BitacoraTab(QWidget):
         return int(((interval - delta).total_seconds() + 86399) // 86400)
 
     def _update_clear_button(self):
+        if REMOTE:
+            # La depuración archiva y borra sobre el archivo SQLite local, no el del servidor
+            self.btn_clear.setEnabled(False)
+            self.btn_clear.setToolTip("Disponible solo en el equipo del servidor de repositorios.")
+            return
         due = self._is_cleanup_due()
         self.btn_clear.setEnabled(due)
         if due:
@@ -223,6 +216,8 @@ class BitacoraTab(QWidget):
             self.btn_clear.setToolTip(f"Disponible en {self._days_until_cleanup()} días.")
 
     def on_clear(self):
+        if REMOTE:
+            return
         # Restriction: Only Admin or Authed
         if session.CURRENT_USER != "DI-ADMIN":
              auth = AdminAuthDialog(self, "Se requieren permisos de administrador para limpiar el historial.")
@@ -231,23 +226,38 @@ class BitacoraTab(QWidget):
 
         if not self._is_cleanup_due():
             return
-        if QMessageBox.question(self, "Confirmar", "¿Eliminar todos los registros?", 
+        msg = (f"¿Archivar y eliminar los registros con más de {BITACORA_RETENTION_DAYS} días?\n"
+               "Podrán consultarse luego desde 'Consultar Archivo'.")
+        if QMessageBox.question(self, "Confirmar", msg,
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No) == QMessageBox.StandardButton.Yes:
+            QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+            try:
+                moved = archive_old_bitacora(BITACORA_RETENTION_DAYS)
+            except Exception as e:
+                QApplication.restoreOverrideCursor()
+                QMessageBox.critical(self, "Error", f"No se pudo depurar la bitácora:\n{e}")
+                return
+            QApplication.restoreOverrideCursor()
+
             global LOGS
             LOGS.clear()
             save_logs()
             self.settings.setValue("bitacora_last_cleanup", datetime.now().isoformat())
             self.settings.sync()
-            add_log("Limpiar Bitácora", "Reinicio mensual")
+            add_log("Limpiar Bitácora", f"Registros archivados: {moved}")
             
             # Bitacora DB
             try:
                 u_obj = get_user(session.CURRENT_USER)
                 if u_obj:
-                    add_bitacora_log(u_obj.id, "Limpiar Historial", "Se realizó limpieza de registros", "Bitacora")
+                    add_bitacora_log(u_obj.id, "Limpiar Historial", f"Se archivaron {moved} registros con más de {BITACORA_RETENTION_DAYS} días", "Bitacora")
             except: pass
             
             self.refresh()
+            QMessageBox.information(self, "Bitácora", f"Se archivaron {moved} registros.")
+
+    def show_archive(self):
+        BitacoraArchivoDialog(self).exec()
 
     # --- Generación de Reportes (Simplificada) ---
     def generar_pdf(self):
@@ -263,7 +273,7 @@ class BitacoraTab(QWidget):
         # Export logic should probably fetch fresh data too, but for simplicity using table dump
         for r in range(self.table.rowCount()):
              get = lambda c: (self.table.item(r, c).text() if self.table.item(r, c) else "")
-             html += f"<tr><td>{get(1)}</td><td>{get(2)}</td><td>{get(3)}</td><td>{get(4)}</td></tr>"
+             html += f"<tr><td>{get(0)}</td><td>{get(1)}</td><td>{get(2)}</td><td>{get(3)}</td></tr>"
         html += "</table></body></html>"
         doc = QTextDocument(); doc.setHtml(html)
         printer = QPrinter(); printer.setOutputFormat(QPrinter.OutputFormat.PdfFormat)
@@ -273,6 +283,11 @@ class BitacoraTab(QWidget):
             doc.print(printer)
             add_log("Generar PDF Bitácora", f"{fn}")
             
+            # Registro de documentos generados
+            try:
+                register_documento(fn, "PDF Bitácora", None)
+            except: pass
+            
             # Bitacora DB
             try:
                 u_obj = get_user(session.CURRENT_USER)
@@ -302,15 +317,20 @@ class BitacoraTab(QWidget):
         for r in range(self.table.rowCount()):
             row = table.add_row().cells
             get = lambda c: (self.table.item(r, c).text() if self.table.item(r, c) else "")
-            row[0].text = get(1)
-            row[1].text = get(2)
-            row[2].text = get(3)
-            row[3].text = get(4)
+            row[0].text = get(0)
+            row[1].text = get(1)
+            row[2].text = get(2)
+            row[3].text = get(3)
         fn, _ = QFileDialog.getSaveFileName(self, "Word", "bitacora.docx", "Word (*.docx)")
         if fn:
             doc.save(fn)
             add_log("Generar Word Bitácora", f"{fn}")
             
+            # Registro de documentos generados
+            try:
+                register_documento(fn, "Word Bitácora", None)
+            except: pass
+            
             # Bitacora DB
             try:
                 u_obj = get_user(session.CURRENT_USER)
@@ -330,9 +350,14 @@ class BitacoraTab(QWidget):
         # Use existing utility just by passing the main table
         fn, _ = QFileDialog.getSaveFileName(self, "Excel", "bitacora.xlsx", "Excel (*.xlsx)")
         if fn:
-            export_table_to_excel(self.table, fn)
+            export_table_to_excel(self.table, fn, row_numbers=True)
             add_log("Generar Excel Bitácora", f"{fn}")
             
+            # Registro de documentos generados
+            try:
+                register_documento(fn, "Excel Bitácora", None)
+            except: pass
+            
             # Bitacora DB
             try:
                 u_obj = get_user(session.CURRENT_USER)
@@ -2,14 +2,24 @@
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, 
     QMessageBox, QFrame, QTableWidget, QTableWidgetItem, QHeaderView, QDialog,
-    QScrollArea, QSizePolicy
+    QScrollArea, QSizePolicy, QInputDialog, QApplication, QFileDialog
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QObject, QThread, pyqtSignal
 from ... import session
 from ...utils import load_icon, validate_password_strength
-from ...data.repositories import get_user, update_user_profile, delete_user, list_users_full, add_bitacora_log
+from ...data.repositories import get_user, update_user_profile, delete_user, list_users_full, add_bitacora_log, REMOTE
 from ..dialogs import AdminAuthDialog, UserEditDialog
-from ..biometrics import FaceCaptureDialog
+
+class _SnapshotWorker(QObject):
+    """Crea el respaldo fuera del hilo de la interfaz."""
+    finished = pyqtSignal(str, str)
+
+    def run(self):
+        from ...data.backup import create_snapshot
+        try:
+            self.finished.emit(str(create_snapshot()), "")
+        except Exception as e:
+            self.finished.emit("", str(e))
 
 class ConfigTab(QWidget):
     def __init__(self):
@@ -359,6 +369,90 @@ class ConfigTab(QWidget):
         btn_layout.addWidget(self.btn_edit_user)
         btn_layout.addWidget(self.btn_del_user)
         admin_layout.addLayout(btn_layout)
+
+        # --- Respaldo de Base de Datos ---
+        lbl_backup = QLabel("Respaldo de Base de Datos")
+        lbl_backup.setStyleSheet("font-weight: 600; color: #E2E8F0; margin-top: 8px;")
+        admin_layout.addWidget(lbl_backup)
+
+        self.lbl_backup_info = QLabel("")
+        self.lbl_backup_info.setProperty("role", "subtitle")
+        self.lbl_backup_info.setWordWrap(True)
+        admin_layout.addWidget(self.lbl_backup_info)
+
+        backup_btns = QHBoxLayout()
+        backup_btns.setSpacing(12)
+
+        self.btn_backup = QPushButton("Crear Respaldo")
+        self.btn_backup.setMinimumHeight(38)
+        self.btn_backup.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.btn_backup.setProperty("class", "secondary")
+        self.btn_backup.clicked.connect(self.on_backup_now)
+
+        self.btn_restore = QPushButton("Restaurar Respaldo")
+        self.btn_restore.setMinimumHeight(38)
+        self.btn_restore.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.btn_restore.setProperty("class", "warning")
+        self.btn_restore.clicked.connect(self.on_restore_backup)
+
+        backup_btns.addWidget(self.btn_backup)
+        backup_btns.addWidget(self.btn_restore)
+        admin_layout.addLayout(backup_btns)
+        self._backup_thread = None
+        if REMOTE:
+            # Los respaldos copian el archivo local: con servidor la BD vive en otro equipo
+            for b in (self.btn_backup, self.btn_restore):
+                b.setEnabled(False)
+                b.setToolTip("Disponible solo en el equipo del servidor de repositorios.")
+
+        # --- Diagnóstico SQL ---
+        lbl_diag = QLabel("Diagnóstico SQL")
+        lbl_diag.setStyleSheet("font-weight: 600; color: #E2E8F0; margin-top: 8px;")
+        admin_layout.addWidget(lbl_diag)
+
+        self.lbl_diag_info = QLabel("")
+        self.lbl_diag_info.setProperty("role", "subtitle")
+        self.lbl_diag_info.setWordWrap(True)
+        admin_layout.addWidget(self.lbl_diag_info)
+
+        self.diag_table = QTableWidget(0, 6)
+        self.diag_table.setHorizontalHeaderLabels(["Acción", "Ejec.", "Consultas", "Total ms", "p95 ms", "N+1"])
+        self.diag_table.verticalHeader().setVisible(False)
+        self.diag_table.setShowGrid(False)
+        self.diag_table.setFrameShape(QFrame.Shape.NoFrame)
+        self.diag_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.diag_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.diag_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.diag_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.diag_table.setMinimumHeight(180)
+        self.diag_table.setProperty("class", "premium-table")
+        admin_layout.addWidget(self.diag_table)
+
+        diag_btns = QHBoxLayout()
+        diag_btns.setSpacing(12)
+
+        self.btn_diag_refresh = QPushButton("Actualizar")
+        self.btn_diag_refresh.setMinimumHeight(38)
+        self.btn_diag_refresh.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.btn_diag_refresh.setProperty("class", "secondary")
+        self.btn_diag_refresh.clicked.connect(self.update_sql_diagnostics)
+
+        self.btn_diag_export = QPushButton("Exportar JSON")
+        self.btn_diag_export.setMinimumHeight(38)
+        self.btn_diag_export.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.btn_diag_export.setProperty("class", "primary")
+        self.btn_diag_export.clicked.connect(self.on_export_sql_stats)
+
+        self.btn_diag_reset = QPushButton("Reiniciar")
+        self.btn_diag_reset.setMinimumHeight(38)
+        self.btn_diag_reset.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.btn_diag_reset.setProperty("class", "warning")
+        self.btn_diag_reset.clicked.connect(self.on_reset_sql_stats)
+
+        diag_btns.addWidget(self.btn_diag_refresh)
+        diag_btns.addWidget(self.btn_diag_export)
+        diag_btns.addWidget(self.btn_diag_reset)
+        admin_layout.addLayout(diag_btns)
         
         cards_layout.addWidget(self.admin_card)
         cards_layout.addStretch(1) # Trailing stretch for centering both
@@ -406,6 +500,8 @@ class ConfigTab(QWidget):
         if is_admin:
             self.admin_card.setVisible(True)
             self.load_users()
+            self.update_backup_info()
+            self.update_sql_diagnostics()
         else:
             self.admin_card.setVisible(False)
 
@@ -485,6 +581,7 @@ class ConfigTab(QWidget):
     def on_config_bio(self):
         u = get_user(session.CURRENT_USER)
         if not u: return
+        from ..biometrics import FaceCaptureDialog
         dlg = FaceCaptureDialog(u.id, self)
         if dlg.exec() == QDialog.DialogCode.Accepted:
              try: add_bitacora_log(u.id, "Registro Facial", "Se configuraron datos biométricos", "Seguridad")
@@ -494,7 +591,7 @@ class ConfigTab(QWidget):
         u = get_user(session.CURRENT_USER)
         if not u: return
         
-        if not u.face_data:
+        if not u.face_hash:
             QMessageBox.information(self, "Biometría", "No tienes datos biométricos configurados.")
             return
 
@@ -592,3 +689,128 @@ class ConfigTab(QWidget):
                 self.load_users()
             else:
                 QMessageBox.critical(self, "Error", "No se pudo eliminar el usuario.")
+
+    # --- Respaldos ---
+    def update_backup_info(self):
+        if REMOTE:
+            self.lbl_backup_info.setText("Conectado al servidor de repositorios: los respaldos se hacen en el servidor.")
+            return
+        from ...data.backup import list_snapshots
+        snaps = list_snapshots()
+        if snaps:
+            self.lbl_backup_info.setText(
+                f"Último respaldo: {snaps[0][1].strftime('%Y-%m-%d %H:%M')} ({len(snaps)} disponibles)")
+        else:
+            self.lbl_backup_info.setText("Aún no hay respaldos.")
+
+    def on_backup_now(self):
+        if REMOTE or self._backup_thread is not None:
+            return
+        self.btn_backup.setEnabled(False)
+        self.btn_backup.setText("Respaldando...")
+        self._backup_thread = QThread(self)
+        self._backup_worker = _SnapshotWorker()
+        self._backup_worker.moveToThread(self._backup_thread)
+        self._backup_thread.started.connect(self._backup_worker.run)
+        self._backup_worker.finished.connect(self._on_backup_finished)
+        self._backup_thread.start()
+
+    def _on_backup_finished(self, path: str, error: str):
+        self._backup_thread.quit()
+        self._backup_thread.wait()
+        self._backup_thread = None
+        self.btn_backup.setEnabled(True)
+        self.btn_backup.setText("Crear Respaldo")
+        self.update_backup_info()
+        if error:
+            QMessageBox.critical(self, "Respaldo", f"No se pudo crear el respaldo:\n{error}")
+            return
+        try:
+            u = get_user(session.CURRENT_USER)
+            add_bitacora_log(u.id if u else None, "Respaldo BD", f"Archivo: {path}", "Seguridad")
+        except: pass
+        QMessageBox.information(self, "Respaldo", f"Respaldo verificado y guardado en:\n{path}")
+
+    def on_restore_backup(self):
+        if REMOTE:
+            return
+        from ...data.backup import list_snapshots, restore_snapshot
+        snaps = list_snapshots()
+        if not snaps:
+            QMessageBox.information(self, "Restaurar", "No hay respaldos disponibles.")
+            return
+        labels = [f"{ts.strftime('%Y-%m-%d %H:%M:%S')}  —  {p.name}" for p, ts in snaps]
+        choice, ok = QInputDialog.getItem(self, "Restaurar Respaldo", "Seleccione el respaldo:", labels, 0, False)
+        if not ok:
+            return
+        path = snaps[labels.index(choice)][0]
+
+        auth = AdminAuthDialog(self, "Restaurar reemplaza todos los datos actuales. Confirme con la contraseña de administrador.")
+        if auth.exec() != QDialog.DialogCode.Accepted:
+            return
+
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            safety = restore_snapshot(path)
+            from ...bootstrap import run_bootstrap
+            run_bootstrap(force=True)
+        except Exception as e:
+            QApplication.restoreOverrideCursor()
+            QMessageBox.critical(self, "Restaurar", f"No se pudo restaurar el respaldo:\n{e}")
+            return
+        QApplication.restoreOverrideCursor()
+        try:
+            u = get_user(session.CURRENT_USER)
+            add_bitacora_log(u.id if u else None, "Restaurar BD", f"Desde: {path.name}", "Seguridad")
+        except: pass
+        self.update_backup_info()
+        extra = f"\nSe guardó el estado anterior en:\n{safety}" if safety else ""
+        QMessageBox.information(self, "Restaurar",
+            f"Respaldo restaurado correctamente.{extra}\n\nReinicie la aplicación para recargar todos los módulos.")
+
+    # --- Diagnóstico SQL ---
+    def update_sql_diagnostics(self):
+        from ...data.instrumentation import stats, NO_ACTION
+        snap = stats.snapshot(top=3)
+        acciones = snap["acciones"]
+        n_plus_one = [name for name, a in acciones.items() if a["n_mas_uno"]]
+        info = f"Desde {snap['desde'].replace('T', ' ')}: {sum(a['consultas'] for a in acciones.values())} consultas."
+        if n_plus_one:
+            info += f" Posible N+1 en: {', '.join(n_plus_one)}."
+        if set(acciones) <= {NO_ACTION}:
+            info += " Inicie con SCEI_PROFILE_UI=1 para desglosarlas por acción de pantalla."
+        self.lbl_diag_info.setText(info)
+
+        self.diag_table.setRowCount(0)
+        for name, a in acciones.items():
+            r = self.diag_table.rowCount()
+            self.diag_table.insertRow(r)
+            peor = a["n_mas_uno"][0] if a["n_mas_uno"] else None
+            values = [
+                name, str(a["ejecuciones"]), str(a["consultas"]),
+                f"{a['total_ms']:.1f}", f"{a['p95_consulta_ms']:.2f}",
+                f"{peor['repeticiones_por_ejecucion']}x" if peor else "",
+            ]
+            # La sentencia repetida (o la más frecuente) como ayuda contextual
+            top_sql = peor["sql"] if peor else (a["sentencias"][0]["sql"] if a["sentencias"] else "")
+            for c, v in enumerate(values):
+                item = QTableWidgetItem(v)
+                item.setToolTip(top_sql)
+                self.diag_table.setItem(r, c, item)
+
+    def on_export_sql_stats(self):
+        from ...data.instrumentation import stats
+        path, _ = QFileDialog.getSaveFileName(self, "Exportar diagnóstico SQL", "diagnostico_sql.json", "JSON (*.json)")
+        if not path:
+            return
+        try:
+            stats.export_json(path)
+        except Exception as e:
+            QMessageBox.critical(self, "Diagnóstico SQL", f"No se pudo exportar:\n{e}")
+            return
+        QMessageBox.information(self, "Diagnóstico SQL", f"Diagnóstico guardado en:\n{path}")
+
+    def on_reset_sql_stats(self):
+        from ...data.instrumentation import stats
+        stats.reset()
+        self.update_sql_diagnostics()
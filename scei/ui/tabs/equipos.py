@@ -5,18 +5,21 @@ from PyQt6.QtWidgets import (
     QTableWidget, QTableWidgetItem, QHeaderView, QComboBox, QDateEdit,
     QMenu, QFileDialog, QMessageBox, QDialog
 )
-from PyQt6.QtCore import Qt, QDate, QTimer
+from PyQt6.QtCore import Qt, QDate
 
-from ...utils import load_icon, export_table_to_excel, NumericTableWidgetItem
+from ...utils import load_icon, export_table_to_excel, SortKeyItem, natural_key, number_rows
 from ...logger import add_log
 from ... import session
 from ..helpers import direccion_nombre
 from ..dialogs import GenerateDialog, EquipoDialog, RecordDetailDialog, AdminAuthDialog
 from ...data.repositories import (
-    list_direcciones, list_equipos, list_equipos_by_direccion, 
+    list_direcciones, list_equipo_rows, get_equipo_rows,
     add_equipo, update_equipo, delete_equipo, get_equipo,
-    add_bitacora_log, get_user
+    add_bitacora_log, get_user, register_documento, ConflictError
 )
+from ...data.events import ChangeEvent, UPDATE, DELETE
+from ...data.normalize import fold
+from ..changes import change_notifier
 from sqlalchemy.exc import IntegrityError
 
 class EquiposTab(QWidget):
@@ -25,16 +28,15 @@ class EquiposTab(QWidget):
         # Departamento eliminado del modelo; ignoramos cualquier valor entrante
         self.departamento_filter = None
         self.direccion_filter = direccion_id
-        self.table = QTableWidget(0, 7)
+        self.table = QTableWidget(0, 6)
         self.table.setHorizontalHeaderLabels([
-            "N°", "Código","Descripción","Marca","Modelo","Serie","Estado"
+            "Código","Descripción","Marca","Modelo","Serie","Estado"
         ])
         self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
         self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
         self.table.setAlternatingRowColors(True)
         self.table.setShowGrid(False)  # Desactivar grid nativo para estilo CSS premium
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents) # Columna N° ajustada
         self.table.setSortingEnabled(True)
         self.search = QLineEdit(); self.search.setPlaceholderText("Buscar por código/desc/modelo/serie…")
         self.codigo = QLineEdit()
@@ -139,7 +141,7 @@ class EquiposTab(QWidget):
         
         # Tabla Config
         self.table.setShowGrid(False)
-        self.table.verticalHeader().setVisible(False)
+        number_rows(self.table)
         self.table.setFrameShape(QTableWidget.Shape.NoFrame)
         
         table_l.addWidget(self.table)
@@ -156,33 +158,9 @@ class EquiposTab(QWidget):
         # Context menu para generar desde selección
         self.table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.table.customContextMenuRequested.connect(self.on_table_context_menu)
-        
-        # Auto-renumerar al ordenar (usando Timer para asegurar que ocurra post-sort)
-        # layoutChanged a veces no se dispara en sorting simple de QTableWidget o es tricky
-        self.table.horizontalHeader().sectionClicked.connect(self.schedule_renumber)
-        self.table.horizontalHeader().sortIndicatorChanged.connect(self.schedule_renumber)
-
-    def schedule_renumber(self):
-        QTimer.singleShot(50, self.update_row_numbers)
-
-    def update_row_numbers(self):
-        # Bloquear señales del MODELO para evitar trigger de layoutChanged/dataChanged recursivo
-        if self.table.model():
-            self.table.model().blockSignals(True)
-        
-        for r in range(self.table.rowCount()):
-            item = self.table.item(r, 0)
-            if not item:
-                item = NumericTableWidgetItem(str(r + 1))
-                self.table.setItem(r, 0, item)
-            else:
-                # Asegurar que sea NumericTableWidgetItem si ya existía (o actualizar texto)
-                item.setText(str(r + 1))
-                
-            item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            
-        if self.table.model():
-            self.table.model().blockSignals(False)
+
+        # Altas, ediciones y bajas (de esta u otra vista) llegan como eventos
+        change_notifier().changed.connect(self.on_data_changed)
 
     def refresh_refs(self):
         self.dir.clear()
@@ -198,46 +176,104 @@ class EquiposTab(QWidget):
             self.dir.setEnabled(False)
         self._update_header()
 
+    def _matches(self, e, term: str) -> bool:
+        # Subcadena sobre todas las columnas (marca, estado, dirección...) de filas que la
+        # tabla ya cargó: no cuesta consultas. Los índices *_norm solo sirven prefijos de
+        # código/serie/descripción; los usa el selector de equipos (pickers.py)
+        if self.direccion_filter and e.direccion_id != self.direccion_filter:
+            return False
+        if not term:
+            return True
+        text_blob = " ".join([
+            e.codigo_interno or "",
+            e.descripcion or "",
+            e.marca or "",
+            e.modelo or "",
+            e.nro_serie or "",
+            e.estado or "",
+            e.direccion_nombre,
+        ])
+        return term in fold(text_blob)
+
+    def _fill_row(self, r, e):
+        cells = (
+            (e.codigo_interno, natural_key(e.codigo_interno)),
+            (e.descripcion, None),
+            (e.marca, None),
+            (e.modelo, None),
+            (e.nro_serie, natural_key(e.nro_serie)),
+            (e.estado, None),
+        )
+        for c, (text, key) in enumerate(cells):
+            item = self.table.item(r, c)
+            if item is None:
+                item = SortKeyItem(text or "", key)
+                self.table.setItem(r, c, item)
+            else:
+                item.set_value(text or "", key)
+        # La columna Código guarda el ID
+        item = self.table.item(r, 0)
+        if e.id not in self._items:
+            item.setData(Qt.ItemDataRole.UserRole, e.id)
+            self._items[e.id] = item
+
     def refresh(self):
-        if self.direccion_filter:
-            data = list_equipos_by_direccion(self.direccion_filter)
-        else:
-            data = list_equipos()
+        data = list_equipo_rows(self.direccion_filter)
         # Evitar glitches con ordenamiento al insertar filas
         was_sorting = self.table.isSortingEnabled()
         if was_sorting:
             self.table.setSortingEnabled(False)
         self.table.setRowCount(0)
-        term = self.search.text().strip().lower()
+        self._items = {}
+        term = fold(self.search.text().strip())
         for e in data:
-            dir_name = direccion_nombre(getattr(e, 'direccion_id', None)) or ""
-            text_blob = " ".join([
-                e.codigo_interno or "",
-                e.descripcion or "",
-                e.marca or "",
-                e.modelo or "",
-                e.nro_serie or "",
-                e.estado or "",
-                dir_name,
-            ]).lower()
-            if term and term not in text_blob:
+            if not self._matches(e, term):
                 continue
             r = self.table.rowCount()
             self.table.insertRow(r)
-            # Columna N°
-            item_n = NumericTableWidgetItem(str(r + 1))
-            item_n.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.table.setItem(r, 0, item_n)
-            self.table.setItem(r, 1, QTableWidgetItem(e.codigo_interno or ""))
-            self.table.setItem(r, 2, QTableWidgetItem(e.descripcion or ""))
-            self.table.setItem(r, 3, QTableWidgetItem(e.marca or ""))
-            self.table.setItem(r, 4, QTableWidgetItem(e.modelo or ""))
-            self.table.setItem(r, 5, QTableWidgetItem(e.nro_serie or ""))
-            self.table.setItem(r, 6, QTableWidgetItem(e.estado or ""))
+            self._fill_row(r, e)
         if was_sorting:
             self.table.setSortingEnabled(True)
-        # Forzar renumeración final para asegurar orden 1..N
-        self.update_row_numbers()
+
+    def on_data_changed(self, event):
+        """Parcha solo las filas de los equipos afectados."""
+        if event.entity == "direccion":
+            self.refresh_refs()
+            return
+        if event.entity != "equipo":
+            return
+        if not event.ids:
+            self.refresh()
+            return
+        was_sorting = self.table.isSortingEnabled()
+        if was_sorting:
+            self.table.setSortingEnabled(False)
+        if event.op == DELETE:
+            for id_ in event.ids:
+                self._remove_row(id_)
+        else:
+            term = fold(self.search.text().strip())
+            for e in get_equipo_rows(event.ids):
+                item = self._items.get(e.id)
+                if not self._matches(e, term):
+                    self._remove_row(e.id)
+                elif item is not None:
+                    self._fill_row(item.row(), e)
+                else:
+                    # Los más nuevos primero, como en el listado completo
+                    self.table.insertRow(0)
+                    self._fill_row(0, e)
+        if was_sorting:
+            self.table.setSortingEnabled(True)
+
+    def _remove_row(self, id_) -> None:
+        item = self._items.pop(id_, None)
+        if item is not None:
+            self.table.removeRow(item.row())
+
+    def row_of(self, id_) -> int:
+        item = self._items.get(id_)
+        return item.row() if item is not None else -1
 
     def on_generate(self):
         # Solo usuarios NO administradores deben solicitar permisos extra
@@ -252,9 +288,9 @@ class EquiposTab(QWidget):
             return
         vals = dlg.values()
         # Build filtered dataset
-        data = list_equipos_by_direccion(self.direccion_filter) if self.direccion_filter else list_equipos()
+        data = list_equipo_rows(self.direccion_filter)
         def ok(s, sub):
-            return (not sub) or (sub.lower() in (s or '').lower())
+            return (not sub) or (fold(sub) in fold(s))
         filtered = []
         for e in data:
             if not ok(e.codigo_interno, vals.get('codigo')): continue
@@ -298,17 +334,14 @@ class EquiposTab(QWidget):
         action = menu.exec(self.table.viewport().mapToGlobal(pos))
         if action is None:
             return
-        # Recoger selección
-        selected = []
-        data = list_equipos_by_direccion(self.direccion_filter) if self.direccion_filter else list_equipos()
-        selected_codes = set()
-        for idx in self.table.selectionModel().selectedRows(0):
-            it = self.table.item(idx.row(), 1)
-            if it:
-                selected_codes.add(it.text())
-        for e in data:
-            if e.codigo_interno in selected_codes:
-                selected.append(e)
+        # Recoger selección por id (columna 0, UserRole), en el orden de la tabla
+        ids = []
+        for idx in sorted(self.table.selectionModel().selectedRows(0), key=lambda i: i.row()):
+            it = self.table.item(idx.row(), 0)
+            if it and it.data(Qt.ItemDataRole.UserRole) is not None:
+                ids.append(it.data(Qt.ItemDataRole.UserRole))
+        by_id = {e.id: e for e in get_equipo_rows(ids)} if ids else {}
+        selected = [by_id[i] for i in ids if i in by_id]
         if action == act_view:
             if not selected:
                 return
@@ -364,7 +397,7 @@ class EquiposTab(QWidget):
         from PyQt6.QtPrintSupport import QPrinter
         from PyQt6.QtGui import QTextDocument
         if data is None:
-            data = list_equipos_by_direccion(self.direccion_filter) if self.direccion_filter else list_equipos()
+            data = list_equipo_rows(self.direccion_filter)
         from datetime import datetime
         fecha_gen = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         html = f"""
@@ -408,6 +441,11 @@ class EquiposTab(QWidget):
             dir_name = direccion_nombre(self.direccion_filter)
             add_log("Generar PDF Equipos", f"Archivo: {fn}", dir_name)
             
+            # Registro de documentos generados
+            try:
+                register_documento(fn, "PDF Equipos", dir_name)
+            except: pass
+            
             # Bitacora DB
             try:
                 u_obj = get_user(session.CURRENT_USER)
@@ -429,7 +467,7 @@ class EquiposTab(QWidget):
             QMessageBox.warning(self, "Librería faltante", "Instala python-docx: pip install python-docx")
             return
         if data is None:
-            data = list_equipos_by_direccion(self.direccion_filter) if self.direccion_filter else list_equipos()
+            data = list_equipo_rows(self.direccion_filter)
         from datetime import datetime
         fecha_gen = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         doc = Document(); style = doc.styles['Normal']; style.font.name = 'Segoe UI'; style.font.size = Pt(10.5)
@@ -462,6 +500,11 @@ class EquiposTab(QWidget):
             dir_name = direccion_nombre(self.direccion_filter)
             add_log("Generar Word Equipos", f"Archivo: {fn}", dir_name)
             
+            # Registro de documentos generados
+            try:
+                register_documento(fn, "Word Equipos", dir_name)
+            except: pass
+            
             # Bitacora DB
             try:
                 u_obj = get_user(session.CURRENT_USER)
@@ -473,7 +516,7 @@ class EquiposTab(QWidget):
 
     def generar_excel_equipos(self, data=None):
         if data is None:
-            data = list_equipos_by_direccion(self.direccion_filter) if self.direccion_filter else list_equipos()
+            data = list_equipo_rows(self.direccion_filter)
         from datetime import datetime
         fecha_gen = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         temp_table = QTableWidget(0, 6)
@@ -492,6 +535,11 @@ class EquiposTab(QWidget):
             dir_name = direccion_nombre(self.direccion_filter)
             add_log("Generar Excel Equipos", f"Archivo: {fn}", dir_name)
             
+            # Registro de documentos generados
+            try:
+                register_documento(fn, "Excel Equipos", dir_name)
+            except: pass
+            
             # Bitacora DB
             try:
                 u_obj = get_user(session.CURRENT_USER)
@@ -525,13 +573,8 @@ class EquiposTab(QWidget):
         r = self.table.currentRow()
         if r < 0:
             return None
-        # Buscar el ID por código interno (ahora en columna 1)
-        codigo_sel = self.table.item(r, 1).text()
-        data = list_equipos_by_direccion(self.direccion_filter) if self.direccion_filter else list_equipos()
-        for e in data:
-            if e.codigo_interno == codigo_sel:
-                return e.id
-        return None
+        # El ID viaja en la columna Código (no hace falta volver a consultar la lista)
+        return self.table.item(r, 0).data(Qt.ItemDataRole.UserRole)
 
     def _update_header(self):
         if not self.direccion_filter:
@@ -558,7 +601,7 @@ class EquiposTab(QWidget):
         if self.direccion_filter:
             vals["direccion_id"] = self.direccion_filter
         try:
-            add_equipo({
+            new_id = add_equipo({
                 **vals,
                 "fecha_alta": date.today(),
             })
@@ -568,17 +611,11 @@ class EquiposTab(QWidget):
         except Exception as e:
             QMessageBox.critical(self, "Error", f"No se pudo agregar el equipo.\n{e}")
             return
-        self.refresh()
-        # seleccionar el creado
-        try:
-            for r in range(self.table.rowCount()):
-                it = self.table.item(r, 1)
-                if it and it.text() == vals["codigo_interno"]:
-                    self.table.selectRow(r)
-                    self.on_select(r, 0)
-                    break
-        except Exception:
-            pass
+        # La fila ya se agregó vía on_data_changed; seleccionar el creado
+        r = self.row_of(new_id)
+        if r >= 0:
+            self.table.selectRow(r)
+            self.on_select(r, 0)
         dir_name = direccion_nombre(vals.get("direccion_id") or self.direccion_filter)
         add_log("Agregar Equipo", f"Código: {vals['codigo_interno']}, Descripción: {vals['descripcion']}", dir_name)
         
@@ -593,72 +630,95 @@ class EquiposTab(QWidget):
         id_ = self.current_id()
         if not id_:
             return
-        # reunir datos actuales desde la tabla
-        r = self.table.currentRow()
+        # Tras un conflicto se vuelve a abrir el editor con los datos actuales
+        while self._edit_equipo(id_):
+            pass
+
+    def _edit_equipo(self, id_) -> bool:
+        """Un ciclo de edición; True si otro usuario guardó antes y hay que reintentar."""
+        # Datos actuales (y su versión) desde la BD: el guardado se confirma contra ellos
+        old = get_equipo(id_)
+        if not old:
+            return False
         cur = {
-            "codigo_interno": self.table.item(r, 1).text() if self.table.item(r, 1) else "",
-            "descripcion": self.table.item(r, 2).text() if self.table.item(r, 2) else "",
-            "marca": self.table.item(r, 3).text() if self.table.item(r, 3) else "",
-            "modelo": self.table.item(r, 4).text() if self.table.item(r, 4) else "",
-            "nro_serie": self.table.item(r, 5).text() if self.table.item(r, 5) else "",
-            "estado": self.table.item(r, 6).text() if self.table.item(r, 6) else "optimo",
-            "direccion_id": self.direccion_filter or (self.dir.currentData() if hasattr(self, 'dir') else None),
+            "codigo_interno": old.codigo_interno or "",
+            "descripcion": old.descripcion or "",
+            "marca": old.marca or "",
+            "modelo": old.modelo or "",
+            "nro_serie": old.nro_serie or "",
+            "estado": old.estado or "optimo",
+            "direccion_id": self.direccion_filter or old.direccion_id,
         }
         dlg = EquipoDialog(direccion_filter=self.direccion_filter, data=cur)
         if dlg.exec() != QDialog.DialogCode.Accepted:
-            return
+            return False
         vals = dlg.values()
         if self.direccion_filter:
             vals["direccion_id"] = self.direccion_filter
         try:
-            old = get_equipo(id_)
-            dir_name = direccion_nombre(vals.get("direccion_id") or old.direccion_id or self.direccion_filter)
-            current_codigo = vals.get("codigo_interno", old.codigo_interno)
-            changes = []
-            for k, v in vals.items():
-                old_v = getattr(old, k)
-                if old_v != v:
-                    field_name = {
-                        'codigo_interno': 'Código',
-                        'descripcion': 'Desc',
-                        'marca': 'Marca',
-                        'modelo': 'Modelo',
-                        'nro_serie': 'Serie',
-                        'estado': 'Estado',
-                        'direccion_id': 'Dirección ID'
-                    }.get(k, k)
-                    changes.append(f"{field_name}: '{old_v}'->'{v}'")
-
-            if changes:
-                change_str = ", ".join(changes)
-                add_log("Editar Equipo", f"Equipo {current_codigo}: {change_str}", dir_name)
-                
-                # Bitacora DB
-                try:
-                    u_obj = get_user(session.CURRENT_USER)
-                    if u_obj:
-                        add_bitacora_log(u_obj.id, "Editar Equipo", f"Equipo {current_codigo}: {change_str}", "Equipos")
-                except: pass
-
-            update_equipo(id_, vals)
-            
+            update_equipo(id_, vals, version=old.version)
+        except ConflictError:
+            return self._reload_after_conflict(id_)
         except IntegrityError:
             QMessageBox.warning(self, "Código duplicado", "Ya existe un Equipo con ese código interno.")
-            return
+            return False
         except Exception as e:
             QMessageBox.critical(self, "Error", f"No se pudo actualizar el equipo.\n{e}")
-            return
-        self.refresh()
-        grandparent = self.parent().parent()
-        if hasattr(grandparent, 'refresh'):
-            grandparent.refresh()
+            return False
+
+        dir_name = direccion_nombre(vals.get("direccion_id") or old.direccion_id or self.direccion_filter)
+        current_codigo = vals.get("codigo_interno", old.codigo_interno)
+        changes = []
+        for k, v in vals.items():
+            old_v = getattr(old, k)
+            if old_v != v:
+                field_name = {
+                    'codigo_interno': 'Código',
+                    'descripcion': 'Desc',
+                    'marca': 'Marca',
+                    'modelo': 'Modelo',
+                    'nro_serie': 'Serie',
+                    'estado': 'Estado',
+                    'direccion_id': 'Dirección ID'
+                }.get(k, k)
+                changes.append(f"{field_name}: '{old_v}'->'{v}'")
+
+        if changes:
+            change_str = ", ".join(changes)
+            add_log("Editar Equipo", f"Equipo {current_codigo}: {change_str}", dir_name)
+
+            # Bitacora DB
+            try:
+                u_obj = get_user(session.CURRENT_USER)
+                if u_obj:
+                    add_bitacora_log(u_obj.id, "Editar Equipo", f"Equipo {current_codigo}: {change_str}", "Equipos")
+            except: pass
+        return False
+
+    def _reload_after_conflict(self, id_) -> bool:
+        """Otro usuario guardó (o eliminó) el equipo mientras se editaba: mostrar lo actual.
+
+        Devuelve True si el equipo sigue existiendo y el editor debe reabrirse.
+        """
+        current = get_equipo(id_)
+        self.on_data_changed(ChangeEvent("equipo", UPDATE if current else DELETE, (id_,)))
+        if not current:
+            QMessageBox.warning(self, "Registro eliminado", "Otro usuario eliminó este equipo mientras lo editaba.")
+            return False
+        QMessageBox.warning(self, "Registro modificado",
+                            "Otro usuario modificó este equipo mientras lo editaba.\n"
+                            "Se cargaron los datos actuales; revise los cambios y vuelva a guardar.")
+        r = self.row_of(id_)
+        if r >= 0:
+            self.table.selectRow(r)
+        return True
 
     def on_delete(self):
         id_ = self.current_id()
         if not id_:
             QMessageBox.information(self, "Selección requerida", "Selecciona un equipo para eliminar.")
             return
-        codigo = self.table.item(self.table.currentRow(), 1).text()
+        codigo = self.table.item(self.table.currentRow(), 0).text()
         # Solo usuarios NO administradores deben solicitar permisos extra
         if session.CURRENT_USER != "DI-ADMIN":
             auth = AdminAuthDialog(self, "Para eliminar equipos se requieren permisos de administrador.")
@@ -678,8 +738,6 @@ class EquiposTab(QWidget):
                 if u_obj:
                     add_bitacora_log(u_obj.id, "Eliminar Equipo", f"Eliminó el equipo: {codigo} de {dir_name}", "Equipos")
             except: pass
-            
-        self.refresh()
 
     def on_select(self, r, c):
         pass
@@ -1,25 +1,138 @@
 
 import os
-import json
-from datetime import datetime
 from PyQt6.QtWidgets import (
-    QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
-    QHeaderView, QPushButton, QLabel, QMessageBox
+    QWidget, QVBoxLayout, QHBoxLayout, QTableView, QHeaderView, QPushButton, QLabel,
+    QMessageBox, QStyledItemDelegate, QStyleOptionButton, QStyle, QApplication
 )
-from PyQt6.QtCore import Qt, QTimer
-from PyQt6.QtGui import QDesktopServices, QUrl
+from PyQt6.QtCore import (
+    Qt, QTimer, QUrl, QObject, QThread, QEvent, QFileSystemWatcher,
+    QAbstractTableModel, QModelIndex, pyqtSignal
+)
+from PyQt6.QtGui import QDesktopServices, QColor
+
+from ...config import DOCUMENTOS_PAGE_SIZE
+from ...data.repositories import list_documentos, set_documentos_existencia, clear_documentos
+
+# Directorios vigilados como máximo (QFileSystemWatcher consume un descriptor por ruta)
+MAX_WATCHED_DIRS = 256
+RESCAN_INTERVAL_MS = 60_000
+
+
+def _format_size(n: int) -> str:
+    size = float(n or 0)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return ""
+
+
+class DocumentosModel(QAbstractTableModel):
+    """Modelo ligero sobre las filas de la tabla documento (sin widgets por fila)."""
+    HEADERS = ["Fecha", "Tipo", "Dirección", "Archivo", "Tamaño", "Acción"]
+    COL_OPEN = 5
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._row_by_id: dict[int, int] = {}
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self._rows = list(rows)
+        self._row_by_id = {d.id: i for i, d in enumerate(self._rows)}
+        self.endResetModel()
+
+    def row_at(self, row: int):
+        return self._rows[row] if 0 <= row < len(self._rows) else None
+
+    def entries(self) -> list[tuple[int, str, int]]:
+        return [(d.id, d.ruta, d.existe) for d in self._rows]
+
+    def apply_exists(self, changes: dict[int, bool]):
+        # Solo se notifican las filas afectadas
+        for id_, exists in changes.items():
+            r = self._row_by_id.get(id_)
+            if r is None:
+                continue
+            self._rows[r].existe = int(exists)
+            self.dataChanged.emit(self.index(r, 0), self.index(r, self.COL_OPEN))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        d = self._rows[index.row()]
+        col = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if col == 0:
+                return d.fecha.strftime("%Y-%m-%d %H:%M:%S") if d.fecha else ""
+            if col == 1:
+                return d.tipo_reporte or ""
+            if col == 2:
+                return d.direccion or ""
+            if col == 3:
+                return d.ruta
+            if col == 4:
+                return _format_size(d.tamano)
+            if col == self.COL_OPEN:
+                return "Abrir" if d.existe else "No existe"
+        elif role == Qt.ItemDataRole.ToolTipRole and col == 3:
+            return f"{d.ruta}\nSHA-256: {d.hash_sha256 or '-'}"
+        elif role == Qt.ItemDataRole.ForegroundRole and not d.existe and col != self.COL_OPEN:
+            return QColor("#64748B")
+        return None
+
+
+class OpenFileDelegate(QStyledItemDelegate):
+    """Dibuja un botón 'Abrir' en la celda y emite la fila al hacer clic."""
+    open_requested = pyqtSignal(int)
+
+    def paint(self, painter, option, index):
+        model = index.model()
+        row = model.row_at(index.row()) if hasattr(model, "row_at") else None
+        btn = QStyleOptionButton()
+        btn.rect = option.rect.adjusted(4, 3, -4, -3)
+        btn.text = index.data() or ""
+        btn.state = QStyle.StateFlag.State_Enabled if (row and row.existe) else QStyle.StateFlag.State_None
+        QApplication.style().drawControl(QStyle.ControlElement.CE_PushButton, btn, painter)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.Type.MouseButtonRelease and event.button() == Qt.MouseButton.LeftButton:
+            self.open_requested.emit(index.row())
+            return True
+        return super().editorEvent(event, model, option, index)
 
-from ...utils import load_icon
-from ...logger import LOGS_FILE
 
-# Archivo de historial junto al de logs
-HISTORY_FILE = os.path.join(os.path.dirname(LOGS_FILE) if LOGS_FILE else os.path.dirname(os.path.abspath(__file__)), "pdf_logs.json")
+class _ExistenceScanner(QObject):
+    """Verifica la existencia de los archivos fuera del hilo de la interfaz."""
+    scanned = pyqtSignal(dict)
+
+    def scan(self, entries):
+        changes = {}
+        for id_, path, existe in entries:
+            now = os.path.exists(path)
+            if now != bool(existe):
+                changes[id_] = now
+        if changes:
+            self.scanned.emit(changes)
+
 
 class PdfRegistrosTab(QWidget):
+    scan_requested = pyqtSignal(list)
+
     def __init__(self):
         super().__init__()
-        self.registros = []
-        self.load_history()
 
         layout = QVBoxLayout(self)
         layout.setContentsMargins(24, 24, 24, 24)
@@ -30,7 +143,7 @@ class PdfRegistrosTab(QWidget):
         lbl.setProperty("role", "heading")
         header.addWidget(lbl)
         header.addStretch(1)
-        
+
         btn_clear = QPushButton("Limpiar Historial")
         btn_clear.clicked.connect(self.clear_history)
         header.addWidget(btn_clear)
@@ -38,81 +151,123 @@ class PdfRegistrosTab(QWidget):
         btn_refresh = QPushButton("Refrescar")
         btn_refresh.clicked.connect(self.refresh_table)
         header.addWidget(btn_refresh)
-        
+
         layout.addLayout(header)
 
-        self.table = QTableWidget(0, 3)
-        self.table.setHorizontalHeaderLabels(["Fecha", "Archivo", "Acción"])
-        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
-        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.ResizeToContents)
+        # Solo los documentos más recientes; "Mostrar más" amplía de a una página
+        self.limit = DOCUMENTOS_PAGE_SIZE
+
+        self.model = DocumentosModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeMode.Stretch)
+        self.table.horizontalHeader().setSectionResizeMode(DocumentosModel.COL_OPEN, QHeaderView.ResizeMode.Fixed)
+        self.table.setColumnWidth(0, 150)
+        self.table.setColumnWidth(DocumentosModel.COL_OPEN, 100)
+        self.table.verticalHeader().setDefaultSectionSize(32)
         self.table.setAlternatingRowColors(True)
-        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
+        self.delegate = OpenFileDelegate(self.table)
+        self.delegate.open_requested.connect(self.open_row)
+        self.table.setItemDelegateForColumn(DocumentosModel.COL_OPEN, self.delegate)
         layout.addWidget(self.table)
 
-        # Timer para auto-recarga (opcional, lo dejamos manual o al mostrar)
+        self.btn_more = QPushButton("Mostrar más")
+        self.btn_more.clicked.connect(self.show_more)
+        layout.addWidget(self.btn_more, alignment=Qt.AlignmentFlag.AlignCenter)
+
+        # Verificación de existencia en segundo plano
+        self._scan_thread = QThread(self)
+        self._scanner = _ExistenceScanner()
+        self._scanner.moveToThread(self._scan_thread)
+        self.scan_requested.connect(self._scanner.scan)
+        self._scanner.scanned.connect(self._on_scanned)
+        self._scan_thread.start()
+        app = QApplication.instance()
+        if app:
+            app.aboutToQuit.connect(self._stop_scanner)
+
+        # Cambios en las carpetas de destino disparan un re-escaneo inmediato
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self._on_directory_changed)
+
+        # Re-escaneo periódico por si el watcher no cubre todas las carpetas
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.check_new_files)
-        # self.timer.start(5000) 
+        self.timer.start(RESCAN_INTERVAL_MS)
         self.refresh_table()
 
-    def load_history(self):
-        if os.path.exists(HISTORY_FILE):
-            try:
-                with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-                    self.registros = json.load(f)
-            except:
-                self.registros = []
-        else:
-            self.registros = []
-
-    def save_history(self):
+    def refresh_table(self):
+        # Una fila de más indica si queda otra página
+        rows = list_documentos(self.limit + 1)
+        self.btn_more.setVisible(len(rows) > self.limit)
+        self.model.set_rows(rows[:self.limit])
+        self._watch_directories()
+        self.check_new_files()
+
+    def show_more(self):
+        self.limit += DOCUMENTOS_PAGE_SIZE
+        self.refresh_table()
+
+    def _watch_directories(self):
+        dirs = []
+        seen = set()
+        for _, path, _ in self.model.entries():
+            d = os.path.dirname(path)
+            if d and d not in seen:
+                seen.add(d)
+                dirs.append(d)
+                if len(dirs) >= MAX_WATCHED_DIRS:
+                    break
+        current = set(self.watcher.directories())
+        stale = [d for d in current if d not in seen]
+        if stale:
+            self.watcher.removePaths(stale)
+        new = [d for d in dirs if d not in current and os.path.isdir(d)]
+        if new:
+            self.watcher.addPaths(new)
+
+    def _on_directory_changed(self, directory: str):
+        entries = [e for e in self.model.entries() if os.path.dirname(e[1]) == directory]
+        if entries:
+            self.scan_requested.emit(entries)
+
+    def _on_scanned(self, changes: dict):
         try:
-            with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-                json.dump(self.registros, f, ensure_ascii=False, indent=4)
-        except:
+            set_documentos_existencia(changes)
+        except Exception:
             pass
+        self.model.apply_exists(changes)
 
-    def add_record(self, filepath):
-        # Esta función puede ser llamada desde otros módulos si se desea centralizar
-        rec = {
-            "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "archivo": filepath
-        }
-        self.registros.insert(0, rec)
-        self.save_history()
-        self.refresh_table()
+    def open_row(self, row: int):
+        d = self.model.row_at(row)
+        if d is not None:
+            self.open_file(d.ruta, bool(d.existe))
 
-    def refresh_table(self):
-        self.load_history()
-        self.table.setRowCount(0)
-        for i, reg in enumerate(self.registros):
-            row = self.table.rowCount()
-            self.table.insertRow(row)
-            self.table.setItem(row, 0, QTableWidgetItem(reg.get("fecha", "")))
-            
-            path_item = QTableWidgetItem(reg.get("archivo", ""))
-            path_item.setToolTip(reg.get("archivo", ""))
-            self.table.setItem(row, 1, path_item)
-
-            btn = QPushButton("Abrir")
-            btn.setCursor(Qt.CursorShape.PointingHandCursor)
-            # Usar lambda con valor default para capturar el path actual
-            btn.clicked.connect(lambda _, p=reg.get("archivo", ""): self.open_file(p))
-            self.table.setCellWidget(row, 2, btn)
-
-    def open_file(self, path):
-        if os.path.exists(path):
-            QDesktopServices.openUrl(QUrl.fromLocalFile(path))
-        else:
-            QMessageBox.warning(self, "Error", f"El archivo ya no existe:\n{path}")
+    def open_file(self, path, exists: bool = True):
+        # Se usa el indicador mantenido por el escáner; no se toca el disco en el hilo de la UI
+        if exists and QDesktopServices.openUrl(QUrl.fromLocalFile(path)):
+            return
+        QMessageBox.warning(self, "Error", f"El archivo ya no existe:\n{path}")
+        self.check_new_files()
 
     def clear_history(self):
         if QMessageBox.question(self, "Limpiar", "¿Borrar todo el historial?") == QMessageBox.StandardButton.Yes:
-            self.registros = []
-            self.save_history()
+            clear_documentos()
             self.refresh_table()
 
     def check_new_files(self):
-        # Lógica para detectar nuevos archivos externos si fuera necesario
-        pass
+        entries = self.model.entries()
+        if entries:
+            self.scan_requested.emit(entries)
+
+    def _stop_scanner(self):
+        if self._scan_thread.isRunning():
+            self._scan_thread.quit()
+            self._scan_thread.wait(2000)
+
+    def closeEvent(self, event):
+        self._stop_scanner()
+        super().closeEvent(event)
@@ -13,9 +13,11 @@ from ... import session
 from ...config import DIRECCIONES_HIERARCHY
 from ...data.repositories import (
     list_direcciones, add_direccion, update_direccion, delete_direccion,
-    add_bitacora_log, get_user
+    add_bitacora_log, get_user, ConflictError
 )
 from ...utils import load_icon
+from ..changes import change_notifier
+from ...data.normalize import fold
 
 class HomeTab(QWidget):
     open_direccion = pyqtSignal(int)
@@ -87,6 +89,11 @@ class HomeTab(QWidget):
         main_layout.addWidget(scroll)
 
         self.refresh()
+        change_notifier().changed.connect(self.on_data_changed)
+
+    def on_data_changed(self, event):
+        if event.entity == "direccion":
+            self.refresh()
 
     def refresh(self):
         # Limpiar grid
@@ -95,11 +102,11 @@ class HomeTab(QWidget):
             if item.widget():
                 item.widget().deleteLater()
 
-        term = self.search.text().strip().lower()
+        term = fold(self.search.text().strip())
         data = list_direcciones()
         
-        # Filtrar
-        filtered = [d for d in data if not term or term in (d.nombre or "").lower()]
+        # Filtrar (subcadena en memoria: las tarjetas ya muestran todas las direcciones)
+        filtered = [d for d in data if not term or term in fold(d.nombre)]
         
         # Ordenar (Jerarquía hardcoded en config)
         pos_map = {name: i for i, name in enumerate(DIRECCIONES_HIERARCHY)}
@@ -232,8 +239,6 @@ class HomeTab(QWidget):
                     if u_obj:
                         add_bitacora_log(u_obj.id, "Crear Dirección", f"Creó la dirección: {nombre}", "Direcciones")
                 except: pass
-                
-                self.refresh()
 
     def on_update_card(self, d_id):
         # Restriction: Only Admin or Authed
@@ -253,7 +258,15 @@ class HomeTab(QWidget):
         if dlg.exec() == QDialog.DialogCode.Accepted:
             new_name = dlg.values()
             if new_name:
-                update_direccion(d_id, new_name, 1) # Activo por defecto 1 al editar nombre
+                try:
+                    # Activo por defecto 1 al editar nombre; confirmado contra la versión leída
+                    update_direccion(d_id, new_name, 1, version=direc.version)
+                except ConflictError:
+                    QMessageBox.warning(self, "Dirección modificada",
+                                        "Otro usuario modificó o eliminó esta dirección mientras la editaba.\n"
+                                        "Se cargaron los datos actuales; vuelva a intentarlo.")
+                    self.refresh()
+                    return
                 add_log("Dirección actualizada", f"ID: {d_id} -> {new_name}")
                 
                 # Bitacora
@@ -262,8 +275,6 @@ class HomeTab(QWidget):
                     if u_obj:
                         add_bitacora_log(u_obj.id, "Editar Dirección", f"Editó dirección: {old_name} -> {new_name}", "Direcciones")
                 except: pass
-                
-                self.refresh()
 
     def on_delete_card(self, d_id):
         # Restriction: Only Admin or Authed
@@ -291,6 +302,4 @@ class HomeTab(QWidget):
                 if u_obj:
                     add_bitacora_log(u_obj.id, "Eliminar Dirección", f"Eliminó la dirección: {dir_name}", "Direcciones")
             except: pass
-            
-            self.refresh()
 
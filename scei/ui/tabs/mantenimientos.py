@@ -5,20 +5,22 @@ from PyQt6.QtWidgets import (
     QTableWidget, QTableWidgetItem, QHeaderView, QComboBox, QDateEdit,
     QFileDialog, QMessageBox, QDialog
 )
-from PyQt6.QtCore import Qt, QDate, QTimer
+from PyQt6.QtCore import Qt, QDate
 
-from ...utils import load_icon, export_table_to_excel, NumericTableWidgetItem
+from ...utils import load_icon, export_table_to_excel, SortKeyItem, natural_key, number_rows
 from ...logger import add_log
 from ... import session
 from ..helpers import direccion_nombre
 from ..dialogs import GenerateDialog, MantenimientoDialog, RecordDetailDialog, AdminAuthDialog
 from ...data.repositories import (
-    list_direcciones, list_equipos, list_mantenimientos, 
-    list_mantenimientos_by_direccion, add_mantenimiento,
+    list_direcciones, list_mantenimiento_rows, get_mantenimiento_rows, add_mantenimiento,
     update_mantenimiento, delete_mantenimiento, get_mantenimiento,
     get_equipo, update_equipo,
-    add_bitacora_log, get_user
+    add_bitacora_log, get_user, register_documento, ConflictError
 )
+from ...data.events import ChangeEvent, UPDATE, DELETE
+from ...data.normalize import fold
+from ..changes import change_notifier
 from sqlalchemy.exc import IntegrityError
 
 class MantenimientoTab(QWidget):
@@ -26,16 +28,15 @@ class MantenimientoTab(QWidget):
         super().__init__()
         self.departamento_filter = None
         self.direccion_filter = direccion_id
-        self.table = QTableWidget(0, 7)
+        self.table = QTableWidget(0, 6)
         self.table.setHorizontalHeaderLabels([
-            "N°", "Equipo (Cód)","Desc. Equipo","Fecha","Observación","Estado Eq.","Dirección"
+            "Equipo (Cód)","Desc. Equipo","Fecha","Observación","Estado Eq.","Dirección"
         ])
         self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
         self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
         self.table.setAlternatingRowColors(True)
         self.table.setShowGrid(False)  # Desactivar grid nativo para estilo CSS premium
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents) # Columna N°
         self.table.setSortingEnabled(True)
 
         self.search = QLineEdit(); self.search.setPlaceholderText("Buscar por código/descripción/obs…")
@@ -134,7 +135,7 @@ class MantenimientoTab(QWidget):
         table_l.setContentsMargins(0, 0, 0, 0)
         
         self.table.setShowGrid(False)
-        self.table.verticalHeader().setVisible(False)
+        number_rows(self.table)
         self.table.setFrameShape(QTableWidget.Shape.NoFrame)
         
         table_l.addWidget(self.table)
@@ -147,24 +148,7 @@ class MantenimientoTab(QWidget):
         self.refresh()
         self.search.textChanged.connect(self.refresh)
         self.table.itemDoubleClicked.connect(self.on_edit)
-        # Auto-renumerar al ordenar
-        self.table.horizontalHeader().sectionClicked.connect(self.schedule_renumber)
-        self.table.horizontalHeader().sortIndicatorChanged.connect(self.schedule_renumber)
-
-    def schedule_renumber(self):
-        QTimer.singleShot(50, self.update_row_numbers)
-
-    def update_row_numbers(self):
-        if self.table.model(): self.table.model().blockSignals(True)
-        for r in range(self.table.rowCount()):
-            item = self.table.item(r, 0)
-            if not item:
-                item = NumericTableWidgetItem(str(r + 1))
-                self.table.setItem(r, 0, item)
-            else:
-                item.setText(str(r + 1))
-            item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-        if self.table.model(): self.table.model().blockSignals(False)
+        change_notifier().changed.connect(self.on_data_changed)
 
     def _update_header(self):
         if not self.direccion_filter:
@@ -173,46 +157,100 @@ class MantenimientoTab(QWidget):
         name = direccion_nombre(self.direccion_filter)
         self.header.setText(f"Dirección: {name}")
 
+    def _matches(self, m, term: str) -> bool:
+        # Subcadena sobre las filas ya cargadas, como en EquiposTab._matches
+        if self.direccion_filter and m.direccion_id != self.direccion_filter:
+            return False
+        if not term:
+            return True
+        blob = (f"{m.equipo_codigo} {m.equipo_descripcion} {m.descripcion or ''} "
+                f"{m.fecha} {m.estado_equipo or ''} {m.direccion_nombre}")
+        return term in fold(blob)
+
+    def _fill_row(self, r, m):
+        cells = (
+            (m.equipo_codigo, natural_key(m.equipo_codigo)),
+            (m.equipo_descripcion, None),
+            (str(m.fecha), m.fecha or date.min),
+            (m.descripcion or "", None),
+            (m.estado_equipo or "", None),
+            (m.direccion_nombre, None),
+        )
+        for c, (text, key) in enumerate(cells):
+            item = self.table.item(r, c)
+            if item is None:
+                self.table.setItem(r, c, SortKeyItem(text, key))
+            else:
+                item.set_value(text, key)
+        # La primera columna guarda el ID
+        if m.id not in self._items:
+            item = self.table.item(r, 0)
+            item.setData(Qt.ItemDataRole.UserRole, m.id)
+            self._items[m.id] = item
+
     def refresh(self):
-        if self.direccion_filter:
-            data = list_mantenimientos_by_direccion(self.direccion_filter)
-        else:
-            data = list_mantenimientos()
+        data = list_mantenimiento_rows(self.direccion_filter)
         was_sorting = self.table.isSortingEnabled()
         if was_sorting:
             self.table.setSortingEnabled(False)
         self.table.setRowCount(0)
-        term = self.search.text().strip().lower()
+        self._items = {}
+        term = fold(self.search.text().strip())
         for m in data:
-            eq = m.equipo
-            eq_code = eq.codigo_interno if eq else ""
-            eq_desc = eq.descripcion if eq else ""
-            obs = m.descripcion or ""
-            date_str = str(m.fecha)
-            est = m.estado_equipo or ""
-            d_id = eq.direccion_id if eq else None
-            dir_name = direccion_nombre(d_id)
-            blob = f"{eq_code} {eq_desc} {obs} {date_str} {est} {dir_name}".lower()
-            if term and term not in blob:
+            if not self._matches(m, term):
                 continue
             r = self.table.rowCount()
-            r = self.table.rowCount()
             self.table.insertRow(r)
-            # N° (y guardamos ID aqui)
-            item_n = NumericTableWidgetItem(str(r + 1))
-            item_n.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.table.setItem(r, 0, item_n)
-            self.table.item(r, 0).setData(Qt.ItemDataRole.UserRole, m.id)
-
-            self.table.setItem(r, 1, QTableWidgetItem(eq_code))
-            self.table.setItem(r, 2, QTableWidgetItem(eq_desc))
-            self.table.setItem(r, 3, QTableWidgetItem(date_str))
-            self.table.setItem(r, 4, QTableWidgetItem(obs))
-            self.table.setItem(r, 5, QTableWidgetItem(est))
-            self.table.setItem(r, 6, QTableWidgetItem(dir_name))
+            self._fill_row(r, m)
+        if was_sorting:
+            self.table.setSortingEnabled(True)
+
+    def on_data_changed(self, event):
+        """Parcha solo las filas afectadas por un cambio de mantenimientos o equipos."""
+        if event.entity == "direccion":
+            self._update_header()
+            if event.op == UPDATE:
+                # Cambia el nombre mostrado en la columna Dirección
+                self.refresh()
+            return
+        if event.entity not in ("mantenimiento", "equipo"):
+            return
+        if event.entity == "equipo" and event.op == DELETE:
+            # Los mantenimientos borrados en cascada llegan como su propio evento
+            return
+        if not event.ids:
+            self.refresh()
+            return
+        was_sorting = self.table.isSortingEnabled()
+        if was_sorting:
+            self.table.setSortingEnabled(False)
+        if event.entity == "mantenimiento" and event.op == DELETE:
+            for id_ in event.ids:
+                self._remove_row(id_)
+        else:
+            if event.entity == "equipo":
+                rows = get_mantenimiento_rows(equipo_ids=event.ids)
+            else:
+                rows = get_mantenimiento_rows(ids=event.ids)
+            term = fold(self.search.text().strip())
+            for m in rows:
+                item = self._items.get(m.id)
+                if not self._matches(m, term):
+                    self._remove_row(m.id)
+                elif item is not None:
+                    self._fill_row(item.row(), m)
+                else:
+                    # Mantenimiento nuevo, o de un equipo que pasó a esta dirección
+                    r = self.table.rowCount()
+                    self.table.insertRow(r)
+                    self._fill_row(r, m)
         if was_sorting:
             self.table.setSortingEnabled(True)
-        self.update_row_numbers()
+
+    def _remove_row(self, id_) -> None:
+        item = self._items.pop(id_, None)
+        if item is not None:
+            self.table.removeRow(item.row())
 
     def current_id(self):
         r = self.table.currentRow()
@@ -231,11 +269,7 @@ class MantenimientoTab(QWidget):
         try:
             old_eq = get_equipo(vals["equipo_id"])
             if old_eq:
-                m_estado = vals.get("estado_equipo")
-                # update equipo state
-                if m_estado and old_eq.estado != m_estado:
-                    update_equipo(old_eq.id, {"estado": m_estado})
-                    add_log("Actualización automática de estado", f"Equipo {old_eq.codigo_interno} pasa a {m_estado}", direccion_nombre(old_eq.direccion_id))
+                self._sync_equipo_estado(old_eq, vals.get("estado_equipo"), direccion_nombre(old_eq.direccion_id))
             add_mantenimiento(vals)
             dir_name = direccion_nombre(old_eq.direccion_id) if old_eq else ""
             add_log("Agregar Mantenimiento", f"Equipo: {old_eq.codigo_interno if old_eq else '?'}", dir_name)
@@ -249,15 +283,20 @@ class MantenimientoTab(QWidget):
             
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Fallo al agregar: {e}")
-        self.refresh()
 
     def on_edit(self):
         id_ = self.current_id()
         if not id_:
             return
+        # Tras un conflicto se vuelve a abrir el editor con los datos actuales
+        while self._edit_mantenimiento(id_):
+            pass
+
+    def _edit_mantenimiento(self, id_) -> bool:
+        """Un ciclo de edición; True si otro usuario guardó antes y hay que reintentar."""
         mant = get_mantenimiento(id_)
         if not mant:
-            return
+            return False
         data = {
             "equipo_id": mant.equipo_id,
             "fecha": mant.fecha,
@@ -266,8 +305,16 @@ class MantenimientoTab(QWidget):
         }
         dlg = MantenimientoDialog(direccion_filter=self.direccion_filter, data=data)
         if dlg.exec() != QDialog.DialogCode.Accepted:
-            return
+            return False
         vals = dlg.values()
+        try:
+            # Confirmado contra la versión leída al abrir el diálogo
+            update_mantenimiento(id_, vals, version=mant.version)
+        except ConflictError:
+            return self._reload_after_conflict(id_)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Fallo al actualizar: {e}")
+            return False
         try:
             eq = get_equipo(vals['equipo_id'])
             # Detect changes for log
@@ -294,15 +341,45 @@ class MantenimientoTab(QWidget):
                         )
                 except Exception: pass
 
-            update_mantenimiento(id_, vals)
             # update equipo state if changed
-            if eq and vals.get("estado_equipo") and eq.estado != vals["estado_equipo"]:
-                update_equipo(eq.id, {"estado": vals["estado_equipo"]})
-                add_log("Actualización automática de estado", f"Equipo {eq.codigo_interno} pasa a {vals['estado_equipo']}", dir_name)
+            if eq:
+                self._sync_equipo_estado(eq, vals.get("estado_equipo"), dir_name)
             
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Fallo al actualizar: {e}")
-        self.refresh()
+        return False
+
+    def _sync_equipo_estado(self, eq, estado, dir_name) -> None:
+        """Actualización automática del estado del equipo, confirmada contra la versión leída."""
+        if not estado or eq.estado == estado:
+            return
+        try:
+            update_equipo(eq.id, {"estado": estado}, version=eq.version)
+        except ConflictError:
+            QMessageBox.warning(self, "Equipo modificado",
+                                f"Otro usuario modificó el equipo {eq.codigo_interno} al mismo tiempo; "
+                                f"su estado no se cambió a '{estado}'. Revíselo en Equipos.")
+            return
+        add_log("Actualización automática de estado", f"Equipo {eq.codigo_interno} pasa a {estado}", dir_name)
+
+    def _reload_after_conflict(self, id_) -> bool:
+        """Otro usuario guardó (o eliminó) el registro mientras se editaba: mostrar lo actual.
+
+        Devuelve True si el registro sigue existiendo y el editor debe reabrirse.
+        """
+        current = get_mantenimiento(id_)
+        self.on_data_changed(ChangeEvent("mantenimiento", UPDATE if current else DELETE, (id_,)))
+        if not current:
+            QMessageBox.warning(self, "Registro eliminado",
+                                "Otro usuario eliminó este mantenimiento mientras lo editaba.")
+            return False
+        QMessageBox.warning(self, "Registro modificado",
+                            "Otro usuario modificó este mantenimiento mientras lo editaba.\n"
+                            "Se cargaron los datos actuales; revise los cambios y vuelva a guardar.")
+        item = self._items.get(id_)
+        if item is not None:
+            self.table.selectRow(item.row())
+        return True
 
     def on_delete(self):
         id_ = self.current_id()
@@ -329,8 +406,6 @@ class MantenimientoTab(QWidget):
                 if u_obj:
                     add_bitacora_log(u_obj.id, "Eliminar Mantenimiento", f"Del equipo {eq_code} en {dir_name}", "Mantenimientos")
             except: pass
-            
-            self.refresh()
 
     def on_generate(self):
         # Solo usuarios NO administradores deben solicitar permisos extra
@@ -344,7 +419,7 @@ class MantenimientoTab(QWidget):
         if dlg.exec() != QDialog.DialogCode.Accepted:
             return
         vals = dlg.values()
-        data = list_mantenimientos_by_direccion(self.direccion_filter) if self.direccion_filter else list_mantenimientos()
+        data = list_mantenimiento_rows(self.direccion_filter)
         # Filter
         f_from = vals.get('from')
         f_to = vals.get('to')
@@ -357,11 +432,10 @@ class MantenimientoTab(QWidget):
             if f_from and str(m.fecha) < f_from: continue
             if f_to and str(m.fecha) > f_to: continue
             if f_est and m.estado_equipo != f_est: continue
-            eq = m.equipo
             if f_eq:
-                blob = f"{eq.codigo_interno or ''} {eq.descripcion or ''} {eq.marca or ''} {eq.modelo or ''} {eq.nro_serie or ''}".lower()
-                if f_eq.lower() not in blob: continue
-            if f_obs and f_obs.lower() not in (m.descripcion or '').lower(): continue
+                blob = f"{m.equipo_codigo} {m.equipo_descripcion} {m.equipo_marca} {m.equipo_modelo} {m.equipo_serie}"
+                if fold(f_eq) not in fold(blob): continue
+            if f_obs and fold(f_obs) not in fold(m.descripcion): continue
             filtered.append(m)
 
         t = vals.get('type', '').lower()
@@ -401,9 +475,8 @@ class MantenimientoTab(QWidget):
         <tr><th>N°</th><th>Equipo</th><th>Fecha</th><th>Observación</th><th>Estado Eq.</th><th>Dirección</th></tr>
         """
         for i, m in enumerate(data, 1):
-            eq = m.equipo
-            eq_str = f"{eq.codigo_interno or ''} ({eq.descripcion or ''})" if eq else "-"
-            dir_name = direccion_nombre(eq.direccion_id) if eq else ""
+            eq_str = f"{m.equipo_codigo} ({m.equipo_descripcion})" if m.equipo_codigo else "-"
+            dir_name = m.direccion_nombre
             html += f"<tr><td>{i}</td><td>{eq_str}</td><td>{m.fecha}</td><td>{m.descripcion or ''}</td><td>{m.estado_equipo or ''}</td><td>{dir_name}</td></tr>"
         html += f"</table><div class='summary'>Registros: {len(data)}</div></body></html>"
         
@@ -417,6 +490,11 @@ class MantenimientoTab(QWidget):
             dir_name = direccion_nombre(self.direccion_filter)
             add_log("Generar PDF Mantenimientos", f"Archivo: {fn}", dir_name)
             
+            # Registro de documentos generados
+            try:
+                register_documento(fn, "PDF Mantenimientos", dir_name)
+            except: pass
+            
             # Bitacora DB
             try:
                 u_obj = get_user(session.CURRENT_USER)
@@ -455,9 +533,8 @@ class MantenimientoTab(QWidget):
             _shade(table.rows[0].cells[i], "34495E")
             
         for i, m in enumerate(data, 1):
-            eq = m.equipo
-            eq_str = f"{eq.codigo_interno}" if eq else "-"
-            dir_name = direccion_nombre(eq.direccion_id) if eq else ""
+            eq_str = m.equipo_codigo or "-"
+            dir_name = m.direccion_nombre
             cells = table.add_row().cells
             vals = [str(i), eq_str, str(m.fecha), str(m.descripcion or ''), str(m.estado_equipo or ''), dir_name]
             for j, v in enumerate(vals): cells[j].text = v
@@ -471,6 +548,11 @@ class MantenimientoTab(QWidget):
             dir_name = direccion_nombre(self.direccion_filter)
             add_log("Generar Word Mantenimientos", f"Archivo: {fn}", dir_name)
             
+            # Registro de documentos generados
+            try:
+                register_documento(fn, "Word Mantenimientos", dir_name)
+            except: pass
+            
             # Bitacora DB
             try:
                 u_obj = get_user(session.CURRENT_USER)
@@ -483,11 +565,9 @@ class MantenimientoTab(QWidget):
     def generar_excel_mantenimientos(self, data):
         rows = []
         for m in data:
-            eq = m.equipo
-            dir_name = direccion_nombre(eq.direccion_id) if eq else ""
             rows.append([
-                eq.codigo_interno if eq else "", eq.descripcion if eq else "", 
-                str(m.fecha), m.descripcion or "", m.estado_equipo or "", dir_name
+                m.equipo_codigo, m.equipo_descripcion,
+                str(m.fecha), m.descripcion or "", m.estado_equipo or "", m.direccion_nombre
             ])
         tmp = QTableWidget(len(rows), 6)
         tmp.setHorizontalHeaderLabels(["Equipo","Desc. Equipo","Fecha","Obs","Estado","Dirección"])
@@ -501,6 +581,11 @@ class MantenimientoTab(QWidget):
             dir_name = direccion_nombre(self.direccion_filter)
             add_log("Generar Excel Mantenimientos", f"Archivo: {fn}", dir_name)
             
+            # Registro de documentos generados
+            try:
+                register_documento(fn, "Excel Mantenimientos", dir_name)
+            except: pass
+            
             # Bitacora DB
             try:
                 u_obj = get_user(session.CURRENT_USER)
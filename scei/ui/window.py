@@ -14,6 +14,13 @@ from .tabs.analitica import AnaliticaTab
 from .tabs.bitacora import BitacoraTab
 from .tabs.config import ConfigTab
 from .tabs.container import ModulosTab
+from .tabs.equipos import EquiposTab
+from .tabs.mantenimientos import MantenimientoTab
+
+# Con SCEI_PROFILE_UI=1, main.py las instrumenta antes de crear la ventana (ver profiler.py).
+# PdfRegistrosTab (tabs/history.py) no figura porque ninguna vista la monta: si se
+# agrega a la navegación, sumarla aquí.
+TAB_CLASSES = [HomeTab, AnaliticaTab, BitacoraTab, ConfigTab, ModulosTab, EquiposTab, MantenimientoTab]
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -130,7 +137,7 @@ class MainWindow(QMainWindow):
         elif key == "analitica":
             self.main_stack.setCurrentWidget(self.analitica_tab)
             self.topbar.set_title("Analítica")
-            self.analitica_tab.refresh()
+            self.analitica_tab.refresh_if_stale()
         elif key == "bitacora":
             self.main_stack.setCurrentWidget(self.bitacora_tab)
             self.topbar.set_title("Bitácora")
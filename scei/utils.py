@@ -1,17 +1,52 @@
 import os
+import re
 import sys
 from pathlib import Path
-from PyQt6.QtWidgets import QApplication, QTableWidget, QMessageBox, QTableWidgetItem
+from PyQt6.QtWidgets import QApplication, QTableWidget, QMessageBox, QTableWidgetItem, QHeaderView
 from PyQt6.QtGui import QIcon, QPixmap, QPainter, QPainterPath, QColor
 from PyQt6.QtCore import Qt
 
-class NumericTableWidgetItem(QTableWidgetItem):
+_DIGITS = re.compile(r"(\d+)")
+
+
+def natural_key(text: str | None) -> tuple:
+    """Clave de orden "natural": EQ-2 antes que EQ-10, sin distinguir mayúsculas."""
+    parts = _DIGITS.split((text or "").casefold())
+    return tuple((0, int(p), "") if p.isdigit() else (1, 0, p) for p in parts)
+
+
+class SortKeyItem(QTableWidgetItem):
+    """Celda que ordena por una clave propia (fecha, número, texto natural) y no por el
+    texto mostrado. Sin clave ordena por el texto sin distinguir mayúsculas."""
+
+    def __init__(self, text: str = "", key=None):
+        super().__init__(text)
+        self.sort_key = key
+
+    def set_value(self, text: str, key=None) -> None:
+        self.setText(text)
+        self.sort_key = key
+
+    def _key(self):
+        key = getattr(self, "sort_key", None)
+        return key if key is not None else self.text().casefold()
+
     def __lt__(self, other):
         try:
-            return int(self.text()) < int(other.text())
-        except ValueError:
+            return self._key() < other._key()
+        except (AttributeError, TypeError):
             return self.text() < other.text()
 
+
+def number_rows(table: QTableWidget) -> None:
+    """Numeración 1..N en el encabezado vertical: la da la posición visual de la fila,
+    así que sigue correcta después de ordenar, insertar o borrar sin recorrer la tabla."""
+    header = table.verticalHeader()
+    header.setVisible(True)
+    header.setDefaultAlignment(Qt.AlignmentFlag.AlignCenter)
+    header.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+    header.setHighlightSections(False)
+
 def resource_path(*parts: str) -> str:
     # Resolver ruta de recursos compatible con entorno congelado (PyInstaller)
     # Asumimos que este archivo está en scei/utils.py
@@ -62,7 +97,7 @@ def apply_light_theme(app: QApplication) -> None:
         with open(theme_path, "r", encoding="utf-8") as f:
             app.setStyleSheet(f.read())
 
-def export_table_to_excel(table: QTableWidget, filename: str) -> None:
+def export_table_to_excel(table: QTableWidget, filename: str, row_numbers: bool = False) -> None:
     try:
         from openpyxl import Workbook
         from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
@@ -75,10 +110,13 @@ def export_table_to_excel(table: QTableWidget, filename: str) -> None:
     ws.title = "Reporte"
 
     headers = [table.horizontalHeaderItem(c).text() for c in range(table.columnCount())]
+    if row_numbers:
+        # La numeración vive en el encabezado vertical, no en una columna
+        headers.insert(0, "N°")
     ws.append(headers)
 
     for r in range(table.rowCount()):
-        row = []
+        row = [r + 1] if row_numbers else []
         for c in range(table.columnCount()):
             item = table.item(r, c)
             row.append(item.text() if item else "")
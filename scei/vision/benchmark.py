@@ -0,0 +1,144 @@
+"""
+Banco de pruebas biométrico sin cámara ni usuario: reproduce imágenes o un video por el
+mismo código que FaceLoginDialog (detección reducida + ROI, normalización y una predicción
+por rostro contra la galería) y reporta latencias por etapa, FPS y falsos
+aceptados/rechazados con el umbral actual.
+
+    python -m scei.vision.benchmark carpeta/            # subcarpetas = usuario esperado
+    python -m scei.vision.benchmark clip.mp4 --expect DI-ADMIN --json resultado.json
+
+En una carpeta etiquetada, cada subcarpeta lleva el username esperado; las llamadas
+"desconocido" (o cualquier usuario sin biometría) cuentan como impostores.
+"""
+import os
+import time
+
+from ..stats import percentile
+from .detection import TrackingDetector
+from .gallery import MATCH_THRESHOLD, recognize_faces
+
+UNKNOWN_LABEL = "desconocido"
+STAGES = ("captura", "deteccion", "reconocimiento", "total")
+
+
+def labeled_sources(path: str, expect: str | None = None):
+    """[(username esperado o None, fuente, es_video)] para una carpeta, carpeta etiquetada o video."""
+    from .sources import ImageDirSource, VideoFileSource
+    if not os.path.isdir(path):
+        return [(expect, VideoFileSource(path, realtime=False), True)]
+    subdirs = sorted(d for d in os.listdir(path) if os.path.isdir(os.path.join(path, d)))
+    if not subdirs or expect is not None:
+        return [(expect, ImageDirSource(path), False)]
+    return [
+        (None if d == UNKNOWN_LABEL else d, ImageDirSource(os.path.join(path, d)), False)
+        for d in subdirs
+    ]
+
+
+def run_benchmark(sources, gallery, engine, threshold: float = MATCH_THRESHOLD,
+                  mirror: bool = True, max_frames: int | None = None) -> dict:
+    """Procesa cada fuente cuadro a cuadro y acumula tiempos y decisiones."""
+    import cv2
+    ids_by_name = {name: uid for uid, name in gallery.usernames.items()}
+    times = {k: [] for k in STAGES}
+    counts = {
+        "cuadros": 0, "sin_rostro": 0, "rostros": 0,
+        "genuinos": 0, "impostores": 0,
+        "aceptados_correctos": 0, "falsos_aceptados": 0,
+        "falsos_rechazados": 0, "rechazos_correctos": 0,
+    }
+    wall = time.perf_counter()
+    for expected, source, is_video in sources:
+        expected_id = ids_by_name.get(expected) if expected else None
+        # Video: seguimiento como en el login; imágenes sueltas: búsqueda completa en cada una
+        tracker = TrackingDetector(engine) if is_video else TrackingDetector(engine, redetect_every=0)
+        try:
+            while max_frames is None or counts["cuadros"] < max_frames:
+                t0 = time.perf_counter()
+                ok, frame = source.read()
+                if not ok or frame is None:
+                    break
+                t1 = time.perf_counter()
+                if mirror:
+                    frame = cv2.flip(frame, 1)
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                faces = tracker.detect(gray)
+                t2 = time.perf_counter()
+                found_id, _ = recognize_faces(gallery, gray, faces, threshold) if faces else (None, None)
+                t3 = time.perf_counter()
+
+                for k, ms in zip(STAGES, (t1 - t0, t2 - t1, t3 - t2, t3 - t0)):
+                    times[k].append(ms * 1000.0)
+                counts["cuadros"] += 1
+                counts["rostros"] += len(faces)
+                if not faces:
+                    counts["sin_rostro"] += 1
+                    if expected_id is not None:
+                        counts["falsos_rechazados"] += 1
+                        counts["genuinos"] += 1
+                    continue
+                if expected_id is not None:
+                    counts["genuinos"] += 1
+                    if found_id == expected_id:
+                        counts["aceptados_correctos"] += 1
+                    elif found_id is None:
+                        counts["falsos_rechazados"] += 1
+                    else:
+                        counts["falsos_aceptados"] += 1
+                else:
+                    counts["impostores"] += 1
+                    if found_id is None:
+                        counts["rechazos_correctos"] += 1
+                    else:
+                        counts["falsos_aceptados"] += 1
+        finally:
+            source.release()
+    wall = time.perf_counter() - wall
+
+    def stats(ms):
+        return {
+            "media_ms": round(sum(ms) / len(ms), 3) if ms else 0.0,
+            **{f"p{p}_ms": round(percentile(ms, p), 3) for p in (50, 90, 95, 99)},
+        }
+
+    n = counts["cuadros"]
+    intentos = counts["genuinos"] + counts["impostores"]
+    return {
+        "umbral": threshold,
+        "usuarios_galeria": len(gallery),
+        "etapas": {k: stats(v) for k, v in times.items()},
+        "fps": round(n / wall, 2) if wall > 0 else 0.0,
+        **counts,
+        "far": round(counts["falsos_aceptados"] / intentos, 4) if intentos else None,
+        "frr": round(counts["falsos_rechazados"] / counts["genuinos"], 4) if counts["genuinos"] else None,
+    }
+
+
+def main(argv=None):
+    import argparse
+    import json
+    from .engine import get_face_engine
+    from .gallery import get_gallery
+    parser = argparse.ArgumentParser(description="Mide el reconocimiento facial sobre imágenes o video grabado.")
+    parser.add_argument("source", help="Video, carpeta de imágenes o carpeta con subcarpetas por usuario")
+    parser.add_argument("--expect", help="Usuario esperado (video o carpeta sin subcarpetas)")
+    parser.add_argument("--threshold", type=float, default=MATCH_THRESHOLD)
+    parser.add_argument("--no-mirror", action="store_true", help="No espejar los cuadros (el login sí lo hace)")
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--json", help="Guardar resultado en este archivo")
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(
+        labeled_sources(args.source, args.expect), get_gallery(), get_face_engine(),
+        threshold=args.threshold, mirror=not args.no_mirror, max_frames=args.max_frames,
+    )
+    result["fuente"] = args.source
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
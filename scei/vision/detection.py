@@ -0,0 +1,168 @@
+"""
+Estrategia de detección para video: cascade sobre el cuadro reducido y, entre
+detecciones completas, búsqueda solo en una región ampliada alrededor del último
+rostro. Cada `redetect_every` cuadros (o si se pierde el rostro) se vuelve a
+buscar en todo el cuadro.
+
+Comparación contra la detección actual (cuadro completo en cada tick):
+    python -m scei.vision.detection grabacion.mp4 [--json salida.json]
+"""
+import time
+
+from ..stats import percentile
+
+DETECT_SCALE = 0.5      # factor de reducción para la búsqueda completa
+ROI_PAD = 0.5           # margen alrededor del último rostro (fracción de su tamaño)
+REDETECT_EVERY = 8      # cuadros entre búsquedas completas
+
+
+class TrackingDetector:
+    """Detector con estado por flujo de video (una instancia por cámara/diálogo)."""
+
+    def __init__(self, engine, scale: float = DETECT_SCALE, pad: float = ROI_PAD,
+                 redetect_every: int = REDETECT_EVERY):
+        self.engine = engine
+        self.scale = scale
+        self.pad = pad
+        self.redetect_every = redetect_every
+        self.full_detections = 0
+        self.roi_detections = 0
+        self.reset()
+
+    def reset(self) -> None:
+        self.last: list[tuple[int, int, int, int]] = []
+        self._since_full = 0
+
+    def _detect_scaled(self, gray, ox: int = 0, oy: int = 0):
+        import cv2
+        if self.scale < 1.0:
+            small = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        else:
+            small = gray
+        inv = 1.0 / self.scale
+        return [
+            (int(x * inv) + ox, int(y * inv) + oy, int(w * inv), int(h * inv))
+            for (x, y, w, h) in self.engine.detect(small)
+        ]
+
+    def _full(self, gray):
+        self.full_detections += 1
+        self._since_full = 0
+        return self._detect_scaled(gray)
+
+    def detect(self, gray):
+        if not self.last or self._since_full >= self.redetect_every:
+            boxes = self._full(gray)
+        else:
+            self.roi_detections += 1
+            self._since_full += 1
+            H, W = gray.shape[:2]
+            boxes = []
+            for (x, y, w, h) in self.last:
+                px, py = int(w * self.pad), int(h * self.pad)
+                x0, y0 = max(0, x - px), max(0, y - py)
+                x1, y1 = min(W, x + w + px), min(H, y + h + py)
+                boxes.extend(self._detect_scaled(gray[y0:y1, x0:x1], x0, y0))
+            if not boxes:
+                # Rostro perdido: búsqueda completa inmediata
+                boxes = self._full(gray)
+        self.last = boxes
+        return boxes
+
+
+def _iou(a, b) -> float:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+def compare_with_baseline(source, engine=None, mirror: bool = False, max_frames: int | None = None,
+                          iou_threshold: float = 0.3, **tracker_kwargs) -> dict:
+    """Ejecuta ambas estrategias sobre la misma fuente y compara tiempo y recall.
+
+    El recall se mide contra la detección completa actual: fracción de rostros que
+    esta encuentra y que la estrategia reducida+ROI también encuentra (IoU >= umbral).
+    """
+    import cv2
+    from .engine import get_face_engine
+    engine = engine or get_face_engine()
+    tracker = TrackingDetector(engine, **tracker_kwargs)
+    base_ms, track_ms = [], []
+    base_faces = matched = 0
+    frames = 0
+    try:
+        while max_frames is None or frames < max_frames:
+            ok, frame = source.read()
+            if not ok or frame is None:
+                break
+            if mirror:
+                frame = cv2.flip(frame, 1)
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+            t0 = time.perf_counter()
+            ref = engine.detect(gray)
+            t1 = time.perf_counter()
+            got = tracker.detect(gray)
+            t2 = time.perf_counter()
+
+            base_ms.append((t1 - t0) * 1000.0)
+            track_ms.append((t2 - t1) * 1000.0)
+            base_faces += len(ref)
+            matched += sum(1 for r in ref if any(_iou(r, g) >= iou_threshold for g in got))
+            frames += 1
+    finally:
+        source.release()
+
+    def stats(ms):
+        return {
+            "media_ms": round(sum(ms) / len(ms), 3) if ms else 0.0,
+            "p50_ms": round(percentile(ms, 50), 3),
+            "p95_ms": round(percentile(ms, 95), 3),
+        }
+
+    base, track = stats(base_ms), stats(track_ms)
+    return {
+        "cuadros": frames,
+        "actual": base,
+        "reducida_roi": track,
+        "aceleracion": round(base["media_ms"] / track["media_ms"], 2) if track["media_ms"] else None,
+        "recall": round(matched / base_faces, 4) if base_faces else None,
+        "rostros_referencia": base_faces,
+        "busquedas_completas": tracker.full_detections,
+        "busquedas_roi": tracker.roi_detections,
+        "parametros": {"scale": tracker.scale, "pad": tracker.pad, "redetect_every": tracker.redetect_every},
+    }
+
+
+def main(argv=None):
+    import argparse
+    import json
+    from .sources import open_source, VideoFileSource
+    parser = argparse.ArgumentParser(description="Compara la detección actual con la reducida + ROI.")
+    parser.add_argument("source", help="Video grabado o carpeta de imágenes")
+    parser.add_argument("--scale", type=float, default=DETECT_SCALE)
+    parser.add_argument("--pad", type=float, default=ROI_PAD)
+    parser.add_argument("--redetect-every", type=int, default=REDETECT_EVERY)
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--json", help="Guardar resultado en este archivo")
+    args = parser.parse_args(argv)
+
+    source = open_source(args.source)
+    if isinstance(source, VideoFileSource):
+        # Medición: leer tan rápido como se pueda, sin simular la cámara
+        source = VideoFileSource(args.source, realtime=False)
+    result = compare_with_baseline(source, scale=args.scale, pad=args.pad,
+                                   redetect_every=args.redetect_every, max_frames=args.max_frames)
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Motor biométrico compartido por todo el proceso.
+
+El clasificador Haar se resuelve y carga una sola vez (en segundo plano tras mostrar el
+login) y luego lo reutilizan FaceCaptureDialog y FaceLoginDialog: cada cuadro solo paga
+la detección. OpenCV se importa de forma diferida para no afectar el arranque.
+"""
+import os
+import sys
+import threading
+
+CASCADE_FN = "haarcascade_frontalface_default.xml"
+
+_engine = None
+_engine_lock = threading.Lock()
+_warm_thread: threading.Thread | None = None
+
+
+def resolve_cascade_path(cascade_fn: str = CASCADE_FN) -> str:
+    """Resuelve la ruta del haarcascade de forma robusta (también en PyInstaller)."""
+    import cv2
+    cascade_path = os.path.join(cv2.data.haarcascades, cascade_fn)
+
+    # En modo frozen onefile, a veces cv2.data.haarcascades falla o apunta mal.
+    # Intentamos buscar en _MEIPASS si existe.
+    if not os.path.exists(cascade_path):
+        if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
+            # Intento 1: root del temp
+            p1 = os.path.join(sys._MEIPASS, cascade_fn)
+            # Intento 2: dentro de cv2/data (si se incluyó así)
+            p2 = os.path.join(sys._MEIPASS, 'cv2', 'data', cascade_fn)
+            if os.path.exists(p1):
+                cascade_path = p1
+            elif os.path.exists(p2):
+                cascade_path = p2
+
+    if not os.path.exists(cascade_path):
+        # Fallback final: intentar cargar directo esperando que cv2 lo resuelva interno
+        cascade_path = cascade_fn
+    return cascade_path
+
+
+def load_cascade(cascade_path: str | None = None):
+    import cv2
+    cascade = cv2.CascadeClassifier(cascade_path or resolve_cascade_path())
+    if cascade.empty():
+        # Si falló, intentar una carga cruda por si cv2 lo tiene en built-ins
+        cascade = cv2.CascadeClassifier(cv2.data.haarcascades + CASCADE_FN)
+        if cascade.empty():
+            raise FileNotFoundError(f"No se pudo cargar el modelo Haar Cascade: {CASCADE_FN}")
+    return cascade
+
+
+class FaceEngine:
+    """Detector de rostros reutilizable. `detector` permite inyectar otro clasificador."""
+
+    def __init__(self, detector=None, scale_factor: float = 1.3, min_neighbors: int = 5):
+        self.detector = detector if detector is not None else load_cascade()
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        # CascadeClassifier no garantiza uso concurrente seguro
+        self._lock = threading.Lock()
+
+    @property
+    def face_cascade(self):
+        return self.detector
+
+    def detect(self, gray, scale_factor: float | None = None, min_neighbors: int | None = None,
+               min_size: tuple[int, int] | None = None):
+        """Devuelve los rectángulos (x, y, w, h) detectados en una imagen en escala de grises."""
+        kwargs = {}
+        if min_size:
+            kwargs["minSize"] = min_size
+        with self._lock:
+            faces = self.detector.detectMultiScale(
+                gray, scale_factor or self.scale_factor, min_neighbors or self.min_neighbors, **kwargs
+            )
+        return [tuple(int(v) for v in f) for f in faces]
+
+    def detect_frame(self, frame_bgr, mirror: bool = False):
+        """Convierte a gris (y opcionalmente espeja) un cuadro BGR; devuelve (frame, gray, faces)."""
+        import cv2
+        if mirror:
+            frame_bgr = cv2.flip(frame_bgr, 1)
+        gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+        return frame_bgr, gray, self.detect(gray)
+
+    def detect_video(self, path: str, max_frames: int | None = None, mirror: bool = False):
+        """Recorre un video grabado y produce (indice, faces) por cuadro; útil para pruebas."""
+        import cv2
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise FileNotFoundError(f"No se pudo abrir el video: {path}")
+        try:
+            i = 0
+            while max_frames is None or i < max_frames:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                _, _, faces = self.detect_frame(frame, mirror)
+                yield i, faces
+                i += 1
+        finally:
+            cap.release()
+
+
+def get_face_engine() -> FaceEngine:
+    """Instancia única del proceso; la primera llamada carga el clasificador."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = FaceEngine()
+    return _engine
+
+
+def set_face_engine(engine: FaceEngine | None) -> None:
+    global _engine
+    with _engine_lock:
+        _engine = engine
+
+
+def warm_up_async() -> threading.Thread | None:
+    """Precarga OpenCV y el clasificador en segundo plano (una sola vez)."""
+    global _warm_thread
+    if _engine is not None or (_warm_thread and _warm_thread.is_alive()):
+        return _warm_thread
+
+    def _warm():
+        try:
+            get_face_engine()
+        except Exception:
+            # Sin OpenCV o sin cascade: los diálogos informarán el error al abrirse
+            pass
+
+    _warm_thread = threading.Thread(target=_warm, name="scei-face-warmup", daemon=True)
+    _warm_thread.start()
+    return _warm_thread
@@ -0,0 +1,81 @@
+"""
+Enrolamiento facial: normalización de muestras y entrenamiento incremental.
+
+Cada muestra se recorta a un tamaño fijo y se ecualiza, y se descartan los cuadros casi
+idénticos al anterior (la cámara entrega muchos cuadros seguidos sin cambios). El modelo
+se guarda marcado como normalizado y el login aplica la misma normalización al rostro
+antes de compararlo; los modelos anteriores, sin esa marca, se siguen comparando contra
+el recorte crudo hasta que el usuario vuelva a registrar su rostro.
+"""
+SAMPLE_SIZE = (100, 100)     # ancho, alto de cada muestra normalizada
+DUPLICATE_DIFF = 3.0         # diferencia media de gris por debajo de la cual se descarta
+TRAIN_BATCH = 8              # muestras por paso de entrenamiento (para informar progreso)
+
+
+def normalize_face(roi_gray, size: tuple[int, int] = SAMPLE_SIZE):
+    """Escala el rostro a `size` y ecualiza su histograma."""
+    import cv2
+    interp = cv2.INTER_AREA if roi_gray.shape[1] > size[0] else cv2.INTER_LINEAR
+    return cv2.equalizeHist(cv2.resize(roi_gray, size, interpolation=interp))
+
+
+def is_near_duplicate(sample, previous, threshold: float = DUPLICATE_DIFF) -> bool:
+    if previous is None:
+        return False
+    import cv2
+    return float(cv2.absdiff(sample, previous).mean()) < threshold
+
+
+class SampleCollector:
+    """Acumula muestras normalizadas hasta `max_samples`, sin cuadros repetidos."""
+
+    def __init__(self, max_samples: int, size: tuple[int, int] = SAMPLE_SIZE,
+                 threshold: float = DUPLICATE_DIFF):
+        self.max_samples = max_samples
+        self.size = size
+        self.threshold = threshold
+        self.samples = []
+        self.rejected = 0
+
+    @property
+    def count(self) -> int:
+        return len(self.samples)
+
+    @property
+    def full(self) -> bool:
+        return len(self.samples) >= self.max_samples
+
+    def add(self, roi_gray) -> bool:
+        if self.full:
+            return False
+        sample = normalize_face(roi_gray, self.size)
+        if is_near_duplicate(sample, self.samples[-1] if self.samples else None, self.threshold):
+            self.rejected += 1
+            return False
+        self.samples.append(sample)
+        return True
+
+
+def train_model(samples, label: int = 1, batch: int = TRAIN_BATCH, progress=None) -> bytes:
+    """Entrena LBPH por lotes (train + update) y devuelve el modelo compacto.
+
+    `progress(hechas, total)` se llama después de cada lote.
+    """
+    import cv2
+    import numpy as np
+    from .model_format import encode_model, recognizer_params
+    if not samples:
+        raise ValueError("No hay muestras para entrenar")
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    total = len(samples)
+    for start in range(0, total, batch):
+        chunk = samples[start:start + batch]
+        labels = np.full(len(chunk), label, dtype=np.int32)
+        if start == 0:
+            recognizer.train(chunk, labels)
+        else:
+            recognizer.update(chunk, labels)
+        if progress:
+            progress(min(start + batch, total), total)
+    params = {**recognizer_params(recognizer), "normalized": True}
+    return encode_model(params, recognizer.getHistograms())
@@ -0,0 +1,127 @@
+"""
+Galería LBPH multiusuario: un único reconocedor con los histogramas de todos los
+usuarios enrolados (etiqueta = id de usuario), de modo que cada rostro detectado
+requiere una sola llamada a predict().
+
+La galería se arma a partir de los modelos compactos (ver model_format) y se cachea;
+solo se reconstruye cuando cambia el face_hash de algún usuario, y aun así solo se
+leen de la BD los modelos cuyo hash no está ya decodificado.
+"""
+import logging
+import os
+import tempfile
+import threading
+
+from .model_format import load_model, cached_model, write_lbph_model
+
+MATCH_THRESHOLD = 60   # LBPH: menor es mejor; por debajo de esto se acepta la coincidencia
+
+log = logging.getLogger("scei.vision.gallery")
+
+_gallery = None
+_gallery_lock = threading.Lock()
+
+
+class FaceGallery:
+    """Reconocedor combinado: etiquetas = ids de usuario.
+
+    Los modelos enrolados con normalize_face y los anteriores (entrenados con el recorte
+    crudo) van en reconocedores separados, y cada uno recibe el rostro preparado igual
+    que sus muestras.
+    """
+
+    def __init__(self, profiles: list[tuple[int, str, str]], fetch_blob=None, signature=None):
+        import cv2
+        import numpy as np
+        self.signature = signature
+        self._lock = threading.Lock()
+        self.usernames: dict[int, str] = {}
+        self.skipped: dict[int, str] = {}   # user_id -> motivo por el que quedó fuera
+        self.params: dict[bool, dict] = {}  # normalizado -> parámetros LBPH del grupo
+        self.recognizers: dict[bool, object] = {}
+        groups: dict[bool, tuple[list, list]] = {}
+        for user_id, username, face_hash in profiles:
+            try:
+                model = cached_model(face_hash) if face_hash else None
+                if model is None:
+                    blob = fetch_blob(user_id) if fetch_blob else None
+                    if not blob:
+                        continue
+                    model = load_model(blob, face_hash)
+                p, mat = model
+            except Exception as e:
+                # Un perfil dañado no debe impedir el login de los demás
+                self._skip(user_id, username, f"modelo ilegible: {e}")
+                continue
+            normalized = bool(p.get("normalized"))
+            expected = self.params.setdefault(normalized, p)
+            if p != expected:
+                # Un solo reconocedor = un solo juego de parámetros LBPH
+                self._skip(user_id, username, f"parámetros LBPH {p} distintos de {expected}")
+                continue
+            mats, labels = groups.setdefault(normalized, ([], []))
+            mats.append(mat)
+            labels.extend([user_id] * mat.shape[0])
+            self.usernames[user_id] = username
+
+        for normalized, (mats, labels) in groups.items():
+            # LBPHFaceRecognizer solo lee desde archivo: un temporal, una vez por reconstrucción
+            fd, path = tempfile.mkstemp(".yml")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(write_lbph_model(self.params[normalized], np.vstack(mats), labels))
+                recognizer = cv2.face.LBPHFaceRecognizer_create()
+                recognizer.read(path)
+            finally:
+                os.remove(path)
+            self.recognizers[normalized] = recognizer
+
+    def _skip(self, user_id: int, username: str, reason: str) -> None:
+        self.skipped[user_id] = reason
+        log.warning("Perfil facial de %s (id %s) fuera de la galería: %s", username, user_id, reason)
+
+    def __len__(self) -> int:
+        return len(self.usernames)
+
+    def predict(self, roi_gray) -> tuple[int | None, float]:
+        """Recorte crudo del rostro contra todos los usuarios. Devuelve (user_id, distancia).
+
+        Una llamada a predict por grupo (normalmente uno solo).
+        """
+        from .enrollment import normalize_face
+        best_id, best = None, float("inf")
+        for normalized, recognizer in self.recognizers.items():
+            roi = normalize_face(roi_gray) if normalized else roi_gray
+            with self._lock:
+                label, conf = recognizer.predict(roi)
+            if label in self.usernames and conf < best:
+                best_id, best = int(label), float(conf)
+        return best_id, best
+
+
+def recognize_faces(gallery: FaceGallery, gray, faces, threshold: float = MATCH_THRESHOLD):
+    """Mejor coincidencia entre los rostros detectados: (user_id o None, distancia)."""
+    found_id, min_conf = None, float("inf")
+    for (x, y, w, h) in faces:
+        uid, conf = gallery.predict(gray[y:y+h, x:x+w])
+        if uid is not None and conf < threshold and conf < min_conf:
+            found_id, min_conf = uid, conf
+    return found_id, min_conf
+
+
+def get_gallery() -> FaceGallery:
+    """Galería cacheada; se reconstruye solo si cambió el face_hash de algún usuario."""
+    global _gallery
+    from ..data.repositories import list_face_hashes, get_face_data
+    profiles = list_face_hashes()
+    signature = tuple((uid, h) for uid, _, h in profiles)
+    with _gallery_lock:
+        if _gallery is None or _gallery.signature != signature:
+            _gallery = FaceGallery(profiles, get_face_data, signature)
+        return _gallery
+
+
+def invalidate_gallery() -> None:
+    global _gallery
+    with _gallery_lock:
+        _gallery = None
@@ -0,0 +1,164 @@
+"""
+Formato binario compacto para los modelos LBPH guardados en user.face_data.
+
+    cabecera (20 bytes, little endian):
+        magic "SCFM" | versión u8 | radius u8 | neighbors u8 | grid_x u8 | grid_y u8
+        | banderas u8 | relleno 2 bytes | cantidad u32 | largo u32
+    cuerpo: histogramas float32 (cantidad x largo) comprimidos con zlib
+
+Todo se codifica y decodifica en memoria. Los modelos YAML anteriores (escritos con
+LBPHFaceRecognizer.save) se siguen leyendo; se reemplazan al volver a enrolar.
+
+La bandera FLAG_NORMALIZED (versión 2) marca los modelos entrenados con muestras
+normalizadas (ver enrollment.normalize_face). Los YAML y los compactos de versión 1 se
+entrenaron con el recorte crudo del rostro, así que se informan con normalized=False y
+la galería los sigue comparando contra el recorte crudo; pasan a normalizados cuando el
+usuario vuelve a registrar su rostro.
+
+Los modelos decodificados se cachean por hash del contenido (user.face_hash), así un
+usuario que no cambió no se vuelve a descomprimir en cada login.
+"""
+import hashlib
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+MAGIC = b"SCFM"
+FORMAT_VERSION = 2
+FLAG_NORMALIZED = 0x01
+_HEADER = struct.Struct("<4sB4BB2xII")   # magic, versión, radius, neighbors, grid_x, grid_y, banderas, cantidad, largo
+LBPH_DEFAULTS = {"radius": 1, "neighbors": 8, "grid_x": 8, "grid_y": 8}
+CACHE_SIZE = 64
+_NO_THRESHOLD = 1.7976931348623157e+308
+
+_cache: OrderedDict = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def model_hash(blob: bytes) -> str:
+    return hashlib.sha256(blob).hexdigest()
+
+
+def is_compact_model(blob) -> bool:
+    return bool(blob) and bytes(blob[:4]) == MAGIC
+
+
+def encode_model(params: dict, histograms) -> bytes:
+    """Serializa parámetros + histogramas (lista de 1xN o matriz) al formato compacto.
+
+    `params["normalized"]` indica si las muestras pasaron por normalize_face.
+    """
+    import numpy as np
+    if isinstance(histograms, np.ndarray):
+        mat = histograms.reshape(-1, histograms.shape[-1])
+    else:
+        mat = np.vstack([np.asarray(h).reshape(1, -1) for h in histograms])
+    mat = np.ascontiguousarray(mat, dtype="<f4")
+    header = _HEADER.pack(
+        MAGIC, FORMAT_VERSION,
+        *(int(params.get(k, LBPH_DEFAULTS[k])) for k in ("radius", "neighbors", "grid_x", "grid_y")),
+        FLAG_NORMALIZED if params.get("normalized") else 0,
+        mat.shape[0], mat.shape[1],
+    )
+    return header + zlib.compress(mat.tobytes(), 6)
+
+
+def decode_model(blob: bytes):
+    """Devuelve (parámetros + "normalized", matriz float32 cantidad x largo)."""
+    import numpy as np
+    blob = bytes(blob)
+    if len(blob) < _HEADER.size:
+        raise ValueError("Modelo biométrico truncado")
+    magic, version, radius, neighbors, grid_x, grid_y, flags, count, length = _HEADER.unpack_from(blob)
+    if magic != MAGIC:
+        raise ValueError("No es un modelo biométrico compacto")
+    if version not in (1, FORMAT_VERSION):
+        raise ValueError(f"Versión de modelo no soportada: {version}")
+    raw = zlib.decompress(blob[_HEADER.size:])
+    if len(raw) != count * length * 4:
+        raise ValueError("Modelo biométrico dañado")
+    mat = np.frombuffer(raw, dtype="<f4").reshape(count, length)
+    params = {"radius": radius, "neighbors": neighbors, "grid_x": grid_x, "grid_y": grid_y,
+              # La versión 1 no tenía banderas (relleno a cero): muestras crudas
+              "normalized": version >= 2 and bool(flags & FLAG_NORMALIZED)}
+    return params, mat
+
+
+def read_lbph_model(blob: bytes):
+    """Lee un modelo LBPH en YAML de OpenCV (formato anterior) sin pasar por disco."""
+    import cv2
+    import numpy as np
+    text = blob.decode("utf-8") if isinstance(blob, (bytes, bytearray, memoryview)) else str(blob)
+    fs = cv2.FileStorage(text, cv2.FILE_STORAGE_READ | cv2.FILE_STORAGE_MEMORY)
+    try:
+        root = fs.getNode("opencv_lbphfaces")
+        if root.empty():
+            raise ValueError("Modelo LBPH inválido")
+        params = {k: int(root.getNode(k).real()) for k in LBPH_DEFAULTS}
+        params["normalized"] = False   # el formato YAML es anterior a la normalización
+        node = root.getNode("histograms")
+        hists = [node.at(i).mat() for i in range(node.size())]
+    finally:
+        fs.release()
+    if not hists:
+        raise ValueError("Modelo LBPH sin histogramas")
+    return params, np.vstack([h.reshape(1, -1) for h in hists]).astype(np.float32)
+
+
+def write_lbph_model(params: dict, histograms, labels) -> str:
+    """Serializa histogramas + etiquetas al YAML que entiende LBPHFaceRecognizer.read()."""
+    import cv2
+    import numpy as np
+    fs = cv2.FileStorage("galeria.yml", cv2.FILE_STORAGE_WRITE | cv2.FILE_STORAGE_MEMORY)
+    fs.startWriteStruct("opencv_lbphfaces", cv2.FILE_NODE_MAP)
+    fs.write("threshold", _NO_THRESHOLD)
+    for k in ("radius", "neighbors", "grid_x", "grid_y"):
+        fs.write(k, int(params.get(k, LBPH_DEFAULTS[k])))
+    fs.startWriteStruct("histograms", cv2.FILE_NODE_SEQ)
+    for h in histograms:
+        fs.write("", np.asarray(h, dtype=np.float32).reshape(1, -1))
+    fs.endWriteStruct()
+    fs.write("labels", np.asarray(labels, dtype=np.int32).reshape(-1, 1))
+    fs.startWriteStruct("labelsInfo", cv2.FILE_NODE_SEQ)
+    fs.endWriteStruct()
+    fs.endWriteStruct()
+    return fs.releaseAndGetString()
+
+
+def load_model(blob: bytes, key: str | None = None):
+    """Decodifica (compacto o YAML) usando la caché por hash de contenido."""
+    key = key or model_hash(bytes(blob))
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    model = decode_model(blob) if is_compact_model(blob) else read_lbph_model(blob)
+    with _cache_lock:
+        _cache[key] = model
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return model
+
+
+def cached_model(key: str):
+    """Modelo ya decodificado para ese hash, o None (evita leer el blob de la BD)."""
+    with _cache_lock:
+        model = _cache.get(key)
+        if model is not None:
+            _cache.move_to_end(key)
+        return model
+
+
+def clear_model_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
+
+
+def recognizer_params(recognizer) -> dict:
+    return {
+        "radius": recognizer.getRadius(),
+        "neighbors": recognizer.getNeighbors(),
+        "grid_x": recognizer.getGridX(),
+        "grid_y": recognizer.getGridY(),
+    }
@@ -0,0 +1,168 @@
+"""
+Pipeline de captura y detección fuera del hilo de la interfaz.
+
+    fuente -> [hilo de captura] -> buffer de 1 cuadro (descarta los viejos)
+           -> [hilo de detección] -> señales Qt (vista previa anotada + resultados)
+
+La interfaz solo recibe cuadros ya anotados y construye el QImage sobre el mismo
+buffer de NumPy (sin copia); si todavía no pintó el anterior, la vista previa se omite.
+"""
+import threading
+import time
+
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtGui import QImage
+
+
+class LatestFrameSlot:
+    """Buffer de una sola posición: put() reemplaza el cuadro pendiente."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._frame = None
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, frame) -> None:
+        with self._cond:
+            if self._frame is not None:
+                self.dropped += 1
+            self._frame = frame
+            self._cond.notify()
+
+    def get(self, timeout: float | None = None):
+        """Devuelve el cuadro más reciente; None si se cerró (o venció el timeout)."""
+        with self._cond:
+            if self._frame is None and not self._closed:
+                self._cond.wait(timeout)
+            frame, self._frame = self._frame, None
+            return frame
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+
+def qimage_from_bgr(frame) -> QImage:
+    """QImage que apunta al buffer del arreglo (sin copia). Mantener vivo `frame` mientras se use."""
+    h, w = frame.shape[:2]
+    return QImage(frame.data, w, h, frame.strides[0], QImage.Format.Format_BGR888)
+
+
+class FacePipeline(QObject):
+    """Captura + detección en hilos propios.
+
+    `analyze(gray, faces, frame)` corre en el hilo de detección (reconocimiento, muestras,
+    etc.); su valor de retorno, si no es None, se emite en `result_ready`.
+    La detección usa `tracker` (por defecto cuadro reducido + ROI, ver detection.py).
+    """
+    frame_ready = pyqtSignal(object, object)   # (frame BGR anotado, lista de rostros)
+    result_ready = pyqtSignal(object)
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
+
+    def __init__(self, source, engine, analyze=None, mirror: bool = True,
+                 max_fps: float = 0.0, box_color=(0, 255, 0), tracker=None, parent=None):
+        super().__init__(parent)
+        from .detection import TrackingDetector
+        self.source = source
+        self.engine = engine
+        self.tracker = tracker if tracker is not None else TrackingDetector(engine)
+        self.analyze = analyze
+        self.mirror = mirror
+        self.min_interval = (1.0 / max_fps) if max_fps else 0.0
+        self.box_color = box_color
+        self.slot = LatestFrameSlot()
+        self.frames_captured = 0
+        self.frames_processed = 0
+        self.previews_skipped = 0
+        self._stop = threading.Event()
+        self._preview_pending = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    # --- Ciclo de vida ---
+    def start(self) -> None:
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="scei-capture", daemon=True),
+            threading.Thread(target=self._detect_loop, name="scei-detect", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+
+    def stop(self, wait: bool = True) -> None:
+        self._stop.set()
+        self.slot.close()
+        if wait:
+            for t in self._threads:
+                if t is not threading.current_thread():
+                    t.join(2.0)
+        try:
+            self.source.release()
+        except Exception:
+            pass
+
+    def is_running(self) -> bool:
+        return any(t.is_alive() for t in self._threads)
+
+    def preview_consumed(self) -> None:
+        """La interfaz avisa que ya pintó el último cuadro."""
+        self._preview_pending.clear()
+
+    # --- Hilos ---
+    def _capture_loop(self) -> None:
+        try:
+            while not self._stop.is_set():
+                ok, frame = self.source.read()
+                if not ok or frame is None:
+                    break
+                self.frames_captured += 1
+                self.slot.put(frame)
+        except Exception as e:
+            self.error.emit(str(e))
+        finally:
+            self.slot.close()
+
+    def _detect_loop(self) -> None:
+        import cv2
+        last = 0.0
+        try:
+            while not self._stop.is_set():
+                frame = self.slot.get(timeout=0.5)
+                if frame is None:
+                    if self.slot.closed:
+                        break
+                    continue
+                if self.min_interval:
+                    wait = last + self.min_interval - time.perf_counter()
+                    if wait > 0 and self._stop.wait(wait):
+                        break
+                last = time.perf_counter()
+
+                if self.mirror:
+                    frame = cv2.flip(frame, 1)
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                faces = self.tracker.detect(gray)
+                self.frames_processed += 1
+                if self.analyze is not None:
+                    result = self.analyze(gray, faces, frame)
+                    if result is not None:
+                        self.result_ready.emit(result)
+                for (x, y, w, h) in faces:
+                    cv2.rectangle(frame, (x, y), (x + w, y + h), self.box_color, 2)
+
+                if self._preview_pending.is_set():
+                    self.previews_skipped += 1
+                else:
+                    self._preview_pending.set()
+                    self.frame_ready.emit(frame, faces)
+        except Exception as e:
+            self.error.emit(str(e))
+        finally:
+            if not self._stop.is_set():
+                self.finished.emit()
@@ -0,0 +1,93 @@
+"""
+Fuentes de cuadros para el pipeline biométrico: cámara, archivo de video o carpeta de
+imágenes (estas dos últimas permiten probar sin cámara ni pantalla).
+
+Variable de entorno SCEI_CAMERA_SOURCE: índice de cámara, ruta de video o carpeta.
+"""
+import os
+import time
+
+SOURCE_ENV = "SCEI_CAMERA_SOURCE"
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+class CameraSource:
+    def __init__(self, index: int = 0):
+        import cv2
+        # Use CAP_DSHOW on Windows for faster init
+        self.cap = cv2.VideoCapture(index, cv2.CAP_DSHOW)
+        if not self.cap or not self.cap.isOpened():
+            self.cap = cv2.VideoCapture(index)
+
+    def is_opened(self) -> bool:
+        return bool(self.cap) and self.cap.isOpened()
+
+    def read(self):
+        return self.cap.read()
+
+    def release(self) -> None:
+        if self.cap:
+            self.cap.release()
+
+
+class VideoFileSource:
+    """Video grabado. Con `realtime` respeta los FPS del archivo (simula una cámara)."""
+
+    def __init__(self, path: str, realtime: bool = False):
+        import cv2
+        self.cap = cv2.VideoCapture(path)
+        fps = self.cap.get(cv2.CAP_PROP_FPS) if self.cap.isOpened() else 0
+        self.frame_interval = (1.0 / fps) if (realtime and fps and fps > 0) else 0.0
+        self._next = 0.0
+
+    def is_opened(self) -> bool:
+        return self.cap.isOpened()
+
+    def read(self):
+        if self.frame_interval:
+            now = time.perf_counter()
+            if self._next > now:
+                time.sleep(self._next - now)
+            self._next = max(now, self._next) + self.frame_interval
+        return self.cap.read()
+
+    def release(self) -> None:
+        self.cap.release()
+
+
+class ImageDirSource:
+    """Recorre en orden las imágenes de una carpeta."""
+
+    def __init__(self, path: str):
+        self.files = sorted(
+            os.path.join(path, f) for f in os.listdir(path) if f.lower().endswith(IMAGE_EXTS)
+        )
+        self._i = 0
+
+    def is_opened(self) -> bool:
+        return bool(self.files)
+
+    def read(self):
+        import cv2
+        while self._i < len(self.files):
+            frame = cv2.imread(self.files[self._i])
+            self._i += 1
+            if frame is not None:
+                return True, frame
+        return False, None
+
+    def release(self) -> None:
+        self._i = len(self.files)
+
+
+def open_source(spec: int | str | None = None):
+    """Abre la fuente indicada (o la de SCEI_CAMERA_SOURCE, o la cámara 0)."""
+    if spec is None:
+        spec = os.environ.get(SOURCE_ENV, 0)
+    if isinstance(spec, str) and spec.isdigit():
+        spec = int(spec)
+    if isinstance(spec, int):
+        return CameraSource(spec)
+    if os.path.isdir(spec):
+        return ImageDirSource(spec)
+    return VideoFileSource(spec, realtime=True)